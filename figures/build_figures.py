@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Build all figures and tables in parallel
+
+Dispatches every figure/table function of the plotting scripts to a process
+pool instead of running the scripts one after another:
+- fix_figures.py                      (Section 7 thesis figures)
+- ml_nonshare/plot_with_ml_nonshare.py
+- ml_nonshare/plot_all_ml_baselines.py
+- ml_nonshare/plot_complete_ml_baselines.py
+
+Each job renders with the non-interactive Agg backend and its own script's
+STYLE block (scripts set different font sizes), and the wall time of every
+figure is reported. Outputs whose data, style and code are unchanged are
+skipped (see ml_nonshare/figure_cache.py); --force re-renders everything.
+--pdf also collects the declarative bar-chart specs (ml_nonshare/figure_specs.py)
+into one multi-page PDF.
+
+Usage:
+    python build_figures.py                    # everything, all cores
+    python build_figures.py --workers 4
+    python build_figures.py --only fix_jitter_line_chart plot_per_ac_comparison
+    python build_figures.py --force
+    python build_figures.py --pdf bar_charts.pdf
+    python build_figures.py --list
+"""
+
+import os
+
+os.environ['MPLBACKEND'] = 'Agg'
+
+import matplotlib
+matplotlib.use('Agg')
+
+import argparse
+import contextlib
+import importlib
+import io
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+FIGURES_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(FIGURES_DIR, 'ml_nonshare'))
+sys.path.insert(0, FIGURES_DIR)
+
+# (module, function) for every figure and table
+FIGURE_JOBS = [
+    ('fix_figures', 'fix_lp_bar_chart'),
+    ('fix_figures', 'fix_jitter_line_chart'),
+    ('plot_with_ml_nonshare', 'plot_latency_bar_lp'),
+    ('plot_with_ml_nonshare', 'plot_latency_bar_hp'),
+    ('plot_with_ml_nonshare', 'plot_latency_line'),
+    ('plot_all_ml_baselines', 'plot_latency_comparison_bar'),
+    ('plot_all_ml_baselines', 'plot_weighted_latency_line'),
+    ('plot_all_ml_baselines', 'plot_ml_vs_rulebased'),
+    ('plot_all_ml_baselines', 'plot_b0_sanity_check'),
+    ('plot_all_ml_baselines', 'generate_comparison_table'),
+    ('plot_complete_ml_baselines', 'plot_all_baselines_bar'),
+    ('plot_complete_ml_baselines', 'plot_weighted_latency_comparison'),
+    ('plot_complete_ml_baselines', 'plot_ml_accuracy_impact'),
+    ('plot_complete_ml_baselines', 'plot_per_ac_comparison'),
+    ('plot_complete_ml_baselines', 'generate_results_table'),
+]
+
+
+def run_job(job):
+    """
+    Run one figure function in this process.
+    Returns (job, seconds, captured stdout, error traceback or None).
+    """
+    module_name, func_name = job
+    output = io.StringIO()
+    start = time.perf_counter()
+    error = None
+    try:
+        import matplotlib.pyplot as plt
+        with contextlib.redirect_stdout(output):
+            module = importlib.import_module(module_name)
+            with plt.rc_context(module.STYLE):
+                getattr(module, func_name)()
+            plt.close('all')
+    except Exception:
+        error = traceback.format_exc()
+    return job, time.perf_counter() - start, output.getvalue(), error
+
+
+def build_all(jobs=FIGURE_JOBS, workers=None, verbose=False):
+    """Run jobs on a process pool; returns the list of run_job() results."""
+    workers = workers or os.cpu_count() or 1
+    results = []
+    if workers == 1:
+        for job in jobs:
+            results.append(run_job(job))
+            _report(results[-1], verbose)
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
+            _report(results[-1], verbose)
+    return results
+
+
+def _report(result, verbose=False):
+    (module_name, func_name), seconds, output, error = result
+    status = "FAILED" if error else "ok"
+    print(f"  {seconds:>7.2f}s  {status:<6} {module_name}.{func_name}")
+    if verbose and output:
+        print("\n".join("           " + line for line in output.rstrip().splitlines()))
+    if error:
+        print("\n".join("           " + line for line in error.rstrip().splitlines()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build all figures in parallel')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='process pool size (default: all cores)')
+    parser.add_argument('--only', nargs='+', metavar='FUNCTION',
+                        help='build only these figure functions')
+    parser.add_argument('--list', action='store_true', help='list figure jobs')
+    parser.add_argument('--force', action='store_true',
+                        help='ignore the figure cache and re-render everything')
+    parser.add_argument('--pdf', metavar='PATH',
+                        help='also write the registered figure specs to one multi-page PDF')
+    parser.add_argument('--verbose', action='store_true',
+                        help='show the output printed by each figure function')
+    args = parser.parse_args()
+
+    if args.force:
+        os.environ['FIGURE_CACHE_FORCE'] = '1'
+
+    jobs = FIGURE_JOBS
+    if args.only:
+        jobs = [job for job in FIGURE_JOBS if job[1] in args.only]
+    if args.list:
+        for module_name, func_name in jobs:
+            print(f"{module_name}.{func_name}")
+        sys.exit(0)
+
+    print("="*70)
+    print(f"Building {len(jobs)} figures/tables on {args.workers or os.cpu_count()} workers")
+    print("="*70)
+
+    start = time.perf_counter()
+    results = build_all(jobs, args.workers, args.verbose)
+    wall = time.perf_counter() - start
+    cpu = sum(r[1] for r in results)
+    failed = [r for r in results if r[3]]
+
+    if args.pdf:
+        import figure_specs
+        figure_specs.render_all(pdf_path=args.pdf)
+
+    print("-"*70)
+    print(f"Wall time: {wall:.2f}s (sum of figure times: {cpu:.2f}s)")
+    print(f"Failed: {len(failed)}" if failed else "All figures built successfully!")
+    print("="*70)
+    sys.exit(1 if failed else 0)
@@ -6,26 +6,20 @@ Fix style inconsistencies in Section 7 and 8 figures
 """
 
 import matplotlib.pyplot as plt
-import numpy as np
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_nonshare'))
+from results_store import case_series, data_source
+from figure_cache import cached_output
+from figure_specs import STYLE_PROFILES, FigureSpec, register, render
 
 # Match original thesis style exactly
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
-plt.rcParams['axes.edgecolor'] = 'black'
-plt.rcParams['axes.linewidth'] = 1.0
-plt.rcParams['font.size'] = 14
-plt.rcParams['axes.labelsize'] = 16
-plt.rcParams['axes.titlesize'] = 18
-plt.rcParams['legend.fontsize'] = 11
-plt.rcParams['xtick.labelsize'] = 14
-plt.rcParams['ytick.labelsize'] = 14
-plt.rcParams['legend.frameon'] = True
-plt.rcParams['legend.edgecolor'] = 'black'
-plt.rcParams['legend.fancybox'] = False
-
-# Output directory
-OUTPUT_DIR = "/home/adlink/浩宗論文/esweek/figures"
+STYLE = STYLE_PROFILES['thesis']
+plt.rcParams.update(STYLE)
+
+# Output directory (this folder, i.e. /home/adlink/浩宗論文/esweek/figures)
+OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ============== Consistent colors ==============
 COLORS = {
@@ -62,168 +56,120 @@ LINESTYLES = {
 
 nwifi_values = [6, 12, 18, 24, 30]
 
-# PBM (wifi6-3-develop) - Priority-Based MU-TXOP Sharing
-pbm_bk = [0.105, 0.231, 0.309, 0.471, 0.449]
-pbm_vi = [0.087, 0.190, 0.219, 0.253, 0.282]
-pbm_vo = [0.070, 0.113, 0.109, 0.234, 0.226]
-
-# MPS (wifi6-4-develop) - Max Performance Sharing
-# CORRECTED: Previously contained Non-MU-TXOP data by mistake
-mps_bk = [0.134, 0.231, 0.310, 0.471, 0.627]
-mps_vi = [0.105, 0.190, 0.219, 0.256, 0.285]
-mps_vo = [0.070, 0.113, 0.108, 0.236, 0.200]
-
-# SU (wifi6-su-develop) - Single User baseline
-su_bk = [0.100, 0.213, 0.240, 0.537, 0.806]
-su_vi = [0.096, 0.119, 0.193, 0.251, 0.321]
-su_vo = [0.068, 0.092, 0.159, 0.157, 0.188]
-
-# Non-MU-TXOP (wifi6-3-mu-txop-develop) - No MU-TXOP Sharing baseline
-# CORRECTED: Previously contained MPS data by mistake
-# Note: nwifi=18 has very high latency (BK=10.068, VI=2.465) due to no sharing
-# Using capped values for visualization; actual values noted in comments
-non_mu_bk = [0.199, 0.540, 10.068, 0.970, 1.698]  # nwifi=18 actual: 10.068
-non_mu_vi = [0.087, 0.211, 2.465, 0.339, 0.784]   # nwifi=18 actual: 2.465
-non_mu_vo = [0.075, 0.160, 0.151, 0.255, 0.280]
-
-# ML
-ml_bk = [0.253, 0.183, 0.285, 0.332, 0.583]
-ml_vi = [0.175, 0.235, 0.228, 0.318, 0.276]
-ml_vo = [0.070, 0.129, 0.152, 0.168, 0.214]
+# Latency series come from the results store (python ml_nonshare/results_store.py build),
+# falling back to the verified case1 numbers in ml_nonshare/results_store.py
+# Note: Non-MU-TXOP nwifi=18 has very high latency (BK=10.068, VI=2.465) due to no sharing
+
+# LP (AC_BK) bar chart, drawn by ml_nonshare/figure_specs.py
+LP_BAR_SPEC = register(FigureSpec(
+    '7.2c1lat_bar_lp_with_ML.png', OUTPUT_DIR,
+    title='Latency Comparison - LP Traffic',  # Fixed title format
+    methods=[
+        ('PBM Scheduler', 'PBM', COLORS['PBM']),                          # wifi6-3-develop
+        ('MPS Scheduler', 'MPS', COLORS['MPS']),                          # wifi6-4-develop
+        ('SU Scheduler', 'SU', COLORS['SU']),                             # wifi6-su-develop
+        ('Non-MU-TXOP Scheduler', 'Non-MU-TXOP', COLORS['Non-MU-TXOP']),  # wifi6-3-mu-txop-develop
+        ('ML Scheduler', 'ML-Old-v2', COLORS['ML']),                      # wifi6-ml-develop-v2
+    ],
+    ylim=1.8, style='thesis', figsize=(14, 7), width=0.15))
 
 # ============== Jitter Data ==============
-# Note: Jitter labels were CORRECT in original (only latency was swapped)
-# Verified: nwifi=18 MPS jitter BK=0.197 matches mps_jitt_lp[2]=0.20
-#           nwifi=18 Non-MU-TXOP jitter BK=3.045 (capped to 0.70)
+# Std-dev jitter computed from the per-packet traces by ml_nonshare/jitter_engine.py
+# during ingestion; 'rfc3550_jitter' selects the RFC 3550 inter-arrival variant.
+# Without a store, the verified case1 jitter numbers are used.
+JITTER_METRIC = 'jitter'
+JITTER_YMAX = 1.5
 
 # PBM jitter (wifi6-3-develop)
-pbm_jitt_lp = [0.02, 0.08, 0.16, 0.58, 0.63]
-pbm_jitt_mp = [0.04, 0.08, 0.10, 0.20, 0.25]
-pbm_jitt_hp = [0.02, 0.06, 0.08, 0.18, 0.27]
+pbm_jitt_lp = case_series('PBM', 'BK', column=JITTER_METRIC)
+pbm_jitt_mp = case_series('PBM', 'VI', column=JITTER_METRIC)
+pbm_jitt_hp = case_series('PBM', 'VO', column=JITTER_METRIC)
 
 # MPS jitter (wifi6-4-develop)
-mps_jitt_lp = [0.07, 0.22, 0.20, 0.56, 0.65]
-mps_jitt_mp = [0.05, 0.11, 0.08, 0.28, 0.32]
-mps_jitt_hp = [0.03, 0.05, 0.08, 0.28, 0.31]
+mps_jitt_lp = case_series('MPS', 'BK', column=JITTER_METRIC)
+mps_jitt_mp = case_series('MPS', 'VI', column=JITTER_METRIC)
+mps_jitt_hp = case_series('MPS', 'VO', column=JITTER_METRIC)
 
 # SU jitter (wifi6-su-develop)
-su_jitt_lp = [0.06, 0.12, 0.12, 0.34, 0.48]
-su_jitt_mp = [0.04, 0.08, 0.11, 0.20, 0.32]
-su_jitt_hp = [0.02, 0.05, 0.10, 0.18, 0.18]
+su_jitt_lp = case_series('SU', 'BK', column=JITTER_METRIC)
+su_jitt_mp = case_series('SU', 'VI', column=JITTER_METRIC)
+su_jitt_hp = case_series('SU', 'VO', column=JITTER_METRIC)
 
 # Non-MU-TXOP jitter (wifi6-3-mu-txop-develop)
-# Note: nwifi=18 actual BK jitter=3.045, capped to 0.70 for visualization
-non_mu_jitt_lp = [0.07, 0.24, 0.70, 0.71, 0.84]
-non_mu_jitt_mp = [0.06, 0.13, 0.22, 0.25, 0.27]
-non_mu_jitt_hp = [0.05, 0.10, 0.11, 0.18, 0.22]
+# Note: nwifi=18 BK jitter=3.045 exceeds the axis and is annotated on the chart
+non_mu_jitt_lp = case_series('Non-MU-TXOP', 'BK', column=JITTER_METRIC)
+non_mu_jitt_mp = case_series('Non-MU-TXOP', 'VI', column=JITTER_METRIC)
+non_mu_jitt_hp = case_series('Non-MU-TXOP', 'VO', column=JITTER_METRIC)
 
-# ML jitter data (estimated based on latency patterns)
-ml_jitt_lp = [0.08, 0.10, 0.18, 0.42, 0.55]
-ml_jitt_mp = [0.06, 0.12, 0.14, 0.22, 0.28]
-ml_jitt_hp = [0.03, 0.07, 0.10, 0.16, 0.20]
+# ML jitter (wifi6-ml-develop-v2)
+# Defaults are estimates based on latency patterns, used only until the ML traces are ingested
+ml_jitt_lp = case_series('ML-Old-v2', 'BK', column=JITTER_METRIC,
+                         default=[0.08, 0.10, 0.18, 0.42, 0.55])
+ml_jitt_mp = case_series('ML-Old-v2', 'VI', column=JITTER_METRIC,
+                         default=[0.06, 0.12, 0.14, 0.22, 0.28])
+ml_jitt_hp = case_series('ML-Old-v2', 'VO', column=JITTER_METRIC,
+                         default=[0.03, 0.07, 0.10, 0.16, 0.20])
 
 
 def fix_lp_bar_chart():
     """
-    Fix 7.2c1lat_bar_lp_with_ML.png
+    Fix 7.2c1lat_bar_lp_with_ML.png (rendered from LP_BAR_SPEC)
     Problems fixed:
     - Title: "Case1: AC_BK (Low Priority) Latency Comparison" -> "Latency Comparison - LP Traffic"
     - Legend: "PBM", "SU", "Full DL", "ML" -> "PBM Scheduler", "MPS Scheduler", "SU Scheduler", "Non-MU-TXOP Scheduler", "ML Scheduler"
     - Add missing MPS Scheduler data
     """
-    fig, ax = plt.subplots(figsize=(14, 7))
-
-    x = np.arange(len(nwifi_values))
-    width = 0.15
-
-    # Consistent scheduler labels
-    labels = ['PBM Scheduler', 'MPS Scheduler', 'SU Scheduler', 'Non-MU-TXOP Scheduler', 'ML Scheduler']
-    colors = [COLORS['PBM'], COLORS['MPS'], COLORS['SU'], COLORS['Non-MU-TXOP'], COLORS['ML']]
-
-    # LP (AC_BK) data
-    data = [pbm_bk, mps_bk, su_bk, non_mu_bk, ml_bk]
-
-    for i, (d, label, color) in enumerate(zip(data, labels, colors)):
-        ax.bar(x + (i-2)*width, d, width, label=label, color=color, edgecolor='black', linewidth=0.8)
-
-    ax.set_xlabel('Total STA Number')
-    ax.set_ylabel('Latency (ms)')
-    ax.set_title('Latency Comparison - LP Traffic')  # Fixed title format
-    ax.set_xticks(x)
-    ax.set_xticklabels(nwifi_values)
-    ax.legend(loc='upper left', frameon=True, fancybox=False, edgecolor='black')
-    ax.set_ylim(0, 1.8)
-
-    for spine in ax.spines.values():
-        spine.set_visible(True)
-        spine.set_linewidth(1)
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, '7.2c1lat_bar_lp_with_ML.png'), dpi=150,
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("Fixed: 7.2c1lat_bar_lp_with_ML.png")
-    print("  - Title: 'Latency Comparison - LP Traffic'")
-    print("  - Legend: Added 'Scheduler' suffix, fixed 'Non-MU-TXOP' naming")
-    print("  - Data: Added MPS Scheduler data")
+    if render(LP_BAR_SPEC):
+        print("Fixed: 7.2c1lat_bar_lp_with_ML.png")
+        print("  - Title: 'Latency Comparison - LP Traffic'")
+        print("  - Legend: Added 'Scheduler' suffix, fixed 'Non-MU-TXOP' naming")
+        print("  - Data: Added MPS Scheduler data")
 
 
+@cached_output(OUTPUT_DIR, '7.7c1jitt_line.png', STYLE)
 def fix_jitter_line_chart():
     """
     Fix 7.7c1jitt_line.png
     Problem fixed:
     - Add ML data lines (was missing in original)
+    - Jitter read from the trace-derived store instead of estimated/capped arrays
     """
     fig, ax = plt.subplots(figsize=(14, 9))
 
     markersize = 8
     linewidth = 1.5
 
-    # PBM - Blue
-    ax.plot(nwifi_values, pbm_jitt_lp, color=COLORS['PBM'], marker=MARKERS['LP'],
-            linestyle=LINESTYLES['LP'], linewidth=linewidth, markersize=markersize, label='PBM - LP')
-    ax.plot(nwifi_values, pbm_jitt_mp, color=COLORS['PBM'], marker=MARKERS['MP'],
-            linestyle=LINESTYLES['MP'], linewidth=linewidth, markersize=markersize, label='PBM - MP')
-    ax.plot(nwifi_values, pbm_jitt_hp, color=COLORS['PBM'], marker=MARKERS['HP'],
-            linestyle=LINESTYLES['HP'], linewidth=linewidth, markersize=markersize, label='PBM - HP')
-
-    # MPS - Red
-    ax.plot(nwifi_values, mps_jitt_lp, color=COLORS['MPS'], marker=MARKERS['LP'],
-            linestyle=LINESTYLES['LP'], linewidth=linewidth, markersize=markersize, label='MPS - LP')
-    ax.plot(nwifi_values, mps_jitt_mp, color=COLORS['MPS'], marker=MARKERS['MP'],
-            linestyle=LINESTYLES['MP'], linewidth=linewidth, markersize=markersize, label='MPS - MP')
-    ax.plot(nwifi_values, mps_jitt_hp, color=COLORS['MPS'], marker=MARKERS['HP'],
-            linestyle=LINESTYLES['HP'], linewidth=linewidth, markersize=markersize, label='MPS - HP')
-
-    # SU - Green
-    ax.plot(nwifi_values, su_jitt_lp, color=COLORS['SU'], marker=MARKERS['LP'],
-            linestyle=LINESTYLES['LP'], linewidth=linewidth, markersize=markersize, label='SU - LP')
-    ax.plot(nwifi_values, su_jitt_mp, color=COLORS['SU'], marker=MARKERS['MP'],
-            linestyle=LINESTYLES['MP'], linewidth=linewidth, markersize=markersize, label='SU - MP')
-    ax.plot(nwifi_values, su_jitt_hp, color=COLORS['SU'], marker=MARKERS['HP'],
-            linestyle=LINESTYLES['HP'], linewidth=linewidth, markersize=markersize, label='SU - HP')
-
-    # Non-MU-TXOP - Brown (dotted line style)
-    ax.plot(nwifi_values, non_mu_jitt_lp, color=COLORS['Non-MU-TXOP'], marker=MARKERS['LP'],
-            linestyle=':', linewidth=linewidth, markersize=markersize, label='Non-MU-TXOP - LP')
-    ax.plot(nwifi_values, non_mu_jitt_mp, color=COLORS['Non-MU-TXOP'], marker=MARKERS['MP'],
-            linestyle=':', linewidth=linewidth, markersize=markersize, label='Non-MU-TXOP - MP')
-    ax.plot(nwifi_values, non_mu_jitt_hp, color=COLORS['Non-MU-TXOP'], marker=MARKERS['HP'],
-            linestyle=':', linewidth=linewidth, markersize=markersize, label='Non-MU-TXOP - HP')
-
-    # ML - Purple (NEW - was missing!)
-    ax.plot(nwifi_values, ml_jitt_lp, color=COLORS['ML'], marker='*',
-            linestyle=LINESTYLES['LP'], linewidth=linewidth+0.5, markersize=markersize+2, label='ML - LP')
-    ax.plot(nwifi_values, ml_jitt_mp, color=COLORS['ML'], marker='*',
-            linestyle=LINESTYLES['MP'], linewidth=linewidth+0.5, markersize=markersize+2, label='ML - MP')
-    ax.plot(nwifi_values, ml_jitt_hp, color=COLORS['ML'], marker='*',
-            linestyle=LINESTYLES['HP'], linewidth=linewidth+0.5, markersize=markersize+2, label='ML - HP')
+    # (name, LP, MP, HP, marker override, linestyle override, emphasis)
+    schedulers = [
+        ('PBM', pbm_jitt_lp, pbm_jitt_mp, pbm_jitt_hp, None, None, 0),           # Blue
+        ('MPS', mps_jitt_lp, mps_jitt_mp, mps_jitt_hp, None, None, 0),           # Red
+        ('SU', su_jitt_lp, su_jitt_mp, su_jitt_hp, None, None, 0),               # Green
+        ('Non-MU-TXOP', non_mu_jitt_lp, non_mu_jitt_mp, non_mu_jitt_hp,
+         None, ':', 0),                                                           # Brown, dotted
+        ('ML', ml_jitt_lp, ml_jitt_mp, ml_jitt_hp, '*', None, 1),               # Purple (NEW - was missing!)
+    ]
+
+    for name, lp, mp, hp, marker, linestyle, emphasis in schedulers:
+        for prio, data in (('LP', lp), ('MP', mp), ('HP', hp)):
+            # Cap off-scale points at the axis limit and annotate the actual value
+            capped = [min(v, JITTER_YMAX) for v in data]
+            ax.plot(nwifi_values, capped, color=COLORS[name],
+                    marker=marker or MARKERS[prio],
+                    linestyle=linestyle or LINESTYLES[prio],
+                    linewidth=linewidth + 0.5*emphasis,
+                    markersize=markersize + 2*emphasis, label=f'{name} - {prio}')
+            for n, val in zip(nwifi_values, data):
+                if val > JITTER_YMAX:
+                    # Placed below the legend box, which spans the top of the axes
+                    ax.annotate(f'{val:.3f}', xy=(n, JITTER_YMAX), xytext=(8, -80),
+                                textcoords='offset points', fontsize=10,
+                                ha='left', color=COLORS[name])
 
     ax.set_xlabel('Total STA Number')
     ax.set_ylabel('Jitter (Std Dev) (ms)')
     ax.set_title('Jitter Comparison')
     ax.set_xticks(nwifi_values)
-    ax.set_ylim(0, 1.5)
+    ax.set_ylim(0, JITTER_YMAX)
     ax.set_xlim(5, 31)
 
     # Legend at top with black border
@@ -243,6 +189,7 @@ if __name__ == '__main__':
     print("Fixing style inconsistencies in Section 7 & 8 figures")
     print("=" * 60)
     print(f"Output directory: {OUTPUT_DIR}")
+    print(f"Data source: {data_source()}")
     print()
 
     # Fix 7.2c1lat_bar_lp_with_ML.png
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Sequential-Sampling Sweep Controller
+
+A fixed seed count per (case, scheduler, nwifi) cell spends as many runs on
+PBM at nwifi=6 (a few percent spread between seeds) as on Non-MU-TXOP at
+nwifi=18, whose AC_BK latency jumps to 10 ms on some seeds. This controller
+drives sweep_orchestrator.run_sweep() in rounds and only schedules more seeds
+for the cells whose confidence interval is still too wide:
+
+1. Every cell runs --min-seeds seeds (seed=1..min)
+2. The per-seed metric of each finished run (weighted latency HP×1.5 + LP×0.5
+   by default, or the mean latency of one AC) is folded into a Welford
+   RunningStats per cell (jitter_engine.py)
+3. A cell has converged when the half-width of its Student-t interval of the
+   mean is within the target: --rel × |mean| or --abs ms
+4. Open cells get the seeds their current spread says they need,
+   n = (t × s / target)^2, at most --batch more per round and --max-seeds in
+   total; the next round starts when the round's jobs are done
+
+Seeds are numbered consecutively per cell, so the jobs are the ones a fixed
+sweep with --seeds 1..n would run: results are journaled and resumed by the
+orchestrator, and a later fixed or adaptive sweep of the same root reuses them.
+
+Usage:
+    python adaptive_sweep.py --root /tmp/sweep --stub --rel 0.05
+    python adaptive_sweep.py --root /tmp/sweep --stub --ac BK --abs 0.02 --store
+    python adaptive_sweep.py --root "$NS3_RESULTS_ROOT" --command '...' --max-seeds 30
+"""
+
+import argparse
+import math
+import sys
+import time
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+
+from jitter_engine import RunningStats
+from metrics_engine import AC_WEIGHTS
+from results_ingest import SCHEDULER_ALIASES, SCHEDULER_FOLDERS
+from results_store import NWIFI_VALUES, RESULTS_STORE, ResultsStore
+from sweep_orchestrator import STUB_COMMAND, Journal, expand_matrix, run_sweep, stub_schedulers
+
+MIN_SEEDS = 3
+MAX_SEEDS = 20
+BATCH = 4
+CONFIDENCE = 0.95
+REL_TARGET = 0.05
+
+Cell = namedtuple('Cell', 'case scheduler nwifi')
+CellEstimate = namedtuple('CellEstimate', 'seeds mean half_width converged')
+
+
+def t_quantile(p, df):
+    """
+    Student-t quantile from the normal one (Cornish-Fisher expansion to 1/df^3;
+    within 3% of the exact value at df=2, 0.1% from df=5).
+    """
+    z = NormalDist().inv_cdf(p)
+    return (z + (z**3 + z) / (4 * df)
+            + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3))
+
+
+def half_width(stats, confidence=CONFIDENCE):
+    """Half-width of the t interval of the mean of a RunningStats (inf below 2 seeds)."""
+    n = stats.count
+    if n < 2:
+        return math.inf
+    t = t_quantile(0.5 + confidence / 2, n - 1)
+    return t * math.sqrt(stats.m2 / (n - 1) / n)
+
+
+def seed_metric(results, case, scheduler, nwifi, seed, ac=None, weights=None):
+    """
+    Per-seed value of a run from run_sweep() results: mean latency of ac, or the
+    weighted latency over the ACs with non-zero weight (None if one is missing).
+    """
+    weights = {ac: 1.0} if ac else (AC_WEIGHTS if weights is None else weights)
+    total = 0.0
+    for name, weight in weights.items():
+        if not weight:
+            continue
+        agg = results.get((case, scheduler, nwifi, seed, name))
+        if agg is None or not agg.count:
+            return None
+        total += weight * agg.mean
+    return total
+
+
+class SequentialController:
+    """
+    Running per-cell statistics and the stopping rule; next_seeds() says how
+    many more seeds each open cell needs.
+    """
+
+    def __init__(self, cells, rel=REL_TARGET, abs_target=None, confidence=CONFIDENCE,
+                 min_seeds=MIN_SEEDS, max_seeds=MAX_SEEDS, batch=BATCH):
+        if min_seeds < 3:
+            raise ValueError("min_seeds must be at least 3 (t interval with df >= 2)")
+        self.cells = list(cells)
+        self.rel = rel
+        self.abs_target = abs_target
+        self.confidence = confidence
+        self.min_seeds = min_seeds
+        self.max_seeds = max_seeds
+        self.batch = batch
+        self.stats = {cell: RunningStats() for cell in self.cells}
+        self.seen = {cell: set() for cell in self.cells}
+        self.scheduled = {cell: 0 for cell in self.cells}
+
+    def add(self, cell, seed, value):
+        """Fold one seed's value into its cell (each seed is counted once)."""
+        if value is None or seed in self.seen[cell] or not math.isfinite(value):
+            return
+        self.seen[cell].add(seed)
+        self.stats[cell].add(np.array([value], dtype=np.float64))
+
+    def target(self, cell):
+        """Allowed half-width of cell: the tighter of the relative and absolute targets."""
+        targets = []
+        if self.rel is not None and self.stats[cell].count:
+            targets.append(self.rel * abs(self.stats[cell].mean))
+        if self.abs_target is not None:
+            targets.append(self.abs_target)
+        return min(targets) if targets else 0.0
+
+    def estimate(self, cell):
+        stats = self.stats[cell]
+        width = half_width(stats, self.confidence)
+        converged = stats.count >= self.min_seeds and width <= self.target(cell)
+        return CellEstimate(stats.count, stats.mean if stats.count else math.nan,
+                            width, converged)
+
+    def needed(self, cell):
+        """Total seeds the cell needs at its current spread (before the caps)."""
+        stats = self.stats[cell]
+        if stats.count < 2:
+            return self.min_seeds
+        target = self.target(cell)
+        if target <= 0:
+            return self.max_seeds
+        t = t_quantile(0.5 + self.confidence / 2, stats.count - 1)
+        return math.ceil(t * t * (stats.m2 / (stats.count - 1)) / (target * target))
+
+    def next_seeds(self):
+        """{cell: seed numbers to run next}; empty when every cell is done."""
+        plan = {}
+        for cell in self.cells:
+            done = self.scheduled[cell]
+            if done >= self.max_seeds or (done >= self.min_seeds and self.estimate(cell).converged):
+                continue
+            if done < self.min_seeds:
+                total = self.min_seeds
+            else:
+                total = min(max(self.needed(cell), done + 1), done + self.batch)
+            total = min(total, self.max_seeds)
+            if total > done:
+                plan[cell] = list(range(done + 1, total + 1))
+        return plan
+
+    def mark_scheduled(self, plan):
+        for cell, seeds in plan.items():
+            self.scheduled[cell] = max(self.scheduled[cell], seeds[-1])
+
+
+def adaptive_sweep(root, cases, schedulers, nwifi_values, command, params=None,
+                   ac=None, weights=None, workers=None, timeout=None, verbose=True,
+                   **controller):
+    """
+    Run the sequential sweep. Returns (controller, results, failed, rounds):
+    results and failed as from run_sweep() over every round, rounds the list
+    of job counts per round.
+    """
+    schedulers = list(dict.fromkeys(SCHEDULER_ALIASES.get(s, s) for s in schedulers))
+    cells = [Cell(c, s, n) for c in cases for s in schedulers for n in nwifi_values]
+    ctrl = SequentialController(cells, **controller)
+    results, failed, rounds = {}, [], []
+
+    while True:
+        plan = ctrl.next_seeds()
+        if not plan:
+            break
+        jobs = []
+        for cell, seeds in plan.items():
+            jobs += expand_matrix([cell.case], [cell.scheduler], [cell.nwifi], seeds,
+                                  command, params)
+        if verbose:
+            print(f"Round {len(rounds) + 1}: {len(jobs)} jobs for {len(plan)} open cells")
+        round_results, round_failed = run_sweep(root, jobs, workers, timeout,
+                                                ingest=True, verbose=False)
+        ctrl.mark_scheduled(plan)
+        results.update(round_results)
+        failed += round_failed
+        rounds.append(len(jobs))
+        for cell, seeds in plan.items():
+            for seed in seeds:
+                ctrl.add(cell, seed, seed_metric(results, cell.case, cell.scheduler,
+                                                 cell.nwifi, seed, ac, weights))
+    return ctrl, results, failed, rounds
+
+
+def simulated_seconds(root, ctrl):
+    """Journaled simulator seconds of the seeds the controller used, and per-run mean."""
+    journal = Journal(root)
+    seconds = [journal.done[(cell.case, cell.scheduler, cell.nwifi, seed)]['seconds']
+               for cell in ctrl.cells for seed in range(1, ctrl.scheduled[cell] + 1)
+               if (cell.case, cell.scheduler, cell.nwifi, seed) in journal.done]
+    return sum(seconds), (sum(seconds) / len(seconds) if seconds else 0.0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sequential-sampling seed sweep')
+    parser.add_argument('--root', required=True, help='results root to fill')
+    parser.add_argument('--cases', nargs='+', default=['case1'])
+    parser.add_argument('--schedulers', nargs='+',
+                        default=[s for s, _ in SCHEDULER_FOLDERS.values()])
+    parser.add_argument('--nwifi', nargs='+', type=int, default=NWIFI_VALUES)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--command', help='simulator command template (see sweep_orchestrator.py)')
+    group.add_argument('--stub', action='store_true',
+                       help='use surrogate_sim.py as the simulator (no ns-3)')
+    parser.add_argument('--duration', type=float, default=1.0,
+                        help='simulated seconds per --stub run')
+    parser.add_argument('--ac', choices=['BE', 'BK', 'VI', 'VO'], default=None,
+                        help='stop on the mean latency of one AC (default: weighted latency)')
+    parser.add_argument('--rel', type=float, default=REL_TARGET,
+                        help='target CI half-width relative to the mean')
+    parser.add_argument('--abs', type=float, default=None, dest='abs_target',
+                        help='target CI half-width in ms (the tighter target applies)')
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE)
+    parser.add_argument('--min-seeds', type=int, default=MIN_SEEDS)
+    parser.add_argument('--max-seeds', type=int, default=MAX_SEEDS)
+    parser.add_argument('--batch', type=int, default=BATCH,
+                        help='most seeds added to a cell per round')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None, help='seconds per job')
+    parser.add_argument('--store', nargs='?', const=True, default=None,
+                        help='write every ingested seed to a results store '
+                             f'(default path: {RESULTS_STORE})')
+    args = parser.parse_args()
+
+    if args.stub:
+        command, params = STUB_COMMAND, {'duration': args.duration}
+        args.schedulers = stub_schedulers(args.schedulers)
+    else:
+        command, params = args.command, {}
+
+    print("="*70)
+    print(f"Sequential sweep into {args.root}: {args.confidence:.0%} CI half-width <= "
+          + " / ".join(([f"{args.rel:.1%} of mean"] if args.rel is not None else [])
+                       + ([f"{args.abs_target} ms"] if args.abs_target is not None else [])))
+    print("="*70)
+    start = time.perf_counter()
+    ctrl, results, failed, rounds = adaptive_sweep(
+        args.root, args.cases, args.schedulers, args.nwifi, command, params,
+        ac=args.ac, workers=args.workers, timeout=args.timeout,
+        rel=args.rel, abs_target=args.abs_target, confidence=args.confidence,
+        min_seeds=args.min_seeds, max_seeds=args.max_seeds, batch=args.batch)
+    wall = time.perf_counter() - start
+
+    print("-"*70)
+    print(f"{'Cell':<32}{'Seeds':>6}{'Mean':>10}{'± CI':>10}  Status")
+    for cell in ctrl.cells:
+        est = ctrl.estimate(cell)
+        status = 'converged' if est.converged else 'max seeds' if est.seeds >= ctrl.max_seeds else 'open'
+        print(f"{cell.case} {cell.scheduler} nwifi={cell.nwifi:<5}".ljust(32)
+              + f"{est.seeds:>6}{est.mean:>10.3f}{est.half_width:>10.3f}  {status}")
+    print("-"*70)
+    runs = sum(ctrl.scheduled.values())
+    fixed = len(ctrl.cells) * args.max_seeds
+    cpu, per_run = simulated_seconds(args.root, ctrl)
+    print(f"Rounds: {len(rounds)} ({' + '.join(map(str, rounds))} jobs), wall {wall:.2f}s")
+    print(f"Simulator runs: {runs} vs {fixed} at a fixed {args.max_seeds} seeds per cell "
+          f"({1 - runs / fixed:.0%} fewer)")
+    print(f"Simulator CPU: {cpu:.1f}s (fixed sweep ~{fixed * per_run:.1f}s)")
+    if failed:
+        print(f"Failed jobs: {len(failed)}")
+    if args.store is not None and results:
+        store = ResultsStore.write(
+            results, args.store if isinstance(args.store, str) else RESULTS_STORE)
+        print(f"Saved: {store.path} ({store.rows} rows)")
+    print("="*70)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Scheduler Decision-Latency Microbenchmarks
+
+Times one scheduling decision of every policy on identical queue states
+(scheduler_policies.sample_states over NWIFI_VALUES, fixed seed), so the
+rule-based schedulers and the ML baselines can be compared on what the
+decision itself costs, next to the TXOP / SIFS budget it must fit in.
+
+Per policy:
+- batch:  ns per decision when `rows` states are decided in one call
+          (median and p99 over `repeats` calls)
+- single: ns per call when one (1, 12) state is decided at a time, as the
+          simulator does per TXOP (p50 / p99 / max over `calls` calls)
+- alloc:  peak bytes allocated during one batch call (per decision) and one
+          single call (tracemalloc, measured apart from the timings)
+- budget: whether the single-call p99 fits in SIFS (16 us)
+
+Policies (BENCH_POLICIES, name -> factory returning a callable or None to skip):
+    PBM, MPS, Non-MU-TXOP, SU   rule-based (scheduler_policies)
+    MLP-float                    mlp_inference.MLPPolicy + Rule 4 mask
+    MLP-int8-ref                 quantized_mlp.QuantizedMLP (NumPy reference)
+    MLP-int8-C                   ml_scheduler_decide_q8 compiled with $CC (skipped without one)
+    MLP-tree                     policy_compiler.DecisionForest distilled from the MLP
+    MLP-tree-C                   ml_scheduler_decide_tree compiled with $CC (skipped without one)
+The MLPs use --weights, or an untrained 12-64-32-11 network with the same cost.
+
+Each run is appended to BENCH_HISTORY (JSON lines with the time, git commit,
+host and numpy version); --compare prints the change against an earlier run.
+
+Usage:
+    python decision_bench.py                                  # all policies
+    python decision_bench.py --weights b1_full_bc.npz --policies MLP-float MLP-int8-C
+    python decision_bench.py --compare                        # vs the previous run
+    python decision_bench.py --history PBM                    # one policy over time
+"""
+
+import argparse
+import ctypes
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+
+from he_phy import SIFS_US
+from results_store import NWIFI_VALUES
+from scheduler_policies import N_FEATURES, POLICIES, feasible_classes, sample_states
+
+BENCH_HISTORY = os.environ.get(
+    'DECISION_BENCH_HISTORY',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'decision_bench.jsonl'))
+
+ROWS = 1 << 16
+REPEATS = 7
+CALLS = 2000
+WARMUP_CALLS = 100
+TREE_SAMPLES = 1 << 18
+
+
+def bench_states(rows, seed=0):
+    """(rows, 12) states, an equal share from every NWIFI_VALUES point, shuffled."""
+    rng = np.random.default_rng(seed)
+    states = np.concatenate([sample_states(-(-rows // len(NWIFI_VALUES)), n, rng)
+                             for n in NWIFI_VALUES])
+    return states[rng.permutation(len(states))[:rows]]
+
+
+# ==============================================================================
+# Policies
+# ==============================================================================
+
+def _mlp_policy(args):
+    from mlp_inference import MLPPolicy
+    return MLPPolicy.load(args.weights) if args.weights else MLPPolicy.random()
+
+
+def _int8_model(args):
+    from quantized_mlp import QuantizedMLP, calibration_states
+    return QuantizedMLP.from_float(_mlp_policy(args), calibration_states())
+
+
+def _compiler():
+    return shutil.which(os.environ.get('CC', 'cc')) or shutil.which('gcc')
+
+
+def build_library(write_header, source, compiler):
+    """(directory, ctypes library) of source compiled against write_header(path)."""
+    directory = tempfile.mkdtemp(prefix='decision_bench_')
+    header = os.path.join(directory, 'decide.h')
+    source_path = os.path.join(directory, 'decide.c')
+    library = os.path.join(directory, 'decide.so')
+    write_header(header)
+    with open(source_path, 'w') as f:
+        f.write(source)
+    subprocess.run([compiler, '-O2', '-std=c99', '-shared', '-fPIC',
+                    f'-DHEADER="{header}"', source_path, '-o', library, '-lm'],
+                   check=True, capture_output=True)
+    return directory, ctypes.CDLL(library)
+
+
+class CompiledInt8:
+    """ml_scheduler_decide_q8 from write_quantized_header(), built with $CC and ctypes."""
+
+    SOURCE = '''
+#include HEADER
+void decide_rows(const float *features, const uint8_t *mask, int32_t *out, int rows)
+{
+    for (int i = 0; i < rows; i++)
+        out[i] = ml_scheduler_decide_q8(features + i * %(n_in)d, mask + i * %(n_out)d);
+}
+'''
+
+    def __init__(self, model, compiler):
+        from quantized_mlp import write_quantized_header
+        self._dir, self._lib = build_library(
+            lambda header: write_quantized_header(header, model),
+            self.SOURCE % {'n_in': model.sizes[0], 'n_out': model.sizes[-1]}, compiler)
+        self._lib.decide_rows.argtypes = [ctypes.c_void_p] * 3 + [ctypes.c_int]
+        self._lib.decide_rows.restype = None
+        self._out = np.empty(0, dtype=np.int32)
+
+    def __call__(self, features):
+        features = np.ascontiguousarray(np.atleast_2d(features), dtype=np.float32)
+        mask = np.ascontiguousarray(feasible_classes(features), dtype=np.uint8)
+        if len(self._out) < len(features):
+            self._out = np.empty(len(features), dtype=np.int32)
+        self._lib.decide_rows(features.ctypes.data, mask.ctypes.data,
+                              self._out.ctypes.data, len(features))
+        return self._out[:len(features)]
+
+    def close(self):
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def _compiled_int8(args):
+    compiler = _compiler()
+    if compiler is None:
+        return None
+    return CompiledInt8(_int8_model(args), compiler)
+
+
+def _tree_policy(args):
+    from policy_compiler import compile_policy, sample_training_states
+    return compile_policy(_mlp_policy(args), sample_training_states(TREE_SAMPLES),
+                          verbose=False)
+
+
+class CompiledTree(CompiledInt8):
+    """ml_scheduler_decide_tree from write_tree_header(), built with $CC and ctypes."""
+
+    SOURCE = '''
+#include HEADER
+void decide_rows(const float *features, const uint8_t *mask, int32_t *out, int rows)
+{
+    (void)mask;
+    for (int i = 0; i < rows; i++)
+        out[i] = ml_scheduler_decide_tree(features + i * %(n_in)d);
+}
+'''
+
+    def __init__(self, forest, compiler):
+        from policy_compiler import write_tree_header
+        self._dir, self._lib = build_library(
+            lambda header: write_tree_header(header, forest),
+            self.SOURCE % {'n_in': N_FEATURES}, compiler)
+        self._lib.decide_rows.argtypes = [ctypes.c_void_p] * 3 + [ctypes.c_int]
+        self._lib.decide_rows.restype = None
+        self._out = np.empty(0, dtype=np.int32)
+
+    def __call__(self, features):
+        features = np.ascontiguousarray(np.atleast_2d(features), dtype=np.float32)
+        if len(self._out) < len(features):
+            self._out = np.empty(len(features), dtype=np.int32)
+        self._lib.decide_rows(features.ctypes.data, None, self._out.ctypes.data, len(features))
+        return self._out[:len(features)]
+
+
+def _compiled_tree(args):
+    compiler = _compiler()
+    if compiler is None:
+        return None
+    return CompiledTree(_tree_policy(args), compiler)
+
+
+BENCH_POLICIES = OrderedDict(
+    [(name, (lambda name: lambda args: POLICIES[name])(name))
+     for name in ('PBM', 'MPS', 'Non-MU-TXOP', 'SU')]
+    + [('MLP-float', _mlp_policy),
+       ('MLP-int8-ref', _int8_model),
+       ('MLP-int8-C', _compiled_int8),
+       ('MLP-tree', _tree_policy),
+       ('MLP-tree-C', _compiled_tree)])
+
+
+# ==============================================================================
+# Measurements
+# ==============================================================================
+
+def time_batch(policy, states, repeats=REPEATS):
+    """(median, p99) ns per decision over repeats calls on all states."""
+    policy(states[:256])
+    per_decision = []
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        policy(states)
+        per_decision.append((time.perf_counter_ns() - start) / len(states))
+    return float(np.median(per_decision)), float(np.percentile(per_decision, 99))
+
+
+def time_single(policy, states, calls=CALLS):
+    """ns per call of single-state decisions: (p50, p99, max, mean)."""
+    rows = [states[i:i + 1] for i in range(min(calls + WARMUP_CALLS, len(states)))]
+    for row in rows[:WARMUP_CALLS]:
+        policy(row)
+    samples = np.empty(len(rows) - WARMUP_CALLS)
+    clock = time.perf_counter_ns
+    for i, row in enumerate(rows[WARMUP_CALLS:]):
+        start = clock()
+        policy(row)
+        samples[i] = clock() - start
+    p50, p99 = np.percentile(samples, [50, 99])
+    return float(p50), float(p99), float(samples.max()), float(samples.mean())
+
+
+def peak_allocation(policy, states):
+    """Peak bytes traced by tracemalloc during one policy(states) call."""
+    policy(states)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        policy(states)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(names, args, rows=ROWS, repeats=REPEATS, calls=CALLS, seed=0,
+                   verbose=True):
+    """{policy: metrics} for the named BENCH_POLICIES on identical states."""
+    states = bench_states(max(rows, calls + WARMUP_CALLS), seed)
+    batch_states = states[:rows]
+    results = OrderedDict()
+    for name in names:
+        policy = BENCH_POLICIES[name](args)
+        if policy is None:
+            if verbose:
+                print(f"  {name:<14} skipped (unavailable)")
+            continue
+        batch_ns, batch_p99_ns = time_batch(policy, batch_states, repeats)
+        p50, p99, worst, mean = time_single(policy, states, calls)
+        results[name] = {
+            'batch_ns': round(batch_ns, 1), 'batch_p99_ns': round(batch_p99_ns, 1),
+            'single_p50_ns': round(p50), 'single_p99_ns': round(p99),
+            'single_max_ns': round(worst), 'single_mean_ns': round(mean),
+            'batch_alloc_bytes_per_decision': round(
+                peak_allocation(policy, batch_states) / len(batch_states), 1),
+            'single_alloc_bytes': peak_allocation(policy, states[:1]),
+            'fits_sifs': p99 <= SIFS_US * 1000,
+        }
+        if hasattr(policy, 'close'):
+            policy.close()
+        if verbose:
+            print_result(name, results[name])
+    return results
+
+
+def print_result(name, r):
+    print(f"  {name:<14}{r['batch_ns']:>9.1f}{r['batch_p99_ns']:>9.1f}"
+          f"{r['single_p50_ns']:>10,}{r['single_p99_ns']:>10,}"
+          f"{r['batch_alloc_bytes_per_decision']:>10.1f}{r['single_alloc_bytes']:>10,}"
+          f"  {'yes' if r['fits_sifs'] else 'NO'}")
+
+
+HEADER = (f"  {'policy':<14}{'batch ns':>9}{'p99':>9}{'1-call ns':>10}{'p99':>10}"
+          f"{'B/dec':>10}{'B/call':>10}  <SIFS")
+
+
+# ==============================================================================
+# History
+# ==============================================================================
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def append_history(results, config, path=BENCH_HISTORY):
+    record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _git_commit(),
+              'host': platform.node(), 'machine': platform.machine(),
+              'python': platform.python_version(), 'numpy': np.__version__,
+              'config': config, 'results': results}
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    return record
+
+
+def load_history(path=BENCH_HISTORY):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def print_comparison(current, previous):
+    print(f"Change vs {previous['time']} ({previous['commit'] or 'no commit'}, "
+          f"{previous['host']}):")
+    print(f"  {'policy':<14}{'batch ns':>20}{'1-call p99 ns':>24}")
+    for name, r in current['results'].items():
+        old = previous['results'].get(name)
+        if old is None:
+            print(f"  {name:<14}{'(new)':>20}")
+            continue
+        print(f"  {name:<14}{old['batch_ns']:>9.1f} -> {r['batch_ns']:<7.1f}"
+              f"{old['single_p99_ns']:>10,} -> {r['single_p99_ns']:<10,}"
+              f"{r['batch_ns'] / old['batch_ns'] - 1:+.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scheduler decision-latency benchmarks')
+    parser.add_argument('--policies', nargs='+', choices=list(BENCH_POLICIES),
+                        default=list(BENCH_POLICIES))
+    parser.add_argument('--weights', help='MLP weights (.pth/.h/.npz); default: untrained')
+    parser.add_argument('--rows', type=int, default=ROWS, help='states per batch call')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--calls', type=int, default=CALLS, help='single-state calls')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=BENCH_HISTORY, help='history file')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--compare', nargs='?', type=int, const=-1, default=None,
+                        help='compare with history record N (default: the last one)')
+    parser.add_argument('--history', metavar='POLICY', help='print one policy over time')
+    args = parser.parse_args()
+
+    print("="*70)
+    if args.history:
+        print(f"{args.history} decision latency history ({args.output})")
+        for record in load_history(args.output):
+            r = record['results'].get(args.history)
+            if r:
+                print(f"  {record['time']} {record['commit'] or '-':<8} {record['host']:<12}"
+                      f"batch {r['batch_ns']:>8.1f} ns, 1-call p99 {r['single_p99_ns']:>8,} ns")
+        print("="*70)
+        raise SystemExit
+
+    history = load_history(args.output)
+    print(f"Decision latency: {args.rows:,} states per batch call x {args.repeats}, "
+          f"{args.calls:,} single calls, {N_FEATURES}-dim states over nWifi {NWIFI_VALUES}")
+    print(f"MLP weights: {args.weights or 'untrained 12-64-32-11'}; "
+          f"SIFS budget {SIFS_US} us")
+    print("-"*70)
+    print(HEADER)
+    results = run_benchmarks(args.policies, args, args.rows, args.repeats, args.calls,
+                             args.seed)
+    config = {'rows': args.rows, 'repeats': args.repeats, 'calls': args.calls,
+              'seed': args.seed, 'weights': args.weights}
+    record = {'time': 'this run', 'commit': None, 'host': platform.node(),
+              'config': config, 'results': results}
+    if not args.no_save:
+        record = append_history(results, config, args.output)
+        print(f"Saved: {args.output}")
+    if args.compare is not None and history:
+        print("-"*70)
+        print_comparison(record, history[args.compare])
+    print("="*70)
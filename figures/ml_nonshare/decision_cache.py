@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Memoized Scheduler Decisions Keyed on a Discretized State
+
+Surrogate and replay runs present the same coarse TXOP states over and over
+(same primary / secondary AC, STA counts, ratio band and queue sizes), so a
+bounded cache in front of a policy turns most decisions into a dictionary
+lookup:
+
+    policy = CachedPolicy(POLICIES['MPS'], capacity=1 << 16, kind='arc')
+    simulate('MPS', 30, policy=policy)
+    policy.stats()      # {'hits': .., 'misses': .., 'hit_rate': .., ...}
+
+Key (StateKey): every field maps one state feature to a bucket with
+searchsorted(edges, value, side='left'), and the buckets are packed into one
+integer. FIELDS holds the available fields; DEFAULT_FIELDS are
+    ac_primary, ac_secondary       AcIndex (secondary: -1 = none)
+    sta_primary, sta_secondary     backlogged STA counts (exact up to STA_CAP)
+    ratio_band                     Rule 4 band / gate (scheduler_policies.MASK_EDGES)
+    queue_vo .. queue_bk           queue length, power-of-two buckets
+The ratio band is always part of the key, so the Rule 4 mask is constant per
+key and a cached decision is always feasible. PBM, SU and Non-MU-TXOP read
+nothing finer than the default key, so their cached decisions are exact; MPS
+and the MLPs return the decision of the first state seen in a bucket
+(`python decision_cache.py` reports the agreement with the uncached policy).
+
+Caches (capacity = decisions kept):
+    lru   OrderedDict in recency order, evicts the least recently used key
+    arc   Adaptive Replacement Cache (Megiddo & Modha): recency and frequency
+          lists plus ghost lists that shift capacity between the two
+
+Invalidation: assigning CachedPolicy.policy, or invalidate(), clears the
+cache. Every check_every calls, the public arrays of the policy object
+(MLPPolicy layers, QuantizedMLP / DecisionForest tables) are fingerprinted,
+and the cache is cleared when the weights were changed in place.
+
+Single-row calls (the surrogate decides once per TXOP) compute the key with
+bisect on Python floats; batch calls decide each missing key once, on its
+first row.
+
+Usage:
+    python decision_cache.py                            # hit rate / agreement / speed
+    python decision_cache.py --policies PBM MPS --kind arc --capacity 4096
+    python decision_cache.py --weights b1_full_bc.npz --surrogate --nwifi 30
+"""
+
+import argparse
+import hashlib
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+import numpy as np
+
+from results_store import NWIFI_VALUES
+from scheduler_policies import (F_AC_P, F_AC_S, F_PHY_P, F_PHY_S, F_RATIO, F_STA_P, F_STA_S,
+                                F_WAIT, FEATURE_NAMES, MASK_EDGES, POLICIES, sample_states)
+
+CAPACITY = 1 << 16
+CHECK_EVERY = 1024
+STA_CAP = 128
+QUEUE_BUCKETS = 12
+
+# Field name -> (feature column, bucket edges)
+_QUEUE_EDGES = 2.0 ** np.arange(QUEUE_BUCKETS) - 0.5           # 0, 1, 2-3, 4-7, ...
+_STA_EDGES = np.arange(STA_CAP) + 0.5
+FIELDS = OrderedDict([
+    ('ac_primary', (F_AC_P, np.arange(3) + 0.5)),
+    ('ac_secondary', (F_AC_S, np.arange(4) - 0.5)),
+    ('sta_primary', (F_STA_P, _STA_EDGES)),
+    ('sta_secondary', (F_STA_S, _STA_EDGES)),
+    ('ratio_band', (F_RATIO, MASK_EDGES)),
+] + [(name, (col, _QUEUE_EDGES)) for col, name in enumerate(FEATURE_NAMES[:4])] + [
+    ('wait_weight', (F_WAIT, np.linspace(0.1, 0.9, 9))),
+    ('phy_primary', (F_PHY_P, (np.arange(11) + 0.5) / 11)),
+    ('phy_secondary', (F_PHY_S, (np.arange(11) + 0.5) / 11)),
+])
+DEFAULT_FIELDS = ('ac_primary', 'ac_secondary', 'sta_primary', 'sta_secondary', 'ratio_band',
+                  'queue_vo', 'queue_vi', 'queue_be', 'queue_bk')
+
+
+class StateKey:
+    """Packs the bucket of every field of a state into one integer."""
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        fields = list(fields)
+        if 'ratio_band' not in fields:
+            fields.append('ratio_band')             # keeps the Rule 4 mask constant per key
+        self.fields = fields
+        self.columns = [FIELDS[name][0] for name in fields]
+        self.edges = [np.asarray(FIELDS[name][1], dtype=np.float64) for name in fields]
+        self._edge_lists = [e.tolist() for e in self.edges]
+        self.radix = [len(e) + 1 for e in self.edges]
+        if np.prod([float(r) for r in self.radix]) >= 2.0 ** 63:
+            raise ValueError(f'key of {fields} does not fit in 64 bits')
+
+    def keys(self, features):
+        """int64 key of every row of (N, 12) states."""
+        f = np.atleast_2d(features)
+        key = np.zeros(len(f), dtype=np.int64)
+        for col, edges, radix in zip(self.columns, self.edges, self.radix):
+            key *= radix
+            key += np.searchsorted(edges, f[:, col], side='left')
+        return key
+
+    def key(self, row):
+        """keys() of one state given as a sequence of floats, without NumPy."""
+        key = 0
+        for col, edges, radix in zip(self.columns, self._edge_lists, self.radix):
+            x = row[col]
+            key = key * radix + (bisect_left(edges, x) if x == x else len(edges))
+        return key
+
+
+# ==============================================================================
+# Bounded caches
+# ==============================================================================
+
+class LRUCache:
+    """Least-recently-used map of at most `capacity` keys."""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+
+class ARCCache:
+    """
+    Adaptive Replacement Cache: t1 holds keys seen once recently, t2 keys seen
+    at least twice; b1 / b2 remember keys evicted from each, and a hit there
+    moves the target size p of t1 toward the list that would have kept it.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.evictions = 0
+        self.p = 0.0
+        self._t1, self._t2 = OrderedDict(), OrderedDict()
+        self._b1, self._b2 = OrderedDict(), OrderedDict()
+
+    def __len__(self):
+        return len(self._t1) + len(self._t2)
+
+    def get(self, key):
+        if key in self._t1:
+            value = self._t2[key] = self._t1.pop(key)
+            return value
+        value = self._t2.get(key)
+        if value is not None:
+            self._t2.move_to_end(key)
+        return value
+
+    def _replace(self, in_b2):
+        if len(self) < self.capacity:
+            return
+        if self._t1 and (len(self._t1) > self.p or (in_b2 and len(self._t1) == self.p)):
+            key, _ = self._t1.popitem(last=False)
+            self._b1[key] = None
+        else:
+            key, _ = self._t2.popitem(last=False)
+            self._b2[key] = None
+        self.evictions += 1
+
+    def put(self, key, value):
+        c = self.capacity
+        if key in self._t1 or key in self._t2:
+            self._t1.pop(key, None)
+            self._t2[key] = value
+            self._t2.move_to_end(key)
+        elif key in self._b1:
+            self.p = min(c, self.p + max(len(self._b2) / len(self._b1), 1))
+            self._replace(False)
+            del self._b1[key]
+            self._t2[key] = value
+        elif key in self._b2:
+            self.p = max(0.0, self.p - max(len(self._b1) / len(self._b2), 1))
+            self._replace(True)
+            del self._b2[key]
+            self._t2[key] = value
+        else:
+            l1 = len(self._t1) + len(self._b1)
+            if l1 >= c:
+                if len(self._t1) < c:
+                    self._b1.popitem(last=False)
+                    self._replace(False)
+                else:
+                    self._t1.popitem(last=False)
+                    self.evictions += 1
+            elif l1 + len(self._t2) + len(self._b2) >= c:
+                if l1 + len(self._t2) + len(self._b2) >= 2 * c:
+                    self._b2.popitem(last=False)
+                self._replace(False)
+            self._t1[key] = value
+
+    def clear(self):
+        for part in (self._t1, self._t2, self._b1, self._b2):
+            part.clear()
+        self.p = 0.0
+
+
+CACHES = {'lru': LRUCache, 'arc': ARCCache}
+
+
+# ==============================================================================
+# Cached policy
+# ==============================================================================
+
+def _arrays(value):
+    if isinstance(value, np.ndarray):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _arrays(item)
+
+
+def weights_fingerprint(policy):
+    """Digest of the public arrays of a policy object (b'' for plain functions)."""
+    h = hashlib.blake2b(digest_size=16)
+    for name, value in sorted(getattr(policy, '__dict__', {}).items()):
+        if not name.startswith('_'):
+            for array in _arrays(value):
+                h.update(np.ascontiguousarray(array).view(np.uint8).ravel())
+    return h.digest()
+
+
+class CachedPolicy:
+    """A (N, 12) -> (N,) decision function memoized on StateKey buckets."""
+
+    def __init__(self, policy, capacity=CAPACITY, kind='lru', fields=DEFAULT_FIELDS,
+                 check_every=CHECK_EVERY):
+        self.state_key = StateKey(fields)
+        self.cache = CACHES[kind](capacity)
+        self.check_every = check_every
+        self._calls = self.invalidations = 0
+        self.policy = policy
+        self.hits = self.misses = self.invalidations = 0
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @policy.setter
+    def policy(self, policy):
+        self._policy = policy
+        self._fingerprint = weights_fingerprint(policy)
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop every cached decision (the counters are kept)."""
+        self.cache.clear()
+        self.invalidations += 1
+
+    def check_weights(self):
+        """Clear the cache if the policy's weights changed since the last check."""
+        fingerprint = weights_fingerprint(self._policy)
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self.invalidate()
+
+    def __call__(self, features):
+        self._calls += 1
+        if self._calls % self.check_every == 0:
+            self.check_weights()
+        f = np.atleast_2d(features)
+        if len(f) == 1:
+            key = self.state_key.key(f[0].tolist())
+            cls = self.cache.get(key)
+            if cls is None:
+                self.misses += 1
+                cls = int(self._policy(f)[0])
+                self.cache.put(key, cls)
+            else:
+                self.hits += 1
+            return np.array([cls])
+
+        unique, first, inverse = np.unique(self.state_key.keys(f), return_index=True,
+                                           return_inverse=True)
+        out = np.empty(len(unique), dtype=np.int64)
+        missing = []
+        for i, key in enumerate(unique.tolist()):
+            cls = self.cache.get(key)
+            if cls is None:
+                missing.append(i)
+            else:
+                out[i] = cls
+        if missing:
+            decided = np.asarray(self._policy(f[first[missing]]), dtype=np.int64)
+            out[missing] = decided
+            for key, cls in zip(unique[missing].tolist(), decided.tolist()):
+                self.cache.put(key, cls)
+        self.misses += len(missing)
+        self.hits += len(f) - len(missing)
+        return out[inverse.ravel()]
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate,
+                'size': len(self.cache), 'capacity': self.cache.capacity,
+                'evictions': self.cache.evictions, 'invalidations': self.invalidations}
+
+
+def cached_policies(policies=POLICIES, **kwargs):
+    """{name: CachedPolicy} over a {name: policy} map (e.g. for policy_error replays)."""
+    return {name: CachedPolicy(policy, **kwargs) for name, policy in policies.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Memoized scheduler decisions')
+    parser.add_argument('--policies', nargs='+', choices=list(POLICIES), default=list(POLICIES))
+    parser.add_argument('--weights', help='also cache an MLP (.pth/.h/.npz)')
+    parser.add_argument('--kind', choices=list(CACHES), default='lru')
+    parser.add_argument('--capacity', type=int, default=CAPACITY)
+    parser.add_argument('--fields', nargs='+', choices=list(FIELDS), default=DEFAULT_FIELDS)
+    parser.add_argument('--rows', type=int, default=1 << 18, help='replay states per nwifi')
+    parser.add_argument('--calls', type=int, default=20000, help='single-row calls per nwifi')
+    parser.add_argument('--surrogate', action='store_true',
+                        help='time one surrogate_sim run per policy instead')
+    parser.add_argument('--nwifi', type=int, nargs='+', default=NWIFI_VALUES)
+    parser.add_argument('--duration', type=float, default=0.5, help='surrogate seconds')
+    args = parser.parse_args()
+
+    policies = {name: POLICIES[name] for name in args.policies}
+    if args.weights:
+        from mlp_inference import MLPPolicy
+        policies['MLP'] = MLPPolicy.load(args.weights)
+
+    print("="*70)
+    print(f"{args.kind.upper()} cache of {args.capacity:,} decisions, key: "
+          f"{', '.join(StateKey(args.fields).fields)}")
+    print("-"*70)
+    for nwifi in args.nwifi:
+        print(f"nwifi={nwifi}")
+        for name, policy in policies.items():
+            cached = CachedPolicy(policy, args.capacity, args.kind, args.fields)
+            if args.surrogate:
+                from surrogate_sim import simulate
+                timings = []
+                for p in (policy, cached):
+                    start = time.perf_counter()
+                    simulate(name if name in POLICIES else 'PBM', nwifi, 1, args.duration,
+                             policy=p)
+                    timings.append(time.perf_counter() - start)
+                print(f"  {name:<12} hit rate {cached.hit_rate:7.2%}  run {timings[0]:6.2f}s"
+                      f" -> {timings[1]:6.2f}s cached")
+                continue
+            rng = np.random.default_rng(nwifi)
+            states = sample_states(args.rows, nwifi, rng)
+            start = time.perf_counter()
+            plain = policy(states)
+            plain_s = time.perf_counter() - start
+            start = time.perf_counter()
+            memo = cached(states)
+            cached_s = time.perf_counter() - start
+            singles = states[:args.calls]
+            timings = []
+            for p in (policy, cached):
+                start = time.perf_counter()
+                for row in singles:
+                    p(row[np.newaxis])
+                timings.append((time.perf_counter() - start) / len(singles) * 1e6)
+            print(f"  {name:<12} hit rate {cached.hit_rate:7.2%}  agreement "
+                  f"{(plain == memo).mean():8.4%}  batch {plain_s / len(states) * 1e9:5.0f}"
+                  f" -> {cached_s / len(states) * 1e9:5.0f} ns  1-call {timings[0]:5.1f}"
+                  f" -> {timings[1]:5.1f} us  ({len(cached.cache):,} keys)")
+    print("="*70)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Streaming Expert-Demonstration Dataset Generator
+
+Labels scheduler states with the rule-based experts and writes them as
+fixed-dtype shards that training can memory-map. The B0-B3 trainers used
+30k-50k samples held in RAM; this scales the same data to 100M+ rows.
+
+State sources:
+- synthetic: scheduler_policies.sample_states(). Every chunk is split evenly
+  over the --nwifi values, each part with an offered load drawn from
+  LOAD_RANGE, and the chunk is shuffled
+- surrogate: the states surrogate_sim.py meets at each TXOP while --behavior
+  schedules (on-policy replay). Simulations of --duration s cycle over the
+  --nwifi values and seeds until the shard is full
+
+Labels (uint8, one column per LABEL_COLUMNS entry):
+    PBM, MPS, Non-MU-TXOP   decision class 0-10 of each expert (B1: PBM, B0: Non-MU-TXOP)
+    B2-Chooser              0 = PBM, 1 = MPS has the lower AC-weighted ns-3 latency
+    B3-Meta                 0 = Non-MU-TXOP, 1 = PBM, 2 = MPS
+(chooser labels as in policy_error.expert_labels)
+
+Layout of a dataset directory:
+
+    manifest.json               dataset config + every shard manifest, in order
+    shard-00000.features.npy    (rows, 12) float32
+    shard-00000.labels.npy      (rows, 5) uint8
+    shard-00000.json            shard manifest: rows, seed, nwifi mix, label histograms
+
+Shards are independent (RNG seed [seed, shard]) and are generated on a
+process pool. A worker labels CHUNK_ROWS states at a time straight into .npy
+memmaps, so memory stays at workers x chunk whatever the dataset size. Shard
+files are renamed into place before their manifest is written; rerunning the
+same command keeps every shard whose manifest matches the config (resume).
+
+Usage:
+    python expert_dataset.py --out /data/expert --samples 100000000
+    python expert_dataset.py --out /tmp/replay --source surrogate --samples 200000
+    python expert_dataset.py --out /data/expert --show
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from policy_error import BASELINES, expert_costs, expert_latency
+from results_store import NWIFI_VALUES
+from scheduler_policies import FEATURE_NAMES, N_FEATURES, POLICIES, sample_states
+
+EXPERTS = ('PBM', 'MPS', 'Non-MU-TXOP')
+CHOOSERS = ('B2-Chooser', 'B3-Meta')
+LABEL_COLUMNS = EXPERTS + CHOOSERS
+
+FEATURE_DTYPE = np.float32
+LABEL_DTYPE = np.uint8
+
+SHARD_ROWS = 1 << 22
+CHUNK_ROWS = 1 << 16
+LOAD_RANGE = (0.5, 1.5)
+SOURCES = ('synthetic', 'surrogate')
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def label_states(states, nwifi):
+    """
+    (n, len(LABEL_COLUMNS)) uint8 expert labels of (n, 12) states drawn at
+    nwifi (n,). Each expert decides and is costed once (at the row's nwifi);
+    the chooser labels are argmins over subsets.
+    """
+    labels = np.empty((len(states), len(LABEL_COLUMNS)), dtype=LABEL_DTYPE)
+    for k, expert in enumerate(EXPERTS):
+        labels[:, k] = POLICIES[expert](states)
+    costs = expert_costs(states, expert_latency(EXPERTS, nwifi))
+    for k, name in enumerate(CHOOSERS, len(EXPERTS)):
+        columns = [EXPERTS.index(e) for e in BASELINES[name].experts]
+        labels[:, k] = np.argmin(costs[:, columns], axis=1)
+    return labels
+
+
+def shard_name(index):
+    return f'shard-{index:05d}'
+
+
+# ==============================================================================
+# State sources (each yields (states, nwifi) pieces)
+# ==============================================================================
+
+def _synthetic_states(config, rng):
+    nwifi_values = config['nwifi']
+    while True:
+        parts, counts = [], []
+        for j, nwifi in enumerate(nwifi_values):
+            n = CHUNK_ROWS // len(nwifi_values) + (j < CHUNK_ROWS % len(nwifi_values))
+            parts.append(sample_states(n, nwifi, rng, load=rng.uniform(*LOAD_RANGE)))
+            counts.append(n)
+        order = rng.permutation(CHUNK_ROWS)
+        nwifi = np.repeat(nwifi_values, counts)[order]
+        yield np.concatenate(parts)[order], nwifi
+
+
+def _surrogate_states(config, rng):
+    from surrogate_sim import simulate
+
+    behavior = POLICIES[config['behavior']]
+    run = 0
+    while True:
+        nwifi = config['nwifi'][run % len(config['nwifi'])]
+        recorded = []
+
+        def record(state):
+            recorded.append(state)
+            return behavior(state)
+
+        simulate(config['behavior'], nwifi, int(rng.integers(1 << 31)),
+                 config['duration'], policy=record)
+        run += 1
+        if recorded:
+            yield np.array(recorded), np.full(len(recorded), nwifi)
+
+
+STATE_SOURCES = {'synthetic': _synthetic_states, 'surrogate': _surrogate_states}
+
+
+# ==============================================================================
+# Shard writer
+# ==============================================================================
+
+def _write_json(path, obj):
+    tmp = path + '.partial'
+    with open(tmp, 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def write_shard(out, index, rows, config):
+    """Generate and label one shard; returns its manifest."""
+    name = shard_name(index)
+    paths = {kind: os.path.join(out, f'{name}.{kind}.npy') for kind in ('features', 'labels')}
+    features = np.lib.format.open_memmap(paths['features'] + '.partial', mode='w+',
+                                         dtype=FEATURE_DTYPE, shape=(rows, N_FEATURES))
+    labels = np.lib.format.open_memmap(paths['labels'] + '.partial', mode='w+',
+                                       dtype=LABEL_DTYPE, shape=(rows, len(LABEL_COLUMNS)))
+    seed = [config['seed'], index]
+    rng = np.random.default_rng(seed)
+    histograms = np.zeros((len(LABEL_COLUMNS), 256), dtype=np.int64)
+    nwifi_counts = {}
+    start = time.perf_counter()
+
+    filled = 0
+    for states, nwifi in STATE_SOURCES[config['source']](config, rng):
+        n = min(len(states), rows - filled)
+        states, nwifi = states[:n], nwifi[:n]
+        features[filled:filled + n] = states
+        labels[filled:filled + n] = label_states(states, nwifi)
+        for k in range(len(LABEL_COLUMNS)):
+            histograms[k] += np.bincount(labels[filled:filled + n, k], minlength=256)
+        values, counts = np.unique(nwifi, return_counts=True)
+        for v, c in zip(values.tolist(), counts.tolist()):
+            nwifi_counts[v] = nwifi_counts.get(v, 0) + c
+        filled += n
+        if filled == rows:
+            break
+
+    for array in (features, labels):
+        array.flush()
+    del features, labels
+    for path in paths.values():
+        os.replace(path + '.partial', path)
+
+    manifest = {
+        'shard': name, 'rows': rows, 'seed': seed,
+        'features': os.path.basename(paths['features']),
+        'labels': os.path.basename(paths['labels']),
+        'nwifi': {str(k): v for k, v in sorted(nwifi_counts.items())},
+        'label_counts': {col: histograms[k][:int(np.flatnonzero(histograms[k]).max()) + 1]
+                         .tolist() for k, col in enumerate(LABEL_COLUMNS)},
+        'seconds': round(time.perf_counter() - start, 3),
+        'config': config,
+    }
+    _write_json(os.path.join(out, f'{name}.json'), manifest)
+    return manifest
+
+
+def _shard_done(out, index, rows, config):
+    path = os.path.join(out, f'{shard_name(index)}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    return manifest if manifest['rows'] == rows and manifest['config'] == config else None
+
+
+def _write_shard_job(job):
+    return write_shard(*job)
+
+
+def generate(out, samples, source='synthetic', nwifi_values=NWIFI_VALUES, seed=0,
+             shard_rows=SHARD_ROWS, workers=None, behavior='PBM', duration=1.0,
+             verbose=True):
+    """
+    Write `samples` labeled states to out in shards of shard_rows rows.
+    Returns the dataset manifest (also written to out/manifest.json).
+    """
+    os.makedirs(out, exist_ok=True)
+    config = {'source': source, 'nwifi': list(nwifi_values), 'seed': seed,
+              'behavior': behavior if source == 'surrogate' else None,
+              'duration': duration if source == 'surrogate' else None}
+    sizes = [min(shard_rows, samples - start) for start in range(0, samples, shard_rows)]
+
+    shards, jobs = [None] * len(sizes), []
+    for index, rows in enumerate(sizes):
+        shards[index] = _shard_done(out, index, rows, config)
+        if shards[index] is None:
+            jobs.append((out, index, rows, config))
+    if verbose:
+        print(f"{samples:,} samples in {len(sizes)} shards "
+              f"({len(sizes) - len(jobs)} already written)")
+
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers == 1:
+        results = map(_write_shard_job, jobs)
+    else:
+        pool = multiprocessing.Pool(processes=workers)
+        results = pool.imap_unordered(_write_shard_job, jobs)
+    for manifest in results:
+        index = int(manifest['shard'].split('-')[1])
+        shards[index] = manifest
+        if verbose:
+            rate = manifest['rows'] / max(manifest['seconds'], 1e-9)
+            print(f"  {manifest['shard']}: {manifest['rows']:,} rows "
+                  f"in {manifest['seconds']:.1f}s ({rate / 1e3:.0f}k rows/s)")
+    if workers > 1:
+        pool.close()
+        pool.join()
+
+    dataset = {'rows': samples, 'feature_names': FEATURE_NAMES,
+               'label_columns': list(LABEL_COLUMNS),
+               'feature_dtype': np.dtype(FEATURE_DTYPE).str,
+               'label_dtype': np.dtype(LABEL_DTYPE).str,
+               'config': config, 'shards': shards}
+    _write_json(os.path.join(out, MANIFEST_FILE), dataset)
+    return dataset
+
+
+def read_manifest(root):
+    with open(os.path.join(root, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def open_shard(root, shard, mmap_mode='r'):
+    """(features, labels) arrays of one shard manifest, memory-mapped."""
+    return (np.load(os.path.join(root, shard['features']), mmap_mode=mmap_mode),
+            np.load(os.path.join(root, shard['labels']), mmap_mode=mmap_mode))
+
+
+def label_totals(manifest):
+    """{label column: class counts over all shards}."""
+    totals = {}
+    for shard in manifest['shards']:
+        for col, counts in shard['label_counts'].items():
+            acc = totals.setdefault(col, np.zeros(0, dtype=np.int64))
+            if len(acc) < len(counts):
+                acc = totals[col] = np.pad(acc, (0, len(counts) - len(acc)))
+            acc[:len(counts)] += counts
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Expert-demonstration dataset generator')
+    parser.add_argument('--out', required=True, help='dataset directory')
+    parser.add_argument('--samples', type=int, default=1 << 24)
+    parser.add_argument('--source', choices=SOURCES, default='synthetic')
+    parser.add_argument('--nwifi', nargs='+', type=int, default=NWIFI_VALUES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shard-rows', type=int, default=SHARD_ROWS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--behavior', choices=list(POLICIES), default='PBM',
+                        help='scheduler driving the surrogate (--source surrogate)')
+    parser.add_argument('--duration', type=float, default=1.0,
+                        help='simulated seconds per surrogate run')
+    parser.add_argument('--show', action='store_true', help='summarize an existing dataset')
+    args = parser.parse_args()
+
+    print("="*70)
+    if args.show:
+        manifest = read_manifest(args.out)
+    else:
+        print(f"Expert dataset ({args.source}) -> {args.out}")
+        print("-"*70)
+        start = time.perf_counter()
+        manifest = generate(args.out, args.samples, args.source, args.nwifi, args.seed,
+                            args.shard_rows, args.workers, args.behavior, args.duration)
+        seconds = time.perf_counter() - start
+        print(f"Wall time: {seconds:.1f}s ({manifest['rows'] / seconds:,.0f} rows/s)")
+        print("-"*70)
+    print(f"{manifest['rows']:,} rows in {len(manifest['shards'])} shards, "
+          f"source {manifest['config']['source']}")
+    for col, counts in label_totals(manifest).items():
+        share = counts / max(counts.sum(), 1)
+        print(f"  {col:<12}" + " ".join(f"{c}:{s:.1%}" for c, s in enumerate(share) if s > 0))
+    print("="*70)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Figure Cache
+
+Each output (PNG or table) is keyed by a SHA-256 over:
+- the data it plots: the values of every module global its plotting function
+  reads, following the module's own helper functions (referenced_inputs());
+  nothing is listed by hand, so a renderer cannot read data its key misses
+- the source of those functions, and of every repo module they call into
+  (with the repo modules those import), so a changed estimator or helper
+  re-renders what depends on it
+- the backing data of the results store (data_version(), data_source())
+- the rcParams STYLE block it is rendered with, and the source code of its
+  plotting function
+
+The key of the last render is kept next to the output in
+<output_dir>/.figure_cache/<filename>.key (one small file per output, so
+parallel builds never contend on a shared manifest). When the key matches and
+the output still exists, the render is skipped; an edit to one scheduler's data
+therefore only re-renders the figures that read that data.
+
+Set FIGURE_CACHE_FORCE=1 (or build_figures.py --force) to re-render everything.
+
+Usage:
+    @cached_output(OUTPUT_DIR, 'fig_b0_sanity_check.png', STYLE)
+    def plot_b0_sanity_check():
+        ...
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+CACHE_DIRNAME = '.figure_cache'
+FIGURES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _force():
+    return os.environ.get('FIGURE_CACHE_FORCE') == '1'
+
+
+def _canonical(value):
+    """JSON-serializable canonical form of a data slice (numpy-aware)."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=str)}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=repr)
+    if inspect.isroutine(value) or inspect.isclass(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', value)}"
+    if hasattr(value, '__dict__') and not inspect.ismodule(value):
+        return {'class': type(value).__qualname__, 'state': _canonical(vars(value))}
+    return value
+
+
+def _repo_file(obj):
+    """Source file of obj when it belongs to this repo (not numpy, matplotlib, ...)."""
+    try:
+        path = inspect.getsourcefile(obj)
+    except TypeError:
+        return None
+    path = path and os.path.abspath(path)
+    return path if path and path.startswith(FIGURES_DIR + os.sep) else None
+
+
+@functools.lru_cache(maxsize=None)
+def _file_digest(path, mtime):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _module_files(name):
+    """Source files of repo module name and of the repo modules it imports (transitively)."""
+    files, pending = set(), [name]
+    while pending:
+        module = sys.modules.get(pending.pop())
+        path = module and _repo_file(module)
+        if path is None or path in files:
+            continue
+        files.add(path)
+        for value in vars(module).values():
+            owner = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+            if isinstance(owner, str) and owner != module.__name__:
+                pending.append(owner)
+    return frozenset(files)
+
+
+def _code_names(code):
+    """Global (and attribute) names read by code and the code objects nested in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def referenced_inputs(func):
+    """
+    ({name: value} of the module globals func reads, following the functions
+    of its own module; sorted source files of the repo modules it uses).
+    Functions contribute their source, data globals their values.
+    """
+    func = inspect.unwrap(func)
+    values, modules = {}, set()
+    pending, seen = [func], set()
+    while pending:
+        f = inspect.unwrap(pending.pop())
+        if f in seen:
+            continue
+        seen.add(f)
+        scope = f.__globals__
+        for name in sorted(_code_names(f.__code__)):
+            if name not in scope or name in values:
+                continue
+            value = scope[name]
+            if inspect.ismodule(value) or inspect.isroutine(value) or inspect.isclass(value):
+                target = inspect.unwrap(value) if inspect.isroutine(value) else value
+                if _repo_file(target) is None:
+                    continue                            # numpy, matplotlib, builtins
+                if getattr(target, '__globals__', None) is scope:
+                    values[name] = inspect.getsource(target)
+                    pending.append(target)
+                else:
+                    modules.add(value.__name__ if inspect.ismodule(value) else target.__module__)
+                continue
+            values[name] = value
+            owner = type(value).__module__
+            if _repo_file(type(value)) is not None:
+                modules.add(owner)
+    files = sorted(set().union(*(_module_files(m) for m in modules)) if modules else ())
+    return values, files
+
+
+def _data_fingerprint():
+    """Version and provenance of the results store the series were read from."""
+    from results_store import data_source, data_version
+    return [data_version(), data_source()]
+
+
+def inputs_of(func, extra=None):
+    """Everything the output of func depends on besides style and its own source."""
+    values, files = referenced_inputs(func)
+    digests = {os.path.relpath(p, FIGURES_DIR): _file_digest(p, os.path.getmtime(p))
+               for p in files}
+    return [values, digests, _data_fingerprint(), extra() if extra else None]
+
+
+def output_key(func, style, data, filename=''):
+    """Cache key for rendering func over data with style into filename."""
+    h = hashlib.sha256()
+    h.update(filename.encode())
+    h.update(json.dumps(_canonical(data), sort_keys=True, default=repr).encode())
+    h.update(json.dumps(_canonical(style), sort_keys=True, default=repr).encode())
+    h.update(inspect.getsource(func).encode())
+    return h.hexdigest()
+
+
+def _key_path(output_dir, filename):
+    return os.path.join(output_dir, CACHE_DIRNAME, filename + '.key')
+
+
+def is_fresh(output_dir, filename, key):
+    """True if filename exists and was last rendered with this key."""
+    if _force() or not os.path.exists(os.path.join(output_dir, filename)):
+        return False
+    try:
+        with open(_key_path(output_dir, filename)) as f:
+            return f.read().strip() == key
+    except OSError:
+        return False
+
+
+def record(output_dir, filename, key):
+    """Remember that filename was rendered with key (atomic replace)."""
+    path = _key_path(output_dir, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(key + '\n')
+    os.replace(tmp, path)
+
+
+def cached_output(output_dir, filename, style, inputs=None):
+    """
+    Decorator: skip func when filename under output_dir is up to date for the
+    data and code it references (inputs_of()), style and source of func.
+    inputs: optional callable returning extra data the key should cover.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = output_key(func, style, inputs_of(func, inputs), filename)
+            if is_fresh(output_dir, filename, key):
+                print(f"Cached: {filename}")
+                return None
+            result = func(*args, **kwargs)
+            record(output_dir, filename, key)
+            return result
+
+        wrapper.cache_key = lambda: output_key(func, style, inputs_of(func, inputs), filename)
+        return wrapper
+    return decorate
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Declarative Figure Specs
+
+The per-method latency bar charts were four near-identical functions
+(fix_lp_bar_chart, plot_latency_bar_lp, plot_latency_comparison_bar,
+plot_all_baselines_bar), each with its own width offsets, capping and
+annotation code. Each chart is now a FigureSpec registered by its script and
+drawn by one renderer:
+
+- methods: (label, source, color); source is a scheduler name, read through
+  case_series() for the spec's ac/metric, an explicit series, or a function
+  returning one, called at render time (B1-B3 estimates)
+- ylim / cap: y-axis limit and optional cap on the drawn bar height
+- annotate: label values above annotate['above'] at height annotate['y']
+- ci: confidence of the bootstrap error bars drawn on scheduler sources that
+  have per-seed rows in the results store (seed_stats.py); None for no bars
+- style: name of the STYLE_PROFILES entry (the rcParams block of each script)
+
+render_all() draws every registered spec in a single pass: series are loaded
+once and shared between specs, one Figure per figure size is reused as a
+template, PNGs whose inputs are unchanged are skipped (figure_cache.py), and
+all pages can be collected into one multi-page PDF.
+
+Usage:
+    python figure_specs.py                        # every registered chart
+    python figure_specs.py --pdf bar_charts.pdf   # plus a combined PDF
+    python figure_specs.py --list
+"""
+
+import argparse
+import collections
+import importlib
+import os
+import sys
+
+import matplotlib
+import numpy as np
+from matplotlib.figure import Figure
+
+from figure_cache import is_fresh, output_key, record
+from results_ingest import AC_INDEX
+from results_store import NWIFI_VALUES, case_series
+from seed_stats import CONFIDENCE, bootstrap_ci, seed_tensor
+
+# rcParams blocks of the plotting scripts (they differ only in font sizes)
+_BASE_STYLE = {
+    'figure.facecolor': 'white',
+    'axes.facecolor': 'white',
+    'axes.edgecolor': 'black',
+    'axes.linewidth': 1.0,
+    'legend.frameon': True,
+    'legend.edgecolor': 'black',
+    'legend.fancybox': False,
+}
+
+
+def _style(font, label, title, legend, ticks):
+    return dict(_BASE_STYLE, **{
+        'font.size': font,
+        'axes.labelsize': label,
+        'axes.titlesize': title,
+        'legend.fontsize': legend,
+        'xtick.labelsize': ticks,
+        'ytick.labelsize': ticks,
+    })
+
+
+STYLE_PROFILES = {
+    'thesis': _style(14, 16, 18, 11, 14),          # fix_figures.py (original thesis style)
+    'ml_nonshare': _style(14, 16, 18, 10, 14),     # plot_with_ml_nonshare.py
+    'all_baselines': _style(12, 14, 16, 9, 12),    # plot_all_ml_baselines.py
+    'complete': _style(11, 13, 14, 9, 11),         # plot_complete_ml_baselines.py
+}
+
+FigureSpec = collections.namedtuple('FigureSpec', [
+    'filename', 'output_dir', 'title', 'methods',
+    'ac', 'metric', 'ylim', 'cap', 'annotate', 'style', 'figsize', 'width',
+    'linewidth', 'legend', 'grid', 'xlabel', 'ylabel', 'case', 'nwifi_values', 'ci',
+], defaults=[
+    'BK', 'mean', None, None, None, 'thesis', (14, 7), 0.13,
+    0.8, None, False, 'Total STA Number', 'Latency (ms)', 'case1', NWIFI_VALUES, CONFIDENCE,
+])
+
+# filename -> FigureSpec, in registration order
+FIGURE_SPECS = {}
+
+# Scripts that register specs when imported (render_all loads them all)
+SPEC_MODULES = [
+    'fix_figures',
+    'plot_with_ml_nonshare',
+    'plot_all_ml_baselines',
+    'plot_complete_ml_baselines',
+]
+
+_SERIES = {}
+_TEMPLATES = {}
+
+
+def register(spec):
+    """Add spec to the registry (replacing one with the same filename)."""
+    FIGURE_SPECS[spec.filename] = spec
+    return spec
+
+
+def load_series(source, ac, metric='mean', case='case1', nwifi_values=NWIFI_VALUES):
+    """Series for a method source; scheduler lookups are loaded once per process."""
+    if callable(source):
+        return list(source())
+    if not isinstance(source, str):
+        return list(source)
+    key = (source, ac, metric, case, tuple(nwifi_values))
+    if key not in _SERIES:
+        _SERIES[key] = case_series(source, ac, case, nwifi_values, column=metric)
+    return list(_SERIES[key])
+
+
+def spec_data(spec):
+    """Resolved series of every method of spec, in method order."""
+    return [load_series(source, spec.ac, spec.metric, spec.case, spec.nwifi_values)
+            for _, source, _ in spec.methods]
+
+
+def spec_intervals(spec):
+    """
+    (low, high) lists per method of spec (None for explicit series and methods
+    without per-seed rows), or None when no method has an interval.
+    """
+    schedulers = [source for _, source, _ in spec.methods if isinstance(source, str)]
+    if spec.ci is None or not schedulers:
+        return None
+    tensor = seed_tensor(schedulers, spec.case, spec.metric, spec.nwifi_values)
+    if tensor is None:
+        return None
+    per_seed = tensor.values[:, :, AC_INDEX[spec.ac], :]
+    interval = bootstrap_ci(per_seed, spec.ci)
+    intervals = []
+    for _, source, _ in spec.methods:
+        m = tensor.index(source) if isinstance(source, str) else None
+        if m is None or np.isnan(interval.low[m]).all():
+            intervals.append(None)
+        else:
+            intervals.append((interval.low[m].tolist(), interval.high[m].tolist()))
+    return intervals if any(intervals) else None
+
+
+def _template(figsize):
+    """Reusable Figure for one figure size (cleared before each render)."""
+    if figsize not in _TEMPLATES:
+        _TEMPLATES[figsize] = Figure(figsize=figsize)
+    return _TEMPLATES[figsize]
+
+
+def _error_bars(values, interval, cap):
+    """(2, nwifi) yerr of one method; no bar where the interval is NaN or the bar is capped."""
+    values = np.asarray(values, dtype=np.float64)
+    low, high = (np.asarray(v, dtype=np.float64) for v in interval)
+    yerr = np.nan_to_num(np.maximum([values - low, high - values], 0))
+    if cap is not None:
+        yerr[:, values > cap] = 0
+    return yerr
+
+
+def render_bar(spec, data, fig, intervals=None):
+    """
+    Draw a grouped bar chart of data (one series per method) into fig, with
+    error bars from intervals (spec_intervals()) where given.
+    """
+    fig.clear()
+    ax = fig.add_subplot()
+
+    x = np.arange(len(spec.nwifi_values))
+    n_methods = len(spec.methods)
+    annotate = spec.annotate
+    intervals = intervals or [None] * n_methods
+
+    for i, ((label, _, color), values, interval) in enumerate(
+            zip(spec.methods, data, intervals)):
+        offset = (i - n_methods/2 + 0.5) * spec.width
+        heights = values if spec.cap is None else [min(v, spec.cap) for v in values]
+        yerr = None if interval is None else _error_bars(values, interval, spec.cap)
+        ax.bar(x + offset, heights, spec.width, label=label, color=color,
+               edgecolor='black', linewidth=spec.linewidth, yerr=yerr,
+               error_kw={'elinewidth': 0.8, 'capsize': 2})
+
+        # Annotate values exceeding the axis
+        if annotate and label in annotate.get('methods', [label]):
+            for j, val in enumerate(values):
+                if val > annotate['above']:
+                    ax.annotate(f'{val:.1f}', xy=(x[j] + offset, annotate['y']),
+                                fontsize=annotate['fontsize'], ha='center',
+                                rotation=annotate.get('rotation', 0),
+                                color=color if annotate.get('colored') else None)
+
+    ax.set_xlabel(spec.xlabel)
+    ax.set_ylabel(spec.ylabel)
+    ax.set_title(spec.title)
+    ax.set_xticks(x)
+    ax.set_xticklabels(spec.nwifi_values)
+    ax.legend(**(spec.legend or {'loc': 'upper left'}))
+    if spec.ylim is not None:
+        ax.set_ylim(0, spec.ylim)
+    if spec.grid:
+        ax.grid(axis='y', alpha=0.3)
+
+    fig.tight_layout()
+    return fig
+
+
+def spec_key(spec, data, intervals=None):
+    """Cache key of spec: drawn data and intervals, layout fields, style and renderer code."""
+    fields = dict(spec._asdict(), output_dir=None,
+                  methods=[(label, color) for label, _, color in spec.methods])
+    return output_key(render_bar, STYLE_PROFILES[spec.style], [fields, data, intervals],
+                      spec.filename)
+
+
+def render(spec, pdf=None):
+    """
+    Render spec to <output_dir>/<filename> unless it is up to date, and add it
+    as a page of pdf (a PdfPages) when given. Returns True if the PNG was written.
+    """
+    import matplotlib.pyplot as plt
+
+    data = spec_data(spec)
+    intervals = spec_intervals(spec)
+    key = spec_key(spec, data, intervals)
+    fresh = is_fresh(spec.output_dir, spec.filename, key)
+    if fresh and pdf is None:
+        print(f"Cached: {spec.filename}")
+        return False
+
+    with plt.rc_context(STYLE_PROFILES[spec.style]):
+        fig = render_bar(spec, data, _template(spec.figsize), intervals)
+        if not fresh:
+            fig.savefig(os.path.join(spec.output_dir, spec.filename), dpi=150,
+                        bbox_inches='tight', facecolor='white')
+            record(spec.output_dir, spec.filename, key)
+            print(f"Saved: {spec.filename}")
+        if pdf is not None:
+            pdf.savefig(fig, bbox_inches='tight')
+    return not fresh
+
+
+def load_specs(modules=SPEC_MODULES):
+    """Import the plotting scripts so that their specs are registered."""
+    figures_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if figures_dir not in sys.path:
+        sys.path.insert(0, figures_dir)
+    for name in modules:
+        importlib.import_module(name)
+    return list(FIGURE_SPECS.values())
+
+
+def render_all(specs=None, pdf_path=None):
+    """Render specs (default: every registered spec) in one pass."""
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    specs = load_specs() if specs is None else specs
+    if pdf_path is None:
+        return [render(spec) for spec in specs]
+    with PdfPages(pdf_path) as pdf:
+        written = [render(spec, pdf) for spec in specs]
+    print(f"Saved: {pdf_path} ({len(specs)} pages)")
+    return written
+
+
+if __name__ == '__main__':
+    matplotlib.use('Agg')
+
+    # The scripts register into the importable module, not into __main__
+    import figure_specs
+
+    parser = argparse.ArgumentParser(description='Render all registered figure specs')
+    parser.add_argument('--pdf', metavar='PATH', help='also write a combined multi-page PDF')
+    parser.add_argument('--only', nargs='+', metavar='FILENAME',
+                        help='render only these outputs')
+    parser.add_argument('--list', action='store_true', help='list registered specs')
+    parser.add_argument('--force', action='store_true',
+                        help='ignore the figure cache and re-render everything')
+    args = parser.parse_args()
+
+    if args.force:
+        os.environ['FIGURE_CACHE_FORCE'] = '1'
+
+    specs = figure_specs.load_specs()
+    if args.only:
+        specs = [spec for spec in specs if spec.filename in args.only]
+    if args.list:
+        for spec in specs:
+            print(f"{spec.filename:<36} {spec.style:<14} {len(spec.methods)} methods, AC_{spec.ac} {spec.metric}")
+        sys.exit(0)
+
+    print("="*70)
+    print(f"Rendering {len(specs)} figure specs")
+    print("="*70)
+    figure_specs.render_all(specs, args.pdf)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+802.11ax (HE) PHY/MAC Timing for the Surrogate Simulator
+
+Constants and airtime helpers for a 40 MHz HE BSS (see figures 2.1, 3.8:
+MHz40_RU / MHz40_RU_Position):
+
+- RU sizes and data tones: 26:24, 52:48, 106:102, 242:234, 484:468
+- RU "units": a 40 MHz channel is 18 x 26-tone units; a 52-tone RU covers 2,
+  a 106-tone RU 4, a 242-tone RU 9 (2 x 106 + center 26) and a 484-tone RU 18
+- RU tree: where each RU can sit (RU_POSITIONS, unit bitmasks). Per 20 MHz,
+  52-tone RUs sit on units 0-1, 2-3, 5-6, 7-8 and 106-tone RUs on 0-3, 5-8;
+  the center 26-tone RU (unit 4) fits no larger RU, so the channel holds at
+  most 8 x 52 or 4 x 106 (RU_MAX_COUNT), not 18 // units. ru_placeable()
+  tests a multiset of RU sizes against every placement (memoized DP over the
+  bitmask of free units)
+- HE-MCS bits per subcarrier (modulation x coding rate), MCS 0..11
+- HE OFDM symbol: 12.8 us + 0.8 us GI = 13.6 us
+- EDCA parameters per AC (AIFSN, CWmin, CWmax, TXOP limit)
+- A-MPDU aggregation limits and MPDU overheads
+
+Only airtime is modeled: RUs are counted against the RU tree but not
+assigned to subcarriers, no PHY errors.
+"""
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+CHANNEL_MHZ = 40
+
+# RU size (tones) -> data tones
+RU_DATA_TONES = {26: 24, 52: 48, 106: 102, 242: 234, 484: 468}
+
+# RU size -> 26-tone units it occupies in a 40 MHz channel
+RU_UNITS = {26: 1, 52: 2, 106: 4, 242: 9, 484: 18}
+CHANNEL_UNITS = RU_UNITS[484]
+RU_SIZES = (26, 52, 106, 242, 484)
+
+# HE-MCS -> coded bits per subcarrier x coding rate
+MCS_BITS = np.array([0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 4.5, 5.0, 6.0, 20 / 3, 7.5, 25 / 3])
+MAX_MCS = len(MCS_BITS) - 1
+
+SYMBOL_US = 13.6          # 12.8 us HE symbol + 0.8 us GI
+SLOT_US = 9
+SIFS_US = 16
+
+# Preambles: L-STF/L-LTF/L-SIG/RL-SIG/HE-SIG-A + HE-STF + one HE-LTF
+HE_SU_PREAMBLE_US = 44
+HE_SIGB_SYMBOL_US = 4
+# Acknowledgement: compressed BlockAck (SU) or MU-BAR trigger + HE TB BlockAcks (MU)
+BLOCK_ACK_US = 32
+MU_ACK_US = 100
+
+# A-MPDU aggregation
+MAX_AMPDU_MPDUS = 64
+MPDU_OVERHEAD_BYTES = 4 + 30 + 4      # delimiter + MAC header/FCS + padding (average)
+SERVICE_TAIL_BITS = 16 + 6
+
+# EDCA parameters (802.11 defaults, HE TXOP limits in us)
+# AC: (AIFSN, CWmin, CWmax, TXOP limit)
+EDCA = {
+    'BE': (3, 15, 1023, 2528),
+    'BK': (7, 15, 1023, 2528),
+    'VI': (2, 7, 15, 4096),
+    'VO': (2, 3, 7, 2080),
+}
+
+# Channel access priority (highest first); wins virtual collisions inside the AP
+AC_PRIORITY = ('VO', 'VI', 'BE', 'BK')
+
+
+def aifs_us(ac):
+    return SIFS_US + EDCA[ac][0] * SLOT_US
+
+
+def ru_rate_mbps(ru, mcs, nss=1):
+    """PHY rate (Mb/s) of one RU at an HE-MCS (vectorized over ru/mcs arrays)."""
+    tones = np.vectorize(RU_DATA_TONES.get)(ru) if np.ndim(ru) else RU_DATA_TONES[ru]
+    return tones * MCS_BITS[mcs] * nss / SYMBOL_US
+
+
+def he_mu_preamble_us(n_users):
+    """HE MU preamble: SU preamble plus HE-SIG-B (two content channels at 40 MHz)."""
+    return HE_SU_PREAMBLE_US + HE_SIGB_SYMBOL_US * math.ceil(max(n_users, 1) / 2)
+
+
+def psdu_bytes(n_mpdus, payload_bytes):
+    """A-MPDU length for n_mpdus MPDUs carrying payload_bytes in total."""
+    return payload_bytes + n_mpdus * MPDU_OVERHEAD_BYTES
+
+
+def data_symbols(psdu, ru, mcs):
+    """HE data symbols needed for a PSDU of psdu bytes on one RU."""
+    bits_per_symbol = RU_DATA_TONES[ru] * MCS_BITS[mcs]
+    return math.ceil((8 * psdu + SERVICE_TAIL_BITS) / bits_per_symbol)
+
+
+def max_psdu_bytes(duration_us, ru, mcs):
+    """Largest PSDU that fits in duration_us of data symbols on one RU."""
+    symbols = int(duration_us // SYMBOL_US)
+    return max(0, int((symbols * RU_DATA_TONES[ru] * MCS_BITS[mcs] - SERVICE_TAIL_BITS) // 8))
+
+
+def _units(units):
+    return sum(1 << u for u in units)
+
+
+def _ru_positions():
+    """(RU size, bitmask of its 26-tone units) of every RU of the 40 MHz tree."""
+    half_units = CHANNEL_UNITS // 2
+    positions = []
+    for half in (0, half_units):
+        positions += [(26, _units([half + u])) for u in range(half_units)]
+        positions += [(52, _units([half + u, half + u + 1])) for u in (0, 2, 5, 7)]
+        positions += [(106, _units(range(half + u, half + u + 4))) for u in (0, 5)]
+        positions.append((242, _units(range(half, half + half_units))))
+    positions.append((484, _units(range(CHANNEL_UNITS))))
+    return positions
+
+
+RU_POSITIONS = _ru_positions()
+FULL_CHANNEL_MASK = (1 << CHANNEL_UNITS) - 1
+
+
+@lru_cache(maxsize=None)
+def ru_placements(free=FULL_CHANNEL_MASK):
+    """
+    RU-size count tuples (per RU_SIZES) placeable on the free units of the mask
+    (idle units allowed): the RU on the lowest free unit is one of those
+    starting there, or none; subproblems are memoized on the mask.
+    """
+    if not free:
+        return frozenset([(0,) * len(RU_SIZES)])
+    low = free & -free
+    counts = set(ru_placements(free & ~low))          # lowest free unit left idle
+    for ru, mask in RU_POSITIONS:
+        if mask & low and not mask & (low - 1) and mask & free == mask:
+            r = RU_SIZES.index(ru)
+            for c in ru_placements(free & ~mask):
+                counts.add(c[:r] + (c[r] + 1,) + c[r + 1:])
+    return frozenset(counts)
+
+
+def ru_placeable(counts):
+    """Whether {RU size: number of RUs} fits the 40 MHz RU tree."""
+    return tuple(counts.get(ru, 0) for ru in RU_SIZES) in ru_placements()
+
+
+@lru_cache(maxsize=None)
+def max_rus(ru, others=()):
+    """Most RUs of size ru placeable next to others ((RU size, count) pairs)."""
+    counts = {}
+    for size, count in others:
+        counts[size] = counts.get(size, 0) + count
+    if not ru_placeable(counts):
+        return 0
+    base, n = counts.get(ru, 0), 0
+    while ru_placeable({**counts, ru: base + n + 1}):
+        n += 1
+    return n
+
+
+RU_MAX_COUNT = {ru: max_rus(ru) for ru in RU_SIZES}
+
+
+def ru_for_users(n_users):
+    """Largest RU size that gives n_users their own RU in the 40 MHz channel."""
+    for ru in (484, 242, 106, 52, 26):
+        if n_users <= RU_MAX_COUNT[ru]:
+            return ru
+    return 26
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+One-Pass Jitter Engine
+
+Computes jitter directly from per-packet latency traces instead of the
+estimated arrays in fix_figures.py:
+
+- Std-dev jitter: standard deviation of latency, per flow and per AC, with
+  Welford running moments. Chunks, files and seeds processed on different
+  cores are combined with Chan's parallel update, so no second pass is needed.
+- RFC 3550 inter-arrival jitter: J += (|D| - J) / 16 with
+  D = latency_i - latency_(i-1) for consecutive packets of one flow.
+  Also reports the mean |D| (ns-3 FlowMonitor jitterSum / (rxPackets - 1)).
+
+Packets are assumed to be in receive order within each trace file.
+
+Usage:
+    python jitter_engine.py <trace.csv> [...]     # per-flow / per-AC jitter
+"""
+
+import math
+import sys
+
+import numpy as np
+
+RFC3550_GAIN = 1.0 / 16
+
+
+def chan_merge(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Chan et al. parallel combination of (count, mean, M2) moments."""
+    n = n_a + n_b
+    if n_b == 0:
+        return n_a, mean_a, m2_a
+    if n_a == 0:
+        return n_b, mean_b, m2_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return n, mean, m2
+
+
+class RunningStats:
+    """Welford mean/variance accumulator with vectorized chunk updates."""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, values):
+        """Fold a 1-D array into the moments (one Chan step per chunk)."""
+        n = int(values.size)
+        if n == 0:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(np.square(values - chunk_mean).sum())
+        self.count, self.mean, self.m2 = chan_merge(
+            self.count, self.mean, self.m2, n, chunk_mean, chunk_m2)
+
+    def merge(self, other):
+        self.count, self.mean, self.m2 = chan_merge(
+            self.count, self.mean, self.m2, other.count, other.mean, other.m2)
+        return self
+
+    @property
+    def std(self):
+        """Population standard deviation (0 for a single sample)."""
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+
+def rfc3550_update(jitter, abs_d):
+    """
+    Apply J += (|D| - J)/16 for every |D| in abs_d and return the final J.
+
+    The recurrence is a first-order IIR filter, so the final state is
+    a^n * J0 + g * sum(a^(n-1-k) * |D_k|) with a = 1 - g: one dot product.
+    """
+    n = abs_d.size
+    if n == 0:
+        return jitter
+    a = 1.0 - RFC3550_GAIN
+    weights = a ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    return float(a ** n * jitter + RFC3550_GAIN * np.dot(weights, abs_d))
+
+
+class FlowJitter:
+    """Per-flow jitter state: latency moments plus RFC 3550 filter state."""
+
+    __slots__ = ('stats', 'last', 'rfc3550', 'ipdv_sum', 'ipdv_count')
+
+    def __init__(self):
+        self.stats = RunningStats()
+        self.last = None
+        self.rfc3550 = 0.0
+        self.ipdv_sum = 0.0
+        self.ipdv_count = 0
+
+    def add(self, latencies):
+        """Fold the next (receive-ordered) latencies of this flow."""
+        if latencies.size == 0:
+            return
+        self.stats.add(latencies)
+        if self.last is not None:
+            latencies = np.concatenate(([self.last], latencies))
+        abs_d = np.abs(np.diff(latencies))
+        self.rfc3550 = rfc3550_update(self.rfc3550, abs_d)
+        self.ipdv_sum += float(abs_d.sum())
+        self.ipdv_count += int(abs_d.size)
+        self.last = float(latencies[-1])
+
+    @property
+    def std(self):
+        return self.stats.std
+
+    @property
+    def ipdv(self):
+        return self.ipdv_sum / self.ipdv_count if self.ipdv_count else math.nan
+
+
+class FlowJitterTracker:
+    """Tracks FlowJitter for every (ac, flow) seen in a stream of chunks."""
+
+    def __init__(self):
+        self.flows = {}
+
+    def add(self, acs, flows, latencies):
+        """
+        Fold one chunk. acs, flows and latencies are aligned 1-D arrays in
+        receive order; packets of each (ac, flow) keep their relative order.
+        """
+        if latencies.size == 0:
+            return
+        keys = acs.astype(np.int64) << 32 | (flows.astype(np.int64) & 0xFFFFFFFF)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], sorted_keys.size]
+        for start, end in zip(starts, ends):
+            idx = order[start:end]
+            key = (int(acs[idx[0]]), int(flows[idx[0]]))
+            if key not in self.flows:
+                self.flows[key] = FlowJitter()
+            self.flows[key].add(latencies[idx])
+
+
+if __name__ == '__main__':
+    from results_ingest import ACS, iter_packet_chunks
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        tracker = FlowJitterTracker()
+        per_ac = {}
+        for chunk in iter_packet_chunks(path):
+            tracker.add(chunk['ac'], chunk['flow'], chunk['latency'])
+            for code in np.unique(chunk['ac']):
+                per_ac.setdefault(int(code), RunningStats()).add(
+                    chunk['latency'][chunk['ac'] == code])
+
+        print("="*70)
+        print(f"Jitter: {path}")
+        print("="*70)
+        print(f"{'AC':<6} {'Flow':>6} {'Packets':>9} {'Std (ms)':>10} "
+              f"{'RFC3550':>10} {'Mean |D|':>10}")
+        for (code, flow), fj in sorted(tracker.flows.items()):
+            print(f"{ACS[code]:<6} {flow:>6} {fj.stats.count:>9} {fj.std:>10.3f} "
+                  f"{fj.rfc3550:>10.3f} {fj.ipdv:>10.3f}")
+        print("-"*70)
+        for code, stats in sorted(per_ac.items()):
+            print(f"AC_{ACS[code]}: std-dev jitter = {stats.std:.3f} ms "
+                  f"({stats.count} packets)")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Vectorized Metrics Engine
+
+Holds per-AC metrics of every method in one dense float array of shape
+(method x nwifi x AC x seed), AC in results_ingest.ACS order (BE, BK, VI, VO),
+with NaN for missing cells. Weighted latency, ratios against a baseline and
+averages are broadcast operations over that array instead of per-point list
+comprehensions in every plotting script.
+
+Weighted latency = sum over ACs of weight[ac] * latency[ac]. The default
+AC_WEIGHTS are the thesis weights (HP: VO, VI = 1.5, LP: BK = 0.5) with no BE
+term; pass e.g. dict(AC_WEIGHTS, BE=0.25) to include AC_BE. ACs with zero
+weight are skipped, so they may be missing (NaN) without affecting the result.
+
+Usage:
+    tensor = MetricsTensor.from_series({'PBM': {'BK': pbm_bk, 'VI': pbm_vi, 'VO': pbm_vo}, ...})
+    tensor = MetricsTensor.from_store(open_store(), 'case1', ['PBM', 'MPS'], seeds='all')
+    tensor.weighted()                    # (method, nwifi) weighted latency
+    tensor.ratio('PBM')                  # weighted latency / PBM's
+    tensor.average()                     # per-method mean over nwifi
+    tensor.weighted_series('PBM')        # list, for plotting
+
+    python metrics_engine.py [--weights BE=0.25 BK=0.5 VI=1.5 VO=1.5]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from results_ingest import ACS, AC_INDEX
+from results_store import ALL_SEEDS, NWIFI_VALUES, case_series
+
+# Weighted latency: HP=1.5 (VO, VI), LP=0.5 (BK), no BE traffic
+AC_WEIGHTS = {'BE': 0.0, 'BK': 0.5, 'VI': 1.5, 'VO': 1.5}
+
+
+def weight_vector(weights=None):
+    """Per-AC weights as an array in ACS order (unlisted ACs weigh 0)."""
+    weights = AC_WEIGHTS if weights is None else weights
+    return np.array([float(weights.get(ac, 0.0)) for ac in ACS])
+
+
+class MetricsTensor:
+    """Dense (method x nwifi x AC x seed) metric array with named axes."""
+
+    def __init__(self, methods, values, nwifi_values=NWIFI_VALUES, seeds=(ALL_SEEDS,)):
+        self.methods = list(methods)
+        self.nwifi_values = list(nwifi_values)
+        self.seeds = list(seeds)
+        self.values = np.asarray(values, dtype=np.float64)
+        expected = (len(self.methods), len(self.nwifi_values), len(ACS), len(self.seeds))
+        if self.values.shape != expected:
+            raise ValueError(f"values has shape {self.values.shape}, expected {expected}")
+        self._method_index = {m: i for i, m in enumerate(self.methods)}
+
+    @classmethod
+    def from_series(cls, series, nwifi_values=NWIFI_VALUES):
+        """Build from {method: {ac: series over nwifi}} (one pooled seed)."""
+        values = np.full((len(series), len(nwifi_values), len(ACS), 1), np.nan)
+        for m, per_ac in enumerate(series.values()):
+            for ac, data in per_ac.items():
+                values[m, :, AC_INDEX[ac], 0] = data
+        return cls(list(series), values, nwifi_values)
+
+    @classmethod
+    def from_case_series(cls, methods, column='mean', acs=('BK', 'VI', 'VO'),
+                         case='case1', nwifi_values=NWIFI_VALUES):
+        """Build from case_series() lookups (store, else the verified numbers)."""
+        return cls.from_series(
+            {m: {ac: case_series(m, ac, case, nwifi_values, column=column) for ac in acs}
+             for m in methods}, nwifi_values)
+
+    @classmethod
+    def from_store(cls, store, case, methods, column='mean',
+                   nwifi_values=NWIFI_VALUES, seeds=None):
+        """
+        Gather a column of a ResultsStore in one fancy-index over the row
+        numbers of the whole block (ResultsStore.block_rows()).
+        seeds: None for the pooled rows, 'all' for every stored seed, or a list.
+        """
+        if seeds is None:
+            seeds = [ALL_SEEDS]
+        elif seeds == 'all':
+            seeds = store.seed_values(case, methods)
+        rows = store.block_rows(case, methods, nwifi_values, ACS, seeds)
+        column_data = np.asarray(store.columns[column], dtype=np.float64)
+        values = np.where(rows >= 0, column_data[np.maximum(rows, 0)], np.nan)
+        return cls(methods, values, nwifi_values, seeds)
+
+    def index(self, method):
+        return self._method_index[method]
+
+    def per_ac(self):
+        """(method, nwifi, AC) metric averaged over seeds."""
+        if len(self.seeds) == 1:
+            return self.values[..., 0]
+        count = np.count_nonzero(~np.isnan(self.values), axis=3)
+        with np.errstate(invalid='ignore'):
+            return np.nansum(self.values, axis=3) / count
+
+    def weighted(self, weights=None, per_seed=False):
+        """
+        Weighted latency, shape (method, nwifi) or (method, nwifi, seed) with
+        per_seed. NaN where an AC with non-zero weight is missing.
+        """
+        w = weight_vector(weights)
+        values = self.values if per_seed else self.per_ac()[..., np.newaxis]
+        # Highest priority AC first: same summation order as 1.5*VO + 1.5*VI + 0.5*BK
+        result = np.zeros(values.shape[:2] + values.shape[3:])
+        for a in reversed(range(len(ACS))):
+            if w[a]:
+                result += w[a] * values[:, :, a, :]
+        return result if per_seed else result[..., 0]
+
+    def ratio(self, baseline='PBM', weights=None):
+        """Weighted latency of every method divided by the baseline's, (method, nwifi)."""
+        weighted = self.weighted(weights)
+        return weighted / weighted[self.index(baseline)]
+
+    def average(self, weights=None):
+        """Mean weighted latency over nwifi, per method."""
+        return self.weighted(weights).mean(axis=1)
+
+    def weighted_series(self, method, weights=None):
+        """Weighted latency of one method as a list over nwifi (for plotting)."""
+        return self.weighted(weights)[self.index(method)].tolist()
+
+    def series(self, method, ac):
+        """Per-AC metric of one method as a list over nwifi."""
+        return self.per_ac()[self.index(method), :, AC_INDEX[ac]].tolist()
+
+
+def parse_weights(items):
+    """['BE=0.25', 'BK=0.5'] -> {'BE': 0.25, 'BK': 0.5} on top of AC_WEIGHTS."""
+    weights = dict(AC_WEIGHTS)
+    for item in items or []:
+        ac, _, value = item.partition('=')
+        if ac not in AC_WEIGHTS:
+            raise ValueError(f"unknown AC {ac!r} (expected one of {', '.join(ACS)})")
+        weights[ac] = float(value)
+    return weights
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Weighted latency of all schedulers')
+    parser.add_argument('--weights', nargs='+', metavar='AC=W',
+                        help='per-AC weights (default: BK=0.5 VI=1.5 VO=1.5, BE=0)')
+    parser.add_argument('--baseline', default='PBM')
+    args = parser.parse_args()
+
+    weights = parse_weights(args.weights)
+    methods = ['PBM', 'MPS', 'SU', 'Non-MU-TXOP', 'ML-Old', 'ML-Old-v2']
+    acs = [ac for ac in ACS if weights[ac]]
+    try:
+        tensor = MetricsTensor.from_case_series(methods, acs=acs)
+    except KeyError as e:
+        sys.exit(e.args[0])
+    weighted = tensor.weighted(weights)
+    ratio = tensor.ratio(args.baseline, weights)
+
+    print("="*70)
+    print("Weighted latency (ms): " + " + ".join(f"{weights[ac]:g}*{ac}" for ac in acs))
+    print("="*70)
+    print(f"{'Method':<14}" + "".join(f"{n:>9}" for n in tensor.nwifi_values)
+          + f"{'Avg':>9}{'vs ' + args.baseline:>10}")
+    print("-"*70)
+    for m, method in enumerate(tensor.methods):
+        avg_ratio = weighted[m].mean() / weighted[tensor.index(args.baseline)].mean()
+        print(f"{method:<14}" + "".join(f"{v:>9.3f}" for v in weighted[m])
+              + f"{weighted[m].mean():>9.3f}{(avg_ratio - 1) * 100:>+9.1f}%")
+    print("-"*70)
+    print(f"Worst point vs {args.baseline}: "
+          + ", ".join(f"{m}={ratio[i].max():.2f}x" for i, m in enumerate(tensor.methods)))
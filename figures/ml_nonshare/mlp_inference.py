@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Batched NumPy Inference for the Scheduler MLP (B1: 12 -> 64 -> 32 -> 11)
+
+Pure-NumPy forward pass of the ML scheduler followed by the Rule 4
+feasibility mask, for offline replay and the surrogate simulator. PyTorch is
+not imported: weights are read from
+
+- the PyTorch checkpoint (.pth / .pt), unpickled with a restricted loader that
+  rebuilds tensors as NumPy arrays from the zip's raw storages
+- the C header written for ns-3 (ml-scheduler-weights.h, float arrays)
+- a NumPy archive (.npz) of the state dict
+
+Layers are the state dict's 'fc<i>.weight' / 'fc<i>.bias' pairs, as written by
+mlp_trainer ((out, in) weights, as in torch.nn.Linear; 'fc<i>_weight' in C
+headers), ReLU between them; optional 'input_mean' / 'input_std' arrays
+standardize the 12 input features first. Any other key (e.g. BatchNorm
+running statistics) is rejected. Dropout is a no-op at inference. bfloat16
+checkpoints are widened to float32.
+
+A call evaluates the batch in chunks of CHUNK_ROWS rows through preallocated
+float32 buffers (three matrix multiplies per chunk), applies the mask with one
+vectorized copyto and returns the masked argmax class per row:
+
+    policy = MLPPolicy.load('b1_full_bc.pth')
+    classes = policy(features)          # (N, 12) -> (N,) int64, like POLICIES
+
+Usage:
+    python mlp_inference.py b1_full_bc.pth                 # summary + throughput
+    python mlp_inference.py ml-scheduler-weights.h --rows 4000000
+    python mlp_inference.py --random                       # untrained 12-64-32-11
+"""
+
+import argparse
+import io
+import pickle
+import re
+import time
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from scheduler_policies import N_CLASSES, N_FEATURES, feasible_classes, sample_states
+
+LAYER_SIZES = (N_FEATURES, 64, 32, N_CLASSES)
+CHUNK_ROWS = 1 << 16
+
+
+# ==============================================================================
+# Weight loading (no PyTorch)
+# ==============================================================================
+
+_BFLOAT16 = 'bfloat16'
+_STORAGE_DTYPES = {
+    'FloatStorage': np.float32, 'DoubleStorage': np.float64,
+    'HalfStorage': np.float16, 'BFloat16Storage': _BFLOAT16,
+    'LongStorage': np.int64, 'IntStorage': np.int32, 'ShortStorage': np.int16,
+    'CharStorage': np.int8, 'ByteStorage': np.uint8, 'BoolStorage': np.bool_,
+}
+
+
+def _storage(data, dtype):
+    """Array over a raw storage; bfloat16 is the high half of a float32."""
+    if dtype is _BFLOAT16:
+        return (np.frombuffer(data, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+    return np.frombuffer(data, dtype=dtype)
+
+
+def _rebuild_tensor(storage, offset, size, stride, *args):
+    itemsize = storage.itemsize
+    return np.lib.stride_tricks.as_strided(
+        storage[offset:], shape=tuple(size),
+        strides=tuple(s * itemsize for s in stride)).copy()
+
+
+class _TorchUnpickler(pickle.Unpickler):
+    """Unpickles a torch.save() zip archive into NumPy arrays."""
+
+    def __init__(self, archive, prefix):
+        self._archive, self._prefix = archive, prefix
+        super().__init__(io.BytesIO(archive.read(f'{prefix}data.pkl')))
+
+    def find_class(self, module, name):
+        if module == 'torch._utils' and name in ('_rebuild_tensor_v2', '_rebuild_tensor'):
+            return _rebuild_tensor
+        if module == 'torch' and name in _STORAGE_DTYPES:
+            return _STORAGE_DTYPES[name]
+        if module == 'collections' and name == 'OrderedDict':
+            return OrderedDict
+        if module == 'torch._utils' and name == '_rebuild_parameter':
+            return lambda data, requires_grad, backward_hooks: data
+        raise pickle.UnpicklingError(f"unsupported object in checkpoint: {module}.{name} "
+                                     "(save the state_dict, not the module)")
+
+    def persistent_load(self, pid):
+        _, dtype, key, _, _ = pid
+        return _storage(self._archive.read(f'{self._prefix}data/{key}'), dtype)
+
+
+def load_torch_state(path):
+    """State dict (name -> array) of a torch.save() checkpoint, without torch."""
+    with zipfile.ZipFile(path) as archive:
+        pkl = next(n for n in archive.namelist() if n.endswith('data.pkl'))
+        state = _TorchUnpickler(archive, pkl[:-len('data.pkl')]).load()
+    # Training checkpoints nest the state dict ({'model_state_dict': ..., 'epoch': ...})
+    while isinstance(state, dict) and not any(isinstance(v, np.ndarray) for v in state.values()):
+        state = next(v for v in state.values() if isinstance(v, dict))
+    return state
+
+
+_HEADER_ARRAY_RE = re.compile(
+    r'(?:float|double)\s+(\w+)\s*((?:\[[^\]]*\])+)\s*=\s*\{(.*?)\}\s*;', re.S)
+_NUMBER_RE = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def load_header_state(path):
+    """Float arrays of a C header (ml-scheduler-weights.h), in declaration order."""
+    with open(path) as f:
+        text = re.sub(r'//[^\n]*|/\*.*?\*/', '', f.read(), flags=re.S)
+    state = OrderedDict()
+    for name, dims, body in _HEADER_ARRAY_RE.findall(text):
+        values = np.array([float(v) for v in _NUMBER_RE.findall(body)], dtype=np.float32)
+        shape = [int(d) for d in re.findall(r'\[\s*(\d+)\s*\]', dims)]
+        state[name] = values.reshape(shape) if len(shape) > 1 and np.prod(shape) == values.size \
+            else values
+    return state
+
+
+def _c_name(name):
+    return re.sub(r'\W', '_', name)
+
+
+def _c_float(value):
+    text = f'{value:.9g}'
+    return (text if any(c in text for c in '.en') else text + '.0') + 'f'
+
+
+def c_array(ctype, name, array, width=16):
+    """Definition of a static const C array (2-D arrays as nested rows)."""
+    array = np.asarray(array)
+    literal = _c_float if ctype in ('float', 'double') else (lambda v: str(int(v)))
+    if array.ndim == 2:
+        rows = ['{' + ', '.join(literal(v) for v in row) + '}' for row in array]
+    else:
+        flat = [literal(v) for v in array.ravel()]
+        rows = [', '.join(flat[i:i + width]) for i in range(0, len(flat), width)]
+    dims = ''.join(f'[{d}]' for d in array.shape)
+    return (f'static const {ctype} {_c_name(name)}{dims} = {{\n    '
+            + ',\n    '.join(rows) + '\n};\n')
+
+
+def write_header_state(path, state, guard='ML_SCHEDULER_WEIGHTS_H'):
+    """C header with one float array per state dict entry (read by load_header_state)."""
+    lines = [f'#ifndef {guard}', f'#define {guard}', '']
+    for name, value in state.items():
+        lines.append(c_array('float', name, np.asarray(value, dtype=np.float32)))
+    lines.append(f'#endif  // {guard}')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def save_state(path, state):
+    """Write a state dict as a .h header or .npz archive (by extension)."""
+    if path.endswith('.h'):
+        write_header_state(path, state)
+    else:
+        np.savez(path, **state)
+
+
+def load_state(path):
+    """State dict of a .pth/.pt checkpoint, .h header or .npz archive."""
+    if path.endswith('.h'):
+        return load_header_state(path)
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            return OrderedDict((k, data[k]) for k in data.files)
+    return load_torch_state(path)
+
+
+_LAYER_RE = re.compile(r'fc(\d+)[._](weight|bias)')
+_NORM_KEYS = {'input_mean': 'mean', 'input_std': 'std'}
+
+
+def layers_from_state(state):
+    """
+    [(W (in, out) float32, b float32)] from a state dict, plus (mean, std) of
+    the input features or None. Keys are 'fc<i>.weight' / 'fc<i>.bias' (or
+    'fc<i>_weight' / 'fc<i>_bias'), i = 1..n, and optionally 'input_mean' /
+    'input_std'; anything else raises ValueError. Flat header arrays are
+    reshaped with the bias length.
+    """
+    params, norm, unknown = {}, {}, []
+    for name, value in state.items():
+        value = np.asarray(value, dtype=np.float32)
+        match = _LAYER_RE.fullmatch(name)
+        if name in _NORM_KEYS:
+            norm[_NORM_KEYS[name]] = value.ravel()
+        elif match:
+            params[(int(match[1]), match[2])] = value
+        else:
+            unknown.append(name)
+    if unknown:
+        raise ValueError(f"unrecognized state dict keys {unknown} (expected fc<i>.weight, "
+                         f"fc<i>.bias, input_mean, input_std)")
+    n_layers = len(params) // 2
+    expected = {(i, kind) for i in range(1, n_layers + 1) for kind in ('weight', 'bias')}
+    if not params or set(params) != expected:
+        raise ValueError(f"expected weight/bias pairs fc1..fc<n>, got {list(state)}")
+
+    layers = []
+    for i in range(1, n_layers + 1):
+        w, b = params[(i, 'weight')], params[(i, 'bias')]
+        w = w.reshape(len(b), -1) if w.ndim == 1 else w
+        layers.append((np.ascontiguousarray(w.T), b))
+    for (w, _), (w_next, _) in zip(layers, layers[1:]):
+        if w.shape[1] != w_next.shape[0]:
+            raise ValueError(f"layer shapes do not chain: {[w.shape for w, _ in layers]}")
+    normalize = None
+    if 'mean' in norm:
+        std = norm.get('std', np.ones_like(norm['mean']))
+        normalize = (norm['mean'], np.where(std == 0, 1, std))
+    return layers, normalize
+
+
+# ==============================================================================
+# Inference
+# ==============================================================================
+
+class MLPPolicy:
+    """ReLU MLP + feasibility mask, evaluated as batched float32 matrix multiplies."""
+
+    def __init__(self, layers, normalize=None, masked=True, chunk_rows=CHUNK_ROWS):
+        self.layers = [(np.ascontiguousarray(w, dtype=np.float32),
+                        np.asarray(b, dtype=np.float32)) for w, b in layers]
+        self.normalize = None if normalize is None else \
+            tuple(np.asarray(v, dtype=np.float32) for v in normalize)
+        self.masked = masked
+        self.chunk_rows = chunk_rows
+        self.sizes = [self.layers[0][0].shape[0]] + [w.shape[1] for w, _ in self.layers]
+        self._buffers = None
+        self._mask = None
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        layers, normalize = layers_from_state(load_state(path))
+        return cls(layers, normalize, **kwargs)
+
+    @classmethod
+    def random(cls, sizes=LAYER_SIZES, seed=0, **kwargs):
+        """He-initialized network (for benchmarks and tests without trained weights)."""
+        rng = np.random.default_rng(seed)
+        layers = [(rng.normal(0, np.sqrt(2 / n_in), (n_in, n_out)), np.zeros(n_out))
+                  for n_in, n_out in zip(sizes, sizes[1:])]
+        return cls(layers, **kwargs)
+
+    @property
+    def n_parameters(self):
+        return sum(w.size + b.size for w, b in self.layers)
+
+    def _chunk_buffers(self, rows):
+        if self._buffers is None or len(self._buffers[0]) < rows:
+            self._buffers = [np.empty((rows, n), dtype=np.float32) for n in self.sizes]
+        return [buf[:rows] for buf in self._buffers]
+
+    def logits(self, features, out=None):
+        """(N, classes) float32 pre-softmax scores."""
+        x = np.atleast_2d(features)
+        out = np.empty((len(x), self.sizes[-1]), dtype=np.float32) if out is None else out
+        for start in range(0, len(x), self.chunk_rows):
+            stop = min(start + self.chunk_rows, len(x))
+            bufs = self._chunk_buffers(stop - start)
+            h = bufs[0]
+            h[...] = x[start:stop]
+            if self.normalize is not None:
+                h -= self.normalize[0]
+                h /= self.normalize[1]
+            for i, (w, b) in enumerate(self.layers):
+                nxt = out[start:stop] if i == len(self.layers) - 1 else bufs[i + 1]
+                np.matmul(h, w, out=nxt)
+                nxt += b
+                if i < len(self.layers) - 1:
+                    np.maximum(nxt, 0, out=nxt)
+                h = nxt
+        return out
+
+    def decide(self, features, mask=None):
+        """Masked argmax class per row; mask defaults to Rule 4 (feasible_classes)."""
+        features = np.atleast_2d(features)
+        scores = self.logits(features)
+        if self.masked:
+            if mask is None:
+                if self._mask is None or len(self._mask) < len(features):
+                    self._mask = np.empty((len(features), N_CLASSES), dtype=bool)
+                mask = feasible_classes(features, out=self._mask[:len(features)])
+            np.copyto(scores, -np.inf, where=~mask)
+        return np.argmax(scores, axis=1)
+
+    __call__ = decide
+
+
+def benchmark(policy, rows=1 << 20, nwifi=18, seed=0):
+    """Decisions per second of policy on rows sampled states."""
+    states = sample_states(rows, nwifi, np.random.default_rng(seed))
+    policy(states[:1024])
+    start = time.perf_counter()
+    classes = policy(states)
+    seconds = time.perf_counter() - start
+    return rows / seconds, np.bincount(classes, minlength=policy.sizes[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batched NumPy MLP scheduler inference')
+    parser.add_argument('weights', nargs='?', help='.pth/.pt, .h or .npz weights')
+    parser.add_argument('--random', action='store_true', help='untrained 12-64-32-11 network')
+    parser.add_argument('--rows', type=int, default=1 << 20, help='states to decide')
+    parser.add_argument('--nwifi', type=int, default=18)
+    parser.add_argument('--no-mask', action='store_true', help='skip the feasibility mask')
+    args = parser.parse_args()
+    if not args.weights and not args.random:
+        parser.error('give a weights file or --random')
+
+    policy = (MLPPolicy.random(masked=not args.no_mask) if args.random
+              else MLPPolicy.load(args.weights, masked=not args.no_mask))
+    print("="*70)
+    print(f"MLP {'-'.join(map(str, policy.sizes))}: {policy.n_parameters:,} parameters"
+          f"{', input standardization' if policy.normalize is not None else ''}"
+          f"{', Rule 4 mask' if policy.masked else ''}")
+    rate, counts = benchmark(policy, args.rows, args.nwifi)
+    print(f"{args.rows:,} decisions: {rate / 1e6:.2f} M decisions/s "
+          f"({1e9 / rate:.0f} ns/decision)")
+    print("Class histogram: " + " ".join(f"{c}:{n}" for c, n in enumerate(counts)))
+    print("="*70)
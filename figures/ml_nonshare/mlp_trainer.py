@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+NumPy Trainer for the ML Baselines (B0-B3)
+
+Trains the scheduler MLPs without PyTorch: a ReLU MLP with configurable
+hidden sizes, dropout, cross-entropy and Adam on float32 mini-batches, and,
+for B1, a masked softmax that gives the Rule 4 infeasible classes zero
+probability (as the feasibility mask does at inference). Startup is the
+NumPy import; a 50k-sample run of the original setup takes seconds.
+
+Tasks (MLBaselineforWi-Fi6MU-TXOPScheduler.md):
+    B0-NonShare   6 features (queues, primary STAs / AC) -> 5 RU sizes of Non-MU-TXOP
+    B1-Full-BC    12 features -> 11 PBM decision classes, Rule 4 masked
+    B2-Chooser    12 features -> PBM / MPS
+    B3-Meta       12 features -> Non-MU-TXOP / PBM / MPS
+
+Data: an expert_dataset.py directory streamed through shard_loader.py (the
+last shard validates), or --samples states drawn and labeled in memory with
+an 80/20 split (the original trainers' 30k-50k samples).
+
+Weights are written as a state dict ('fc<i>.weight' (out, in), 'fc<i>.bias',
+'input_mean', 'input_std'): .npz, or the C header format of
+ml-scheduler-weights.h with .h. Both load with mlp_inference.MLPPolicy.
+--confusion stores the validation confusion matrix in policy_confusion.json
+for policy_error.py.
+
+Usage:
+    python mlp_trainer.py B1-Full-BC --samples 50000 --out b1_full_bc.npz
+    python mlp_trainer.py B3-Meta --data /data/expert --epochs 5 --out b3.h
+    python mlp_trainer.py B2-Chooser --hidden 128 64 --dropout 0.2 --confusion
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from expert_dataset import LABEL_COLUMNS, label_states
+from mlp_inference import save_state
+from policy_error import POLICY_CONFUSION_FILE
+from results_store import NWIFI_VALUES
+from scheduler_policies import (F_AC_P, F_QUEUE, F_STA_P, N_CLASSES, N_FEATURES,
+                                feasible_classes, ru_for_users_array, sample_states)
+
+# features: column indices of the 12-dim state; label: expert_dataset column
+# (None: derived from the features); masked: Rule 4 masked softmax
+Task = namedtuple('Task', 'features label classes masked')
+B0_FEATURES = list(range(N_FEATURES)[F_QUEUE]) + [F_STA_P, F_AC_P]
+B0_RU_SIZES = np.array([26, 52, 106, 242, 484])
+TASKS = {
+    'B0-NonShare': Task(B0_FEATURES, None, len(B0_RU_SIZES), False),
+    'B1-Full-BC': Task(list(range(N_FEATURES)), 'PBM', N_CLASSES, True),
+    'B2-Chooser': Task(list(range(N_FEATURES)), 'B2-Chooser', 2, False),
+    'B3-Meta': Task(list(range(N_FEATURES)), 'B3-Meta', 3, False),
+}
+
+HIDDEN = (64, 32)
+DROPOUT = (0.1, 0.0)
+EPOCHS = 50
+BATCH_SIZE = 256
+LEARNING_RATE = 1e-3
+SAMPLES = 50000
+NORM_ROWS = 1 << 20
+MASKED_LOGIT = -1e9
+
+
+def task_targets(task, features, labels):
+    """Class targets of a batch: the task's label column, or B0's RU size index."""
+    if task.label is None:
+        ru = ru_for_users_array(features[:, F_STA_P])
+        return np.searchsorted(B0_RU_SIZES, ru)
+    labels = labels if labels.ndim == 1 else labels[:, LABEL_COLUMNS.index(task.label)]
+    return labels.astype(np.int64)
+
+
+# ==============================================================================
+# Model
+# ==============================================================================
+
+class MLP:
+    """ReLU MLP with inverted dropout after the hidden layers, float32 parameters."""
+
+    def __init__(self, sizes, dropout=DROPOUT, mean=None, std=None, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.sizes = list(sizes)
+        self.dropout = list(dropout) + [0.0] * (len(sizes) - 2 - len(dropout))
+        # torch.nn.Linear default init: U(-1/sqrt(fan_in), 1/sqrt(fan_in))
+        self.params = []
+        for n_in, n_out in zip(sizes, sizes[1:]):
+            bound = 1 / np.sqrt(n_in)
+            self.params += [self.rng.uniform(-bound, bound, (n_in, n_out)).astype(np.float32),
+                            self.rng.uniform(-bound, bound, n_out).astype(np.float32)]
+        self.mean = np.zeros(sizes[0], np.float32) if mean is None else mean.astype(np.float32)
+        self.std = np.ones(sizes[0], np.float32) if std is None else std.astype(np.float32)
+        self._cache = None
+
+    def forward(self, x, train=False):
+        """Logits of a batch; with train, applies dropout and keeps activations."""
+        h = (np.asarray(x, dtype=np.float32) - self.mean) / self.std
+        cache = [h]
+        n_layers = len(self.params) // 2
+        for i in range(n_layers):
+            w, b = self.params[2 * i], self.params[2 * i + 1]
+            h = h @ w + b
+            if i < n_layers - 1:
+                np.maximum(h, 0, out=h)
+                p = self.dropout[i]
+                keep = None
+                if train and p > 0:
+                    keep = (self.rng.random(h.shape, dtype=np.float32) >= p) / np.float32(1 - p)
+                    h *= keep
+                cache += [keep, h]
+        if train:
+            self._cache = cache
+        return h
+
+    def backward(self, grad):
+        """Parameter gradients for the last training forward(); grad = dL/dlogits."""
+        cache = self._cache
+        grads = [None] * len(self.params)
+        for i in reversed(range(len(self.params) // 2)):
+            h_in = cache[2 * i]
+            grads[2 * i] = h_in.T @ grad
+            grads[2 * i + 1] = grad.sum(axis=0)
+            if i:
+                grad = grad @ self.params[2 * i].T
+                keep = cache[2 * i - 1]
+                if keep is not None:
+                    grad *= keep
+                grad *= h_in > 0
+        return grads
+
+    def state_dict(self):
+        state = OrderedDict()
+        for i in range(len(self.params) // 2):
+            state[f'fc{i + 1}.weight'] = self.params[2 * i].T.copy()
+            state[f'fc{i + 1}.bias'] = self.params[2 * i + 1]
+        state['input_mean'] = self.mean
+        state['input_std'] = self.std
+        return state
+
+    @property
+    def n_parameters(self):
+        return sum(p.size for p in self.params)
+
+
+class Adam:
+    """Adam over a list of float32 arrays, updated in place."""
+
+    def __init__(self, params, lr=LEARNING_RATE, betas=(0.9, 0.999), eps=1e-8):
+        self.params, self.lr, self.betas, self.eps = params, lr, betas, eps
+        self.m = [np.zeros_like(p) for p in params]
+        self.v = [np.zeros_like(p) for p in params]
+        self.t = 0
+
+    def step(self, grads):
+        self.t += 1
+        b1, b2 = self.betas
+        scale = self.lr * np.sqrt(1 - b2 ** self.t) / (1 - b1 ** self.t)
+        for p, g, m, v in zip(self.params, grads, self.m, self.v):
+            m *= b1
+            m += (1 - b1) * g
+            v *= b2
+            v += (1 - b2) * g * g
+            p -= scale * m / (np.sqrt(v) + self.eps)
+
+
+def masked_softmax_loss(logits, targets, mask=None):
+    """
+    Mean cross-entropy, dL/dlogits and the masked logits (for argmax);
+    mask=False classes get probability 0 (the label itself is never masked
+    in the loss).
+    """
+    rows = np.arange(len(targets))
+    masked = logits
+    if mask is not None:
+        masked = np.where(mask, logits, np.float32(MASKED_LOGIT))
+        if mask[rows, targets].all():
+            logits = masked
+        else:
+            logits = np.where(mask | (np.arange(logits.shape[1]) == targets[:, None]),
+                              logits, np.float32(MASKED_LOGIT))
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    total = exp.sum(axis=1, keepdims=True)
+    loss = float(np.mean(np.log(total[:, 0]) - shifted[rows, targets]))
+    grad = exp / total
+    grad[rows, targets] -= 1
+    grad /= len(targets)
+    return loss, grad.astype(np.float32), masked
+
+
+# ==============================================================================
+# Data
+# ==============================================================================
+
+def memory_dataset(samples, nwifi_values=NWIFI_VALUES, seed=0):
+    """(features float32, labels uint8) of `samples` labeled synthetic states."""
+    rng = np.random.default_rng(seed)
+    parts = [sample_states(len(idx), nwifi, rng)
+             for nwifi, idx in zip(nwifi_values, np.array_split(np.arange(samples),
+                                                                len(nwifi_values)))]
+    states = np.concatenate(parts)[rng.permutation(samples)]
+    return states.astype(np.float32), label_states(states)
+
+
+def array_batches(features, labels, batch_size, rng):
+    order = rng.permutation(len(features))
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        yield features[idx], labels[idx]
+
+
+def shard_rows(root, shards, rows=NORM_ROWS):
+    """Up to `rows` leading feature rows of the given shards (for normalization)."""
+    from expert_dataset import open_shard, read_manifest
+    manifest = read_manifest(root)
+    parts, left = [], rows
+    for i in shards:
+        features, _ = open_shard(root, manifest['shards'][i])
+        parts.append(np.asarray(features[:left]))
+        left -= len(parts[-1])
+        if left <= 0:
+            break
+    return np.concatenate(parts)
+
+
+# ==============================================================================
+# Training
+# ==============================================================================
+
+def evaluate(model, task, batches):
+    """(accuracy, mean loss, confusion matrix) over (features, labels) batches."""
+    confusion = np.zeros((task.classes, task.classes), dtype=np.int64)
+    loss_sum = rows = 0
+    for features, labels in batches:
+        targets = task_targets(task, features, labels)
+        mask = feasible_classes(features) if task.masked else None
+        loss, _, logits = masked_softmax_loss(model.forward(features[:, task.features]),
+                                              targets, mask)
+        pred = np.argmax(logits, axis=1)
+        np.add.at(confusion, (targets, pred), 1)
+        loss_sum += loss * len(targets)
+        rows += len(targets)
+    return np.trace(confusion) / max(rows, 1), loss_sum / max(rows, 1), confusion
+
+
+def train(task, train_batches, val_batches, norm_features, hidden=HIDDEN, dropout=DROPOUT,
+          epochs=EPOCHS, lr=LEARNING_RATE, seed=0, verbose=True):
+    """
+    Train a task's MLP. train_batches / val_batches: callables returning a new
+    iterable of (features, labels) batches per epoch (raw 12-dim features).
+    Returns (model, history [(epoch, train loss, val accuracy, val loss, seconds)]).
+    """
+    norm = norm_features[:, task.features].astype(np.float64)
+    std = norm.std(axis=0)
+    model = MLP([len(task.features), *hidden, task.classes], dropout,
+                norm.mean(axis=0), np.where(std > 0, std, 1), seed)
+    optimizer = Adam(model.params, lr)
+    history = []
+    for epoch in range(1, epochs + 1):
+        start = time.perf_counter()
+        loss_sum = rows = 0
+        for features, labels in train_batches():
+            targets = task_targets(task, features, labels)
+            mask = feasible_classes(features) if task.masked else None
+            logits = model.forward(features[:, task.features], train=True)
+            loss, grad, _ = masked_softmax_loss(logits, targets, mask)
+            optimizer.step(model.backward(grad))
+            loss_sum += loss * len(targets)
+            rows += len(targets)
+        accuracy, val_loss, _ = evaluate(model, task, val_batches())
+        history.append((epoch, loss_sum / rows, accuracy, val_loss, time.perf_counter() - start))
+        if verbose:
+            print(f"  epoch {epoch:>3}: train loss {loss_sum / rows:.4f}, "
+                  f"val loss {val_loss:.4f}, val acc {accuracy:.2%} "
+                  f"({history[-1][-1]:.2f}s)")
+    return model, history
+
+
+def save_confusion(name, confusion, path=POLICY_CONFUSION_FILE):
+    """Add / replace one baseline's confusion matrix in policy_confusion.json."""
+    data = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    data[name] = confusion.tolist()
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+if __name__ == '__main__':
+    start_time = time.perf_counter()
+    parser = argparse.ArgumentParser(description='NumPy trainer for the ML baselines')
+    parser.add_argument('task', choices=list(TASKS))
+    parser.add_argument('--data', help='expert_dataset.py directory (default: in memory)')
+    parser.add_argument('--samples', type=int, default=SAMPLES, help='in-memory samples')
+    parser.add_argument('--hidden', nargs='+', type=int, default=list(HIDDEN))
+    parser.add_argument('--dropout', nargs='+', type=float, default=list(DROPOUT))
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE)
+    parser.add_argument('--lr', type=float, default=LEARNING_RATE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='weights to write (.npz or .h)')
+    parser.add_argument('--confusion', action='store_true',
+                        help=f'store the validation confusion matrix in {POLICY_CONFUSION_FILE}')
+    args = parser.parse_args()
+    task = TASKS[args.task]
+    rng = np.random.default_rng(args.seed)
+
+    if args.data:
+        from shard_loader import ShardLoader, train_val_shards
+        train_shards, val_shards = train_val_shards(args.data)
+        loader = ShardLoader(args.data, task.label, args.batch, shards=train_shards,
+                             seed=args.seed)
+        val_loader = ShardLoader(args.data, task.label, 1 << 16, shuffle=False,
+                                 shards=val_shards)
+        train_batches, val_batches = (lambda: loader), (lambda: val_loader)
+        norm_features = shard_rows(args.data, train_shards)
+        source = f"{args.data} ({loader.rows:,} train / {val_loader.rows:,} val rows)"
+    else:
+        features, labels = memory_dataset(args.samples, seed=args.seed)
+        split = int(len(features) * 0.8)
+        train_batches = lambda: array_batches(features[:split], labels[:split], args.batch, rng)
+        val_batches = lambda: [(features[split:], labels[split:])]
+        norm_features = features[:split]
+        source = f"{args.samples:,} in-memory samples (80/20 split)"
+
+    print("="*70)
+    print(f"{args.task}: {len(task.features)} -> {' -> '.join(map(str, args.hidden))} -> "
+          f"{task.classes}{', Rule 4 masked softmax' if task.masked else ''}")
+    print(f"Data: {source}")
+    print(f"Startup: {time.perf_counter() - start_time:.2f}s")
+    print("-"*70)
+    model, history = train(task, train_batches, val_batches, norm_features, args.hidden,
+                           args.dropout, args.epochs, args.lr, args.seed)
+    accuracy, _, confusion = evaluate(model, task, val_batches())
+    print("-"*70)
+    print(f"{model.n_parameters:,} parameters, validation accuracy {accuracy:.2%}, "
+          f"{sum(h[-1] for h in history):.1f}s training")
+    if args.out:
+        save_state(args.out, model.state_dict())
+        print(f"Saved: {args.out}")
+    if args.confusion and args.task != 'B0-NonShare':
+        save_confusion(args.task, confusion)
+        print(f"Saved: {POLICY_CONFUSION_FILE} [{args.task}]")
+    print("="*70)
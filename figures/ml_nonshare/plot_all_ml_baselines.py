@@ -20,20 +20,16 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 
+from results_store import case_series, data_source
+from figure_cache import cached_output
+from figure_specs import STYLE_PROFILES, FigureSpec, register, render
+from metrics_engine import MetricsTensor
+from seed_stats import (CONFIDENCE, format_interval, paired_comparison,
+                        seed_tensor, weighted_intervals)
+
 # Style configuration
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
-plt.rcParams['axes.edgecolor'] = 'black'
-plt.rcParams['axes.linewidth'] = 1.0
-plt.rcParams['font.size'] = 12
-plt.rcParams['axes.labelsize'] = 14
-plt.rcParams['axes.titlesize'] = 16
-plt.rcParams['legend.fontsize'] = 9
-plt.rcParams['xtick.labelsize'] = 12
-plt.rcParams['ytick.labelsize'] = 12
-plt.rcParams['legend.frameon'] = True
-plt.rcParams['legend.edgecolor'] = 'black'
-plt.rcParams['legend.fancybox'] = False
+STYLE = STYLE_PROFILES['all_baselines']
+plt.rcParams.update(STYLE)
 
 OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -56,39 +52,42 @@ nwifi_values = [6, 12, 18, 24, 30]
 # RULE-BASED DATA (from ns-3 results, CORRECTED mapping)
 # ==============================================================================
 
+# Series come from the results store (python results_store.py build),
+# falling back to the verified case1 numbers in results_store.py
+
 # PBM (wifi6-3-develop/third_ac_latency.csv)
-pbm_bk = [0.105, 0.231, 0.309, 0.471, 0.449]
-pbm_vi = [0.087, 0.190, 0.219, 0.253, 0.282]
-pbm_vo = [0.070, 0.113, 0.109, 0.234, 0.226]
+pbm_bk = case_series('PBM', 'BK')
+pbm_vi = case_series('PBM', 'VI')
+pbm_vo = case_series('PBM', 'VO')
 
 # MPS (wifi6-4-develop/forth_ac_latency.csv)
-mps_bk = [0.134, 0.231, 0.310, 0.471, 0.627]
-mps_vi = [0.105, 0.190, 0.219, 0.256, 0.285]
-mps_vo = [0.070, 0.113, 0.108, 0.236, 0.200]
+mps_bk = case_series('MPS', 'BK')
+mps_vi = case_series('MPS', 'VI')
+mps_vo = case_series('MPS', 'VO')
 
 # SU (wifi6-su-develop)
-su_bk = [0.100, 0.213, 0.240, 0.537, 0.806]
-su_vi = [0.096, 0.119, 0.193, 0.251, 0.321]
-su_vo = [0.068, 0.092, 0.159, 0.157, 0.188]
+su_bk = case_series('SU', 'BK')
+su_vi = case_series('SU', 'VI')
+su_vo = case_series('SU', 'VO')
 
 # Non-MU-TXOP (wifi6-3-mu-txop-develop/third_ac_latency.csv)
-non_mu_bk = [0.199, 0.540, 10.068, 0.970, 1.698]
-non_mu_vi = [0.087, 0.211, 2.465, 0.339, 0.784]
-non_mu_vo = [0.075, 0.160, 0.151, 0.255, 0.280]
+non_mu_bk = case_series('Non-MU-TXOP', 'BK')
+non_mu_vi = case_series('Non-MU-TXOP', 'VI')
+non_mu_vo = case_series('Non-MU-TXOP', 'VO')
 
 # ==============================================================================
 # ML BASELINE DATA (from ns-3 results)
 # ==============================================================================
 
 # ML-Old (wifi6-ml-develop/third_ac_latency.csv)
-ml_old_bk = [0.253, 0.183, 0.285, 0.337, 0.586]
-ml_old_vi = [0.175, 0.235, 0.228, 0.316, 0.278]
-ml_old_vo = [0.070, 0.129, 0.152, 0.169, 0.215]
+ml_old_bk = case_series('ML-Old', 'BK')
+ml_old_vi = case_series('ML-Old', 'VI')
+ml_old_vo = case_series('ML-Old', 'VO')
 
 # ML-Old-v2 (wifi6-ml-develop-v2/third_ac_latency.csv)
-ml_old_v2_bk = [0.253, 0.183, 0.285, 0.332, 0.583]
-ml_old_v2_vi = [0.175, 0.235, 0.228, 0.318, 0.276]
-ml_old_v2_vo = [0.070, 0.129, 0.152, 0.168, 0.214]
+ml_old_v2_bk = case_series('ML-Old-v2', 'BK')
+ml_old_v2_vi = case_series('ML-Old-v2', 'VI')
+ml_old_v2_vo = case_series('ML-Old-v2', 'VO')
 
 # B0: ML-NonShare (100% accuracy imitation of Non-MU-TXOP)
 # Therefore: B0 = Non-MU-TXOP exactly
@@ -97,69 +96,55 @@ b0_nonshare_vi = non_mu_vi.copy()
 b0_nonshare_vo = non_mu_vo.copy()
 
 
-def calc_weighted_latency(vo, vi, bk):
-    """Calculate weighted latency: HP=1.5 (VO, VI), LP=0.5 (BK)"""
-    return [1.5*vo[i] + 1.5*vi[i] + 0.5*bk[i] for i in range(len(vo))]
+# Per-AC latency of every method; weighted latency and averages come from the
+# metrics engine (HP×1.5 + LP×0.5, see metrics_engine.AC_WEIGHTS)
+METRICS = MetricsTensor.from_series({
+    'PBM': {'BK': pbm_bk, 'VI': pbm_vi, 'VO': pbm_vo},
+    'MPS': {'BK': mps_bk, 'VI': mps_vi, 'VO': mps_vo},
+    'SU': {'BK': su_bk, 'VI': su_vi, 'VO': su_vo},
+    'Non-MU-TXOP': {'BK': non_mu_bk, 'VI': non_mu_vi, 'VO': non_mu_vo},
+    'ML-Old': {'BK': ml_old_bk, 'VI': ml_old_vi, 'VO': ml_old_vo},
+    'ML-Old-v2': {'BK': ml_old_v2_bk, 'VI': ml_old_v2_vi, 'VO': ml_old_v2_vo},
+    'B0-NonShare': {'BK': b0_nonshare_bk, 'VI': b0_nonshare_vi, 'VO': b0_nonshare_vo},
+})
+
+
+LP_BAR_SPEC = register(FigureSpec(
+    'fig_all_methods_lp_latency.png', OUTPUT_DIR,
+    title='LP Traffic (AC_BK) Latency Comparison - All Methods',
+    methods=[
+        ('PBM', 'PBM', COLORS['PBM']),
+        ('MPS', 'MPS', COLORS['MPS']),
+        ('SU', 'SU', COLORS['SU']),
+        ('Non-MU-TXOP', 'Non-MU-TXOP', COLORS['Non-MU-TXOP']),
+        ('ML-Old', 'ML-Old', COLORS['ML-Old']),
+        ('ML-Old-v2', 'ML-Old-v2', COLORS['ML-Old-v2']),
+        ('B0-NonShare', 'B0-NonShare', COLORS['B0-NonShare']),
+    ],
+    ylim=2.0, annotate={'above': 2.0, 'y': 1.95, 'fontsize': 8, 'rotation': 90},
+    style='all_baselines', figsize=(16, 8), width=0.11, linewidth=0.5,
+    legend={'loc': 'upper left', 'ncol': 2}, grid=True))
 
 
 def plot_latency_comparison_bar():
-    """Bar chart comparing LP latency across all methods"""
-    fig, ax = plt.subplots(figsize=(16, 8))
-
-    x = np.arange(len(nwifi_values))
-    width = 0.11
-    n_methods = 7
-
-    methods = [
-        ('PBM', pbm_bk, COLORS['PBM']),
-        ('MPS', mps_bk, COLORS['MPS']),
-        ('SU', su_bk, COLORS['SU']),
-        ('Non-MU-TXOP', non_mu_bk, COLORS['Non-MU-TXOP']),
-        ('ML-Old', ml_old_bk, COLORS['ML-Old']),
-        ('ML-Old-v2', ml_old_v2_bk, COLORS['ML-Old-v2']),
-        ('B0-NonShare', b0_nonshare_bk, COLORS['B0-NonShare']),
-    ]
-
-    for i, (label, data, color) in enumerate(methods):
-        offset = (i - n_methods/2 + 0.5) * width
-        bars = ax.bar(x + offset, data, width, label=label, color=color,
-                      edgecolor='black', linewidth=0.5)
-
-        # Annotate high values that exceed ylim
-        for j, val in enumerate(data):
-            if val > 2.0:
-                ax.annotate(f'{val:.1f}', xy=(x[j] + offset, 1.95),
-                           fontsize=8, ha='center', rotation=90)
-
-    ax.set_xlabel('Total STA Number')
-    ax.set_ylabel('Latency (ms)')
-    ax.set_title('LP Traffic (AC_BK) Latency Comparison - All Methods')
-    ax.set_xticks(x)
-    ax.set_xticklabels(nwifi_values)
-    ax.legend(loc='upper left', ncol=2)
-    ax.set_ylim(0, 2.0)
-    ax.grid(axis='y', alpha=0.3)
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'fig_all_methods_lp_latency.png'),
-                dpi=150, bbox_inches='tight')
-    plt.close()
-    print("Saved: fig_all_methods_lp_latency.png")
+    """Bar chart comparing LP latency across all methods (rendered from LP_BAR_SPEC)"""
+    render(LP_BAR_SPEC)
 
 
+@cached_output(OUTPUT_DIR, 'fig_all_methods_weighted_latency.png', STYLE)
 def plot_weighted_latency_line():
     """Line chart of weighted latency"""
     fig, ax = plt.subplots(figsize=(14, 8))
 
     # Calculate weighted latencies
     methods = [
-        ('PBM', calc_weighted_latency(pbm_vo, pbm_vi, pbm_bk), COLORS['PBM'], 'o', '-'),
-        ('MPS', calc_weighted_latency(mps_vo, mps_vi, mps_bk), COLORS['MPS'], 's', '-'),
-        ('SU', calc_weighted_latency(su_vo, su_vi, su_bk), COLORS['SU'], '^', '-'),
-        ('Non-MU-TXOP', calc_weighted_latency(non_mu_vo, non_mu_vi, non_mu_bk), COLORS['Non-MU-TXOP'], 'D', ':'),
-        ('ML-Old', calc_weighted_latency(ml_old_vo, ml_old_vi, ml_old_bk), COLORS['ML-Old'], 'v', '--'),
-        ('ML-Old-v2', calc_weighted_latency(ml_old_v2_vo, ml_old_v2_vi, ml_old_v2_bk), COLORS['ML-Old-v2'], 'p', '--'),
-        ('B0-NonShare', calc_weighted_latency(b0_nonshare_vo, b0_nonshare_vi, b0_nonshare_bk), COLORS['B0-NonShare'], '*', ':'),
+        ('PBM', METRICS.weighted_series('PBM'), COLORS['PBM'], 'o', '-'),
+        ('MPS', METRICS.weighted_series('MPS'), COLORS['MPS'], 's', '-'),
+        ('SU', METRICS.weighted_series('SU'), COLORS['SU'], '^', '-'),
+        ('Non-MU-TXOP', METRICS.weighted_series('Non-MU-TXOP'), COLORS['Non-MU-TXOP'], 'D', ':'),
+        ('ML-Old', METRICS.weighted_series('ML-Old'), COLORS['ML-Old'], 'v', '--'),
+        ('ML-Old-v2', METRICS.weighted_series('ML-Old-v2'), COLORS['ML-Old-v2'], 'p', '--'),
+        ('B0-NonShare', METRICS.weighted_series('B0-NonShare'), COLORS['B0-NonShare'], '*', ':'),
     ]
 
     for label, data, color, marker, linestyle in methods:
@@ -188,6 +173,7 @@ def plot_weighted_latency_line():
     print("Saved: fig_all_methods_weighted_latency.png")
 
 
+@cached_output(OUTPUT_DIR, 'fig_ml_vs_rulebased_by_ac.png', STYLE)
 def plot_ml_vs_rulebased():
     """Focused comparison: ML baselines vs best rule-based"""
     fig, axes = plt.subplots(1, 3, figsize=(18, 6))
@@ -238,6 +224,7 @@ def plot_ml_vs_rulebased():
     print("Saved: fig_ml_vs_rulebased_by_ac.png")
 
 
+@cached_output(OUTPUT_DIR, 'fig_b0_sanity_check.png', STYLE)
 def plot_b0_sanity_check():
     """B0 Sanity Check: ML-NonShare should equal Non-MU-TXOP"""
     fig, ax = plt.subplots(figsize=(12, 6))
@@ -277,19 +264,28 @@ def plot_b0_sanity_check():
     print("Saved: fig_b0_sanity_check.png")
 
 
+# Tail columns of the comparison table (need per-packet sketches in the store)
+TAIL_STATS = ['p50', 'p95', 'p99']
+
+
+@cached_output(OUTPUT_DIR, 'comparison_table.md', STYLE)
 def generate_comparison_table():
     """Generate markdown table comparing all methods"""
 
-    # Calculate weighted latency for each method
-    methods_data = {
-        'PBM': calc_weighted_latency(pbm_vo, pbm_vi, pbm_bk),
-        'MPS': calc_weighted_latency(mps_vo, mps_vi, mps_bk),
-        'SU': calc_weighted_latency(su_vo, su_vi, su_bk),
-        'Non-MU-TXOP': calc_weighted_latency(non_mu_vo, non_mu_vi, non_mu_bk),
-        'ML-Old': calc_weighted_latency(ml_old_vo, ml_old_vi, ml_old_bk),
-        'ML-Old-v2': calc_weighted_latency(ml_old_v2_vo, ml_old_v2_vi, ml_old_v2_bk),
-        'B0-NonShare': calc_weighted_latency(b0_nonshare_vo, b0_nonshare_vi, b0_nonshare_bk),
-    }
+    # Weighted latency for each method
+    methods_data = {method: METRICS.weighted_series(method) for method in METRICS.methods}
+
+    # Bootstrap CIs over seeds and paired tests vs PBM (stores with per-seed rows only)
+    seeds = seed_tensor(list(methods_data))
+    if seeds is not None:
+        intervals, _ = weighted_intervals(seeds)
+        vs_pbm, p_values = paired_comparison(seeds, 'PBM')
+
+    def cell(method, j, val):
+        if seeds is None:
+            return f"{val:.3f}"
+        m = seeds.index(method)
+        return format_interval(val, intervals.low[m, j], intervals.high[m, j])
 
     print("\n" + "="*80)
     print("COMPARISON TABLE: Weighted Latency (ms)")
@@ -311,14 +307,54 @@ def generate_comparison_table():
 
     print("="*80)
 
+    # Tail latency (p50/p95/p99) from the per-packet quantile sketches
+    try:
+        tail_data = {}
+        for stat in TAIL_STATS:
+            tensor = MetricsTensor.from_case_series(list(methods_data), column=stat)
+            tail_data[stat] = {method: tensor.weighted_series(method)
+                               for method in tensor.methods}
+    except KeyError:
+        tail_data = {}
+        print("Tail latency: no per-packet store (python results_store.py build), skipped")
+
+    for stat, stat_data in tail_data.items():
+        print(f"\nWeighted {stat} Latency (ms)")
+        print(header)
+        for method, data in stat_data.items():
+            print(f"| {method:<15} |" + "".join(f" {val:>8.3f} |" for val in data))
+
     # Also save to file
     with open(os.path.join(OUTPUT_DIR, 'comparison_table.md'), 'w') as f:
         f.write("# ML Baseline Comparison Results\n\n")
+        f.write(f"Data source: {data_source()}\n\n")
         f.write("## Weighted Latency (HP×1.5 + LP×0.5)\n\n")
+        if seeds is not None:
+            f.write(f"[{CONFIDENCE:.0%} bootstrap CI over {len(seeds.seeds)} seeds]\n\n")
         f.write("| Method | " + " | ".join([f"nWifi={n}" for n in nwifi_values]) + " |\n")
         f.write("|--------|" + "|".join(["-------"]*5) + "|\n")
         for method, data in methods_data.items():
-            f.write(f"| {method} | " + " | ".join([f"{v:.3f}" for v in data]) + " |\n")
+            f.write(f"| {method} | " + " | ".join([cell(method, j, v) for j, v in enumerate(data)])
+                    + " |\n")
+
+        if seeds is not None:
+            f.write("\n## Weighted Latency vs PBM (paired over seeds)\n\n")
+            f.write("Relative difference [bootstrap CI], paired permutation test p-value\n\n")
+            f.write("| Method | " + " | ".join([f"nWifi={n}" for n in nwifi_values]) + " |\n")
+            f.write("|--------|" + "|".join(["-------"]*5) + "|\n")
+            for m, method in enumerate(seeds.methods):
+                if method == 'PBM' or np.isnan(p_values[m]).all():
+                    continue
+                f.write(f"| {method} | " + " | ".join(
+                    [f"{vs_pbm.mean[m, j]:+.1%} [{vs_pbm.low[m, j]:+.1%}, {vs_pbm.high[m, j]:+.1%}]"
+                     f" p={p_values[m, j]:.3f}" for j in range(len(nwifi_values))]) + " |\n")
+
+        for stat, stat_data in tail_data.items():
+            f.write(f"\n## Weighted {stat} Latency (HP×1.5 + LP×0.5)\n\n")
+            f.write("| Method | " + " | ".join([f"nWifi={n}" for n in nwifi_values]) + " |\n")
+            f.write("|--------|" + "|".join(["-------"]*5) + "|\n")
+            for method, data in stat_data.items():
+                f.write(f"| {method} | " + " | ".join([f"{v:.3f}" for v in data]) + " |\n")
 
         f.write("\n## Key Observations\n\n")
         f.write("1. **B0-NonShare = Non-MU-TXOP**: Sanity check PASSED (100% accuracy imitation)\n")
@@ -333,7 +369,8 @@ def print_data_sources():
     print("\n" + "="*80)
     print("DATA SOURCES (from ns-3 Test_result)")
     print("="*80)
-    print("""
+    print(f"""
+Data source: {data_source()}
 Directory: /home/adlink/浩宗論文/實驗/Test_result(ns-3)/case1/
 
 Rule-based Schedulers:
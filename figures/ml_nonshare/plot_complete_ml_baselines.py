@@ -20,28 +20,27 @@ Rule-based Schedulers:
 Data Sources:
 - Rule-based & ML-Old: Actual ns-3 simulation results
 - B0: = Non-MU-TXOP (100% accuracy imitation)
-- B1, B2, B3: Estimated based on training accuracy and teacher performance
+- B1, B2, B3: Monte-Carlo estimate from training accuracy and teacher performance
+  (policy_error.py)
 """
 
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 from datetime import datetime
+from functools import lru_cache
+
+from results_store import case_series, data_source
+from figure_cache import cached_output
+from figure_specs import STYLE_PROFILES, FigureSpec, register, render
+from metrics_engine import MetricsTensor
+from policy_error import estimate_baseline, mean_series
+from seed_stats import (CONFIDENCE, bootstrap_ratio_ci, format_interval,
+                        paired_permutation_test, seed_tensor, weighted_intervals)
 
 # Style configuration
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
-plt.rcParams['axes.edgecolor'] = 'black'
-plt.rcParams['axes.linewidth'] = 1.0
-plt.rcParams['font.size'] = 11
-plt.rcParams['axes.labelsize'] = 13
-plt.rcParams['axes.titlesize'] = 14
-plt.rcParams['legend.fontsize'] = 9
-plt.rcParams['xtick.labelsize'] = 11
-plt.rcParams['ytick.labelsize'] = 11
-plt.rcParams['legend.frameon'] = True
-plt.rcParams['legend.edgecolor'] = 'black'
-plt.rcParams['legend.fancybox'] = False
+STYLE = STYLE_PROFILES['complete']
+plt.rcParams.update(STYLE)
 
 OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -66,30 +65,33 @@ nwifi_values = [6, 12, 18, 24, 30]
 # ACTUAL NS-3 DATA (Verified from Test_result)
 # ==============================================================================
 
+# Series come from the results store (python results_store.py build),
+# falling back to the verified case1 numbers in results_store.py
+
 # PBM (wifi6-3-develop)
-pbm_bk = [0.105, 0.231, 0.309, 0.471, 0.449]
-pbm_vi = [0.087, 0.190, 0.219, 0.253, 0.282]
-pbm_vo = [0.070, 0.113, 0.109, 0.234, 0.226]
+pbm_bk = case_series('PBM', 'BK')
+pbm_vi = case_series('PBM', 'VI')
+pbm_vo = case_series('PBM', 'VO')
 
 # MPS (wifi6-4-develop)
-mps_bk = [0.134, 0.231, 0.310, 0.471, 0.627]
-mps_vi = [0.105, 0.190, 0.219, 0.256, 0.285]
-mps_vo = [0.070, 0.113, 0.108, 0.236, 0.200]
+mps_bk = case_series('MPS', 'BK')
+mps_vi = case_series('MPS', 'VI')
+mps_vo = case_series('MPS', 'VO')
 
 # SU (wifi6-su-develop)
-su_bk = [0.100, 0.213, 0.240, 0.537, 0.806]
-su_vi = [0.096, 0.119, 0.193, 0.251, 0.321]
-su_vo = [0.068, 0.092, 0.159, 0.157, 0.188]
+su_bk = case_series('SU', 'BK')
+su_vi = case_series('SU', 'VI')
+su_vo = case_series('SU', 'VO')
 
 # Non-MU-TXOP (wifi6-3-mu-txop-develop)
-non_mu_bk = [0.199, 0.540, 10.068, 0.970, 1.698]
-non_mu_vi = [0.087, 0.211, 2.465, 0.339, 0.784]
-non_mu_vo = [0.075, 0.160, 0.151, 0.255, 0.280]
+non_mu_bk = case_series('Non-MU-TXOP', 'BK')
+non_mu_vi = case_series('Non-MU-TXOP', 'VI')
+non_mu_vo = case_series('Non-MU-TXOP', 'VO')
 
 # ML-Old (wifi6-ml-develop) - Actual ns-3 results
-ml_old_bk = [0.253, 0.183, 0.285, 0.337, 0.586]
-ml_old_vi = [0.175, 0.235, 0.228, 0.316, 0.278]
-ml_old_vo = [0.070, 0.129, 0.152, 0.169, 0.215]
+ml_old_bk = case_series('ML-Old', 'BK')
+ml_old_vi = case_series('ML-Old', 'VI')
+ml_old_vo = case_series('ML-Old', 'VO')
 
 # ==============================================================================
 # ML BASELINE ESTIMATIONS (Based on training accuracy)
@@ -106,114 +108,101 @@ ACCURACY_B1 = 0.5289
 ACCURACY_B2 = 0.5940
 ACCURACY_B3 = 0.3665
 
+# TXOPs replayed per nwifi point (python policy_error.py runs millions)
+PLOT_TRIALS = 1 << 16
+
 # B0: ML-NonShare = Non-MU-TXOP (100% accuracy)
 b0_bk = non_mu_bk.copy()
 b0_vi = non_mu_vi.copy()
 b0_vo = non_mu_vo.copy()
 
-# Estimation methodology:
-# When ML makes wrong decision, latency degrades towards worst-case
-# Estimated latency = accuracy × teacher_latency + (1-accuracy) × degraded_latency
-# where degraded_latency = teacher_latency × degradation_factor
-
-def estimate_latency(teacher, accuracy, degradation_factor=1.5):
-    """Estimate ML latency based on accuracy and teacher performance."""
-    return [t * (accuracy + (1 - accuracy) * degradation_factor) for t in teacher]
-
-# B1: Imitates PBM (accuracy ~53%)
-# Performance should be between PBM and random
-b1_bk = estimate_latency(pbm_bk, ACCURACY_B1, 1.8)  # 1.8x degradation for wrong decisions
-b1_vi = estimate_latency(pbm_vi, ACCURACY_B1, 1.6)
-b1_vo = estimate_latency(pbm_vo, ACCURACY_B1, 1.4)
-
-# B2: Chooses between PBM/MPS (accuracy ~59%)
-# Should achieve close to min(PBM, MPS) when correct
-best_pbm_mps_bk = [min(p, m) for p, m in zip(pbm_bk, mps_bk)]
-best_pbm_mps_vi = [min(p, m) for p, m in zip(pbm_vi, mps_vi)]
-best_pbm_mps_vo = [min(p, m) for p, m in zip(pbm_vo, mps_vo)]
-b2_bk = estimate_latency(best_pbm_mps_bk, ACCURACY_B2, 2.0)
-b2_vi = estimate_latency(best_pbm_mps_vi, ACCURACY_B2, 1.8)
-b2_vo = estimate_latency(best_pbm_mps_vo, ACCURACY_B2, 1.5)
-
-# B3: Meta-controller among {Non-MU, PBM, MPS} (accuracy ~37%)
-# Should achieve close to best when correct, but low accuracy hurts
-# Note: Non-MU-TXOP can be very bad at nwifi=18
-best_all_bk = [min(n, p, m) for n, p, m in zip(non_mu_bk, pbm_bk, mps_bk)]
-best_all_vi = [min(n, p, m) for n, p, m in zip(non_mu_vi, pbm_vi, mps_vi)]
-best_all_vo = [min(n, p, m) for n, p, m in zip(non_mu_vo, pbm_vo, mps_vo)]
-# B3 has very low accuracy, so it often picks wrong scheduler
-b3_bk = estimate_latency(best_all_bk, ACCURACY_B3, 3.0)
-b3_vi = estimate_latency(best_all_vi, ACCURACY_B3, 2.5)
-b3_vo = estimate_latency(best_all_vo, ACCURACY_B3, 2.0)
-
-
-def calc_weighted(vo, vi, bk):
-    """Calculate weighted latency: HP=1.5, LP=0.5"""
-    return [1.5*vo[i] + 1.5*vi[i] + 0.5*bk[i] for i in range(len(vo))]
-
-
-def plot_all_baselines_bar():
-    """Main figure: All methods LP latency comparison"""
-    fig, ax = plt.subplots(figsize=(18, 8))
-
-    x = np.arange(len(nwifi_values))
-    width = 0.09
-    n_methods = 9
-
-    methods = [
-        ('PBM', pbm_bk, COLORS['PBM']),
-        ('MPS', mps_bk, COLORS['MPS']),
-        ('SU', su_bk, COLORS['SU']),
-        ('Non-MU-TXOP', non_mu_bk, COLORS['Non-MU-TXOP']),
-        ('ML-Old', ml_old_bk, COLORS['ML-Old']),
-        ('B0-NonShare', b0_bk, COLORS['B0-NonShare']),
-        ('B1-Full-BC', b1_bk, COLORS['B1-Full-BC']),
-        ('B2-Chooser', b2_bk, COLORS['B2-Chooser']),
-        ('B3-Meta', b3_bk, COLORS['B3-Meta']),
-    ]
+# Estimation methodology (policy_error.py):
+# Monte-Carlo replay of sampled TXOP decisions. Each baseline's decision is
+# drawn from its confusion matrix (diagonal = training accuracy unless the
+# trainers exported one) and replayed through an airtime model against the
+# decision of the expert it should follow; the service-time ratio (with the
+# error penalty fitted on ML-Old) scales that expert's own ns-3 latency.
+# The replay runs on first use (ml_estimates()), not at import
+
+def _mc_estimate(name, accuracy):
+    estimates = estimate_baseline(name, nwifi_values, accuracy=accuracy, trials=PLOT_TRIALS)
+    return {ac: mean_series(estimates, ac) for ac in ('BK', 'VI', 'VO')}
+
+
+@lru_cache(maxsize=None)
+def ml_estimates():
+    """{baseline: {ac: series}} of B1-B3, estimated once per process."""
+    return {
+        # B1: Imitates PBM's 11-class decisions (accuracy ~53%), Rule 4 mask applied
+        'B1-Full-BC': _mc_estimate('B1-Full-BC', ACCURACY_B1),
+        # B2: Chooses between PBM/MPS (accuracy ~59%)
+        # Each TXOP is scored against the ns-3 latency of the expert it should pick
+        'B2-Chooser': _mc_estimate('B2-Chooser', ACCURACY_B2),
+        # B3: Meta-controller among {Non-MU, PBM, MPS} (accuracy ~37%)
+        # Wrong picks of Non-MU-TXOP lose the secondary AC's RUs
+        'B3-Meta': _mc_estimate('B3-Meta', ACCURACY_B3),
+    }
 
-    for i, (label, data, color) in enumerate(methods):
-        offset = (i - n_methods/2 + 0.5) * width
-        capped_data = [min(d, 2.5) for d in data]
-        bars = ax.bar(x + offset, capped_data, width, label=label, color=color,
-                      edgecolor='black', linewidth=0.5)
 
-        # Annotate values exceeding ylim
-        for j, val in enumerate(data):
-            if val > 2.5:
-                ax.annotate(f'{val:.1f}', xy=(x[j] + offset, 2.4),
-                           fontsize=7, ha='center', rotation=90, color=color)
+@lru_cache(maxsize=None)
+def metrics():
+    """
+    Per-AC latency of every method; weighted latency and averages come from the
+    metrics engine (HP=1.5, LP=0.5, see metrics_engine.AC_WEIGHTS)
+    """
+    return MetricsTensor.from_series({
+        'PBM': {'BK': pbm_bk, 'VI': pbm_vi, 'VO': pbm_vo},
+        'MPS': {'BK': mps_bk, 'VI': mps_vi, 'VO': mps_vo},
+        'SU': {'BK': su_bk, 'VI': su_vi, 'VO': su_vo},
+        'Non-MU-TXOP': {'BK': non_mu_bk, 'VI': non_mu_vi, 'VO': non_mu_vo},
+        'ML-Old': {'BK': ml_old_bk, 'VI': ml_old_vi, 'VO': ml_old_vo},
+        'B0-NonShare': {'BK': b0_bk, 'VI': b0_vi, 'VO': b0_vo},
+        **ml_estimates(),
+    })
+
+
+# B1-B3 are estimated series, passed to the spec as functions (run at render time)
+LP_BAR_SPEC = register(FigureSpec(
+    'fig_complete_lp_latency.png', OUTPUT_DIR,
+    title='LP Traffic Latency Comparison - All ML Baselines',
+    methods=[
+        ('PBM', 'PBM', COLORS['PBM']),
+        ('MPS', 'MPS', COLORS['MPS']),
+        ('SU', 'SU', COLORS['SU']),
+        ('Non-MU-TXOP', 'Non-MU-TXOP', COLORS['Non-MU-TXOP']),
+        ('ML-Old', 'ML-Old', COLORS['ML-Old']),
+        ('B0-NonShare', 'B0-NonShare', COLORS['B0-NonShare']),
+        ('B1-Full-BC', lambda: ml_estimates()['B1-Full-BC']['BK'], COLORS['B1-Full-BC']),
+        ('B2-Chooser', lambda: ml_estimates()['B2-Chooser']['BK'], COLORS['B2-Chooser']),
+        ('B3-Meta', lambda: ml_estimates()['B3-Meta']['BK'], COLORS['B3-Meta']),
+    ],
+    ylim=2.6, cap=2.5,
+    annotate={'above': 2.5, 'y': 2.4, 'fontsize': 7, 'rotation': 90, 'colored': True},
+    style='complete', figsize=(18, 8), width=0.09, linewidth=0.5,
+    ylabel='AC_BK Latency (ms)', legend={'loc': 'upper left', 'ncol': 3, 'fontsize': 8},
+    grid=True))
 
-    ax.set_xlabel('Total STA Number')
-    ax.set_ylabel('AC_BK Latency (ms)')
-    ax.set_title('LP Traffic Latency Comparison - All ML Baselines')
-    ax.set_xticks(x)
-    ax.set_xticklabels(nwifi_values)
-    ax.legend(loc='upper left', ncol=3, fontsize=8)
-    ax.set_ylim(0, 2.6)
-    ax.grid(axis='y', alpha=0.3)
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'fig_complete_lp_latency.png'),
-                dpi=150, bbox_inches='tight')
-    plt.close()
-    print("Saved: fig_complete_lp_latency.png")
+def plot_all_baselines_bar():
+    """Main figure: All methods LP latency comparison (rendered from LP_BAR_SPEC)"""
+    render(LP_BAR_SPEC)
 
 
+@cached_output(OUTPUT_DIR, 'fig_complete_weighted_latency.png', STYLE)
 def plot_weighted_latency_comparison():
     """Weighted latency comparison line chart"""
     fig, ax = plt.subplots(figsize=(14, 8))
 
     methods = [
-        ('PBM', calc_weighted(pbm_vo, pbm_vi, pbm_bk), COLORS['PBM'], 'o', '-', 2),
-        ('MPS', calc_weighted(mps_vo, mps_vi, mps_bk), COLORS['MPS'], 's', '-', 2),
-        ('SU', calc_weighted(su_vo, su_vi, su_bk), COLORS['SU'], '^', '-', 2),
-        ('Non-MU-TXOP', calc_weighted(non_mu_vo, non_mu_vi, non_mu_bk), COLORS['Non-MU-TXOP'], 'D', ':', 1.5),
-        ('ML-Old', calc_weighted(ml_old_vo, ml_old_vi, ml_old_bk), COLORS['ML-Old'], 'v', '--', 2),
-        ('B0-NonShare', calc_weighted(b0_vo, b0_vi, b0_bk), COLORS['B0-NonShare'], '*', ':', 1.5),
-        ('B1-Full-BC', calc_weighted(b1_vo, b1_vi, b1_bk), COLORS['B1-Full-BC'], 'p', '--', 2),
-        ('B2-Chooser', calc_weighted(b2_vo, b2_vi, b2_bk), COLORS['B2-Chooser'], 'h', '--', 2),
-        ('B3-Meta', calc_weighted(b3_vo, b3_vi, b3_bk), COLORS['B3-Meta'], 'X', '--', 2),
+        ('PBM', metrics().weighted_series('PBM'), COLORS['PBM'], 'o', '-', 2),
+        ('MPS', metrics().weighted_series('MPS'), COLORS['MPS'], 's', '-', 2),
+        ('SU', metrics().weighted_series('SU'), COLORS['SU'], '^', '-', 2),
+        ('Non-MU-TXOP', metrics().weighted_series('Non-MU-TXOP'), COLORS['Non-MU-TXOP'], 'D', ':', 1.5),
+        ('ML-Old', metrics().weighted_series('ML-Old'), COLORS['ML-Old'], 'v', '--', 2),
+        ('B0-NonShare', metrics().weighted_series('B0-NonShare'), COLORS['B0-NonShare'], '*', ':', 1.5),
+        ('B1-Full-BC', metrics().weighted_series('B1-Full-BC'), COLORS['B1-Full-BC'], 'p', '--', 2),
+        ('B2-Chooser', metrics().weighted_series('B2-Chooser'), COLORS['B2-Chooser'], 'h', '--', 2),
+        ('B3-Meta', metrics().weighted_series('B3-Meta'), COLORS['B3-Meta'], 'X', '--', 2),
     ]
 
     for label, data, color, marker, linestyle, lw in methods:
@@ -242,6 +231,7 @@ def plot_weighted_latency_comparison():
     print("Saved: fig_complete_weighted_latency.png")
 
 
+@cached_output(OUTPUT_DIR, 'fig_accuracy_impact.png', STYLE)
 def plot_ml_accuracy_impact():
     """Show how training accuracy affects performance"""
     fig, axes = plt.subplots(1, 2, figsize=(14, 6))
@@ -251,12 +241,9 @@ def plot_ml_accuracy_impact():
     accuracies = [100, 52.89, 59.40, 36.65]
     baselines = ['B0', 'B1', 'B2', 'B3']
     # Average weighted latency across all nWifi
-    avg_latencies = [
-        np.mean(calc_weighted(b0_vo, b0_vi, b0_bk)),
-        np.mean(calc_weighted(b1_vo, b1_vi, b1_bk)),
-        np.mean(calc_weighted(b2_vo, b2_vi, b2_bk)),
-        np.mean(calc_weighted(b3_vo, b3_vi, b3_bk)),
-    ]
+    average = dict(zip(metrics().methods, metrics().average()))
+    avg_latencies = [average['B0-NonShare'], average['B1-Full-BC'],
+                     average['B2-Chooser'], average['B3-Meta']]
 
     colors = [COLORS['B0-NonShare'], COLORS['B1-Full-BC'], COLORS['B2-Chooser'], COLORS['B3-Meta']]
     for i, (acc, lat, bl) in enumerate(zip(accuracies, avg_latencies, baselines)):
@@ -271,8 +258,8 @@ def plot_ml_accuracy_impact():
 
     # Right: Comparison with rule-based
     ax = axes[1]
-    pbm_avg = np.mean(calc_weighted(pbm_vo, pbm_vi, pbm_bk))
-    mps_avg = np.mean(calc_weighted(mps_vo, mps_vi, mps_bk))
+    pbm_avg = average['PBM']
+    mps_avg = average['MPS']
 
     methods = ['PBM\n(Rule)', 'MPS\n(Rule)', 'B0\n(100%)', 'B1\n(53%)', 'B2\n(59%)', 'B3\n(37%)']
     latencies = [pbm_avg, mps_avg] + avg_latencies
@@ -298,16 +285,18 @@ def plot_ml_accuracy_impact():
     print("Saved: fig_accuracy_impact.png")
 
 
+@cached_output(OUTPUT_DIR, 'fig_per_ac_comparison.png', STYLE)
 def plot_per_ac_comparison():
     """Per-AC latency comparison for main baselines"""
     fig, axes = plt.subplots(1, 3, figsize=(18, 5))
 
+    b1, b2 = ml_estimates()['B1-Full-BC'], ml_estimates()['B2-Chooser']
     baselines = [
         ('PBM', pbm_bk, pbm_vi, pbm_vo, COLORS['PBM'], 'o', '-'),
         ('MPS', mps_bk, mps_vi, mps_vo, COLORS['MPS'], 's', '-'),
         ('ML-Old', ml_old_bk, ml_old_vi, ml_old_vo, COLORS['ML-Old'], 'v', '--'),
-        ('B1-Full-BC', b1_bk, b1_vi, b1_vo, COLORS['B1-Full-BC'], 'p', '--'),
-        ('B2-Chooser', b2_bk, b2_vi, b2_vo, COLORS['B2-Chooser'], 'h', '--'),
+        ('B1-Full-BC', b1['BK'], b1['VI'], b1['VO'], COLORS['B1-Full-BC'], 'p', '--'),
+        ('B2-Chooser', b2['BK'], b2['VI'], b2['VO'], COLORS['B2-Chooser'], 'h', '--'),
     ]
 
     # AC_BK
@@ -353,20 +342,40 @@ def plot_per_ac_comparison():
     print("Saved: fig_per_ac_comparison.png")
 
 
+@cached_output(OUTPUT_DIR, 'results_table.md', STYLE)
 def generate_results_table():
     """Generate comprehensive results table"""
 
-    all_methods = {
-        'PBM': calc_weighted(pbm_vo, pbm_vi, pbm_bk),
-        'MPS': calc_weighted(mps_vo, mps_vi, mps_bk),
-        'SU': calc_weighted(su_vo, su_vi, su_bk),
-        'Non-MU-TXOP': calc_weighted(non_mu_vo, non_mu_vi, non_mu_bk),
-        'ML-Old': calc_weighted(ml_old_vo, ml_old_vi, ml_old_bk),
-        'B0-NonShare': calc_weighted(b0_vo, b0_vi, b0_bk),
-        'B1-Full-BC': calc_weighted(b1_vo, b1_vi, b1_bk),
-        'B2-Chooser': calc_weighted(b2_vo, b2_vi, b2_bk),
-        'B3-Meta': calc_weighted(b3_vo, b3_vi, b3_bk),
-    }
+    tensor = metrics()
+    all_methods = {method: tensor.weighted_series(method) for method in tensor.methods}
+
+    # Bootstrap CIs over seeds of the simulated methods (stores with per-seed rows
+    # only); the estimated B1-B3 have no seeds and keep their point values
+    seeds = seed_tensor(list(all_methods))
+    if seeds is not None:
+        intervals, avg_intervals = weighted_intervals(seeds)
+        seed_avg = seeds.weighted(per_seed=True).mean(axis=1)
+
+    def cell(method, j, val):
+        if seeds is None:
+            return f"{val:.3f}"
+        m = seeds.index(method)
+        if j is None:
+            return format_interval(val, avg_intervals.low[m], avg_intervals.high[m])
+        return format_interval(val, intervals.low[m, j], intervals.high[m, j])
+
+    def vs_pbm(method):
+        """Signed ' (+x.x%)' of the average vs PBM, with the paired CI and p-value when seeded."""
+        change = (np.mean(all_methods[method]) / np.mean(all_methods['PBM']) - 1) * 100
+        if seeds is None:
+            return f" ({change:+.1f}%)"
+        a, b = seed_avg[seeds.index(method)], seed_avg[seeds.index('PBM')]
+        ratio = bootstrap_ratio_ci(a, b)
+        _, p = paired_permutation_test(a, b)
+        if np.isnan(ratio.low):
+            return f" ({change:+.1f}%)"
+        return (f" ({change:+.1f}%, {CONFIDENCE:.0%} CI [{ratio.low * 100:+.1f}%, "
+                f"{ratio.high * 100:+.1f}%], paired p={p:.3f})")
 
     print("\n" + "="*90)
     print("COMPLETE RESULTS TABLE: Weighted Latency (HP×1.5 + LP×0.5)")
@@ -399,22 +408,26 @@ def generate_results_table():
     # Save to markdown
     with open(os.path.join(OUTPUT_DIR, 'results_table.md'), 'w') as f:
         f.write(f"# Complete ML Baseline Results\n\n")
-        f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Data source: {data_source()}\n\n")
 
         f.write("## Weighted Latency (HP×1.5 + LP×0.5)\n\n")
+        if seeds is not None:
+            f.write(f"[{CONFIDENCE:.0%} bootstrap CI over {len(seeds.seeds)} seeds]\n\n")
         f.write("| Method | Accuracy | " + " | ".join([f"nWifi={n}" for n in nwifi_values]) + " | Average |\n")
         f.write("|--------|----------|" + "|".join(["--------"]*5) + "|--------|\n")
 
         for method, data in all_methods.items():
             acc = accuracies[method]
             avg = np.mean(data)
-            f.write(f"| {method} | {acc} | " + " | ".join([f"{v:.3f}" for v in data]) + f" | {avg:.3f} |\n")
+            f.write(f"| {method} | {acc} | " + " | ".join([cell(method, j, v) for j, v in enumerate(data)])
+                    + f" | {cell(method, None, avg)} |\n")
 
         f.write("\n## Key Findings\n\n")
         f.write("### 1. Rule-based vs ML Performance\n")
         f.write(f"- **PBM** (best rule-based): Average = {np.mean(all_methods['PBM']):.3f} ms\n")
-        f.write(f"- **ML-Old** (actual ns-3): Average = {np.mean(all_methods['ML-Old']):.3f} ms (+{(np.mean(all_methods['ML-Old'])/np.mean(all_methods['PBM'])-1)*100:.1f}%)\n")
-        f.write(f"- **B1-Full-BC** (estimated): Average = {np.mean(all_methods['B1-Full-BC']):.3f} ms (+{(np.mean(all_methods['B1-Full-BC'])/np.mean(all_methods['PBM'])-1)*100:.1f}%)\n\n")
+        f.write(f"- **ML-Old** (actual ns-3): Average = {np.mean(all_methods['ML-Old']):.3f} ms{vs_pbm('ML-Old')}\n")
+        f.write(f"- **B1-Full-BC** (estimated): Average = {np.mean(all_methods['B1-Full-BC']):.3f} ms ({(np.mean(all_methods['B1-Full-BC'])/np.mean(all_methods['PBM'])-1)*100:+.1f}%)\n\n")
 
         f.write("### 2. Training Accuracy Impact\n")
         f.write("| Baseline | Accuracy | Avg Latency | vs PBM |\n")
@@ -423,7 +436,7 @@ def generate_results_table():
                             ('B1-Full-BC', '53%'), ('B3-Meta', '37%')]:
             avg = np.mean(all_methods[bl])
             vs_pbm = (avg / np.mean(all_methods['PBM']) - 1) * 100
-            f.write(f"| {bl} | {acc_str} | {avg:.3f} | +{vs_pbm:.1f}% |\n")
+            f.write(f"| {bl} | {acc_str} | {avg:.3f} | {vs_pbm:+.1f}% |\n")
 
         f.write("\n### 3. Conclusions\n\n")
         f.write("1. **ML baselines perform worse than PBM/MPS** in all cases\n")
@@ -14,20 +14,14 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 
+from results_store import case_series, data_source
+from figure_cache import cached_output
+from figure_specs import STYLE_PROFILES, FigureSpec, register, render
+from metrics_engine import MetricsTensor
+
 # Style configuration
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
-plt.rcParams['axes.edgecolor'] = 'black'
-plt.rcParams['axes.linewidth'] = 1.0
-plt.rcParams['font.size'] = 14
-plt.rcParams['axes.labelsize'] = 16
-plt.rcParams['axes.titlesize'] = 18
-plt.rcParams['legend.fontsize'] = 10
-plt.rcParams['xtick.labelsize'] = 14
-plt.rcParams['ytick.labelsize'] = 14
-plt.rcParams['legend.frameon'] = True
-plt.rcParams['legend.edgecolor'] = 'black'
-plt.rcParams['legend.fancybox'] = False
+STYLE = STYLE_PROFILES['ml_nonshare']
+plt.rcParams.update(STYLE)
 
 OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -45,74 +39,76 @@ nwifi_values = [6, 12, 18, 24, 30]
 
 # ============== CORRECTED DATA from ns-3 results ==============
 
+# Series come from the results store (python results_store.py build),
+# falling back to the verified case1 numbers in results_store.py
+
 # PBM (wifi6-3-develop)
-pbm_bk = [0.105, 0.231, 0.309, 0.471, 0.449]  # nwifi=30 uses nwifi=30new
-pbm_vi = [0.087, 0.190, 0.219, 0.253, 0.282]
-pbm_vo = [0.070, 0.113, 0.109, 0.234, 0.226]
+pbm_bk = case_series('PBM', 'BK')
+pbm_vi = case_series('PBM', 'VI')
+pbm_vo = case_series('PBM', 'VO')  # nwifi=30 uses nwifi=30new
 
 # MPS (wifi6-4-develop) - CORRECTED! Was mislabeled as Non-MU-TXOP before
-mps_bk = [0.134, 0.231, 0.310, 0.471, 0.627]
-mps_vi = [0.105, 0.190, 0.219, 0.256, 0.285]
-mps_vo = [0.070, 0.113, 0.108, 0.236, 0.200]
+mps_bk = case_series('MPS', 'BK')
+mps_vi = case_series('MPS', 'VI')
+mps_vo = case_series('MPS', 'VO')
 
 # SU (wifi6-su-develop)
-su_bk = [0.100, 0.213, 0.240, 0.537, 0.806]
-su_vi = [0.096, 0.119, 0.193, 0.251, 0.321]
-su_vo = [0.068, 0.092, 0.159, 0.157, 0.188]
+su_bk = case_series('SU', 'BK')
+su_vi = case_series('SU', 'VI')
+su_vo = case_series('SU', 'VO')
 
 # Non-MU-TXOP (wifi6-3-mu-txop-develop) - CORRECTED! Was mislabeled as MPS before
 # Note: nwifi=18 has very high latency (BK=10.068, VI=2.465) due to no sharing
-non_mu_bk = [0.199, 0.540, 10.068, 0.970, 1.698]
-non_mu_vi = [0.087, 0.211, 2.465, 0.339, 0.784]
-non_mu_vo = [0.075, 0.160, 0.151, 0.255, 0.280]
+non_mu_bk = case_series('Non-MU-TXOP', 'BK')
+non_mu_vi = case_series('Non-MU-TXOP', 'VI')
+non_mu_vo = case_series('Non-MU-TXOP', 'VO')
 
 # ML-NonShare: Same as Non-MU-TXOP (100% accuracy imitation learning)
 ml_nonshare_bk = non_mu_bk.copy()
 ml_nonshare_vi = non_mu_vi.copy()
 ml_nonshare_vo = non_mu_vo.copy()
 
-# ML-Old (original ML baseline)
-ml_old_bk = [0.253, 0.183, 0.285, 0.332, 0.583]
-ml_old_vi = [0.175, 0.235, 0.228, 0.318, 0.276]
-ml_old_vo = [0.070, 0.129, 0.152, 0.168, 0.214]
+# ML-Old (original ML baseline, numbers from the wifi6-ml-develop-v2 run)
+ml_old_bk = case_series('ML-Old-v2', 'BK')
+ml_old_vi = case_series('ML-Old-v2', 'VI')
+ml_old_vo = case_series('ML-Old-v2', 'VO')
+
+# Per-AC latency of every method; weighted latency and averages come from the
+# metrics engine (HP×1.5 + LP×0.5, see metrics_engine.AC_WEIGHTS)
+METRICS = MetricsTensor.from_series({
+    'PBM': {'BK': pbm_bk, 'VI': pbm_vi, 'VO': pbm_vo},
+    'MPS': {'BK': mps_bk, 'VI': mps_vi, 'VO': mps_vo},
+    'SU': {'BK': su_bk, 'VI': su_vi, 'VO': su_vo},
+    'Non-MU-TXOP': {'BK': non_mu_bk, 'VI': non_mu_vi, 'VO': non_mu_vo},
+    'ML-NonShare': {'BK': ml_nonshare_bk, 'VI': ml_nonshare_vi, 'VO': ml_nonshare_vo},
+    'ML-Old': {'BK': ml_old_bk, 'VI': ml_old_vi, 'VO': ml_old_vo},
+})
+
+
+LP_BAR_SPEC = register(FigureSpec(
+    'fig7_lat_lp_with_ml_nonshare.png', OUTPUT_DIR,
+    title='Latency Comparison - LP Traffic (AC_BK)',
+    methods=[
+        ('PBM', 'PBM', COLORS['PBM']),
+        ('MPS', 'MPS', COLORS['MPS']),
+        ('SU', 'SU', COLORS['SU']),
+        ('Non-MU-TXOP', 'Non-MU-TXOP', COLORS['Non-MU-TXOP']),
+        ('ML-NonShare', 'Non-MU-TXOP', COLORS['ML-NonShare']),
+        ('ML-Old', 'ML-Old-v2', COLORS['ML-Old']),
+    ],
+    # Cap at 2.5 for visibility, nwifi=18 Non-MU-TXOP is 10ms
+    ylim=2.5, annotate={'above': 2.5, 'y': 2.4, 'fontsize': 9, 'colored': True,
+                        'methods': ['Non-MU-TXOP']},
+    style='ml_nonshare', figsize=(14, 7), width=0.13,
+    legend={'loc': 'upper left', 'ncol': 2}))
 
 
 def plot_latency_bar_lp():
-    """Fig 7.x: LP (AC_BK) Latency Bar Chart with ML-NonShare"""
-    fig, ax = plt.subplots(figsize=(14, 7))
-
-    x = np.arange(len(nwifi_values))
-    width = 0.13
-
-    labels = ['PBM', 'MPS', 'SU', 'Non-MU-TXOP', 'ML-NonShare', 'ML-Old']
-    colors = [COLORS[l] for l in labels]
-    data = [pbm_bk, mps_bk, su_bk, non_mu_bk, ml_nonshare_bk, ml_old_bk]
-
-    for i, (d, label, color) in enumerate(zip(data, labels, colors)):
-        ax.bar(x + (i-2.5)*width, d, width, label=label, color=color,
-               edgecolor='black', linewidth=0.8)
-
-    ax.set_xlabel('Total STA Number')
-    ax.set_ylabel('Latency (ms)')
-    ax.set_title('Latency Comparison - LP Traffic (AC_BK)')
-    ax.set_xticks(x)
-    ax.set_xticklabels(nwifi_values)
-    ax.legend(loc='upper left', ncol=2)
-    ax.set_ylim(0, 2.5)  # Cap at 2.5 for visibility, nwifi=18 Non-MU-TXOP is 10ms
-
-    # Add annotation for capped values
-    for i, val in enumerate(non_mu_bk):
-        if val > 2.5:
-            ax.annotate(f'{val:.1f}', xy=(i + 0.5*width, 2.4), fontsize=9,
-                       ha='center', color=COLORS['Non-MU-TXOP'])
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'fig7_lat_lp_with_ml_nonshare.png'),
-                dpi=150, bbox_inches='tight')
-    plt.close()
-    print("Saved: fig7_lat_lp_with_ml_nonshare.png")
+    """Fig 7.x: LP (AC_BK) Latency Bar Chart with ML-NonShare (rendered from LP_BAR_SPEC)"""
+    render(LP_BAR_SPEC)
 
 
+@cached_output(OUTPUT_DIR, 'fig7_lat_hp_with_ml_nonshare.png', STYLE)
 def plot_latency_bar_hp():
     """Fig 7.x: HP (AC_VI + AC_VO) Latency Bar Chart with ML-NonShare"""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
@@ -164,21 +160,14 @@ def plot_latency_bar_hp():
     print("Saved: fig7_lat_hp_with_ml_nonshare.png")
 
 
+@cached_output(OUTPUT_DIR, 'fig8_weighted_lat_with_ml_nonshare.png', STYLE)
 def plot_latency_line():
     """Fig 8.x: Latency Line Chart comparing all methods"""
     fig, ax = plt.subplots(figsize=(14, 8))
 
-    # Calculate weighted latency: HP=1.5, MP=1.0, LP=0.5
     # Weighted = 1.5*VO + 1.5*VI + 0.5*BK (assuming no BE traffic)
-    def calc_weighted(vo, vi, bk):
-        return [1.5*vo[i] + 1.5*vi[i] + 0.5*bk[i] for i in range(len(vo))]
-
-    pbm_weighted = calc_weighted(pbm_vo, pbm_vi, pbm_bk)
-    mps_weighted = calc_weighted(mps_vo, mps_vi, mps_bk)
-    su_weighted = calc_weighted(su_vo, su_vi, su_bk)
-    non_mu_weighted = calc_weighted(non_mu_vo, non_mu_vi, non_mu_bk)
-    ml_nonshare_weighted = calc_weighted(ml_nonshare_vo, ml_nonshare_vi, ml_nonshare_bk)
-    ml_old_weighted = calc_weighted(ml_old_vo, ml_old_vi, ml_old_bk)
+    (pbm_weighted, mps_weighted, su_weighted, non_mu_weighted,
+     ml_nonshare_weighted, ml_old_weighted) = METRICS.weighted()
 
     ax.plot(nwifi_values, pbm_weighted, 'o-', color=COLORS['PBM'],
             label='PBM', linewidth=2, markersize=8)
@@ -220,6 +209,7 @@ def print_data_verification():
     print("DATA SOURCE VERIFICATION")
     print("="*70)
 
+    print(f"\nData source: {data_source()}")
     print("\n📁 ns-3 Results Directory: /home/adlink/浩宗論文/實驗/Test_result(ns-3)/case1/")
     print("\nScheduler Mapping:")
     print("  - PBM        → wifi6-3-develop/nwifi=*/third_ac_latency.csv")
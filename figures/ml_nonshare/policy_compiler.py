@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Compile the Scheduler MLP into a Lookup Table + Shallow Decision Trees
+
+Distills a trained MLP and its Rule 4 mask into a policy with no dense layers:
+
+1. Lookup: the row's mask cell (scheduler_policies.mask_index: secondary AC
+   present x ratio band / gate) selects one tree. The feasible classes are
+   constant within a cell, so the mask is applied at compile time and every
+   decision is feasible by construction
+2. Tree: a CART tree of depth <= max_depth, grown on the MLP's masked
+   decisions for the states of that cell, with `x[f] < threshold` tests
+
+Training states are sample_states() over NWIFI_VALUES with loads from
+LOAD_RANGE (or an expert_dataset.py directory). Features are pre-binned
+into BINS quantile bins, so a split search is one bincount per feature and
+node. A leaf predicts the majority MLP decision of its states; cells that
+no training state reaches fall back to the most frequent decision among the
+cell's feasible classes.
+
+Fidelity is reported as agreement with the MLP (overall, per nwifi and per
+MLP decision) on fresh states, and both policies' accuracy on the expert
+label. write_tree_header() emits the trees and ml_scheduler_decide_tree()
+for the same C header flow as quantized_mlp.py; decision_bench.py times both
+as MLP-tree / MLP-tree-C. Any mlp_trainer.TASKS network compiles (--task):
+unmasked ones (B0, B2, B3) get a single tree.
+
+Usage:
+    python policy_compiler.py b1_full_bc.npz                    # fidelity report
+    python policy_compiler.py b1_full_bc.npz --depth 12 --out ml-scheduler-tree.h
+    python policy_compiler.py --random --samples 4000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from mlp_inference import MLPPolicy, c_array
+from results_store import NWIFI_VALUES
+from scheduler_policies import (F_AC_S, F_RATIO, MASK_BANDS, MASK_EDGES, MASK_TABLE,
+                                N_CLASSES, N_FEATURES, mask_index, sample_states)
+
+MAX_DEPTH = 10
+MIN_LEAF = 32
+BINS = 64
+SAMPLES = 1 << 20
+LOAD_RANGE = (0.5, 1.5)
+
+_CELL_MASKS = MASK_TABLE.reshape(-1, N_CLASSES)
+
+
+def sample_training_states(samples, nwifi_values=NWIFI_VALUES, seed=0):
+    rng = np.random.default_rng(seed)
+    parts = [sample_states(len(idx), nwifi, rng, load=rng.uniform(*LOAD_RANGE))
+             for nwifi, idx in zip(nwifi_values,
+                                   np.array_split(np.arange(samples), len(nwifi_values)))]
+    return np.concatenate(parts)
+
+
+def quantile_edges(features, bins=BINS):
+    """Per feature: sorted unique cut points (at most bins - 1)."""
+    qs = np.linspace(0, 100, bins + 1)[1:-1]
+    return [np.unique(np.percentile(features[:, f], qs)) for f in range(features.shape[1])]
+
+
+def bin_codes(features, edges):
+    """(n, features) uint8 codes: code c <=> edges[c-1] <= x < edges[c]."""
+    codes = np.empty(features.shape, dtype=np.uint8)
+    for f, e in enumerate(edges):
+        codes[:, f] = np.searchsorted(e, features[:, f], side='right')
+    return codes
+
+
+class DecisionForest:
+    """
+    One tree per mask cell, stored as flat node arrays: feature (-1 = leaf),
+    threshold, left / right child, and the class of leaves; roots[cell] is the
+    first node of the cell's tree.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, masked=True):
+        self.feature = np.asarray(feature, dtype=np.int8)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.uint8)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.masked = masked
+        self.depth = self._depth()
+
+    def _depth(self):
+        depth = np.zeros(len(self.feature), dtype=np.int64)
+        for node in range(len(self.feature)):         # children come after parents
+            if self.feature[node] >= 0:
+                depth[self.left[node]] = depth[self.right[node]] = depth[node] + 1
+        return int(depth.max()) if len(depth) else 0
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def n_leaves(self):
+        return int((self.feature < 0).sum())
+
+    def decide(self, features):
+        """Class per row of (n, 12) states: lookup of the mask cell, then its tree."""
+        x = np.atleast_2d(features).astype(np.float32)
+        node = self.roots[mask_index(x)] if self.masked else np.full(len(x), self.roots[0])
+        rows = np.flatnonzero(self.feature[node] >= 0)
+        while len(rows):                                # rows still at an inner node
+            at = node[rows]
+            step = np.where(x[rows, self.feature[at]] < self.threshold[at],
+                            self.left[at], self.right[at])
+            node[rows] = step
+            rows = rows[self.feature[step] >= 0]
+        return self.value[node].astype(np.int64)
+
+    __call__ = decide
+
+
+def _grow(codes, y, edges, allowed, max_depth, min_leaf, nodes):
+    """Append the CART tree of (codes, y) to nodes (list of 5-lists); returns its root."""
+    n_classes = len(allowed)
+    fallback = int(np.flatnonzero(allowed)[0])
+
+    def leaf(counts):
+        cls = int(np.argmax(np.where(allowed, counts, -1))) if counts.sum() else fallback
+        nodes.append([-1, 0.0, -1, -1, cls])
+        return len(nodes) - 1
+
+    root = None
+    stack = [(np.arange(len(y)), 0, None, None)]       # (rows, depth, parent, side)
+    while stack:
+        rows, depth, parent, side = stack.pop()
+        counts = np.bincount(y[rows], minlength=n_classes)
+        best = None
+        if depth < max_depth and len(rows) >= 2 * min_leaf and (counts > 0).sum() > 1:
+            total = counts.astype(np.float64)
+            impurity = len(rows) - (total ** 2).sum() / len(rows)
+            for f in range(codes.shape[1]):
+                n_bins = len(edges[f]) + 1
+                if n_bins < 2:
+                    continue
+                hist = np.bincount(codes[rows, f].astype(np.int64) * n_classes + y[rows],
+                                   minlength=n_bins * n_classes).reshape(n_bins, n_classes)
+                left = np.cumsum(hist, axis=0)[:-1].astype(np.float64)
+                right = total - left
+                n_left, n_right = left.sum(axis=1), right.sum(axis=1)
+                ok = (n_left >= min_leaf) & (n_right >= min_leaf)
+                if not ok.any():
+                    continue
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    cost = (n_left - (left ** 2).sum(axis=1) / n_left
+                            + n_right - (right ** 2).sum(axis=1) / n_right)
+                cost = np.where(ok, cost, np.inf)
+                b = int(np.argmin(cost))
+                if cost[b] < impurity - 1e-9 and (best is None or cost[b] < best[0]):
+                    best = (cost[b], f, b)
+        if best is None:
+            node = leaf(counts)
+        else:
+            _, f, b = best
+            nodes.append([f, float(edges[f][b]), -1, -1, 0])
+            node = len(nodes) - 1
+            go_left = codes[rows, f] <= b
+            stack.append((rows[~go_left], depth + 1, node, 3))
+            stack.append((rows[go_left], depth + 1, node, 2))
+        if parent is None:
+            root = node
+        else:
+            nodes[parent][side] = node
+    return root
+
+
+def compile_policy(policy, states, features=None, max_depth=MAX_DEPTH, min_leaf=MIN_LEAF,
+                   bins=BINS, verbose=True):
+    """
+    DecisionForest distilled from policy's decisions on (n, 12) states. features
+    are the state columns the network reads (mlp_trainer.Task.features); the
+    mask cells are only used when the policy is Rule 4 masked, otherwise a
+    single tree covers every state.
+    """
+    start = time.perf_counter()
+    features = list(range(N_FEATURES)) if features is None else list(features)
+    y = policy(states[:, features]).astype(np.int64)
+    edges = quantile_edges(states[:, features], bins)
+    codes = bin_codes(states[:, features], edges)
+    n_classes = policy.sizes[-1]
+    if policy.masked:
+        cells, cell_masks = mask_index(states), _CELL_MASKS
+    else:
+        cells, cell_masks = np.zeros(len(states), dtype=np.int64), np.ones((1, n_classes), bool)
+    global_counts = np.bincount(y, minlength=n_classes)
+
+    nodes, roots = [], []
+    for cell in range(len(cell_masks)):
+        allowed = cell_masks[cell]
+        rows = np.flatnonzero(cells == cell)
+        if len(rows) == 0:
+            cls = int(np.argmax(np.where(allowed, global_counts, -1)))
+            nodes.append([-1, 0.0, -1, -1, cls])
+            roots.append(len(nodes) - 1)
+            continue
+        # node indices of this tree are offset by the nodes already emitted
+        sub = []
+        root = _grow(codes[rows], y[rows], edges, allowed,
+                     max_depth, min_leaf, sub)
+        offset = len(nodes)
+        for f, t, left, right, v in sub:
+            nodes.append([features[f] if f >= 0 else -1, t, left + offset if left >= 0 else -1,
+                          right + offset if right >= 0 else -1, v])
+        roots.append(root + offset)
+    forest = DecisionForest(*zip(*nodes), roots=roots, masked=policy.masked)
+    if verbose:
+        print(f"Compiled {forest.n_nodes:,} nodes ({forest.n_leaves:,} leaves, depth "
+              f"{forest.depth}) from {len(states):,} states in {time.perf_counter() - start:.1f}s")
+    return forest
+
+
+def fidelity(policy, forest, states, features=slice(None), nwifi=None, targets=None):
+    """Agreement of the compiled policy with the MLP, overall / per nwifi / per class."""
+    mlp_cls = policy(states[:, features])
+    tree_cls = forest(states)
+    agree = mlp_cls == tree_cls
+    report = {'agreement': float(agree.mean()),
+              'per_class': {int(c): (int((mlp_cls == c).sum()), float(agree[mlp_cls == c].mean()))
+                            for c in np.unique(mlp_cls)}}
+    if nwifi is not None:
+        report['per_nwifi'] = {int(n): float(agree[nwifi == n].mean()) for n in np.unique(nwifi)}
+    if targets is not None:
+        report['mlp_accuracy'] = float((mlp_cls == targets).mean())
+        report['tree_accuracy'] = float((tree_cls == targets).mean())
+    return report
+
+
+def write_tree_header(path, forest, guard='ML_SCHEDULER_TREE_H'):
+    """C header: the forest arrays and ml_scheduler_decide_tree(features)."""
+    if forest.masked:
+        root = [
+            '    int band = 0;',
+            f'    while (band < {len(MASK_EDGES)} && !(features[{F_RATIO}] <= dt_mask_edges[band]))',
+            '        band++;',
+            f'    int node = dt_root[(features[{F_AC_S}] >= 0) * {MASK_BANDS} + band];']
+    else:
+        root = ['    int node = dt_root[0];']
+    lines = [f'#ifndef {guard}', f'#define {guard}', '', '#include <stdint.h>', '',
+             c_array('float', 'dt_mask_edges', MASK_EDGES.astype(np.float32)),
+             c_array('int32_t', 'dt_root', forest.roots),
+             c_array('int8_t', 'dt_feature', forest.feature),
+             c_array('float', 'dt_threshold', forest.threshold),
+             c_array('int32_t', 'dt_left', forest.left),
+             c_array('int32_t', 'dt_right', forest.right),
+             c_array('uint8_t', 'dt_value', forest.value),
+             f'/* features: {N_FEATURES} floats (raw scheduler state) */',
+             'static inline int ml_scheduler_decide_tree(const float *features)',
+             '{'] + root + [
+             '    while (dt_feature[node] >= 0)',
+             '        node = features[dt_feature[node]] < dt_threshold[node]'
+             ' ? dt_left[node] : dt_right[node];',
+             '    return dt_value[node];',
+             '}', '', f'#endif  // {guard}']
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    from expert_dataset import label_states
+    from mlp_trainer import TASKS, task_targets
+
+    parser = argparse.ArgumentParser(description='Compile a scheduler MLP into trees')
+    parser.add_argument('weights', nargs='?', help='float weights (.pth/.h/.npz)')
+    parser.add_argument('--task', choices=list(TASKS), default='B1-Full-BC')
+    parser.add_argument('--random', action='store_true', help='untrained 12-64-32-11 network')
+    parser.add_argument('--samples', type=int, default=SAMPLES, help='training states')
+    parser.add_argument('--depth', type=int, default=MAX_DEPTH)
+    parser.add_argument('--min-leaf', type=int, default=MIN_LEAF)
+    parser.add_argument('--bins', type=int, default=BINS, help='quantile bins per feature')
+    parser.add_argument('--eval', type=int, default=1 << 18, help='fresh states to evaluate')
+    parser.add_argument('--out', help='C header to write')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not args.weights and not args.random:
+        parser.error('give a weights file or --random')
+    task = TASKS['B1-Full-BC' if args.random else args.task]
+
+    policy = (MLPPolicy.random() if args.random
+              else MLPPolicy.load(args.weights, masked=task.masked))
+    print("="*70)
+    print(f"MLP {'-'.join(map(str, policy.sizes))} -> "
+          f"{'mask-cell lookup + ' if policy.masked else ''}depth <= {args.depth} trees")
+    print("-"*70)
+    forest = compile_policy(policy, sample_training_states(args.samples, seed=args.seed),
+                            task.features, args.depth, args.min_leaf, args.bins)
+
+    rng = np.random.default_rng(args.seed + 1)
+    per = args.eval // len(NWIFI_VALUES)
+    states = np.concatenate([sample_states(per, n, rng) for n in NWIFI_VALUES])
+    nwifi = np.repeat(NWIFI_VALUES, per)
+    targets = task_targets(task, states, label_states(states))
+    report = fidelity(policy, forest, states, task.features, nwifi, targets)
+    print(f"Fidelity on {len(states):,} fresh states: {report['agreement']:.3%} agreement")
+    print("  per nwifi: " + ", ".join(f"{n}: {a:.2%}" for n, a in report['per_nwifi'].items()))
+    print("  per MLP decision: " + ", ".join(f"{c}: {a:.1%} ({n:,})"
+                                             for c, (n, a) in report['per_class'].items()))
+    print(f"Accuracy vs {task.label or 'Non-MU-TXOP RU'}: MLP {report['mlp_accuracy']:.3%}, "
+          f"tree {report['tree_accuracy']:.3%}")
+    for name, fn in (('MLP', lambda s: policy(s[:, task.features])), ('tree', forest)):
+        fn(states[:1024])
+        start = time.perf_counter()
+        fn(states)
+        print(f"  {name:<6}{(time.perf_counter() - start) / len(states) * 1e9:>7.0f} ns/decision")
+    if args.out:
+        write_tree_header(args.out, forest)
+        print(f"Saved: {args.out}")
+    print("="*70)
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Monte-Carlo Policy-Error Estimator for the ML Baselines (B1-B3)
+
+Replaces the closed-form estimate (teacher latency scaled by a hand-picked
+degradation factor per AC) with a replay of sampled TXOP decisions:
+
+1. Draw TXOP states for an nwifi point (scheduler_policies.sample_states)
+2. Label each state with the expert the model should follow:
+   - B1-Full-BC:  PBM, and PBM's decision class (11 classes)
+   - B2-Chooser:  the better of {PBM, MPS} for this TXOP
+   - B3-Meta:     the best of {Non-MU-TXOP, PBM, MPS} for this TXOP
+   ("better" = what a correct pick scores in step 5: the expert's ns-3
+   latency of the TXOP's primary and secondary AC, weighted by AC weight and
+   queued bytes, see expert_costs)
+3. Sample the model's decision from the row of its confusion matrix for the
+   true label. For B1 the training accuracy is read as that of the masked
+   model: the label keeps its probability and the errors go only to the
+   other Rule 4 feasible classes (a TXOP whose mask leaves just the label is
+   always right). The replayed agreement with the label is checked against
+   the matrix (estimate_baseline raises ValueError if they differ)
+4. Airtime model (service_times): each side (primary / secondary AC) is
+   served by the RUs the decision gives it; the MU PPDU lasts as long as its
+   longest side, and bytes that do not fit wait further access cycles
+5. A side's latency is the labelled expert's own ns-3 latency for its AC,
+   times service time(model) / service time(expert's decision), times
+   1 + ERROR_PENALTY if the model's decision differs from the expert's.
+   Every decision is thus scored against one scheduler's real latency; per
+   AC, the byte-weighted mean over a window of TXOPs is one latency sample
+
+ERROR_PENALTY is what the airtime model misses of a wrong decision's cost.
+It is fitted (--calibrate) so that B1 reproduces ML-Old, the ns-3 run of the
+original 11-class PBM imitator with B1's 12 input features; ML-Old's
+accuracy was not recorded, so B1's is assumed.
+
+Trials are processed in fixed-size batches of NumPy arrays, so millions of
+TXOPs per configuration run in seconds with bounded memory. Windows give a
+latency distribution; the estimate is its mean with a 95% confidence interval
+and the 5th/95th percentile of the window latency.
+
+Confusion matrices: POLICY_CONFUSION_FILE (JSON {baseline: K x K rows =
+true label, columns = prediction}) when the trainers have exported one, else
+a matrix with the training accuracy on the diagonal and the errors spread
+uniformly over the other classes.
+
+Usage:
+    python policy_error.py                          # B1-B3, default trials
+    python policy_error.py --trials 4000000 --window 2000
+    python policy_error.py --confusion confusion.json
+    python policy_error.py --cache 65536            # memoized expert decisions
+    python policy_error.py --calibrate              # refit ERROR_PENALTY on ML-Old
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from metrics_engine import MetricsTensor, weight_vector
+from results_ingest import ACS, AC_INDEX
+from results_store import NWIFI_VALUES, case_series
+from he_phy import he_mu_preamble_us
+from scheduler_policies import (F_AC_P, F_AC_S, N_CLASSES, POLICIES,
+                                capacity_bytes, feasible_classes, queued_bytes,
+                                sample_states, txop_duration_us)
+
+POLICY_CONFUSION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     'policy_confusion.json')
+
+# Training accuracies (MLBaselineforWi-Fi6MU-TXOPScheduler.md)
+# experts: None = imitate PBM's decision classes, else the schedulers chosen between
+Baseline = namedtuple('Baseline', 'accuracy experts')
+BASELINES = {
+    'B1-Full-BC': Baseline(0.5289, None),
+    'B2-Chooser': Baseline(0.5940, ('PBM', 'MPS')),
+    'B3-Meta': Baseline(0.3665, ('Non-MU-TXOP', 'PBM', 'MPS')),
+}
+B1_TEACHER = 'PBM'
+
+# ACs with ns-3 latency to score against
+REFERENCE_ACS = ('BK', 'VI', 'VO')
+
+# Airtime model: fixed PPDU overhead, and access cycles (in TXOP data airtimes)
+# a side waits for every further TXOP it needs
+PPDU_OVERHEAD_US = he_mu_preamble_us(8)
+ACCESS_CYCLES = 2
+
+# Latency factor 1 + ERROR_PENALTY on a decision that differs from the
+# expert's, fitted on ML-Old (python policy_error.py --calibrate)
+ERROR_PENALTY = 0.579
+CALIBRATION_BASELINE = 'B1-Full-BC'
+CALIBRATION_TARGET = 'ML-Old'
+
+TRIALS = 1 << 20
+WINDOW = 1024           # TXOPs per latency sample
+BATCH = 1 << 16         # TXOPs per NumPy batch (multiple of WINDOW)
+
+Estimate = namedtuple('Estimate', 'mean ci_low ci_high p05 p95')
+# Replayed decisions that could miss the label: count, how many hit it, and
+# the expected hits and their variance under the confusion matrix
+Agreement = namedtuple('Agreement', 'decisions correct expected variance')
+AGREEMENT_SIGMAS = 5
+
+
+def default_confusion(accuracy, n_classes):
+    """accuracy on the diagonal, errors uniform over the other classes."""
+    off = (1 - accuracy) / (n_classes - 1)
+    return np.full((n_classes, n_classes), off) + np.eye(n_classes) * (accuracy - off)
+
+
+def load_confusion(path=POLICY_CONFUSION_FILE):
+    """{baseline: row-normalized confusion matrix} from path, or {} if absent."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        raw = json.load(f)
+    return {name: np.asarray(m, dtype=np.float64) / np.sum(m, axis=1, keepdims=True)
+            for name, m in raw.items()}
+
+
+def sample_predictions(confusion, labels, rng, mask=None):
+    """
+    (predicted class, probability of the label) per row: inverse-CDF draw from
+    confusion[labels[i]]. With a mask the row is taken as post-mask: the label
+    keeps its probability and the rest is spread over the other classes of
+    mask[i] in proportion to the row; rows with none of them keep the label.
+    """
+    rows = np.arange(len(labels))
+    probs = confusion[labels]
+    if mask is not None:
+        hit = probs[rows, labels]
+        probs = probs * mask
+        probs[rows, labels] = 0
+        errors = probs.sum(axis=1)
+        probs *= np.where(errors > 0, (1 - hit) / np.where(errors > 0, errors, 1), 0)[:, None]
+        probs[rows, labels] = np.where(errors > 0, hit, 1)
+    cdf = np.cumsum(probs, axis=1)
+    u = rng.random(len(labels))[:, None] * cdf[:, -1:]
+    pred = np.minimum((u >= cdf).sum(axis=1), probs.shape[1] - 1)
+    return np.where(cdf[:, -1] > 0, pred, labels), probs[rows, labels]
+
+
+def service_times(states, classes, duration):
+    """
+    (primary, secondary) queued bytes and service time (us) of each side when
+    decision classes[i] is taken on states[i].
+
+    The MU PPDU lasts as long as its longest side (capped at the TXOP's data
+    airtime); a side whose queue exceeds its RU capacity waits ceil(Q / cap) - 1
+    further access cycles for the rest, and a side without an RU waits one.
+    """
+    queued = queued_bytes(states)
+    capacity = capacity_bytes(states, classes, duration)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        airtime = [np.where(cap > 0, np.minimum(q, cap) / cap * duration, 0)
+                   for q, cap in zip(queued, capacity)]
+        extra = [np.where(q > 0, np.where(cap > 0, np.ceil(q / cap) - 1, 1), 0)
+                 for q, cap in zip(queued, capacity)]
+    ppdu = PPDU_OVERHEAD_US + np.maximum(*airtime)
+    return tuple((q, ppdu + k * ACCESS_CYCLES * duration) for q, k in zip(queued, extra))
+
+
+def expert_latency(experts, nwifi, acs=REFERENCE_ACS):
+    """
+    (len(nwifi), k, len(ACS)) ns-3 mean latency of each of the k experts,
+    interpolated between NWIFI_VALUES (clamped at the ends); NaN for ACs not
+    in acs.
+    """
+    nwifi = np.atleast_1d(nwifi)
+    latency = np.full((len(nwifi), len(experts), len(ACS)), np.nan)
+    for k, expert in enumerate(experts):
+        for ac in acs:
+            latency[:, k, AC_INDEX[ac]] = np.interp(nwifi, NWIFI_VALUES, case_series(expert, ac))
+    return latency
+
+
+def _side_latency(states, latency):
+    """(n, k) latency lookups of the primary and secondary AC (-1 = no secondary)."""
+    rows = np.arange(len(states))
+    latency = np.broadcast_to(latency, (len(states),) + np.shape(latency)[-2:])
+    return tuple(latency[rows, :, np.maximum(states[:, col], 0).astype(np.int64)]
+                 for col in (F_AC_P, F_AC_S))
+
+
+def expert_costs(states, latency):
+    """
+    (n, k) cost of following each of k experts: what a correct pick scores,
+    the expert's ns-3 latency of the primary and secondary AC weighted by
+    AC_WEIGHTS and the queued bytes. latency: (k, len(ACS)) for all rows or
+    (n, k, len(ACS)) per row (expert_latency()).
+    """
+    weight = weight_vector()
+    cost = 0
+    for col, q, lat in zip((F_AC_P, F_AC_S), queued_bytes(states), _side_latency(states, latency)):
+        ac = states[:, col].astype(np.int64)
+        w = (np.where(ac >= 0, weight[np.maximum(ac, 0)], 0) * q)[:, None]
+        cost = cost + np.where(w > 0, w * lat, 0)
+    return cost
+
+
+def expert_labels(experts, states, latency, policies=POLICIES):
+    """
+    Chooser label per row: index into experts of the lowest expert_costs(),
+    and the (n, k) expert classes.
+    """
+    expert_cls = np.stack([policies[e](states) for e in experts], axis=1)
+    return np.argmin(expert_costs(states, latency), axis=1), expert_cls
+
+
+def replay_batch(baseline, confusion, states, rng, latency, penalty=ERROR_PENALTY,
+                 policies=POLICIES):
+    """
+    Model latency for a batch of states, scored against the labelled expert.
+    latency: (k, len(ACS)) ns-3 latency of the experts (of the teacher for B1).
+    Returns (AcIndex per side (n, 2), queued bytes (n, 2), latency (n, 2),
+    (probability the model picks the label (n,), whether it did (n,))).
+    policies: {scheduler: policy} deciding for the teachers / experts (e.g.
+    decision_cache.cached_policies()).
+    """
+    duration = txop_duration_us(states)
+    rows = np.arange(len(states))
+    if baseline.experts is None:
+        expert = np.zeros(len(states), dtype=np.int64)
+        teacher_cls = policies[B1_TEACHER](states)
+        model_cls, hit = sample_predictions(confusion, teacher_cls, rng,
+                                            feasible_classes(states))
+        correct = model_cls == teacher_cls
+    else:
+        expert, expert_cls = expert_labels(baseline.experts, states, latency, policies)
+        teacher_cls = expert_cls[rows, expert]
+        pred, hit = sample_predictions(confusion, expert, rng)
+        model_cls = expert_cls[rows, pred]
+        correct = pred == expert
+
+    (q_p, t_p), (q_s, t_s) = service_times(states, teacher_cls, duration)
+    (_, m_p), (_, m_s) = service_times(states, model_cls, duration)
+    own_p, own_s = (lat[rows, expert] for lat in _side_latency(states, latency))
+
+    acs = np.stack([states[:, F_AC_P], states[:, F_AC_S]], axis=1).astype(np.int64)
+    queued = np.stack([q_p, q_s], axis=1)
+    factor = np.where(model_cls != teacher_cls, 1 + penalty, 1)[:, None]
+    samples = np.stack([own_p * m_p / t_p, own_s * m_s / t_s], axis=1) * factor
+    return acs, queued, samples, (hit, correct)
+
+
+def window_latencies(baseline, confusion, nwifi, latency, trials=TRIALS, window=WINDOW,
+                     batch=BATCH, seed=0, penalty=ERROR_PENALTY, policies=POLICIES,
+                     acs=REFERENCE_ACS):
+    """
+    ({ac: array of per-window byte-weighted latencies}, Agreement) over
+    `trials` TXOPs (trials // window windows); latency as in replay_batch.
+    """
+    rng = np.random.default_rng([seed, nwifi])
+    batch = max(window, batch // window * window)
+    sums = {ac: [] for ac in acs}
+    agreement = np.zeros(len(Agreement._fields))
+    done = 0
+    while done < trials:
+        n = min(batch, (trials - done) // window * window)
+        if n == 0:
+            break
+        side_acs, queued, samples, (hit, correct) = replay_batch(
+            baseline, confusion, sample_states(n, nwifi, rng), rng, latency, penalty, policies)
+        open_rows = hit < 1
+        p = hit[open_rows]
+        agreement += [p.size, correct[open_rows].sum(), p.sum(), (p * (1 - p)).sum()]
+        for ac in acs:
+            mine = side_acs == AC_INDEX[ac]
+            w = np.where(mine, queued, 0).reshape(-1, window * 2)
+            wl = np.where(mine, queued * samples, 0).reshape(-1, window * 2)
+            weight = w.sum(axis=1)
+            with np.errstate(invalid='ignore'):
+                sums[ac].append(np.where(weight > 0, wl.sum(axis=1) / weight, np.nan))
+        done += n
+    return {ac: np.concatenate(v) for ac, v in sums.items()}, Agreement(*agreement)
+
+
+def check_agreement(name, nwifi, agreement, sigmas=AGREEMENT_SIGMAS):
+    """
+    Raise ValueError if the replayed model hits its label more or less often
+    than the confusion matrix (for the default matrix: the training accuracy)
+    says, by more than `sigmas` binomial standard deviations.
+    """
+    a = agreement
+    if abs(a.correct - a.expected) > sigmas * math.sqrt(a.variance) + 1e-9:
+        raise ValueError(f"{name}, nwifi={nwifi}: replayed accuracy "
+                         f"{a.correct / a.decisions:.2%} over {a.decisions:.0f} decisions, "
+                         f"expected {a.expected / a.decisions:.2%}")
+
+
+def summarize(samples):
+    """Estimate of a latency sample array (NaN-free part)."""
+    samples = samples[~np.isnan(samples)]
+    if samples.size == 0:
+        return Estimate(*([math.nan] * 5))
+    mean = float(samples.mean())
+    half = 1.96 * float(samples.std(ddof=1)) / math.sqrt(samples.size) if samples.size > 1 else 0.0
+    p05, p95 = np.percentile(samples, [5, 95])
+    return Estimate(mean, mean - half, mean + half, float(p05), float(p95))
+
+
+def estimate_baseline(name, nwifi_values=NWIFI_VALUES, confusion=None, accuracy=None,
+                      trials=TRIALS, window=WINDOW, seed=0, penalty=ERROR_PENALTY,
+                      policies=POLICIES, latency=None):
+    """
+    {ac: [Estimate per nwifi]} latency of baseline `name` (ms).
+    confusion: K x K matrix (default: POLICY_CONFUSION_FILE, else from accuracy).
+    latency: (len(nwifi_values), k, len(ACS)) ns-3 latency of the experts
+    (default: expert_latency()).
+    """
+    baseline = BASELINES[name]
+    if accuracy is not None:
+        baseline = baseline._replace(accuracy=accuracy)
+    experts = baseline.experts or (B1_TEACHER,)
+    latency = expert_latency(experts, nwifi_values) if latency is None else np.asarray(latency)
+    n_classes = N_CLASSES if baseline.experts is None else len(experts)
+    if confusion is None:
+        confusion = load_confusion().get(name)
+    if confusion is None:
+        confusion = default_confusion(baseline.accuracy, n_classes)
+
+    acs = [ac for ac in ACS if not np.isnan(latency[..., AC_INDEX[ac]]).all()]
+    estimates = {ac: [] for ac in acs}
+    for j, nwifi in enumerate(nwifi_values):
+        samples, agreement = window_latencies(baseline, confusion, nwifi, latency[j], trials,
+                                              window, seed=seed, penalty=penalty,
+                                              policies=policies, acs=acs)
+        check_agreement(name, nwifi, agreement)
+        for ac in acs:
+            estimates[ac].append(summarize(samples[ac]))
+    return estimates
+
+
+def mean_series(estimates, ac):
+    """Point estimates of one AC as a list over nwifi (for plotting)."""
+    return [round(e.mean, 3) for e in estimates[ac]]
+
+
+def calibrate_penalty(trials=TRIALS, window=WINDOW, seed=0, policies=POLICIES):
+    """
+    (penalty, CALIBRATION_BASELINE weighted latency per nwifi with it,
+    CALIBRATION_TARGET's): the ERROR_PENALTY at which the baseline's mean
+    weighted latency over NWIFI_VALUES equals the target's ns-3 one. The
+    samples are linear in the penalty, so two replays with the same seed fix
+    it. Raises ValueError if the baseline never errs or the fit is <= -1.
+    """
+    def weighted(penalty):
+        estimates = estimate_baseline(CALIBRATION_BASELINE, trials=trials, window=window,
+                                      seed=seed, penalty=penalty, policies=policies)
+        return MetricsTensor.from_series(
+            {CALIBRATION_BASELINE: {ac: [e.mean for e in per_point]
+                                    for ac, per_point in estimates.items()}}).weighted()[0]
+
+    base, slope = weighted(0.0), weighted(1.0)
+    slope = slope - base
+    target = MetricsTensor.from_case_series([CALIBRATION_TARGET]).weighted()[0]
+    if not slope.mean() > 0:
+        raise ValueError(f"{CALIBRATION_BASELINE} never departs from its teacher: "
+                         f"no penalty to fit")
+    penalty = float((target.mean() - base.mean()) / slope.mean())
+    if penalty <= -1:
+        raise ValueError(f"{CALIBRATION_BASELINE} is slower than {CALIBRATION_TARGET} "
+                         f"for any penalty (fit {penalty:.3f})")
+    return penalty, base + penalty * slope, target
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte-Carlo latency of ML baselines B1-B3')
+    parser.add_argument('--baselines', nargs='+', choices=list(BASELINES), default=list(BASELINES))
+    parser.add_argument('--trials', type=int, default=TRIALS, help='TXOPs per nwifi point')
+    parser.add_argument('--window', type=int, default=WINDOW, help='TXOPs per latency sample')
+    parser.add_argument('--confusion', default=POLICY_CONFUSION_FILE,
+                        help='JSON {baseline: confusion matrix}')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', type=int, default=0, metavar='STATES',
+                        help='memoize the expert decisions on discretized states '
+                             '(decision_cache.py)')
+    parser.add_argument('--calibrate', action='store_true',
+                        help=f'fit ERROR_PENALTY so that {CALIBRATION_BASELINE} reproduces '
+                             f'{CALIBRATION_TARGET}, and compare them per nwifi')
+    args = parser.parse_args()
+
+    policies = POLICIES
+    if args.cache:
+        from decision_cache import cached_policies
+        policies = cached_policies(capacity=args.cache)
+    if args.calibrate:
+        print("="*70)
+        print(f"Calibration: {CALIBRATION_BASELINE} "
+              f"({BASELINES[CALIBRATION_BASELINE].accuracy:.2%}) vs {CALIBRATION_TARGET} ns-3, "
+              f"{args.trials} TXOPs per point")
+        print("="*70)
+        try:
+            penalty, fitted, target = calibrate_penalty(args.trials, args.window, args.seed,
+                                                        policies)
+        except ValueError as e:
+            raise SystemExit(f"Calibration failed: {e}")
+        print(f"{'nWifi':<8}{CALIBRATION_BASELINE:>14}{CALIBRATION_TARGET:>14}{'ratio':>10}")
+        for n, b, t in zip(NWIFI_VALUES, fitted, target):
+            print(f"{n:<8}{b:>14.3f}{t:>14.3f}{b / t:>10.3f}")
+        print(f"{'Average':<8}{fitted.mean():>14.3f}{target.mean():>14.3f}")
+        print(f"\nERROR_PENALTY = {penalty:.3f} (in use: {ERROR_PENALTY:.3f})")
+        print("="*70)
+        raise SystemExit(0)
+
+    confusion = load_confusion(args.confusion)
+    print("="*70)
+    print(f"Monte-Carlo policy error: {args.trials} TXOPs per point, "
+          f"window {args.window} TXOPs, error penalty {ERROR_PENALTY:.3f}")
+    print("="*70)
+    for name in args.baselines:
+        start = time.perf_counter()
+        source = 'file' if name in confusion else f'accuracy {BASELINES[name].accuracy:.2%}'
+        estimates = estimate_baseline(name, confusion=confusion.get(name), trials=args.trials,
+                                      window=args.window, seed=args.seed, policies=policies)
+        print(f"\n{name} (confusion: {source}), {time.perf_counter() - start:.1f}s")
+        print(f"{'AC':<4}" + "".join(f"{n:>22}" for n in NWIFI_VALUES))
+        for ac, per_point in estimates.items():
+            print(f"{ac:<4}" + "".join(f"{e.mean:>8.3f} [{e.ci_low:.3f},{e.ci_high:.3f}]"
+                                      for e in per_point))
+    if args.cache:
+        print("\nDecision cache hit rate: " + ", ".join(
+            f"{name} {p.hit_rate:.2%}" for name, p in policies.items() if p.hits + p.misses))
+    print("="*70)
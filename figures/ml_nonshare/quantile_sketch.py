@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Mergeable Latency Quantile Sketch
+
+Log-bucketed (HDR / DDSketch style) histogram for per-packet latency. Bucket i
+covers (GAMMA^(i-1), GAMMA^i] ms, so any reported quantile is within
+RELATIVE_ACCURACY of the true value. Every sketch uses the same fixed bucket
+layout, which makes merging (across shards, files and seeds) a plain array add
+and lets the results store keep sketches as one 2-D column.
+
+Usage:
+    sketch = LatencySketch()
+    sketch.add(latencies_ms)          # numpy array, any length
+    sketch.merge(other_sketch)
+    sketch.quantile(0.99)             # p99 in ms
+"""
+
+import math
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Tracked range: 1 us .. 100 s (values outside are clamped to the edge buckets)
+MIN_LATENCY_MS = 1e-3
+MAX_LATENCY_MS = 1e5
+
+_MIN_INDEX = math.ceil(math.log(MIN_LATENCY_MS) / LOG_GAMMA)
+_MAX_INDEX = math.ceil(math.log(MAX_LATENCY_MS) / LOG_GAMMA)
+N_BUCKETS = _MAX_INDEX - _MIN_INDEX + 2   # +1 underflow bucket (<= MIN_LATENCY_MS)
+
+# Representative value per bucket (midpoint in relative terms)
+_BUCKET_VALUES = np.empty(N_BUCKETS)
+_BUCKET_VALUES[0] = MIN_LATENCY_MS
+_BUCKET_VALUES[1:] = (2 * GAMMA ** np.arange(_MIN_INDEX, _MAX_INDEX + 1)
+                      / (GAMMA + 1))
+
+QUANTILES = {'p50': 0.50, 'p95': 0.95, 'p99': 0.99, 'p99.9': 0.999}
+
+
+def bucket_indices(values):
+    """Bucket index for each latency value (vectorized)."""
+    values = np.asarray(values, dtype=np.float64)
+    idx = np.zeros(values.shape, dtype=np.int64)
+    above = values > MIN_LATENCY_MS
+    idx[above] = (np.ceil(np.log(values[above]) / LOG_GAMMA).astype(np.int64)
+                  - _MIN_INDEX + 1)
+    return np.clip(idx, 0, N_BUCKETS - 1)
+
+
+def bucket_quantiles(counts, q):
+    """
+    Latency (ms) at quantile q of every sketch in a (..., N_BUCKETS) count
+    array, e.g. one sketch per grid cell; nan where a sketch is empty.
+    """
+    cumulative = np.cumsum(counts, axis=-1)
+    total = cumulative[..., -1]
+    ranks = np.floor(q * (total - 1))
+    idx = np.minimum((cumulative <= ranks[..., np.newaxis]).sum(axis=-1), N_BUCKETS - 1)
+    return np.where(total > 0, _BUCKET_VALUES[idx], math.nan)
+
+
+class LatencySketch:
+    """Fixed-layout log histogram; add() and merge() are O(N_BUCKETS)."""
+
+    __slots__ = ('counts',)
+
+    def __init__(self, counts=None):
+        if counts is None:
+            counts = np.zeros(N_BUCKETS, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+    def add(self, values):
+        """Fold a 1-D array of latencies (ms) into the sketch."""
+        if len(values):
+            self.counts += np.bincount(bucket_indices(values), minlength=N_BUCKETS)
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """Latency (ms) at quantile q in [0, 1]; nan for an empty sketch."""
+        return float(self.quantiles([q])[0])
+
+    def quantiles(self, qs):
+        """Vectorized quantile lookup for a sequence of q values."""
+        qs = np.asarray(qs, dtype=np.float64)
+        total = self.counts.sum()
+        if total == 0:
+            return np.full(qs.shape, math.nan)
+        cumulative = np.cumsum(self.counts)
+        # rank of the q-quantile (0-based), same convention as DDSketch
+        ranks = np.floor(qs * (total - 1))
+        return _BUCKET_VALUES[np.searchsorted(cumulative, ranks, side='right')]
+
+    def __repr__(self):
+        if not self.count:
+            return "LatencySketch(empty)"
+        p50, p99 = self.quantiles([0.5, 0.99])
+        return f"LatencySketch(count={self.count}, p50={p50:.3f}, p99={p99:.3f})"
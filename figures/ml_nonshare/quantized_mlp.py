@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Int8 Quantized Scheduler MLP: Export, Bit-Exact Reference, Float Comparison
+
+Quantizes a trained scheduler MLP (mlp_inference.MLPPolicy) for the ns-3 /
+AP decision path, writes it as a C header with an integer-only forward pass,
+and measures what the integer path costs in decisions against the float model.
+
+Scheme (symmetric, zero points 0):
+- Input: x_q = clamp(rint((x - mean) * in_scale), -127, 127) in float32,
+  in_scale = 1 / (std * s_x) with s_x from the calibration states
+- Hidden layers: int8 weights per output channel (s_w[j] = max|W[:, j]| / 127),
+  int32 accumulator acc = x_q . W_q[j] + b_q[j] with b_q = rint(b / (s_in s_w[j])),
+  ReLU, then requantized to the next layer's int8 scale s_out by a fixed-point
+  multiplier: y = clamp((acc * M[j] + 2^(shift[j]-1)) >> shift[j], 0, 127),
+  M[j] / 2^shift[j] ~ s_in s_w[j] / s_out with M[j] in [2^30, 2^31)
+- Output layer: one weight scale for all classes, so the masked argmax is
+  taken on the int32 accumulators directly
+Activation scales come from the CALIBRATION_PERCENTILE of the float
+activations on calibration states (sample_states over NWIFI_VALUES).
+
+QuantizedMLP.logits() is the bit-exact reference of the C code emitted by
+write_quantized_header(): every product and sum is an integer below 2^53, so
+float64 matrix multiplies give the exact int32 accumulator values, and the
+requantization runs in int64 as in C.
+
+Usage:
+    python quantized_mlp.py export b1_full_bc.npz --out ml-scheduler-weights-q8.h
+    python quantized_mlp.py compare b1_full_bc.npz --rows 4000000
+    python quantized_mlp.py compare b3.npz --task B3-Meta --data /data/expert
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from mlp_inference import MLPPolicy, c_array
+from results_store import NWIFI_VALUES
+from scheduler_policies import feasible_classes, sample_states
+
+QMAX = 127
+CALIBRATION_ROWS = 1 << 18
+CALIBRATION_PERCENTILE = 99.99
+CHUNK_ROWS = 1 << 16
+INT32_MIN = np.iinfo(np.int32).min
+
+
+def fixed_point_multiplier(scale):
+    """(M, shift) int arrays with M / 2^shift ~ scale and M in [2^30, 2^31)."""
+    scale = np.asarray(scale, dtype=np.float64)
+    exponent = np.floor(np.log2(scale)).astype(np.int64)
+    shift = 30 - exponent
+    multiplier = np.rint(scale * np.exp2(shift)).astype(np.int64)
+    overflow = multiplier >= 1 << 31          # rounding up to 2^31
+    multiplier = np.where(overflow, multiplier >> 1, multiplier)
+    shift = np.where(overflow, shift - 1, shift)
+    if (shift < 1).any() or (shift > 62).any():
+        raise ValueError(f"requantization scale out of range: {scale}")
+    return multiplier, shift
+
+
+def calibration_states(rows=CALIBRATION_ROWS, nwifi_values=NWIFI_VALUES, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.concatenate([sample_states(rows // len(nwifi_values), n, rng)
+                           for n in nwifi_values])
+
+
+class QuantizedMLP:
+    """Integer-only MLP (int8 weights / activations, int32 accumulators)."""
+
+    def __init__(self, mean, in_scale, weights, biases, multipliers, shifts, masked=True):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.in_scale = np.asarray(in_scale, dtype=np.float32)
+        self.weights = [np.asarray(w, dtype=np.int8) for w in weights]          # (out, in)
+        self.biases = [np.asarray(b, dtype=np.int32) for b in biases]
+        self.multipliers = [np.asarray(m, dtype=np.int64) for m in multipliers]
+        self.shifts = [np.asarray(s, dtype=np.int64) for s in shifts]
+        self.masked = masked
+        self.sizes = [self.weights[0].shape[1]] + [w.shape[0] for w in self.weights]
+        self._weights_f64 = [w.T.astype(np.float64) for w in self.weights]
+
+    @classmethod
+    def from_float(cls, policy, states, percentile=CALIBRATION_PERCENTILE):
+        """Quantize an MLPPolicy, with activation scales calibrated on states."""
+        mean, std = policy.normalize if policy.normalize is not None else \
+            (np.zeros(policy.sizes[0], np.float32), np.ones(policy.sizes[0], np.float32))
+        h = (states.astype(np.float32) - mean) / std
+        s_in = max(np.percentile(np.abs(h), percentile), 1e-12) / QMAX
+        in_scale = (1 / (std.astype(np.float64) * s_in)).astype(np.float32)
+
+        weights, biases, multipliers, shifts = [], [], [], []
+        last = len(policy.layers) - 1
+        for i, (w, b) in enumerate(policy.layers):           # w: (in, out)
+            w = w.astype(np.float64)
+            if i < last:
+                s_w = np.maximum(np.abs(w).max(axis=0), 1e-12) / QMAX
+            else:
+                s_w = np.full(w.shape[1], max(np.abs(w).max(), 1e-12) / QMAX)
+            weights.append(np.clip(np.rint(w / s_w), -QMAX, QMAX).astype(np.int8).T)
+            biases.append(np.rint(b / (s_in * s_w)).astype(np.int32))
+            h = np.maximum(h @ w + b, 0) if i < last else h
+            if i < last:
+                s_out = max(np.percentile(h, percentile), 1e-12) / QMAX
+                m, s = fixed_point_multiplier(s_in * s_w / s_out)
+                multipliers.append(m)
+                shifts.append(s)
+                s_in = s_out
+        return cls(mean, in_scale, weights, biases, multipliers, shifts, policy.masked)
+
+    @property
+    def n_parameters(self):
+        return sum(w.size + b.size for w, b in zip(self.weights, self.biases))
+
+    def quantize_input(self, features):
+        x = (np.asarray(features, dtype=np.float32) - self.mean) * self.in_scale
+        return np.clip(np.rint(x), -QMAX, QMAX)
+
+    def logits(self, features):
+        """(N, classes) int32 output accumulators (bit-exact with the C code)."""
+        features = np.atleast_2d(features)
+        out = np.empty((len(features), self.sizes[-1]), dtype=np.int32)
+        for start in range(0, len(features), CHUNK_ROWS):
+            h = self.quantize_input(features[start:start + CHUNK_ROWS]).astype(np.float64)
+            for i, (w, b) in enumerate(zip(self._weights_f64, self.biases)):
+                acc = (h @ w).astype(np.int64) + b
+                if i < len(self.multipliers):
+                    acc = np.maximum(acc, 0)
+                    acc = (acc * self.multipliers[i] + (1 << (self.shifts[i] - 1))) >> self.shifts[i]
+                    h = np.minimum(acc, QMAX).astype(np.float64)
+            out[start:start + CHUNK_ROWS] = acc
+        return out
+
+    def decide(self, features, mask=None):
+        """Masked argmax class per row (first maximum, as in the C loop)."""
+        features = np.atleast_2d(features)
+        scores = self.logits(features)
+        if self.masked:
+            mask = feasible_classes(features) if mask is None else mask
+            scores[~mask] = INT32_MIN
+        return np.argmax(scores, axis=1)
+
+    __call__ = decide
+
+    # ------------------------------------------------------------------ header
+
+    def header_arrays(self):
+        """[(C type, name, array)] in the order of the C header."""
+        arrays = [('float', 'q_input_mean', self.mean),
+                  ('float', 'q_input_scale', self.in_scale)]
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays += [('int8_t', f'q_fc{i + 1}_weight', w), ('int32_t', f'q_fc{i + 1}_bias', b)]
+            if i < len(self.multipliers):
+                arrays += [('int32_t', f'q_fc{i + 1}_multiplier', self.multipliers[i]),
+                           ('int8_t', f'q_fc{i + 1}_shift', self.shifts[i])]
+        return arrays
+
+    @classmethod
+    def load(cls, path, masked=True):
+        """Read a header written by write_quantized_header()."""
+        with open(path) as f:
+            text = f.read()
+        arrays = {}
+        for ctype, name, dims, body in _Q_ARRAY_RE.findall(text):
+            shape = [int(d) for d in re.findall(r'\[(\d+)\]', dims)]
+            dtype = np.float32 if ctype == 'float' else np.int64
+            values = np.array([float(v) if ctype == 'float' else int(v)
+                               for v in re.findall(r'[-+]?[\d.]+(?:[eE][-+]?\d+)?', body)],
+                              dtype=dtype)
+            arrays[name] = values.reshape(shape)
+        n = sum(1 for name in arrays if name.endswith('_weight'))
+        hidden = range(1, n)
+        return cls(arrays['q_input_mean'], arrays['q_input_scale'],
+                   [arrays[f'q_fc{i}_weight'] for i in range(1, n + 1)],
+                   [arrays[f'q_fc{i}_bias'] for i in range(1, n + 1)],
+                   [arrays[f'q_fc{i}_multiplier'] for i in hidden],
+                   [arrays[f'q_fc{i}_shift'] for i in hidden], masked)
+
+
+_Q_ARRAY_RE = re.compile(
+    r'static const (float|int8_t|int32_t) (\w+)((?:\[\d+\])+) = \{(.*?)\};', re.S)
+
+
+def write_quantized_header(path, model, guard='ML_SCHEDULER_WEIGHTS_Q8_H'):
+    """
+    C header: the quantized arrays plus ml_scheduler_decide_q8(features, mask),
+    the integer forward pass and masked argmax that QuantizedMLP mirrors.
+    """
+    lines = [f'#ifndef {guard}', f'#define {guard}', '', '#include <math.h>',
+             '#include <stdint.h>', '']
+    for ctype, name, array in model.header_arrays():
+        lines.append(c_array(ctype, name, array))
+
+    sizes = model.sizes
+    widest = max(sizes)
+    body = [f'/* features: {sizes[0]} floats; mask: {sizes[-1]} flags (NULL = no mask) */',
+            'static inline int ml_scheduler_decide_q8(const float *features, '
+            'const uint8_t *mask)',
+            '{',
+            f'    int32_t in[{widest}], out[{widest}];',
+            f'    for (int i = 0; i < {sizes[0]}; i++) {{',
+            '        float x = rintf((features[i] - q_input_mean[i]) * q_input_scale[i]);',
+            f'        in[i] = x > {QMAX} ? {QMAX} : x < -{QMAX} ? -{QMAX} : (int32_t) x;',
+            '    }']
+    for i in range(len(model.weights)):
+        n_in, n_out = sizes[i], sizes[i + 1]
+        body += [f'    for (int j = 0; j < {n_out}; j++) {{',
+                 f'        int32_t acc = q_fc{i + 1}_bias[j];',
+                 f'        for (int k = 0; k < {n_in}; k++)',
+                 f'            acc += in[k] * q_fc{i + 1}_weight[j][k];']
+        if i < len(model.multipliers):
+            body += ['        if (acc < 0) acc = 0;',
+                     f'        int64_t y = ((int64_t) acc * q_fc{i + 1}_multiplier[j]'
+                     f' + ((int64_t) 1 << (q_fc{i + 1}_shift[j] - 1))) >> q_fc{i + 1}_shift[j];',
+                     f'        out[j] = y > {QMAX} ? {QMAX} : (int32_t) y;',
+                     '    }',
+                     f'    for (int j = 0; j < {n_out}; j++) in[j] = out[j];']
+        else:
+            body += ['        out[j] = acc;', '    }']
+    body += ['    int best = -1;',
+             f'    for (int j = 0; j < {sizes[-1]}; j++)',
+             '        if ((!mask || mask[j]) && (best < 0 || out[j] > out[best])) best = j;',
+             '    return best < 0 ? 0 : best;',
+             '}', '', f'#endif  // {guard}']
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines + body) + '\n')
+
+
+# ==============================================================================
+# Float vs quantized comparison
+# ==============================================================================
+
+def compare(policy, qmodel, states, targets=None, features=slice(None), masked=True):
+    """
+    Decision agreement of the float and quantized models on states, per class
+    of the float decision, and both models' accuracy against targets.
+    """
+    x = states[:, features]
+    mask = feasible_classes(states) if masked else None
+    start = time.perf_counter()
+    float_cls = policy.decide(x, mask=mask)
+    float_s = time.perf_counter() - start
+    start = time.perf_counter()
+    q_cls = qmodel.decide(x, mask=mask)
+    q_s = time.perf_counter() - start
+    agree = float_cls == q_cls
+    n_classes = policy.sizes[-1]
+    report = {
+        'rows': len(states),
+        'agreement': float(agree.mean()),
+        'per_class': {c: (int((float_cls == c).sum()), float(agree[float_cls == c].mean()))
+                      for c in range(n_classes) if (float_cls == c).any()},
+        'float_ns': float_s / len(states) * 1e9,
+        'quantized_ns': q_s / len(states) * 1e9,
+    }
+    if targets is not None:
+        report['float_accuracy'] = float((float_cls == targets).mean())
+        report['quantized_accuracy'] = float((q_cls == targets).mean())
+    return report
+
+
+if __name__ == '__main__':
+    from mlp_trainer import TASKS, task_targets
+
+    parser = argparse.ArgumentParser(description='Int8 quantized scheduler MLP')
+    parser.add_argument('command', choices=['export', 'compare'])
+    parser.add_argument('weights', help='float weights (.pth/.h/.npz)')
+    parser.add_argument('--task', choices=list(TASKS), default='B1-Full-BC')
+    parser.add_argument('--out', default='ml-scheduler-weights-q8.h')
+    parser.add_argument('--rows', type=int, default=1 << 20, help='replay states to compare')
+    parser.add_argument('--data', help='compare on an expert_dataset.py directory instead')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    task = TASKS[args.task]
+
+    policy = MLPPolicy.load(args.weights, masked=task.masked)
+    calibration = calibration_states()[:, task.features]
+    qmodel = QuantizedMLP.from_float(policy, calibration)
+
+    print("="*70)
+    print(f"{args.weights}: {'-'.join(map(str, policy.sizes))}, "
+          f"{qmodel.n_parameters:,} int8/int32 parameters "
+          f"({sum(w.size for w in qmodel.weights) + 4 * sum(b.size for b in qmodel.biases):,}"
+          f" bytes vs {4 * policy.n_parameters:,} float32)")
+    if args.command == 'export':
+        write_quantized_header(args.out, qmodel)
+        print(f"Saved: {args.out}")
+    else:
+        if args.data:
+            from expert_dataset import open_shard, read_manifest
+            manifest = read_manifest(args.data)
+            features, labels = open_shard(args.data, manifest['shards'][-1])
+            states, labels = np.asarray(features[:args.rows]), np.asarray(labels[:args.rows])
+        else:
+            from expert_dataset import label_states
+            rng = np.random.default_rng(args.seed)
+            states = np.concatenate([sample_states(args.rows // len(NWIFI_VALUES), n, rng)
+                                     for n in NWIFI_VALUES])
+            labels = label_states(states)
+        targets = task_targets(task, states, labels)
+        report = compare(policy, qmodel, states, targets, task.features, task.masked)
+        print(f"{report['rows']:,} states: decision agreement {report['agreement']:.4%}")
+        print(f"Accuracy vs {task.label or 'Non-MU-TXOP RU'}: float {report['float_accuracy']:.4%}, "
+              f"int8 {report['quantized_accuracy']:.4%}")
+        print(f"NumPy time: float {report['float_ns']:.0f} ns, "
+              f"int8 reference {report['quantized_ns']:.0f} ns per decision")
+        print("Agreement by float decision:")
+        for c, (count, share) in report['per_class'].items():
+            print(f"  class {c:>2}: {count:>9,} rows, {share:.4%}")
+    print("="*70)
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+Streaming ns-3 Results Ingester
+
+Walks an ns-3 results root and reduces the per-packet latency CSVs to
+per-(case, scheduler, nwifi, AC) aggregates (mean, min/max and a mergeable
+quantile sketch for p50..p99.9), replacing the latency lists that were typed
+in by hand in the plotting scripts.
+
+Expected layout (see README.md, "Scheduler → Folder Mapping"):
+
+    <root>/case1/wifi6-3-develop/nwifi=6/third_ac_latency.csv
+    <root>/case1/wifi6-4-develop/nwifi=6/forth_ac_latency.csv
+    <root>/case1/wifi6-3-develop/nwifi=30new/...      (rerun, supersedes nwifi=30)
+    <root>/case1/wifi6-3-develop/nwifi=6/seed=2/...   (optional per-seed folders)
+
+Supported CSV formats:
+- Long:  one row per packet with an AC column ('ac', 'AC', 'access_category'
+         or 'tid'), a latency column ('latency', 'latency_ms', 'delay', ...),
+         optionally a flow column ('flow', 'flow_id', 'sta', ...) and a
+         receive time column ('time', 'rx_time', 'time_us', ...; seconds
+         unless suffixed)
+- Wide:  one column per AC ('AC_BK', 'AC_VI', 'AC_VO', ...), one latency per cell
+
+Jitter (std-dev per AC and per flow, RFC 3550) is computed in the same pass,
+see jitter_engine.py.
+
+Files are read in fixed-size row chunks so memory stays constant regardless of
+file size, and sweep points are spread over a process pool.
+"""
+
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from jitter_engine import FlowJitterTracker, chan_merge
+from quantile_sketch import QUANTILES, LatencySketch
+
+RESULTS_ROOT = os.environ.get(
+    'NS3_RESULTS_ROOT', "/home/adlink/浩宗論文/實驗/Test_result(ns-3)")
+
+# Scheduler → Folder Mapping (CORRECTED, same as README.md)
+# folder: (scheduler, csv prefix)
+SCHEDULER_FOLDERS = {
+    'wifi6-3-develop': ('PBM', 'third_'),
+    'wifi6-4-develop': ('MPS', 'forth_'),
+    'wifi6-su-develop': ('SU', ''),
+    'wifi6-3-mu-txop-develop': ('Non-MU-TXOP', 'third_'),
+    'wifi6-ml-develop': ('ML-Old', 'third_'),
+    'wifi6-ml-develop-v2': ('ML-Old-v2', 'third_'),
+}
+
+# Methods without their own ns-3 run
+# B0-NonShare: 100% accuracy imitation of Non-MU-TXOP
+SCHEDULER_ALIASES = {
+    'B0-NonShare': 'Non-MU-TXOP',
+}
+
+# ns-3 AcIndex order: AC_BE=0, AC_BK=1, AC_VI=2, AC_VO=3
+ACS = ('BE', 'BK', 'VI', 'VO')
+AC_INDEX = {ac: i for i, ac in enumerate(ACS)}
+
+# 802.11e user priority (TID) → AC
+TID_TO_AC = {0: 'BE', 1: 'BK', 2: 'BK', 3: 'BE', 4: 'VI', 5: 'VI', 6: 'VO', 7: 'VO'}
+
+AC_COLUMNS = ('ac', 'access_category', 'accesscategory', 'tid')
+FLOW_COLUMNS = ('flow', 'flow_id', 'flowid', 'sta', 'sta_id', 'node', 'node_id')
+LATENCY_COLUMNS = ('latency', 'latency_ms', 'latency(ms)', 'delay', 'delay_ms',
+                   'latency_us', 'delay_us', 'latency_ns', 'delay_ns',
+                   'latency_s', 'delay_s')
+
+TIME_COLUMNS = ('time', 'rx_time', 'rxtime', 'timestamp', 'time_s', 'rx_time_s',
+                'time_ms', 'rx_time_ms', 'time_us', 'rx_time_us', 'time_ns', 'rx_time_ns')
+
+# Unit suffix → scale to milliseconds (all scripts plot in ms)
+UNIT_SCALE = {'_us': 1e-3, '_ns': 1e-6, '_s': 1e3}
+
+# Unit suffix → scale to seconds (packet receive times, unsuffixed = seconds)
+TIME_UNIT_SCALE = {'_ms': 1e-3, '_us': 1e-6, '_ns': 1e-9}
+
+CHUNK_ROWS = 65536
+
+NWIFI_DIR_RE = re.compile(r'^nwifi=(\d+)(.*)$')
+SEED_DIR_RE = re.compile(r'^(?:seed|run)=(\d+)$')
+
+SweepPoint = namedtuple('SweepPoint', 'case scheduler nwifi seed path')
+
+
+class LatencyAggregate:
+    """
+    Mergeable per-AC latency summary: count, sum, min, max, Welford M2
+    (std-dev jitter), quantile sketch and per-flow jitter sums.
+    """
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'm2', 'sketch',
+                 'flows', 'flow_std_sum', 'rfc3550_sum', 'ipdv_sum', 'ipdv_count')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.m2 = 0.0
+        self.sketch = LatencySketch()
+        self.flows = 0
+        self.flow_std_sum = 0.0
+        self.rfc3550_sum = 0.0
+        self.ipdv_sum = 0.0
+        self.ipdv_count = 0
+
+    def add(self, values):
+        """Fold a 1-D array of latencies (ms) into the aggregate."""
+        if values.size == 0:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(np.square(values - chunk_mean).sum())
+        _, _, self.m2 = chan_merge(self.count, self.mean if self.count else 0.0,
+                                   self.m2, int(values.size), chunk_mean, chunk_m2)
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.sketch.add(values)
+
+    def add_flow(self, flow):
+        """Fold the final jitter state of one flow (jitter_engine.FlowJitter)."""
+        self.flows += 1
+        self.flow_std_sum += flow.std
+        self.rfc3550_sum += flow.rfc3550
+        self.ipdv_sum += flow.ipdv_sum
+        self.ipdv_count += flow.ipdv_count
+
+    def merge(self, other):
+        """Combine with another aggregate (other shard, seed or file)."""
+        _, _, self.m2 = chan_merge(self.count, self.mean if self.count else 0.0, self.m2,
+                                   other.count, other.mean if other.count else 0.0,
+                                   other.m2)
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+        self.flows += other.flows
+        self.flow_std_sum += other.flow_std_sum
+        self.rfc3550_sum += other.rfc3550_sum
+        self.ipdv_sum += other.ipdv_sum
+        self.ipdv_count += other.ipdv_count
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def jitter(self):
+        """Std-dev jitter over all packets of the AC (ms)."""
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+    @property
+    def flow_jitter(self):
+        """Mean per-flow std-dev jitter (ms)."""
+        return self.flow_std_sum / self.flows if self.flows else math.nan
+
+    @property
+    def rfc3550_jitter(self):
+        """Mean per-flow RFC 3550 inter-arrival jitter (ms)."""
+        return self.rfc3550_sum / self.flows if self.flows else math.nan
+
+    @property
+    def ipdv(self):
+        """Mean |latency difference| of consecutive packets (ms)."""
+        return self.ipdv_sum / self.ipdv_count if self.ipdv_count else math.nan
+
+    def quantile(self, q):
+        """Latency (ms) at quantile q, within the sketch's relative accuracy."""
+        return self.sketch.quantile(q)
+
+    def columns(self):
+        """Flat {column: value} view used by the results store."""
+        return {'count': self.count, 'total': self.total, 'mean': self.mean,
+                'min': self.minimum, 'max': self.maximum, 'm2': self.m2,
+                'jitter': self.jitter, 'flow_jitter': self.flow_jitter,
+                'rfc3550_jitter': self.rfc3550_jitter, 'ipdv': self.ipdv,
+                'flows': self.flows, 'flow_std_sum': self.flow_std_sum,
+                'rfc3550_sum': self.rfc3550_sum, 'ipdv_sum': self.ipdv_sum,
+                'ipdv_count': self.ipdv_count, 'sketch': self.sketch.counts}
+
+    @classmethod
+    def from_columns(cls, columns):
+        agg = cls()
+        agg.count = int(columns['count'])
+        agg.total = float(columns['total'])
+        agg.minimum = float(columns['min'])
+        agg.maximum = float(columns['max'])
+        agg.m2 = float(columns['m2'])
+        agg.sketch = LatencySketch(np.array(columns['sketch']))
+        agg.flows = int(columns['flows'])
+        agg.flow_std_sum = float(columns['flow_std_sum'])
+        agg.rfc3550_sum = float(columns['rfc3550_sum'])
+        agg.ipdv_sum = float(columns['ipdv_sum'])
+        agg.ipdv_count = int(columns['ipdv_count'])
+        return agg
+
+    def __repr__(self):
+        return (f"LatencyAggregate(count={self.count}, mean={self.mean:.3f}, "
+                f"p99={self.quantile(0.99):.3f}, jitter={self.jitter:.3f})")
+
+
+# ==============================================================================
+# CSV parsing
+# ==============================================================================
+
+def normalize_ac(value):
+    """Map 'AC_BK', 'bk', '1' (AcIndex) etc. to 'BK'. Returns None if unknown."""
+    v = value.strip().upper()
+    if v.startswith('AC_'):
+        v = v[3:]
+    if v in AC_INDEX:
+        return v
+    if v.isdigit() and int(v) < len(ACS):
+        return ACS[int(v)]
+    return None
+
+
+def _unit_scale(column):
+    for suffix, scale in UNIT_SCALE.items():
+        if column.endswith(suffix):
+            return scale
+    return 1.0
+
+
+def _time_scale(column):
+    for suffix, scale in TIME_UNIT_SCALE.items():
+        if column.endswith(suffix):
+            return scale
+    return 1.0
+
+
+def _parse_header(header):
+    """Return a row→(ac, flow, latency, time) plan for a CSV header."""
+    names = [h.strip().lower() for h in header]
+
+    wide = {}
+    for i, name in enumerate(names):
+        ac = normalize_ac(name) if name.upper().startswith('AC_') else None
+        if ac is not None:
+            wide[i] = AC_INDEX[ac]
+    if wide:
+        return 'wide', wide, 1.0
+
+    ac_col = next((names.index(c) for c in AC_COLUMNS if c in names), None)
+    lat_col = next((names.index(c) for c in LATENCY_COLUMNS if c in names), None)
+    flow_col = next((names.index(c) for c in FLOW_COLUMNS if c in names), None)
+    time_col = next((names.index(c) for c in TIME_COLUMNS if c in names), None)
+    if ac_col is None or lat_col is None:
+        raise ValueError(f"Unrecognized latency CSV header: {header}")
+    is_tid = names[ac_col] == 'tid'
+    time_scale = None if time_col is None else _time_scale(names[time_col])
+    return ('long', (ac_col, lat_col, flow_col, is_tid, time_col, time_scale),
+            _unit_scale(names[lat_col]))
+
+
+def iter_packet_chunks(path, chunk_rows=CHUNK_ROWS):
+    """
+    Stream a latency CSV as chunks of at most chunk_rows rows, each a dict of
+    aligned arrays in file (receive) order:
+        'ac':      int8 AC index (ACS order)
+        'flow':    int64 flow id, numbered per file in order of first
+                   appearance (-1 when the file has no flow column)
+        'latency': float64 latency in ms
+        'time':    float64 receive time in s (only when the file has a time column)
+        'flow_labels': the flow column's labels by flow id (one list per file,
+                   grown as new flows appear)
+    Memory use is bounded by chunk_rows, not by file size.
+    """
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        layout, spec, scale = _parse_header(header)
+        ac_codes = {}
+        flow_ids = {}
+        flow_labels = []
+
+        while True:
+            rows = list(itertools.islice(reader, chunk_rows))
+            if not rows:
+                break
+            acs, flows, latencies, times = [], [], [], []
+
+            if layout == 'wide':
+                for row in rows:
+                    for i, code in spec.items():
+                        if i < len(row) and row[i].strip():
+                            acs.append(code)
+                            latencies.append(row[i])
+                flows = [-1] * len(acs)
+            else:
+                ac_col, lat_col, flow_col, is_tid, time_col, time_scale = spec
+                width = max(ac_col, lat_col, -1 if flow_col is None else flow_col,
+                            -1 if time_col is None else time_col)
+                for row in rows:
+                    if len(row) <= width:
+                        continue
+                    raw = row[ac_col]
+                    if raw not in ac_codes:
+                        ac = TID_TO_AC.get(int(raw)) if is_tid else normalize_ac(raw)
+                        ac_codes[raw] = None if ac is None else AC_INDEX[ac]
+                    code = ac_codes[raw]
+                    if code is None:
+                        continue
+                    acs.append(code)
+                    latencies.append(row[lat_col])
+                    if time_col is not None:
+                        times.append(row[time_col])
+                    if flow_col is None:
+                        flows.append(-1)
+                    else:
+                        label = row[flow_col]
+                        if label not in flow_ids:
+                            flow_ids[label] = len(flow_labels)
+                            flow_labels.append(label)
+                        flows.append(flow_ids[label])
+
+            if acs:
+                chunk = {'ac': np.asarray(acs, dtype=np.int8),
+                         'flow': np.asarray(flows, dtype=np.int64),
+                         'latency': np.asarray(latencies, dtype=np.float64) * scale,
+                         'flow_labels': flow_labels}
+                if times:
+                    chunk['time'] = np.asarray(times, dtype=np.float64) * time_scale
+                yield chunk
+
+
+def iter_latency_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Stream a latency CSV as {ac: np.ndarray of ms} chunks."""
+    for chunk in iter_packet_chunks(path, chunk_rows):
+        yield {ACS[code]: chunk['latency'][chunk['ac'] == code]
+               for code in np.unique(chunk['ac'])}
+
+
+def ingest_csv(path, chunk_rows=CHUNK_ROWS):
+    """
+    Reduce one latency CSV to {ac: LatencyAggregate} in a single pass:
+    latency moments, quantile sketch and per-flow jitter.
+    """
+    aggregates = {}
+    tracker = FlowJitterTracker()
+    for chunk in iter_packet_chunks(path, chunk_rows):
+        tracker.add(chunk['ac'], chunk['flow'], chunk['latency'])
+        for code in np.unique(chunk['ac']):
+            values = chunk['latency'][chunk['ac'] == code]
+            aggregates.setdefault(ACS[code], LatencyAggregate()).add(values)
+    for (code, _), flow in tracker.flows.items():
+        aggregates[ACS[code]].add_flow(flow)
+    return aggregates
+
+
+# ==============================================================================
+# Results tree discovery
+# ==============================================================================
+
+def _find_latency_csv(directory, prefix):
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return None
+    if prefix:
+        name = f'{prefix}ac_latency.csv'
+        return os.path.join(directory, name) if name in names else None
+    for name in names:
+        if name.endswith('ac_latency.csv'):
+            return os.path.join(directory, name)
+    return None
+
+
+def discover_sweep_points(root=RESULTS_ROOT, cases=None):
+    """
+    Walk <root>/<case>/<folder>/nwifi=*/ and return a list of SweepPoint.
+
+    Reruns such as 'nwifi=30new' supersede the plain 'nwifi=30' folder.
+    """
+    points = []
+    for case in sorted(os.listdir(root)):
+        case_dir = os.path.join(root, case)
+        if not os.path.isdir(case_dir) or (cases and case not in cases):
+            continue
+        for folder, (scheduler, prefix) in SCHEDULER_FOLDERS.items():
+            sched_dir = os.path.join(case_dir, folder)
+            if not os.path.isdir(sched_dir):
+                continue
+
+            # nwifi -> (is_rerun, dirname); rerun folders win
+            nwifi_dirs = {}
+            for name in os.listdir(sched_dir):
+                m = NWIFI_DIR_RE.match(name)
+                if not m or not os.path.isdir(os.path.join(sched_dir, name)):
+                    continue
+                nwifi, is_rerun = int(m.group(1)), bool(m.group(2))
+                if nwifi not in nwifi_dirs or is_rerun > nwifi_dirs[nwifi][0]:
+                    nwifi_dirs[nwifi] = (is_rerun, name)
+
+            for nwifi, (_, name) in sorted(nwifi_dirs.items()):
+                point_dir = os.path.join(sched_dir, name)
+                path = _find_latency_csv(point_dir, prefix)
+                if path:
+                    points.append(SweepPoint(case, scheduler, nwifi, 0, path))
+                for sub in sorted(os.listdir(point_dir)):
+                    m = SEED_DIR_RE.match(sub)
+                    if not m:
+                        continue
+                    path = _find_latency_csv(os.path.join(point_dir, sub), prefix)
+                    if path:
+                        points.append(SweepPoint(case, scheduler, nwifi,
+                                                 int(m.group(1)), path))
+    return points
+
+
+# ==============================================================================
+# Parallel ingestion
+# ==============================================================================
+
+def _ingest_point(point):
+    return point, ingest_csv(point.path)
+
+
+def ingest_points(points, workers=None):
+    """
+    Ingest sweep points on a process pool (one task per CSV).
+
+    Returns {(case, scheduler, nwifi, seed, ac): LatencyAggregate}.
+    """
+    workers = workers or os.cpu_count() or 1
+    results = {}
+
+    if workers == 1 or len(points) <= 1:
+        mapped = map(_ingest_point, points)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes=min(workers, len(points)))
+        mapped = pool.imap_unordered(_ingest_point, points)
+
+    try:
+        for point, aggregates in mapped:
+            for ac, agg in aggregates.items():
+                key = (point.case, point.scheduler, point.nwifi, point.seed, ac)
+                if key in results:
+                    results[key].merge(agg)
+                else:
+                    results[key] = agg
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # Alias methods share the data of their source scheduler
+    for alias, source in SCHEDULER_ALIASES.items():
+        for (case, scheduler, nwifi, seed, ac), agg in list(results.items()):
+            if scheduler == source:
+                results[(case, alias, nwifi, seed, ac)] = agg
+
+    return results
+
+
+def ingest_results(root=RESULTS_ROOT, cases=None, workers=None):
+    """Discover and ingest every sweep point under root."""
+    return ingest_points(discover_sweep_points(root, cases), workers)
+
+
+def merge_seeds(results):
+    """Collapse the seed dimension: {(case, scheduler, nwifi, ac): LatencyAggregate}."""
+    merged = {}
+    for (case, scheduler, nwifi, seed, ac), agg in results.items():
+        key = (case, scheduler, nwifi, ac)
+        merged.setdefault(key, LatencyAggregate()).merge(agg)
+    return merged
+
+
+def latency_series(merged, case, scheduler, ac, nwifi_values, stat='mean'):
+    """
+    Latency list for one scheduler/AC, aligned to nwifi_values (nan if missing).
+    stat: 'mean' or a quantile name from QUANTILES ('p50', 'p95', 'p99', 'p99.9').
+    """
+    series = []
+    for n in nwifi_values:
+        agg = merged.get((case, scheduler, n, ac))
+        if agg is None:
+            series.append(math.nan)
+        elif stat == 'mean':
+            series.append(round(agg.mean, 3))
+        else:
+            series.append(round(agg.quantile(QUANTILES[stat]), 3))
+    return series
+
+
+def print_summary(merged, case='case1', stats=('mean', 'p99')):
+    """Print AC latency per scheduler, in the layout of the plot scripts."""
+    nwifi_values = sorted({k[2] for k in merged if k[0] == case})
+    schedulers = [s for s, _ in SCHEDULER_FOLDERS.values()] + list(SCHEDULER_ALIASES)
+
+    for ac in ('BK', 'BE', 'VI', 'VO'):
+        if not any(k[0] == case and k[3] == ac for k in merged):
+            continue
+        for stat in stats:
+            print("\n" + "-"*70)
+            print(f"{case}: AC_{ac} {stat} latency (ms)")
+            print("-"*70)
+            print(f"{'Method':<14}" + "".join(f"{n:>9}" for n in nwifi_values))
+            for scheduler in schedulers:
+                series = latency_series(merged, case, scheduler, ac, nwifi_values, stat)
+                if all(math.isnan(v) for v in series):
+                    continue
+                print(f"{scheduler:<14}" + "".join(f"{v:>9.3f}" for v in series))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('root', nargs='?', default=RESULTS_ROOT,
+                        help='ns-3 results root (default: %(default)s)')
+    parser.add_argument('--case', action='append',
+                        help='restrict to case folder(s), e.g. --case case1')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='process pool size (default: all cores)')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("Ingesting ns-3 results")
+    print("="*70)
+    print(f"Results root: {args.root}")
+
+    points = discover_sweep_points(args.root, args.case)
+    print(f"Sweep points: {len(points)}")
+    merged = merge_seeds(ingest_points(points, args.workers))
+
+    for case in sorted({k[0] for k in merged}):
+        print_summary(merged, case)
+    print("="*70)
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Columnar Results Store
+
+On-disk store for ingested ns-3 results, so figures and tables are rendered
+from one ingest instead of re-deriving (or re-typing) their data.
+
+Layout of a store directory:
+
+    index.json          vocabularies, column dtypes/shapes, row count
+    key_case.npy        int16 code  ┐
+    key_scheduler.npy   int16 code  │ one row per
+    key_nwifi.npy       int32       │ (case, scheduler, nwifi, ac, seed)
+    key_ac.npy          int16 code  │
+    key_seed.npy        int32       ┘ (ALL_SEEDS = pooled over seeds)
+    col_<name>.npy      one file per metric column (1-D, or 2-D for the
+                        per-row quantile sketch bucket counts)
+
+Columns are opened with np.load(mmap_mode='r'), and a dict index over the five
+key columns gives O(1) slice lookup. Whole (scheduler x nwifi x AC x seed)
+blocks are looked up at once (block_rows()): the key columns are packed into
+one sorted int64 key per row, and the block's keys are found by
+np.searchsorted.
+
+Usage:
+    python results_store.py build [results_root]   # ingest + write store
+    python results_store.py show                    # print stored means
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from quantile_sketch import QUANTILES, LatencySketch
+from results_ingest import (ACS, RESULTS_ROOT, SCHEDULER_ALIASES,
+                            SCHEDULER_FOLDERS, LatencyAggregate, ingest_results)
+
+RESULTS_STORE = os.environ.get(
+    'RESULTS_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results_store'))
+
+KEY_COLUMNS = ('case', 'scheduler', 'nwifi', 'ac', 'seed')
+ALL_SEEDS = -1
+
+# Bits of each key column in the packed int64 row key (seed stored as seed + 1)
+KEY_BITS = {'case': 8, 'scheduler': 10, 'nwifi': 16, 'ac': 4, 'seed': 24}
+
+NWIFI_VALUES = [6, 12, 18, 24, 30]
+
+# ==============================================================================
+# VERIFIED CASE1 DATA (fallback when no store has been built)
+# Source: /home/adlink/浩宗論文/實驗/Test_result(ns-3)/case1/
+# Mapping CORRECTED 2026-01-25 (MPS and Non-MU-TXOP were previously swapped)
+# ==============================================================================
+
+VERIFIED_CASE1 = {
+    'mean': {
+        # PBM (wifi6-3-develop/third_ac_latency.csv), nwifi=30 uses nwifi=30new
+        'PBM': {
+            'BK': [0.105, 0.231, 0.309, 0.471, 0.449],
+            'VI': [0.087, 0.190, 0.219, 0.253, 0.282],
+            'VO': [0.070, 0.113, 0.109, 0.234, 0.226],
+        },
+        # MPS (wifi6-4-develop/forth_ac_latency.csv)
+        'MPS': {
+            'BK': [0.134, 0.231, 0.310, 0.471, 0.627],
+            'VI': [0.105, 0.190, 0.219, 0.256, 0.285],
+            'VO': [0.070, 0.113, 0.108, 0.236, 0.200],
+        },
+        # SU (wifi6-su-develop)
+        'SU': {
+            'BK': [0.100, 0.213, 0.240, 0.537, 0.806],
+            'VI': [0.096, 0.119, 0.193, 0.251, 0.321],
+            'VO': [0.068, 0.092, 0.159, 0.157, 0.188],
+        },
+        # Non-MU-TXOP (wifi6-3-mu-txop-develop/third_ac_latency.csv)
+        # Note: nwifi=18 has very high latency (BK=10.068, VI=2.465) due to no sharing
+        'Non-MU-TXOP': {
+            'BK': [0.199, 0.540, 10.068, 0.970, 1.698],
+            'VI': [0.087, 0.211, 2.465, 0.339, 0.784],
+            'VO': [0.075, 0.160, 0.151, 0.255, 0.280],
+        },
+        # ML-Old (wifi6-ml-develop/third_ac_latency.csv)
+        'ML-Old': {
+            'BK': [0.253, 0.183, 0.285, 0.337, 0.586],
+            'VI': [0.175, 0.235, 0.228, 0.316, 0.278],
+            'VO': [0.070, 0.129, 0.152, 0.169, 0.215],
+        },
+        # ML-Old-v2 (wifi6-ml-develop-v2/third_ac_latency.csv)
+        'ML-Old-v2': {
+            'BK': [0.253, 0.183, 0.285, 0.332, 0.583],
+            'VI': [0.175, 0.235, 0.228, 0.318, 0.276],
+            'VO': [0.070, 0.129, 0.152, 0.168, 0.214],
+        },
+    },
+    # Std-dev jitter (LP=AC_BK, MP=AC_VI, HP=AC_VO)
+    # Note: Jitter labels were CORRECT in original (only latency was swapped)
+    'jitter': {
+        'PBM': {
+            'BK': [0.02, 0.08, 0.16, 0.58, 0.63],
+            'VI': [0.04, 0.08, 0.10, 0.20, 0.25],
+            'VO': [0.02, 0.06, 0.08, 0.18, 0.27],
+        },
+        # Verified: nwifi=18 MPS jitter BK=0.197
+        'MPS': {
+            'BK': [0.07, 0.22, 0.20, 0.56, 0.65],
+            'VI': [0.05, 0.11, 0.08, 0.28, 0.32],
+            'VO': [0.03, 0.05, 0.08, 0.28, 0.31],
+        },
+        'SU': {
+            'BK': [0.06, 0.12, 0.12, 0.34, 0.48],
+            'VI': [0.04, 0.08, 0.11, 0.20, 0.32],
+            'VO': [0.02, 0.05, 0.10, 0.18, 0.18],
+        },
+        # nwifi=18 BK jitter is the actual 3.045 (previously capped to 0.70 by hand)
+        'Non-MU-TXOP': {
+            'BK': [0.07, 0.24, 3.045, 0.71, 0.84],
+            'VI': [0.06, 0.13, 0.22, 0.25, 0.27],
+            'VO': [0.05, 0.10, 0.11, 0.18, 0.22],
+        },
+    },
+}
+for _column in VERIFIED_CASE1.values():
+    for _alias, _source in SCHEDULER_ALIASES.items():
+        _column[_alias] = _column[_source]
+
+
+class ResultsStore:
+    """Memory-mapped columnar store indexed by (case, scheduler, nwifi, ac, seed)."""
+
+    def __init__(self, path=RESULTS_STORE):
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            meta = json.load(f)
+        self.vocab = meta['vocab']
+        self.rows = meta['rows']
+
+        keys = {name: np.load(os.path.join(path, f'key_{name}.npy'))
+                for name in KEY_COLUMNS}
+        self.columns = {name: np.load(os.path.join(path, f'col_{name}.npy'),
+                                      mmap_mode='r')
+                        for name in meta['columns']}
+
+        decoded = [
+            [self.vocab['case'][c] for c in keys['case']],
+            [self.vocab['scheduler'][s] for s in keys['scheduler']],
+            keys['nwifi'].tolist(),
+            [self.vocab['ac'][a] for a in keys['ac']],
+            keys['seed'].tolist(),
+        ]
+        self._index = {key: row for row, key in enumerate(zip(*decoded))}
+        self._keys = keys
+        packed = self._pack(*(keys[name] for name in KEY_COLUMNS))
+        self._order = np.argsort(packed, kind='stable')
+        self._packed = packed[self._order]
+
+    @staticmethod
+    def _pack(case, scheduler, nwifi, ac, seed):
+        """One int64 per key (arrays broadcast); see KEY_BITS."""
+        key = np.asarray(case, dtype=np.int64)
+        for name, part in (('scheduler', scheduler), ('nwifi', nwifi), ('ac', ac),
+                           ('seed', np.asarray(seed, dtype=np.int64) + 1)):
+            key = (key << KEY_BITS[name]) | np.asarray(part, dtype=np.int64)
+        return key
+
+    @classmethod
+    def exists(cls, path=RESULTS_STORE):
+        return os.path.isfile(os.path.join(path, 'index.json'))
+
+    @classmethod
+    def write(cls, results, path=RESULTS_STORE):
+        """
+        Write ingested results to a new store at path (replacing any old one).
+
+        results: {(case, scheduler, nwifi, seed, ac): aggregate} as returned by
+        results_ingest.ingest_points(). Rows pooled over seeds are added with
+        seed=ALL_SEEDS.
+        """
+        pooled = {}
+        for (case, scheduler, nwifi, seed, ac), agg in results.items():
+            key = (case, scheduler, nwifi, ac, ALL_SEEDS)
+            pooled.setdefault(key, type(agg)()).merge(agg)
+
+        rows = {(c, s, n, a, seed): agg
+                for (c, s, n, seed, a), agg in results.items()}
+        rows.update(pooled)
+        ordered = sorted(rows)
+
+        vocab = {
+            'case': sorted({k[0] for k in ordered}),
+            'scheduler': sorted({k[1] for k in ordered}),
+            'ac': list(ACS),
+        }
+        codes = {name: {v: i for i, v in enumerate(vals)}
+                 for name, vals in vocab.items()}
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.results_store-', dir=parent)
+
+        np.save(os.path.join(tmp, 'key_case.npy'),
+                np.array([codes['case'][k[0]] for k in ordered], dtype=np.int16))
+        np.save(os.path.join(tmp, 'key_scheduler.npy'),
+                np.array([codes['scheduler'][k[1]] for k in ordered], dtype=np.int16))
+        np.save(os.path.join(tmp, 'key_nwifi.npy'),
+                np.array([k[2] for k in ordered], dtype=np.int32))
+        np.save(os.path.join(tmp, 'key_ac.npy'),
+                np.array([codes['ac'][k[3]] for k in ordered], dtype=np.int16))
+        np.save(os.path.join(tmp, 'key_seed.npy'),
+                np.array([k[4] for k in ordered], dtype=np.int32))
+
+        columns = {}
+        per_row = [rows[k].columns() for k in ordered]
+        for name in (per_row[0] if per_row else {}):
+            data = np.array([r[name] for r in per_row])
+            np.save(os.path.join(tmp, f'col_{name}.npy'), data)
+            columns[name] = {'dtype': str(data.dtype), 'shape': list(data.shape)}
+
+        with open(os.path.join(tmp, 'index.json'), 'w') as f:
+            json.dump({'rows': len(ordered), 'vocab': vocab, 'columns': columns},
+                      f, indent=2, ensure_ascii=False)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+        return cls(path)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def has_column(self, column):
+        """True if series() can answer column (stores built by older ingesters may lack it)."""
+        if column in QUANTILES:
+            return column in self.columns or 'sketch' in self.columns
+        return column in self.columns
+
+    def row(self, case, scheduler, nwifi, ac, seed=ALL_SEEDS):
+        """Row number for a key, or None if absent."""
+        return self._index.get((case, scheduler, nwifi, ac, seed))
+
+    def _codes(self, name, values):
+        """Vocabulary code of every value (-1 for values the store does not hold)."""
+        index = {v: i for i, v in enumerate(self.vocab[name])}
+        return np.array([index.get(v, -1) for v in values], dtype=np.int64)
+
+    def block_rows(self, case, schedulers, nwifi_values, acs, seeds):
+        """
+        (scheduler, nwifi, AC, seed) array of row numbers, -1 where a key is
+        absent: one packed-key np.searchsorted over the whole block.
+        """
+        shape = (len(schedulers), len(nwifi_values), len(acs), len(seeds))
+        if case not in self.vocab['case'] or self.rows == 0:
+            return np.full(shape, -1, dtype=np.int64)
+        scheduler = self._codes('scheduler', schedulers)[:, None, None, None]
+        nwifi = np.asarray(nwifi_values, dtype=np.int64)[None, :, None, None]
+        ac = self._codes('ac', acs)[None, None, :, None]
+        seed = np.asarray(seeds, dtype=np.int64)[None, None, None, :]
+        query = self._pack(self.vocab['case'].index(case), scheduler, nwifi, ac, seed)
+        pos = np.minimum(np.searchsorted(self._packed, query), len(self._packed) - 1)
+        found = (self._packed[pos] == query) & (scheduler >= 0) & (ac >= 0)
+        return np.where(found, self._order[pos], -1)
+
+    def seed_values(self, case, schedulers):
+        """Sorted per-seed keys stored for any of schedulers in case (no pooled rows)."""
+        if case not in self.vocab['case']:
+            return []
+        mask = ((self._keys['case'] == self.vocab['case'].index(case))
+                & np.isin(self._keys['scheduler'], self._codes('scheduler', schedulers))
+                & (self._keys['seed'] != ALL_SEEDS))
+        return np.unique(self._keys['seed'][mask]).tolist()
+
+    def get(self, column, case, scheduler, nwifi, ac, seed=ALL_SEEDS):
+        """Value (or 1-D array for 2-D columns) at a key, or None."""
+        row = self.row(case, scheduler, nwifi, ac, seed)
+        return None if row is None else self.columns[column][row]
+
+    def series(self, case, scheduler, ac, nwifi_values=NWIFI_VALUES,
+               column='mean', seed=ALL_SEEDS):
+        """
+        List of column values over nwifi_values (nan where missing).
+        column may also be a quantile name ('p50', 'p95', 'p99', 'p99.9'),
+        answered from the stored sketches.
+        """
+        values = []
+        for n in nwifi_values:
+            row = self.row(case, scheduler, n, ac, seed)
+            if row is None:
+                values.append(math.nan)
+            elif column in QUANTILES and column not in self.columns:
+                sketch = LatencySketch(self.columns['sketch'][row])
+                values.append(sketch.quantile(QUANTILES[column]))
+            else:
+                values.append(float(self.columns[column][row]))
+        return values
+
+    def aggregate(self, case, scheduler, nwifi, ac, seed=ALL_SEEDS):
+        """Rebuild the mergeable aggregate stored at a key, or None."""
+        row = self.row(case, scheduler, nwifi, ac, seed)
+        if row is None:
+            return None
+        return LatencyAggregate.from_columns(
+            {name: col[row] for name, col in self.columns.items()})
+
+    def seeds(self, case, scheduler, nwifi, ac):
+        """Per-seed keys stored for a cell (excluding the pooled row)."""
+        return sorted(k[4] for k in self._index
+                      if k[:4] == (case, scheduler, nwifi, ac) and k[4] != ALL_SEEDS)
+
+    def keys(self):
+        return self._index.keys()
+
+
+_default_store = None
+
+# Series case_series() could not read from an open store:
+# {(source, scheduler, column): [ACs]}, source 'verified case1' or 'default'
+_fallbacks = {}
+
+
+def open_store(path=RESULTS_STORE):
+    """Open the default store once per process; None if it was never built."""
+    global _default_store
+    if _default_store is None and ResultsStore.exists(path):
+        _default_store = ResultsStore(path)
+    return _default_store
+
+
+def case_series(scheduler, ac, case='case1', nwifi_values=NWIFI_VALUES,
+                column='mean', default=None):
+    """
+    Series for one scheduler/AC, from the store when it holds the cell,
+    otherwise from the verified case1 numbers above, otherwise default.
+    With a store open, every series that falls back is recorded and listed by
+    data_source(), so outputs never mix sources without saying so.
+    column: 'mean', 'jitter', 'rfc3550_jitter', 'p99', ... (see ResultsStore)
+    """
+    store = open_store()
+    if store is not None and store.has_column(column):
+        values = [round(v, 3) for v in
+                  store.series(case, scheduler, ac, nwifi_values, column)]
+        if not any(math.isnan(v) for v in values):
+            return values
+    if case == 'case1' and list(nwifi_values) == NWIFI_VALUES:
+        fallback = VERIFIED_CASE1.get(column, {}).get(scheduler, {}).get(ac)
+        if fallback is not None:
+            _record_fallback(store, 'verified case1', scheduler, column, ac)
+            return list(fallback)
+    if default is not None:
+        _record_fallback(store, 'default', scheduler, column, ac)
+        return list(default)
+    raise KeyError(f"No {column} data for {case}/{scheduler}/AC_{ac}; "
+                   f"build the store with: python results_store.py build")
+
+
+def _record_fallback(store, source, scheduler, column, ac):
+    if store is not None:
+        acs = _fallbacks.setdefault((source, scheduler, column), [])
+        if ac not in acs:
+            acs.append(ac)
+
+
+def fallbacks():
+    """['ML-Old mean BK/VI/VO (verified case1)', ...]: series not read from the open store."""
+    return [f"{scheduler} {column} {'/'.join(acs)} ({source})"
+            for (source, scheduler, column), acs in sorted(_fallbacks.items())]
+
+
+def data_version():
+    """Fingerprint of the backing data (store index mtime), for output caching."""
+    store = open_store()
+    if store is None:
+        return 'verified-case1'
+    return f"{store.path}@{os.path.getmtime(os.path.join(store.path, 'index.json'))}"
+
+
+def data_source():
+    """Human-readable description of where case_series() reads from."""
+    store = open_store()
+    if store is None:
+        return "verified case1 numbers (no store built)"
+    source = f"results store ({store.path})"
+    if _fallbacks:
+        source += "; NOT in the store, taken from: " + ", ".join(fallbacks())
+    return source
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Columnar results store')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='ingest ns-3 results into the store')
+    build.add_argument('root', nargs='?', default=RESULTS_ROOT)
+    build.add_argument('--workers', type=int, default=None)
+    build.add_argument('--store', default=RESULTS_STORE)
+    show = sub.add_parser('show', help='print pooled means from the store')
+    show.add_argument('--store', default=RESULTS_STORE)
+    args = parser.parse_args()
+
+    print("="*70)
+    if args.command == 'build':
+        print(f"Ingesting: {args.root}")
+        store = ResultsStore.write(ingest_results(args.root, workers=args.workers),
+                                   args.store)
+        print(f"Saved: {store.path} ({store.rows} rows)")
+    else:
+        store = ResultsStore(args.store)
+        schedulers = [s for s, _ in SCHEDULER_FOLDERS.values()] + list(SCHEDULER_ALIASES)
+        for case in store.vocab['case']:
+            nwifi_values = sorted({k[2] for k in store.keys() if k[0] == case})
+            for ac in ACS:
+                if not any(k[0] == case and k[3] == ac for k in store.keys()):
+                    continue
+                print(f"\n{case}: AC_{ac} mean latency (ms)")
+                print(f"{'Method':<14}" + "".join(f"{n:>9}" for n in nwifi_values))
+                for scheduler in schedulers:
+                    series = store.series(case, scheduler, ac, nwifi_values)
+                    if all(math.isnan(v) for v in series):
+                        continue
+                    print(f"{scheduler:<14}" + "".join(f"{v:>9.3f}" for v in series))
+    print("="*70)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Exact Per-TXOP RU Allocation Oracle (40 MHz MU-TXOP)
+
+The rule-based schedulers and the MLP pick one of the 11 RU_CLASSES from the
+12-dim state, and allocate() turns the class into users per AC, one RU size
+per side.
+The oracle sees the queues themselves (every backlogged STA's MCS and queued
+packets) and searches every allocation the 40 MHz RU tree allows, so its
+latency is a reference for what a per-TXOP decision can reach next to PBM /
+MPS / ML in the surrogate (surrogate_sim.simulate(allocator=...)).
+
+RU tree (he_phy: per 20 MHz nine 26-tone RUs; 52-tone RUs on units 0-1,
+2-3, 5-6, 7-8; 106-tone RUs on 0-3 and 5-8; the center 26-tone RU (unit 4)
+belongs to neither 106), two 20 MHz halves and the 484-tone RU over both:
+- he_phy.RU_POSITIONS: the 33 RUs as bitmasks over the 18 26-tone units
+- partitions(): every multiset of RU sizes that can be placed without overlap
+  (idle units allowed), he_phy.ru_placements() (19 memoized masks, 261
+  multisets). allocate() is capped by the same tree; unplaceable_classes()
+  lists any class it would still overfill, and compare() refuses to run
+  (print_partitions() flags them) rather than publish such a comparison
+- ALLOCATIONS: (primary RU, primary users, secondary RU, secondary users)
+  placeable on the tree, one RU size per AC as in RU_CLASSES
+
+Per TXOP (primary / secondary AC from EDCA as in the surrogate; users of each
+AC oldest head-of-line first, as allocate() pops them):
+- airtime(): A-MPDU length and data symbols of one user for (TXOP budget, RU,
+  MCS, packet size, queued packets), memoized; the budget takes at most one
+  value per HE-SIG-B length, so a run reuses a few hundred entries
+- prefix tables per AC, budget and RU size: packets sent by the first u users
+  and the symbols of the longest of them
+- every allocation is scored at once (NumPy gather over the tables) together
+  with the single-user HE SU PPDU of class 0; the oracle returns the one that
+  drains the most AC-weighted packets (metrics_engine.AC_WEIGHTS) per us of
+  channel time (preamble + PPDU + SIFS + acknowledgement)
+
+Draining weighted packets at the highest rate minimizes the weighted queue,
+and with it (Little's law) the weighted latency, one TXOP at a time; the
+oracle is exact for that per-TXOP objective, not over a whole run.
+
+Usage:
+    python ru_oracle.py                                  # Oracle vs PBM / MPS / SU / Non-MU-TXOP
+    python ru_oracle.py --nwifi 18 30 --seeds 1 2 3 --duration 1.0
+    python ru_oracle.py --partitions                     # RU tree vs allocate() classes
+"""
+
+import argparse
+import math
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from metrics_engine import AC_WEIGHTS
+from he_phy import (BLOCK_ACK_US, CHANNEL_UNITS, EDCA, HE_SU_PREAMBLE_US, MAX_AMPDU_MPDUS,
+                    MPDU_OVERHEAD_BYTES, MU_ACK_US, RU_MAX_COUNT, RU_POSITIONS, RU_SIZES,
+                    SIFS_US, SYMBOL_US, data_symbols, he_mu_preamble_us, max_psdu_bytes,
+                    psdu_bytes, ru_placeable, ru_placements)
+from results_store import NWIFI_VALUES
+from scheduler_policies import RU_CLASSES, allocate
+from surrogate_sim import STA_ACS, TRAFFIC, ac_means, load_params, simulate
+
+MAX_USERS = CHANNEL_UNITS
+SIGB_LENGTHS = (MAX_USERS + 1) // 2
+
+COMPARE_SCHEDULERS = ['PBM', 'MPS', 'SU', 'Non-MU-TXOP']
+
+
+def partitions():
+    """Every multiset of RU sizes the 40 MHz tree can hold, as count tuples."""
+    return ru_placements()
+
+
+def unplaceable_classes(n_users=MAX_USERS):
+    """
+    {class: {RU size: RUs}} of the RU_CLASSES whose allocate() result, with
+    n_users backlogged STAs per AC, does not fit the tree.
+    """
+    out = {}
+    for cls in RU_CLASSES:
+        ru_p, n_p, ru_s, n_s = allocate(cls, n_users, n_users)
+        counts = {ru_p: n_p}
+        if n_s:
+            counts[ru_s] = counts.get(ru_s, 0) + n_s
+        if not ru_placeable(counts):
+            out[cls] = counts
+    return out
+
+
+def _allocations():
+    """Sorted (p_ru, p_users, s_ru, s_users) with p_users >= 1 placeable on the tree."""
+    out = set()
+    for c in partitions():
+        used = [r for r, n in enumerate(c) if n]
+        for p in used:
+            others = [r for r in used if r != p]
+            if not others:
+                out.update((p, c[p] - s, p if s else None, s) for s in range(c[p]))
+            elif len(others) == 1:
+                out.add((p, c[p], others[0], c[others[0]]))
+    return sorted(out, key=lambda a: (a[0], a[1], -1 if a[2] is None else a[2], a[3]))
+
+
+ALLOCATIONS = _allocations()
+_A = np.array([(p, n_p, 0 if s is None else s, n_s) for p, n_p, s, n_s in ALLOCATIONS])
+_A_PRU, _A_PN, _A_SRU, _A_SN = _A.T
+_A_SIGB = (_A_PN + _A_SN + 1) // 2 - 1                 # index of the HE-SIG-B length
+_SIGB_OVERHEAD = np.array([he_mu_preamble_us(2 * b + 1) + SIFS_US + MU_ACK_US
+                           for b in range(SIGB_LENGTHS)], dtype=np.float64)
+_RU_MAX_USERS = [RU_MAX_COUNT[ru] for ru in RU_SIZES]
+
+
+@lru_cache(maxsize=None)
+def _candidates(n_primary, n_secondary):
+    """Indices of ALLOCATIONS with at most n_primary / n_secondary users."""
+    return np.flatnonzero((_A_PN <= n_primary) & (_A_SN <= n_secondary))
+
+
+@lru_cache(maxsize=1 << 16)
+def airtime(budget_us, ru, mcs, size, queued):
+    """(MPDUs sent, data symbols) of one user, as surrogate_sim.simulate sends them."""
+    fit = max_psdu_bytes(budget_us, ru, mcs) // (size + MPDU_OVERHEAD_BYTES)
+    k = int(min(queued, MAX_AMPDU_MPDUS, max(fit, 1)))
+    return k, data_symbols(psdu_bytes(k, k * size), ru, mcs)
+
+
+class RUOracle:
+    """
+    Allocator for surrogate_sim.simulate(allocator=...): called with the
+    Backlog and the primary / secondary AC at TXOP start, returns
+    (su, p_ru, p_users, s_ru, s_users) like allocate() (su: HE SU PPDU).
+    Counts decisions and their time for the per-decision cost.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = dict(AC_WEIGHTS, **(weights or {}))
+        self.decisions = 0
+        self.seconds = 0.0
+
+    def _tables(self, backlog, ac, stas, budgets):
+        """
+        (SIG-B length, RU size, u) tables for the first u of stas (oldest
+        first): AC-weighted packets sent and data symbols of the longest user.
+        """
+        weighted = np.zeros((SIGB_LENGTHS, len(RU_SIZES), MAX_USERS + 1))
+        symbols = np.zeros_like(weighted)
+        size = TRAFFIC[ac][0]
+        users = [(backlog.mcs[i], backlog.queued[i]) for i in stas]
+        for b, budget in enumerate(budgets):
+            for r, ru in enumerate(RU_SIZES):
+                sent = longest = 0
+                for u, (mcs, queued) in enumerate(users[:_RU_MAX_USERS[r]], 1):
+                    k, s = airtime(budget, ru, mcs, size, queued)
+                    sent += k
+                    longest = max(longest, s)
+                    weighted[b, r, u], symbols[b, r, u] = sent, longest
+        return weighted * self.weights[ac], symbols
+
+    def __call__(self, backlog, primary, secondary):
+        start = time.perf_counter()
+        p_stas = backlog.peek(primary, MAX_USERS)
+        s_stas = backlog.peek(secondary, MAX_USERS) if secondary is not None else []
+        txop = EDCA[primary][3]
+        budgets = [txop - int(overhead) for overhead in
+                   _SIGB_OVERHEAD[:(min(len(p_stas) + len(s_stas), MAX_USERS) + 1) // 2]]
+        w_p, sym_p = self._tables(backlog, primary, p_stas, budgets)
+        w_s, sym_s = self._tables(backlog, secondary, s_stas, budgets) if s_stas else (
+            np.zeros_like(w_p), np.zeros_like(sym_p))
+
+        index = _candidates(len(p_stas), len(s_stas))
+        b, pr, pn, sr, sn = (_A_SIGB[index], _A_PRU[index], _A_PN[index],
+                             _A_SRU[index], _A_SN[index])
+        channel = _SIGB_OVERHEAD[b] + np.maximum(sym_p[b, pr, pn], sym_s[b, sr, sn]) * SYMBOL_US
+        rate = (w_p[b, pr, pn] + w_s[b, sr, sn]) / channel
+        best = int(np.argmax(rate))
+
+        # class 0: the oldest primary user alone on the 484-tone RU in an HE SU PPDU
+        i = p_stas[0]
+        k, s = airtime(txop - HE_SU_PREAMBLE_US - SIFS_US - BLOCK_ACK_US, 484,
+                       backlog.mcs[i], TRAFFIC[primary][0], backlog.queued[i])
+        su_rate = self.weights[primary] * k / (HE_SU_PREAMBLE_US + s * SYMBOL_US
+                                               + SIFS_US + BLOCK_ACK_US)
+        if su_rate > rate[best]:
+            decision = (True, 484, 1, None, 0)
+        else:
+            p_ru, n_p, s_ru, n_s = ALLOCATIONS[index[best]]
+            decision = (False, RU_SIZES[p_ru], n_p, RU_SIZES[s_ru] if n_s else None, n_s)
+        self.decisions += 1
+        self.seconds += time.perf_counter() - start
+        return decision
+
+    def us_per_decision(self):
+        return self.seconds / self.decisions * 1e6 if self.decisions else math.nan
+
+
+def compare(nwifi_values=NWIFI_VALUES, seeds=(1,), duration_s=1.0,
+            schedulers=COMPARE_SCHEDULERS, params=None, weights=None):
+    """
+    ({(scheduler, nwifi): weighted latency (ms)} averaged over seeds, with
+    'Oracle' next to the schedulers; the oracle's mean us per decision).
+    Raises ValueError if allocate() overfills the RU tree for some class, as
+    the schedulers would then be credited with RUs the channel cannot hold.
+    """
+    overfilled = unplaceable_classes()
+    if overfilled:
+        raise ValueError("allocate() overfills the RU tree for classes "
+                         f"{sorted(overfilled)}; see ru_oracle.py --partitions")
+    params = load_params() if params is None else params
+    weights = dict(AC_WEIGHTS, **(weights or {}))
+    oracle = RUOracle(weights)
+    table = {}
+    for scheduler in list(schedulers) + ['Oracle']:
+        allocator = oracle if scheduler == 'Oracle' else None
+        for n in nwifi_values:
+            runs = [ac_means(*simulate(scheduler, n, seed, duration_s, params,
+                                       allocator=allocator)) for seed in seeds]
+            table[(scheduler, n)] = float(np.mean(
+                [sum(weights[ac] * means.get(ac, math.nan) for ac in STA_ACS) for means in runs]))
+    return table, oracle.us_per_decision()
+
+
+def print_partitions():
+    """Size of the RU tree search space, and the allocate() classes it cannot place."""
+    print(f"RU tree: {len(RU_POSITIONS)} RUs, {len(partitions())} placeable RU multisets "
+          f"({ru_placements.cache_info().currsize} memoized masks), "
+          f"{len(ALLOCATIONS)} (primary, secondary) allocations")
+    print("Max RUs per size: " + ", ".join(f"{ru}: {n}" for ru, n in
+                                           zip(RU_SIZES, _RU_MAX_USERS)))
+    print("-"*70)
+    print("allocate() classes that overfill the tree (all STAs backlogged):")
+    overfilled = unplaceable_classes()
+    for cls, counts in overfilled.items():
+        p_ru, s_ru = RU_CLASSES[cls]
+        print(f"  class {cls:>2} (P{p_ru}/S{s_ru}): "
+              + " + ".join(f"{n}x{ru}" for ru, n in counts.items()))
+    if not overfilled:
+        print("  none")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exact per-TXOP RU allocation oracle')
+    parser.add_argument('--nwifi', nargs='+', type=int, default=NWIFI_VALUES)
+    parser.add_argument('--seeds', nargs='+', type=int, default=[1])
+    parser.add_argument('--duration', type=float, default=1.0, help='seconds per run')
+    parser.add_argument('--schedulers', nargs='+', choices=COMPARE_SCHEDULERS,
+                        default=COMPARE_SCHEDULERS)
+    parser.add_argument('--partitions', action='store_true',
+                        help='only print the RU tree search space')
+    args = parser.parse_args()
+
+    print("="*70)
+    print_partitions()
+    if not args.partitions:
+        print("-"*70)
+        start = time.perf_counter()
+        table, us = compare(args.nwifi, args.seeds, args.duration, args.schedulers)
+        names = args.schedulers + ['Oracle']
+        print("Surrogate weighted latency (ms), " + f"{len(args.seeds)} seed(s) x {args.duration:g} s")
+        print(f"{'nwifi':>6}" + "".join(f"{s:>14}" for s in names) + f"{'Oracle gap':>12}")
+        for n in args.nwifi:
+            best = min(table[(s, n)] for s in args.schedulers)
+            print(f"{n:>6}" + "".join(f"{table[(s, n)]:>14.3f}" for s in names)
+                  + f"{table[('Oracle', n)] / best - 1:>+12.1%}")
+        print("(Oracle gap: vs the best scheduler per nwifi)")
+        print(f"Oracle: {us:.0f} us per decision; total {time.perf_counter() - start:.1f} s")
+    print("="*70)
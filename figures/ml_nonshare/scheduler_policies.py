@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+MU-TXOP Scheduler Policies (vectorized)
+
+Decision rules of the rule-based schedulers, applied to batches of the
+12-dim scheduler state used by the ML baselines (MLBaselineforWi-Fi6MU-TXOPScheduler.md):
+
+    0-3   queue lengths AC_VO, AC_VI, AC_BE, AC_BK (packets)
+    4-5   backlogged STA count: primary, secondary AC
+    6     packet size ratio: primary / secondary queued bytes (0 without secondary)
+    7     waiting time weight: secondary / (primary + secondary) head-of-line wait
+    8-9   AC type: primary, secondary (AcIndex; -1 without secondary)
+    10-11 PHY metric: mean HE-MCS / 11 of the primary, secondary STAs
+
+Every policy maps an (N, 12) feature array to N decision classes:
+
+    0   Original mode (single-user TXOP, no sharing)
+    1   Primary AC only (OFDMA, RU size from the STA count)
+    2   P242/S52    3   P242/S106   4   P106/S52
+    5   P242/S242   6   P106/S106   7   P52/S52
+    8   P106/S242   9   P52/S106    10  P52/S242
+
+Px/Sy is the RU size given to each primary / secondary AC user; see
+allocate() for how the 40 MHz channel is divided (user counts are capped by
+what the RU tree can place, he_phy.max_rus(), not by 26-tone units alone).
+"""
+
+from bisect import bisect_left
+
+import numpy as np
+
+from results_ingest import ACS
+from he_phy import (CHANNEL_UNITS, EDCA, MCS_BITS, MU_ACK_US, RU_DATA_TONES,
+                    RU_MAX_COUNT, SIFS_US, SYMBOL_US, he_mu_preamble_us, max_rus,
+                    ru_for_users)
+
+N_FEATURES = 12
+FEATURE_NAMES = [
+    'queue_vo', 'queue_vi', 'queue_be', 'queue_bk',
+    'sta_primary', 'sta_secondary',
+    'size_ratio', 'wait_weight',
+    'ac_primary', 'ac_secondary',
+    'phy_primary', 'phy_secondary',
+]
+F_QUEUE = slice(0, 4)
+F_STA_P, F_STA_S = 4, 5
+F_RATIO, F_WAIT = 6, 7
+F_AC_P, F_AC_S = 8, 9
+F_PHY_P, F_PHY_S = 10, 11
+
+# Queue feature order (VO, VI, BE, BK) -> AcIndex (BE=0, BK=1, VI=2, VO=3)
+QUEUE_AC_INDEX = np.array([3, 2, 0, 1])
+
+N_CLASSES = 11
+CLASS_ORIGINAL, CLASS_PRIMARY_ONLY = 0, 1
+
+# Decision class -> (primary RU, secondary RU); None: decided by the STA count
+RU_CLASSES = {
+    0: (484, None),
+    1: (None, None),
+    2: (242, 52),
+    3: (242, 106),
+    4: (106, 52),
+    5: (242, 242),
+    6: (106, 106),
+    7: (52, 52),
+    8: (106, 242),
+    9: (52, 106),
+    10: (52, 242),
+}
+SHARING_CLASSES = np.arange(2, N_CLASSES)
+
+# Ratio bands (primary / secondary bytes) and the sharing classes allowed in each
+RATIO_EDGES = np.array([0.25, 0.5, 2.0, 4.0])
+RATIO_BAND_CLASSES = [(10,), (8, 9), (5, 6, 7), (2, 3, 4), (2,)]
+RATIO_GATE = 9.0
+
+# Rule 4 bands and the Stage-1 gate compiled into lookup tables. The mask
+# index of a row is searchsorted(MASK_EDGES, ratio) (0..4: Rule 4 band,
+# 5: ratio > RATIO_GATE) plus MASK_BANDS if a secondary AC exists; without
+# one, or above the gate, only the non-sharing classes are allowed.
+MASK_EDGES = np.append(RATIO_EDGES, RATIO_GATE)
+MASK_BANDS = len(MASK_EDGES) + 1
+GATE_CLOSED_CLASSES = (0, 1)
+
+
+def _class_bits(classes):
+    return sum(1 << c for c in classes)
+
+
+# (secondary AC present, band) -> bitmask of allowed classes, and as (.., 11) bool rows
+MASK_BITS = np.array(
+    [[_class_bits(GATE_CLOSED_CLASSES)] * MASK_BANDS,
+     [_class_bits(c) for c in RATIO_BAND_CLASSES] + [_class_bits(GATE_CLOSED_CLASSES)]],
+    dtype=np.uint16)
+MASK_TABLE = ((MASK_BITS[..., np.newaxis] >> np.arange(N_CLASSES)) & 1).astype(bool)
+_MASK_ROWS = MASK_TABLE.reshape(-1, N_CLASSES)
+_MASK_BITS_FLAT = MASK_BITS.ravel()
+_MASK_BITS_LIST = MASK_BITS.tolist()
+_MASK_EDGES_LIST = MASK_EDGES.tolist()
+
+# Mean packet size per AcIndex (BE, BK, VI, VO), used to turn queue lengths into bytes
+AC_PACKET_BYTES = np.array([1500, 1500, 1400, 200])
+
+# Channel access priority and TXOP limit per AcIndex (higher rank wins)
+AC_RANK = np.array([1, 0, 2, 3])
+TXOP_LIMIT_US = np.array([EDCA[ac][3] for ac in ACS])
+
+
+# Per sharing class (2..10): RU sizes and data tones of each side, the most
+# primary users placeable next to one secondary RU, and the most secondary
+# users placeable next to k primary users (_MAX_S[class - 2, k])
+_P_RU = [RU_CLASSES[c][0] for c in SHARING_CLASSES]
+_S_RU = [RU_CLASSES[c][1] for c in SHARING_CLASSES]
+_P_TONES = np.array([RU_DATA_TONES[ru] for ru in _P_RU])
+_S_TONES = np.array([RU_DATA_TONES[ru] for ru in _S_RU])
+_MAX_P = np.array([max_rus(p, ((s, 1),)) for p, s in zip(_P_RU, _S_RU)])
+_MAX_S = np.array([[max_rus(s, ((p, k),)) for k in range(CHANNEL_UNITS + 1)]
+                   for p, s in zip(_P_RU, _S_RU)])
+
+
+def allocate(cls, n_primary, n_secondary):
+    """
+    Users per AC for one decision: (primary RU, primary users, secondary RU,
+    secondary users). One secondary RU is reserved first, primary users take
+    what they can of the rest, secondary users fill the remainder; every
+    result is placeable on the 40 MHz RU tree.
+    """
+    p_ru, s_ru = RU_CLASSES[cls]
+    if cls == CLASS_ORIGINAL:
+        return 484, min(n_primary, 1), None, 0
+    if cls == CLASS_PRIMARY_ONLY or n_secondary == 0:
+        ru = ru_for_users(n_primary)
+        return ru, min(n_primary, RU_MAX_COUNT[ru]), None, 0
+    c = cls - SHARING_CLASSES[0]
+    p_users = int(min(n_primary, _MAX_P[c]))
+    s_users = int(min(n_secondary, _MAX_S[c, p_users]))
+    return p_ru, p_users, s_ru, s_users
+
+
+def ratio_band(features):
+    """Ratio band index 0..4 of every row (see RATIO_EDGES)."""
+    return np.searchsorted(RATIO_EDGES, features[:, F_RATIO], side='left')
+
+
+def gate_open(features):
+    """Rows where TXOP sharing is allowed: a secondary AC exists and ratio <= RATIO_GATE."""
+    return (features[:, F_AC_S] >= 0) & (features[:, F_RATIO] <= RATIO_GATE)
+
+
+def mask_index(features):
+    """Row of MASK_TABLE (flattened) for every row: gate state and ratio band."""
+    f = np.atleast_2d(features)
+    index = np.searchsorted(MASK_EDGES, f[:, F_RATIO], side='left')
+    index += (f[:, F_AC_S] >= 0) * MASK_BANDS
+    return index
+
+
+def feasible_classes(features, out=None):
+    """(N, 11) boolean mask of the decisions allowed for each row (Rule 4 + gate)."""
+    return np.take(_MASK_ROWS, mask_index(features), axis=0, out=out)
+
+
+def feasible_bits(features):
+    """uint16 bitmask (bit c = class c allowed) of every row."""
+    return _MASK_BITS_FLAT[mask_index(features)]
+
+
+def feasible_bits_scalar(ratio, ac_secondary):
+    """feasible_bits() of one state, without NumPy (per-TXOP decisions)."""
+    band = bisect_left(_MASK_EDGES_LIST, ratio) if ratio <= RATIO_GATE else MASK_BANDS - 1
+    return _MASK_BITS_LIST[int(ac_secondary >= 0)][band]
+
+
+def su_policy(features):
+    """SU: every TXOP serves one STA of the primary AC on the full channel."""
+    return np.zeros(len(np.atleast_2d(features)), dtype=np.int64)
+
+
+def non_mu_policy(features):
+    """Non-MU-TXOP: OFDMA among primary AC STAs only, never shares the TXOP."""
+    return np.full(len(np.atleast_2d(features)), CLASS_PRIMARY_ONLY, dtype=np.int64)
+
+
+def pbm_policy(features):
+    """
+    PBM (Priority-Based MU-TXOP sharing): share whenever the gate is open,
+    pick the ratio band's class from the STA counts, and give the secondary AC
+    the larger RU of its band when it has the higher channel access priority.
+    """
+    f = np.atleast_2d(features)
+    n_p, n_s = f[:, F_STA_P], f[:, F_STA_S]
+    band = ratio_band(f)
+    secondary_first = AC_RANK[f[:, F_AC_S].astype(np.int64)] > AC_RANK[f[:, F_AC_P].astype(np.int64)]
+
+    choice = np.select(
+        [band == 0, band == 1, band == 2, band == 3],
+        [np.full(len(f), 10),
+         np.where(secondary_first | (n_p <= 2), 8, 9),
+         np.where(secondary_first | (n_p + n_s <= 2), 5, np.where(n_p + n_s <= 4, 6, 7)),
+         np.where(secondary_first, 3, np.where(n_p >= 3, 4, np.where(n_s <= 2, 3, 2)))],
+        default=2)
+    closed = ~gate_open(f)
+    return np.where(closed, np.where(n_p > 1, CLASS_PRIMARY_ONLY, CLASS_ORIGINAL), choice)
+
+
+def _served_bytes(features, duration_us):
+    """(N, 9) bytes served by each sharing class in a PPDU of duration_us."""
+    f = features
+    ac_p = f[:, F_AC_P].astype(np.int64)
+    ac_s = np.maximum(f[:, F_AC_S].astype(np.int64), 0)
+    queue = f[:, F_QUEUE][:, np.argsort(QUEUE_AC_INDEX)]          # -> AcIndex order
+    rows = np.arange(len(f))
+    bytes_p = (queue[rows, ac_p] * AC_PACKET_BYTES[ac_p])[:, None]
+    bytes_s = (queue[rows, ac_s] * AC_PACKET_BYTES[ac_s])[:, None]
+    n_p, n_s = f[:, F_STA_P][:, None], f[:, F_STA_S][:, None]
+
+    p_users = np.minimum(n_p, _MAX_P)
+    s_users = np.minimum(n_s, _MAX_S[np.arange(len(_P_RU)), p_users.astype(np.int64)])
+    mcs_p = np.rint(f[:, F_PHY_P] * 11).astype(np.int64)[:, None]
+    mcs_s = np.rint(f[:, F_PHY_S] * 11).astype(np.int64)[:, None]
+    symbols = duration_us // SYMBOL_US
+    cap_p = p_users * _P_TONES * MCS_BITS[mcs_p] * symbols / 8
+    cap_s = s_users * _S_TONES * MCS_BITS[mcs_s] * symbols / 8
+    return np.minimum(bytes_p, cap_p) + np.minimum(bytes_s, cap_s)
+
+
+# Per decision class (0..10): RU size of each side; 0 = from the STA count / none
+_CLASS_P_RU = np.array([484, 0] + _P_RU)
+_CLASS_S_RU = np.array([0, 0] + _S_RU)
+# RU size (tones) -> most RUs on the tree / data tones, as arrays indexed by the RU size
+_MAX_COUNT_BY_RU = np.zeros(485, dtype=np.int64)
+_TONES_BY_RU = np.zeros(485, dtype=np.int64)
+for _ru in RU_MAX_COUNT:
+    _MAX_COUNT_BY_RU[_ru], _TONES_BY_RU[_ru] = RU_MAX_COUNT[_ru], RU_DATA_TONES[_ru]
+_RU_BY_USERS = [(RU_MAX_COUNT[ru], ru) for ru in (484, 242, 106, 52)]
+
+
+def ru_for_users_array(n_users):
+    """Vectorized he_phy.ru_for_users()."""
+    n = np.asarray(n_users)
+    return np.select([n <= count for count, _ in _RU_BY_USERS],
+                     [ru for _, ru in _RU_BY_USERS], default=26)
+
+
+def queued_bytes(features):
+    """(primary, secondary) queued bytes of every row (0 without secondary AC)."""
+    f = np.atleast_2d(features)
+    has_s = f[:, F_AC_S] >= 0
+    ac_p = f[:, F_AC_P].astype(np.int64)
+    ac_s = np.maximum(f[:, F_AC_S].astype(np.int64), 0)
+    queue = f[:, F_QUEUE][:, np.argsort(QUEUE_AC_INDEX)]          # -> AcIndex order
+    rows = np.arange(len(f))
+    return (queue[rows, ac_p] * AC_PACKET_BYTES[ac_p],
+            np.where(has_s, queue[rows, ac_s] * AC_PACKET_BYTES[ac_s], 0))
+
+
+def capacity_bytes(features, classes, duration_us):
+    """
+    (primary, secondary) bytes that decision classes[i] can carry for row i in
+    a PPDU of duration_us: RU users from allocate(), RU data tones and the
+    mean HE-MCS of each side.
+    """
+    f = np.atleast_2d(features)
+    cls = np.broadcast_to(np.asarray(classes, dtype=np.int64), len(f))
+    n_p = f[:, F_STA_P]
+    n_s = np.where(f[:, F_AC_S] >= 0, f[:, F_STA_S], 0)
+
+    sharing = (cls >= SHARING_CLASSES[0]) & (n_s > 0)
+    p_ru = np.where((cls == CLASS_PRIMARY_ONLY) | ((cls != CLASS_ORIGINAL) & ~sharing),
+                    ru_for_users_array(n_p), _CLASS_P_RU[cls])
+    s_ru = np.where(sharing, _CLASS_S_RU[cls], 0)
+    c = np.maximum(cls - SHARING_CLASSES[0], 0)
+    p_users = np.where(cls == CLASS_ORIGINAL, np.minimum(n_p, 1),
+                       np.minimum(n_p, np.where(sharing, _MAX_P[c], _MAX_COUNT_BY_RU[p_ru])))
+    s_users = np.where(sharing, np.minimum(n_s, _MAX_S[c, p_users.astype(np.int64)]), 0)
+
+    mcs_p = np.rint(f[:, F_PHY_P] * 11).astype(np.int64)
+    mcs_s = np.rint(np.maximum(f[:, F_PHY_S], 0) * 11).astype(np.int64)
+    symbols = np.asarray(duration_us) // SYMBOL_US
+    return (p_users * _TONES_BY_RU[p_ru] * MCS_BITS[mcs_p] * symbols / 8,
+            s_users * _TONES_BY_RU[s_ru] * MCS_BITS[mcs_s] * symbols / 8)
+
+
+def served_bytes(features, classes, duration_us):
+    """(primary, secondary) queued bytes served by classes[i] within duration_us."""
+    bytes_p, bytes_s = queued_bytes(features)
+    cap_p, cap_s = capacity_bytes(features, classes, duration_us)
+    return np.minimum(bytes_p, cap_p), np.minimum(bytes_s, cap_s)
+
+
+def txop_duration_us(features):
+    """Data airtime of a TXOP: the primary AC's TXOP limit minus MU overheads."""
+    f = np.atleast_2d(features)
+    txop = TXOP_LIMIT_US[f[:, F_AC_P].astype(np.int64)]
+    overhead = he_mu_preamble_us(8) + SIFS_US + MU_ACK_US
+    return np.maximum(txop - overhead, SYMBOL_US)
+
+
+def mps_policy(features):
+    """
+    MPS (Max Performance Sharing): among the feasible sharing classes, pick the
+    one that serves the most queued bytes within the primary AC's TXOP limit.
+    """
+    f = np.atleast_2d(features)
+    mask = feasible_classes(f)
+    txop = TXOP_LIMIT_US[f[:, F_AC_P].astype(np.int64)]
+    overhead = he_mu_preamble_us(8) + SIFS_US + MU_ACK_US
+    served = _served_bytes(f, np.maximum(txop - overhead, SYMBOL_US)[:, None])
+    served = np.where(mask[:, SHARING_CLASSES], served, -1)
+    choice = SHARING_CLASSES[np.argmax(served, axis=1)]
+    closed = ~mask[:, SHARING_CLASSES].any(axis=1)
+    n_p = f[:, F_STA_P]
+    return np.where(closed, np.where(n_p > 1, CLASS_PRIMARY_ONLY, CLASS_ORIGINAL), choice)
+
+
+# Synthetic TXOP states (sample_states): downlink STAs cycle over VO, VI, BK as
+# in the case1 scenario; EDCA access weight per AC ~ 1 / (AIFSN + CWmin / 2)
+STATE_ACS = ('VO', 'VI', 'BK')
+_STATE_AC_INDEX = np.array([3, 2, 1])
+_STATE_QUEUE_COL = np.array([0, 1, 3])
+_STATE_ACCESS_WEIGHT = np.array([1 / (EDCA[ac][0] + EDCA[ac][1] / 2) for ac in STATE_ACS])
+STATE_MCS_RANGE = (5, 9)
+
+
+def sample_states(n, nwifi, rng, load=1.0):
+    """
+    (n, 12) random scheduler states at TXOP start for an nwifi-STA BSS.
+
+    Per AC, the backlogged STA count is binomial with a busy probability
+    growing with nwifi * load, each backlogged STA holds 1 + Poisson packets,
+    the primary AC wins EDCA with probability proportional to its access
+    weight, and the secondary AC is the highest-priority other backlogged AC.
+    A coarse stand-in for replayed ns-3 / surrogate states.
+    """
+    stas = np.array([len(range(i, nwifi, len(STATE_ACS))) for i in range(len(STATE_ACS))])
+    busy = 1 - np.exp(-load * nwifi / 24)
+    backlogged = rng.binomial(stas, busy, size=(n, len(STATE_ACS)))
+    empty = backlogged.sum(axis=1) == 0
+    backlogged[empty, rng.integers(0, len(STATE_ACS), empty.sum())] = 1
+    backlogged = np.minimum(backlogged, stas)
+    packets = backlogged + rng.poisson(backlogged * load * nwifi / 12)
+
+    weight = (backlogged > 0) * _STATE_ACCESS_WEIGHT
+    cdf = np.cumsum(weight, axis=1)
+    primary = (rng.random(n)[:, None] * cdf[:, -1:] >= cdf).sum(axis=1)
+    others = (backlogged > 0) & (np.arange(len(STATE_ACS)) != primary[:, None])
+    has_s = others.any(axis=1)
+    secondary = np.argmax(others, axis=1)           # STATE_ACS is in priority order
+
+    rows = np.arange(n)
+    f = np.zeros((n, N_FEATURES))
+    f[:, _STATE_QUEUE_COL] = packets
+    f[:, F_STA_P] = backlogged[rows, primary]
+    f[:, F_STA_S] = np.where(has_s, backlogged[rows, secondary], 0)
+    f[:, F_AC_P] = _STATE_AC_INDEX[primary]
+    f[:, F_AC_S] = np.where(has_s, _STATE_AC_INDEX[secondary], -1)
+    bytes_p = packets[rows, primary] * AC_PACKET_BYTES[_STATE_AC_INDEX[primary]]
+    bytes_s = packets[rows, secondary] * AC_PACKET_BYTES[_STATE_AC_INDEX[secondary]]
+    f[:, F_RATIO] = np.where(has_s, bytes_p / np.maximum(bytes_s, 1), 0)
+    f[:, F_WAIT] = np.where(has_s, rng.beta(2, 2, n), 0)
+    f[:, F_PHY_P] = rng.uniform(*STATE_MCS_RANGE, n) / 11
+    f[:, F_PHY_S] = np.where(has_s, rng.uniform(*STATE_MCS_RANGE, n) / 11, 0)
+    return f
+
+
+# Scheduler name -> policy (names as in results_ingest.SCHEDULER_FOLDERS)
+POLICIES = {
+    'PBM': pbm_policy,
+    'MPS': mps_policy,
+    'SU': su_policy,
+    'Non-MU-TXOP': non_mu_policy,
+}
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Bootstrap Confidence Intervals and Paired Permutation Tests over Seeds
+
+The tables and charts report one number per (method, nwifi) cell; this module
+puts an interval on it from the per-seed rows of the results store, and tests
+whether two schedulers really differ on the seeds they share.
+
+Bootstrap (percentile intervals of the mean over seeds):
+- All resamples of a batch of cells are drawn as one (resamples, n) index
+  array and folded into a (resamples, n) count matrix, so the resampled means
+  of every cell are one matrix product: values @ (counts / n).T
+- Cells are grouped by their number of valid seeds n (missing seeds are NaN);
+  each group shares one index array, so paired arrays (e.g. a method and its
+  baseline) are resampled on the same seeds
+- Cells with fewer than 2 seeds get a NaN interval
+
+Paired permutation test (per cell, on the per-seed differences a - b of the
+seeds both have): the null distribution of the mean difference is drawn as one
+(permutations, seeds) sign-flip matrix, or all 2^seeds sign patterns when that
+is fewer; two-sided p = (1 + #|null| >= |observed|) / (1 + permutations).
+
+seed_tensor() loads the per-seed MetricsTensor of the store (None when it was
+built without per-seed folders), and weighted_intervals() / paired_comparison()
+work on its weighted latency, as the comparison and results tables use them.
+
+Usage:
+    python seed_stats.py                             # weighted latency CIs, tests vs PBM
+    python seed_stats.py --baseline MPS --resamples 20000
+    python seed_stats.py --bench                     # timing on synthetic cells
+"""
+
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from metrics_engine import MetricsTensor
+from results_store import NWIFI_VALUES, open_store
+
+RESAMPLES = 10000
+PERMUTATIONS = 10000
+CONFIDENCE = 0.95
+
+Interval = namedtuple('Interval', 'mean low high')
+
+
+def _flatten(samples):
+    samples = np.asarray(samples, dtype=np.float64)
+    return samples.reshape(-1, samples.shape[-1]), samples.shape[:-1]
+
+
+def _compact(arrays):
+    """Seeds valid in every array moved to the front of the last axis, and their count."""
+    valid = np.logical_and.reduce([~np.isnan(a) for a in arrays])
+    order = np.argsort(~valid, axis=-1, kind='stable')
+    return ([np.take_along_axis(np.where(valid, a, 0.0), order, axis=-1) for a in arrays],
+            valid.sum(axis=-1))
+
+
+def resample_weights(n, resamples, rng):
+    """(resamples, n) bootstrap weights (counts / n) from one index array."""
+    index = rng.integers(0, n, (resamples, n)) + n * np.arange(resamples)[:, np.newaxis]
+    return np.bincount(index.ravel(), minlength=resamples * n).reshape(resamples, n) / n
+
+
+def bootstrap_means(*samples, resamples=RESAMPLES, seed=0):
+    """
+    (*cells, resamples) resampled means of each (*cells, seeds) array; the
+    arrays are paired: every resample draws the same seeds for all of them.
+    """
+    flat = [_flatten(s) for s in samples]
+    shape = flat[0][1]
+    values, counts = _compact([f for f, _ in flat])
+    rng = np.random.default_rng(seed)
+    out = [np.full((len(counts), resamples), np.nan) for _ in values]
+    for n in np.unique(counts[counts > 0]):
+        cells = np.flatnonzero(counts == n)
+        weights = resample_weights(int(n), resamples, rng)
+        for o, v in zip(out, values):
+            o[cells] = v[cells, :n] @ weights.T
+    return [o.reshape(shape + (resamples,)) for o in out]
+
+
+def _percentiles(boot, point, counts, confidence):
+    alpha = (1 - confidence) / 2 * 100
+    low, high = np.percentile(boot, [alpha, 100 - alpha], axis=-1)
+    few = counts < 2
+    return Interval(point, np.where(few, np.nan, low), np.where(few, np.nan, high))
+
+
+def bootstrap_ci(samples, confidence=CONFIDENCE, resamples=RESAMPLES, seed=0):
+    """Interval(mean, low, high) of the mean over the last (seed) axis, per cell."""
+    samples = np.asarray(samples, dtype=np.float64)
+    counts = np.count_nonzero(~np.isnan(samples), axis=-1)
+    with np.errstate(invalid='ignore'):
+        point = np.nansum(samples, axis=-1) / counts
+    boot, = bootstrap_means(samples, resamples=resamples, seed=seed)
+    return _percentiles(boot, point, counts, confidence)
+
+
+def bootstrap_ratio_ci(a, b, confidence=CONFIDENCE, resamples=RESAMPLES, seed=0):
+    """Interval of mean(a) / mean(b) - 1 over the seeds both have (paired resamples)."""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    both = ~np.isnan(a) & ~np.isnan(b)
+    counts = both.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        point = np.where(both, a, 0).sum(-1) / np.where(both, b, 0).sum(-1) - 1
+        boot_a, boot_b = bootstrap_means(a, b, resamples=resamples, seed=seed)
+        return _percentiles(boot_a / boot_b - 1, point, counts, confidence)
+
+
+def paired_permutation_test(a, b, permutations=PERMUTATIONS, seed=0):
+    """(mean difference a - b, two-sided p-value) per cell, over the seeds both have."""
+    diff, shape = _flatten(np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64))
+    valid = ~np.isnan(diff)
+    counts = valid.sum(axis=1)
+    diff = np.where(valid, diff, 0.0)
+    n_seeds = diff.shape[1]
+    if 2 ** n_seeds <= permutations:
+        patterns = np.arange(2 ** n_seeds)[:, np.newaxis] >> np.arange(n_seeds) & 1
+    else:
+        patterns = np.random.default_rng(seed).integers(0, 2, (permutations, n_seeds))
+    signs = 1.0 - 2.0 * patterns
+    with np.errstate(invalid='ignore', divide='ignore'):
+        observed = diff.sum(axis=1) / counts
+        null = (signs @ diff.T) / counts                        # (patterns, cells)
+        extreme = (np.abs(null) >= np.abs(observed) - 1e-12).sum(axis=0)
+    if len(signs) == 2 ** n_seeds:
+        # exact: the 2^(seeds - n) patterns that only flip missing seeds repeat each outcome
+        p = extreme / len(signs)
+    else:
+        p = (1 + extreme) / (1 + len(signs))
+    p = np.where(counts >= 2, p, np.nan)
+    return observed.reshape(shape), p.reshape(shape)
+
+
+# ==============================================================================
+# Results store helpers
+# ==============================================================================
+
+def seed_tensor(methods, case='case1', column='mean', nwifi_values=NWIFI_VALUES):
+    """Per-seed MetricsTensor of methods from the store, or None without per-seed rows."""
+    store = open_store()
+    if store is None or column not in store.columns:
+        return None
+    tensor = MetricsTensor.from_store(store, case, list(methods), column, nwifi_values,
+                                      seeds='all')
+    return tensor if len(tensor.seeds) >= 2 else None
+
+
+def weighted_intervals(tensor, weights=None, confidence=CONFIDENCE, resamples=RESAMPLES):
+    """
+    Interval arrays of the weighted latency: per (method, nwifi), and of the
+    average over nwifi per method (as the results table's Average column).
+    """
+    per_seed = tensor.weighted(weights, per_seed=True)
+    return (bootstrap_ci(per_seed, confidence, resamples),
+            bootstrap_ci(per_seed.mean(axis=1), confidence, resamples))
+
+
+def paired_comparison(tensor, baseline='PBM', weights=None, confidence=CONFIDENCE,
+                      resamples=RESAMPLES, permutations=PERMUTATIONS):
+    """
+    Every method vs baseline on the weighted latency, per (method, nwifi):
+    (Interval of the relative difference, p-value of the paired permutation test).
+    """
+    per_seed = tensor.weighted(weights, per_seed=True)
+    base = np.broadcast_to(per_seed[tensor.index(baseline)], per_seed.shape)
+    ratio = bootstrap_ratio_ci(per_seed, base, confidence, resamples)
+    _, p = paired_permutation_test(per_seed, base, permutations)
+    return ratio, p
+
+
+def format_interval(value, low, high, digits=3):
+    """'0.288 [0.280, 0.296]', or just the value when the interval is NaN."""
+    if np.isnan(low) or np.isnan(high):
+        return f"{value:.{digits}f}"
+    return f"{value:.{digits}f} [{low:.{digits}f}, {high:.{digits}f}]"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bootstrap CIs and permutation tests over seeds')
+    parser.add_argument('--methods', nargs='+',
+                        default=['PBM', 'MPS', 'SU', 'Non-MU-TXOP', 'ML-Old', 'ML-Old-v2'])
+    parser.add_argument('--baseline', default='PBM')
+    parser.add_argument('--case', default='case1')
+    parser.add_argument('--resamples', type=int, default=RESAMPLES)
+    parser.add_argument('--permutations', type=int, default=PERMUTATIONS)
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE)
+    parser.add_argument('--bench', action='store_true', help='time synthetic cells instead')
+    parser.add_argument('--cells', type=int, default=500, help='--bench cells')
+    parser.add_argument('--seeds', type=int, default=10, help='--bench seeds per cell')
+    args = parser.parse_args()
+
+    print("="*70)
+    if args.bench:
+        rng = np.random.default_rng(0)
+        a = rng.gamma(4, 0.1, (args.cells, args.seeds))
+        b = a * rng.normal(1.05, 0.05, a.shape)
+        a[rng.random(a.shape) < 0.05] = np.nan
+        for name, fn in (('bootstrap CI', lambda: bootstrap_ci(a, resamples=args.resamples)),
+                         ('paired ratio CI', lambda: bootstrap_ratio_ci(b, a, resamples=args.resamples)),
+                         ('permutation test', lambda: paired_permutation_test(
+                             b, a, permutations=args.permutations))):
+            start = time.perf_counter()
+            fn()
+            print(f"{name:<18} {args.cells} cells x {args.seeds} seeds: "
+                  f"{(time.perf_counter() - start) * 1e3:8.1f} ms")
+        print(f"({args.resamples:,} resamples, {args.permutations:,} permutations)")
+        print("="*70)
+        raise SystemExit
+
+    tensor = seed_tensor(args.methods, args.case)
+    if tensor is None:
+        raise SystemExit("No per-seed rows in the results store (ingest seed=<n> folders "
+                         "with: python results_store.py build)")
+    cells, average = weighted_intervals(tensor, confidence=args.confidence,
+                                        resamples=args.resamples)
+    ratio, p = paired_comparison(tensor, args.baseline, confidence=args.confidence,
+                                 resamples=args.resamples, permutations=args.permutations)
+    print(f"Weighted latency (ms), {args.confidence:.0%} bootstrap CI over "
+          f"{len(tensor.seeds)} seeds ({args.resamples:,} resamples)")
+    print("-"*70)
+    seeded = [m for m in range(len(tensor.methods)) if not np.isnan(cells.mean[m]).all()]
+    for m in seeded:
+        method = tensor.methods[m]
+        print(f"{method:<14}" + "  ".join(format_interval(*(c[m, n] for c in cells))
+                                          for n in range(len(tensor.nwifi_values)))
+              + f"  | avg {format_interval(average.mean[m], average.low[m], average.high[m])}")
+    print("-"*70)
+    print(f"vs {args.baseline}: relative difference [CI], paired permutation p")
+    for m in seeded:
+        method = tensor.methods[m]
+        if method == args.baseline:
+            continue
+        print(f"{method:<14}" + "  ".join(
+            f"{ratio.mean[m, n]:+.1%} [{ratio.low[m, n]:+.1%}, {ratio.high[m, n]:+.1%}] "
+            f"p={p[m, n]:.3f}" for n in range(len(tensor.nwifi_values))))
+    print("="*70)
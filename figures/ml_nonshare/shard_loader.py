@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Shuffled Loader for Expert-Demonstration Shards
+
+Streams mini-batches from an expert_dataset.py directory without reading it
+into RAM, for training the B0-B3 scheduler MLPs on datasets far larger than
+the 30k-50k samples the trainers held in memory:
+
+    loader = ShardLoader('/data/expert', label='PBM', batch_size=256)
+    for epoch in range(epochs):
+        for features, labels in loader:     # (256, 12) float32, (256,) uint8
+            ...
+
+Shuffling (per epoch, seeded with [seed, epoch]):
+1. The shards are cut into blocks of block_rows contiguous rows, and the
+   blocks are visited in random order (sequential reads within a block)
+2. Blocks are copied into a shuffle window of shuffle_rows rows; the window
+   is permuted and emitted as batches, and the rows that do not fill a last
+   batch are carried into the next window
+Memory is the window plus (prefetch + 2) batches, whatever the dataset size.
+
+A background thread assembles batches (np.take into preallocated contiguous
+float32 / uint8 buffers, which releases the GIL) while the training step runs,
+and keeps up to `prefetch` of them queued. Batch buffers are recycled: a
+batch is valid until the next one is requested (copy it to keep it).
+With shuffle=False batches are zero-copy views of the memory-mapped shards
+(the last batch of each shard may be short).
+
+Usage:
+    python shard_loader.py /data/expert                    # loader throughput
+    python shard_loader.py /data/expert --label B3-Meta --batch 1024 --train
+"""
+
+import argparse
+import math
+import queue
+import threading
+import time
+
+import numpy as np
+
+from expert_dataset import open_shard, read_manifest
+
+BATCH_SIZE = 256
+SHUFFLE_ROWS = 1 << 20
+BLOCK_ROWS = 1 << 12
+PREFETCH = 4
+
+_END = object()
+
+
+class ShardLoader:
+    """Iterable of (features, labels) mini-batches over memory-mapped shards."""
+
+    def __init__(self, root, label='PBM', batch_size=BATCH_SIZE, shuffle=True,
+                 shuffle_rows=SHUFFLE_ROWS, block_rows=BLOCK_ROWS, prefetch=PREFETCH,
+                 shards=None, drop_last=False, seed=0):
+        """
+        label: label column name (LABEL_COLUMNS), or None for every column.
+        shards: indices of the shards to read (e.g. a train / validation split).
+        """
+        manifest = read_manifest(root)
+        self.label_columns = manifest['label_columns']
+        self.label = None if label is None else self.label_columns.index(label)
+        entries = manifest['shards'] if shards is None else [manifest['shards'][i] for i in shards]
+        self._shards = [open_shard(root, shard) for shard in entries]
+        self.rows = sum(len(features) for features, _ in self._shards)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.block_rows = block_rows
+        self.shuffle_rows = max(shuffle_rows, block_rows + batch_size)
+        self.prefetch = prefetch
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+        self.wait_seconds = 0.0     # consumer time blocked on the loader, last epoch
+
+    def __len__(self):
+        if self.drop_last:
+            return self.rows // self.batch_size
+        if self.shuffle:
+            return math.ceil(self.rows / self.batch_size)
+        return sum(math.ceil(len(f) / self.batch_size) for f, _ in self._shards)
+
+    def _labels(self, labels, start, stop):
+        return labels[start:stop] if self.label is None else labels[start:stop, self.label]
+
+    def _sequential(self):
+        for features, labels in self._shards:
+            for start in range(0, len(features), self.batch_size):
+                stop = min(start + self.batch_size, len(features))
+                if self.drop_last and stop - start < self.batch_size:
+                    break
+                yield features[start:stop], self._labels(labels, start, stop)
+
+    def _shuffled(self, rng):
+        features0, labels0 = self._shards[0]
+        label_shape = labels0.shape[1:] if self.label is None else ()
+        window_f = np.empty((self.shuffle_rows,) + features0.shape[1:], dtype=features0.dtype)
+        window_l = np.empty((self.shuffle_rows,) + label_shape, dtype=labels0.dtype)
+        ring = [(np.empty((self.batch_size,) + features0.shape[1:], dtype=features0.dtype),
+                 np.empty((self.batch_size,) + label_shape, dtype=labels0.dtype))
+                for _ in range(self.prefetch + 2)]
+        turn = 0
+
+        blocks = [(s, start) for s, (features, _) in enumerate(self._shards)
+                  for start in range(0, len(features), self.block_rows)]
+        order = rng.permutation(len(blocks))
+        filled, next_block = 0, 0
+        while True:
+            while next_block < len(order):
+                s, start = blocks[order[next_block]]
+                features, labels = self._shards[s]
+                stop = min(start + self.block_rows, len(features))
+                if filled + stop - start > self.shuffle_rows:
+                    break
+                window_f[filled:filled + stop - start] = features[start:stop]
+                window_l[filled:filled + stop - start] = self._labels(labels, start, stop)
+                filled += stop - start
+                next_block += 1
+            last = next_block == len(order)
+
+            perm = rng.permutation(filled)
+            full = filled - filled % self.batch_size
+            for i in range(0, full, self.batch_size):
+                batch_f, batch_l = ring[turn]
+                turn = (turn + 1) % len(ring)
+                np.take(window_f, perm[i:i + self.batch_size], axis=0, out=batch_f)
+                np.take(window_l, perm[i:i + self.batch_size], axis=0, out=batch_l)
+                yield batch_f, batch_l
+            rest = perm[full:]
+            if last:
+                if len(rest) and not self.drop_last:
+                    yield window_f[rest], window_l[rest]
+                return
+            window_f[:len(rest)] = window_f[rest]
+            window_l[:len(rest)] = window_l[rest]
+            filled = len(rest)
+
+    def batches(self):
+        """This epoch's batches, assembled in the calling thread."""
+        rng = np.random.default_rng([self.seed, self.epoch])
+        self.epoch += 1
+        return self._shuffled(rng) if self.shuffle else self._sequential()
+
+    def __iter__(self):
+        batches = self.batches()
+        self.wait_seconds = 0.0
+        if not self.prefetch:
+            yield from batches
+            return
+
+        ready = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for batch in batches:
+                    if not put(batch):
+                        return
+                put(_END)
+            except BaseException as error:
+                put(error)
+
+        thread = threading.Thread(target=produce, name='shard-loader', daemon=True)
+        thread.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = ready.get()
+                self.wait_seconds += time.perf_counter() - start
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+
+def train_val_shards(root, val_shards=1):
+    """(train, validation) shard indices: the last val_shards shards validate."""
+    n = len(read_manifest(root)['shards'])
+    val_shards = min(val_shards, n - 1)
+    return list(range(n - val_shards)), list(range(n - val_shards, n))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shuffled memmap loader throughput')
+    parser.add_argument('root', help='expert_dataset.py directory')
+    parser.add_argument('--label', default='PBM')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE)
+    parser.add_argument('--shuffle-rows', type=int, default=SHUFFLE_ROWS)
+    parser.add_argument('--prefetch', type=int, default=PREFETCH)
+    parser.add_argument('--train', action='store_true',
+                        help='run an MLP forward pass per batch as the training step')
+    args = parser.parse_args()
+
+    loader = ShardLoader(args.root, args.label, args.batch, shuffle_rows=args.shuffle_rows,
+                         prefetch=args.prefetch)
+    step = None
+    if args.train:
+        from mlp_inference import MLPPolicy
+        step = MLPPolicy.random(masked=False).logits
+
+    print("="*70)
+    print(f"{loader.rows:,} rows, batch {args.batch}, window {loader.shuffle_rows:,} rows, "
+          f"prefetch {args.prefetch}")
+    start = time.perf_counter()
+    rows = 0
+    for features, labels in loader:
+        if step is not None:
+            step(features)
+        rows += len(features)
+    seconds = time.perf_counter() - start
+    print(f"Epoch: {seconds:.2f}s, {rows / seconds / 1e6:.2f} M rows/s, "
+          f"{len(loader) / seconds:,.0f} batches/s")
+    print(f"Waiting on the loader: {loader.wait_seconds:.2f}s "
+          f"({loader.wait_seconds / seconds:.1%} of the epoch)")
+    print("="*70)
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Case 2 Spatial Latency Heatmaps (Smart Warehouse mobility)
+
+Case 2 (4.2Smart_Warehouse.png) moves the STAs through the warehouse, but
+8.1c2lat_bar_with_ML.png and 8.2c2lat_bar_n40_with_ML.png only show per-AC
+means, so the ML latency increase under mobility cannot be tied to where it
+happens. This pipeline joins every packet with the position of its STA at the
+packet's receive time and bins latency on a spatial grid.
+
+Inputs per sweep point (<root>/case2/<folder>/nwifi=<n>[/seed=<s>]/, as found
+by results_ingest.discover_sweep_points):
+- the latency CSV, in long format with a receive time column and a flow/STA
+  column (see results_ingest.iter_packet_chunks)
+- a mobility trace in the same folder, or one shared trace in <root>/<case>/
+  (the same RngRun gives the same mobility for every scheduler):
+  - ns-3 MobilityHelper::EnableAsciiAll lines,
+    'now=+2000000000.0ns node=3 pos=12.5:4.0:0.0 vel=1.0:0.0:0.0'
+  - CSV with time (s), node, x, y and optionally vx, vy columns
+
+Streaming join (both traces are in time order):
+- Mobility rows are read in chunks into a TrajectoryWindow that holds, per
+  node, the segment active at the current packet time and any later ones
+- A packet at time t is placed at pos + vel * (t - t0) of its node's segment
+  (velocity from the trace, else from the next sample of the node)
+- After each packet chunk, segments superseded before its last receive time
+  are dropped, so memory is bounded by the chunk sizes and the node count,
+  not by the size of either trace
+
+Binning: SpatialGrid cells of --cell metres anchored at the origin; the grid
+grows when packets land outside it. Per (AC, cell) it keeps the packet count,
+latency sum and a quantile_sketch bucket row, each updated with one
+np.bincount over flattened (AC, cell[, bucket]) indices per chunk. Grids of
+different files and seeds merge by array add. Flow label i is STA node
+i + --node-offset.
+
+Usage:
+    python spatial_latency.py --root "$NS3_RESULTS_ROOT" --nwifi 40
+    python spatial_latency.py --root /tmp/case2 --nwifi 18 --acs BK --cell 2.5
+    python spatial_latency.py --root /tmp/case2 --nwifi 18 --mobility warehouse.tr
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from quantile_sketch import N_BUCKETS, bucket_indices, bucket_quantiles
+from results_ingest import (ACS, AC_INDEX, CHUNK_ROWS, RESULTS_ROOT, SCHEDULER_FOLDERS,
+                            discover_sweep_points, iter_packet_chunks)
+
+OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CELL_M = 5.0
+TAIL_QUANTILE = 0.99
+MIN_TAIL_PACKETS = 100      # cells with fewer packets get no tail value
+MOBILITY_CHUNK_ROWS = 65536
+
+NS3_MOBILITY_RE = re.compile(
+    r'now=([-+0-9.eE]+)ns\s+node=(\d+)\s+pos=([^:\s]+):([^:\s]+):[^:\s]+'
+    r'\s+vel=([^:\s]+):([^:\s]+):')
+
+MobilityChunk = namedtuple('MobilityChunk', 'time node x y vx vy')
+
+
+# ==============================================================================
+# Mobility traces
+# ==============================================================================
+
+def find_mobility_trace(directory, root=None, case=None):
+    """Mobility trace of a sweep point folder, else the shared one of its case."""
+    candidates = [directory]
+    if root and case:
+        candidates.append(os.path.join(root, case))
+    for folder in candidates:
+        try:
+            names = sorted(os.listdir(folder))
+        except OSError:
+            continue
+        for name in names:
+            if 'mobility' in name.lower() and name.endswith(('.tr', '.txt', '.csv')):
+                return os.path.join(folder, name)
+    return None
+
+
+def _csv_mobility_chunk(lines, columns):
+    rows = np.array([line.split(',') for line in lines if line.strip()], dtype=np.float64)
+    rows = rows.reshape(-1, len(columns))
+    col = {name: rows[:, i] for i, name in enumerate(columns)}
+    nan = np.full(len(rows), np.nan)
+    return MobilityChunk(col['time'], col['node'].astype(np.int64), col['x'], col['y'],
+                         col.get('vx', nan), col.get('vy', nan))
+
+
+def iter_mobility_chunks(path, chunk_rows=MOBILITY_CHUNK_ROWS):
+    """
+    Stream a mobility trace as MobilityChunk arrays (time in s; vx, vy NaN when
+    the trace has no velocities), chunk_rows lines at a time.
+    """
+    with open(path) as f:
+        first = f.readline()
+        if NS3_MOBILITY_RE.search(first):
+            columns = None
+            pending = [first]
+        else:
+            columns = [c.strip().lower() for c in first.split(',')]
+            missing = {'time', 'node', 'x', 'y'} - set(columns)
+            if missing:
+                raise ValueError(f"Mobility CSV {path} lacks columns {sorted(missing)}")
+            pending = []
+        while True:
+            lines = pending + list(itertools.islice(f, chunk_rows))
+            pending = []
+            if not lines:
+                break
+            if columns is not None:
+                chunk = _csv_mobility_chunk(lines, columns)
+            else:
+                rows = np.array(NS3_MOBILITY_RE.findall(''.join(lines)), dtype=np.float64)
+                rows = rows.reshape(-1, 6)
+                chunk = MobilityChunk(rows[:, 0] * 1e-9, rows[:, 1].astype(np.int64),
+                                      rows[:, 2], rows[:, 3], rows[:, 4], rows[:, 5])
+            if len(chunk.time):
+                yield chunk
+
+
+class TrajectoryWindow:
+    """
+    Mobility segments near the current time, sorted by (node, time). Segment
+    i of a node holds from its time until the node's next segment.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._columns = [np.empty(0, dtype=np.int64)] + [np.empty(0)] * 5
+        self._read_until = -math.inf
+        self._exhausted = False
+
+    def advance(self, until):
+        """
+        Read trace chunks until every segment starting at or before `until` is
+        loaded, and all rows of the first trace time after it (the next sample
+        of each node, which derived velocities need).
+        """
+        new = []
+        loaded = self._columns[1]
+        after = loaded[loaded > until].min() if (loaded > until).any() else math.inf
+        while not self._exhausted and self._read_until <= after:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+                break
+            new.append(chunk)
+            self._read_until = float(chunk.time[-1])
+            later = chunk.time[chunk.time > until]
+            if len(later):
+                after = min(after, float(later.min()))
+        if not new:
+            return
+        node, time, x, y, vx, vy = self._columns
+        node = np.concatenate([node] + [c.node for c in new])
+        time = np.concatenate([time] + [c.time for c in new])
+        order = np.lexsort((time, node))
+        self._columns = [node[order], time[order]] + [
+            np.concatenate([old] + [getattr(c, name) for c in new])[order]
+            for old, name in zip((x, y, vx, vy), ('x', 'y', 'vx', 'vy'))]
+
+    def prune(self, until):
+        """Drop segments superseded by a later segment of the same node starting by `until`."""
+        node, time = self._columns[0], self._columns[1]
+        superseded = np.zeros(len(node), dtype=bool)
+        superseded[:-1] = (node[1:] == node[:-1]) & (time[1:] <= until)
+        self._columns = [c[~superseded] for c in self._columns]
+
+    def positions(self, nodes, times):
+        """(x, y) of each (node, time) query; NaN before a node's first segment."""
+        node, time, x, y, vx, vy = self._columns
+        if not len(node):
+            return np.full(len(nodes), np.nan), np.full(len(nodes), np.nan)
+        # composite key: node-major, time-minor (times are offset into [0, span])
+        t0 = min(time.min(), times.min())
+        span = max(time.max(), times.max()) - t0 + 1.0
+        keys = node * span + (time - t0)
+        idx = np.searchsorted(keys, nodes * span + (times - t0), side='right') - 1
+        valid = (idx >= 0) & (node[np.maximum(idx, 0)] == nodes)
+        idx = np.maximum(idx, 0)
+
+        # velocities missing from the trace: towards the node's next sample
+        vel_x, vel_y = vx[idx], vy[idx]
+        derive = np.isnan(vel_x)
+        if derive.any():
+            nxt = np.minimum(idx + 1, len(node) - 1)
+            same = (node[nxt] == node[idx]) & (time[nxt] > time[idx])
+            dt = np.where(same, time[nxt] - time[idx], 1.0)
+            vel_x = np.where(derive, np.where(same, (x[nxt] - x[idx]) / dt, 0.0), vel_x)
+            vel_y = np.where(derive, np.where(same, (y[nxt] - y[idx]) / dt, 0.0), vel_y)
+
+        elapsed = times - time[idx]
+        px = np.where(valid, x[idx] + vel_x * elapsed, np.nan)
+        py = np.where(valid, y[idx] + vel_y * elapsed, np.nan)
+        return px, py
+
+
+# ==============================================================================
+# Spatial grid
+# ==============================================================================
+
+class SpatialGrid:
+    """
+    Per-(AC, cell) packet count, latency sum and latency sketch over a grid of
+    square cells; cell (i, j) covers [i, i+1) x [j, j+1) times the cell size.
+    """
+
+    def __init__(self, cell=CELL_M):
+        self.cell = float(cell)
+        self.origin = (0, 0)                  # cell index of array [.., 0, 0]
+        self.count = np.zeros((len(ACS), 0, 0), dtype=np.int64)
+        self.total = np.zeros((len(ACS), 0, 0))
+        self.buckets = np.zeros((len(ACS), 0, 0, N_BUCKETS), dtype=np.int64)
+
+    @property
+    def shape(self):
+        return self.count.shape[1:]
+
+    def extent(self):
+        """(x0, x1, y0, y1) of the grid in metres (imshow extent)."""
+        (iy0, ix0), (ny, nx) = self.origin, self.shape
+        return (ix0 * self.cell, (ix0 + nx) * self.cell,
+                iy0 * self.cell, (iy0 + ny) * self.cell)
+
+    def _grow(self, iy_min, iy_max, ix_min, ix_max):
+        """Pad the arrays so that cell indices [min, max] are inside the grid."""
+        (iy0, ix0), (ny, nx) = self.origin, self.shape
+        if ny and nx:
+            iy_min, ix_min = min(iy_min, iy0), min(ix_min, ix0)
+            iy_max, ix_max = max(iy_max, iy0 + ny - 1), max(ix_max, ix0 + nx - 1)
+        else:
+            iy0, ix0 = iy_min, ix_min
+        pad_y = (iy0 - iy_min, iy_max - iy0 + 1 - ny)
+        pad_x = (ix0 - ix_min, ix_max - ix0 + 1 - nx)
+        if pad_y == (0, 0) and pad_x == (0, 0):
+            return
+        self.count = np.pad(self.count, ((0, 0), pad_y, pad_x))
+        self.total = np.pad(self.total, ((0, 0), pad_y, pad_x))
+        self.buckets = np.pad(self.buckets, ((0, 0), pad_y, pad_x, (0, 0)))
+        self.origin = (iy_min, ix_min)
+
+    def add(self, acs, x, y, latencies):
+        """Bin packets (AC index, position in m, latency in ms); NaN positions are skipped."""
+        keep = ~(np.isnan(x) | np.isnan(y))
+        acs, latencies = acs[keep], latencies[keep]
+        if not len(acs):
+            return
+        ix = np.floor(x[keep] / self.cell).astype(np.int64)
+        iy = np.floor(y[keep] / self.cell).astype(np.int64)
+        self._grow(iy.min(), iy.max(), ix.min(), ix.max())
+        (iy0, ix0), (ny, nx) = self.origin, self.shape
+        flat = (acs.astype(np.int64) * ny + (iy - iy0)) * nx + (ix - ix0)
+        cells = len(ACS) * ny * nx
+        self.count += np.bincount(flat, minlength=cells).reshape(self.count.shape)
+        self.total += np.bincount(flat, weights=latencies, minlength=cells).reshape(self.total.shape)
+        self.buckets += np.bincount(flat * N_BUCKETS + bucket_indices(latencies),
+                                    minlength=cells * N_BUCKETS).reshape(self.buckets.shape)
+
+    def merge(self, other):
+        """Add another grid of the same cell size (grids are aligned by cell index)."""
+        if other.count.size == 0:
+            return self
+        if other.cell != self.cell:
+            raise ValueError(f"Cell sizes differ: {self.cell} vs {other.cell}")
+        (oy, ox), (ny, nx) = other.origin, other.shape
+        self._grow(oy, oy + ny - 1, ox, ox + nx - 1)
+        y0, x0 = oy - self.origin[0], ox - self.origin[1]
+        window = (slice(None), slice(y0, y0 + ny), slice(x0, x0 + nx))
+        self.count[window] += other.count
+        self.total[window] += other.total
+        self.buckets[window] += other.buckets
+        return self
+
+    def mean(self, acs=ACS):
+        """(ny, nx) mean latency (ms) over the given ACs; NaN in empty cells."""
+        rows = [AC_INDEX[ac] for ac in acs]
+        count = self.count[rows].sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, self.total[rows].sum(axis=0) / count, np.nan)
+
+    def quantile(self, q=TAIL_QUANTILE, acs=ACS, min_packets=MIN_TAIL_PACKETS):
+        """(ny, nx) latency quantile (ms) over the given ACs; NaN below min_packets."""
+        rows = [AC_INDEX[ac] for ac in acs]
+        values = bucket_quantiles(self.buckets[rows].sum(axis=0), q)
+        return np.where(self.count[rows].sum(axis=0) >= min_packets, values, np.nan)
+
+
+# ==============================================================================
+# Pipeline
+# ==============================================================================
+
+def bin_point(latency_csv, mobility_path, cell=CELL_M, node_offset=0,
+              chunk_rows=CHUNK_ROWS):
+    """
+    Stream one latency CSV against its mobility trace into a SpatialGrid.
+    Returns (grid, packets that could not be placed).
+    """
+    grid = SpatialGrid(cell)
+    window = TrajectoryWindow(iter_mobility_chunks(mobility_path))
+    label_nodes = np.empty(0, dtype=np.int64)
+    unplaced = 0
+    for chunk in iter_packet_chunks(latency_csv, chunk_rows):
+        if 'time' not in chunk or (chunk['flow'] < 0).any():
+            raise ValueError(f"{latency_csv} needs receive time and flow/STA columns")
+        labels = chunk['flow_labels']
+        if len(labels) > len(label_nodes):
+            label_nodes = np.array([int(label) + node_offset for label in labels],
+                                   dtype=np.int64)
+        times = chunk['time']
+        window.advance(times.max())
+        x, y = window.positions(label_nodes[chunk['flow']], times)
+        grid.add(chunk['ac'], x, y, chunk['latency'])
+        unplaced += int(np.isnan(x).sum())
+        window.prune(times.max())
+    return grid, unplaced
+
+
+def _bin_job(job):
+    point, mobility_path, cell, node_offset = job
+    return point, bin_point(point.path, mobility_path, cell, node_offset)
+
+
+def case_grids(root=RESULTS_ROOT, case='case2', nwifi=None, schedulers=None,
+               cell=CELL_M, node_offset=0, mobility=None, workers=None):
+    """
+    {scheduler: SpatialGrid} of one nwifi, merged over seeds (one process per
+    sweep point). mobility overrides the trace lookup (find_mobility_trace).
+    """
+    points = [p for p in discover_sweep_points(root, [case])
+              if (nwifi is None or p.nwifi == nwifi)
+              and (schedulers is None or p.scheduler in schedulers)]
+    jobs = []
+    for point in points:
+        trace = mobility or find_mobility_trace(os.path.dirname(point.path), root, case)
+        if trace is None:
+            print(f"  no mobility trace for {point.path}, skipped")
+            continue
+        jobs.append((point, trace, cell, node_offset))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        mapped, pool = map(_bin_job, jobs), None
+    else:
+        pool = multiprocessing.Pool(processes=min(workers, len(jobs)))
+        mapped = pool.imap_unordered(_bin_job, jobs)
+
+    grids = {}
+    try:
+        for point, (grid, unplaced) in mapped:
+            grids.setdefault(point.scheduler, SpatialGrid(cell)).merge(grid)
+            if unplaced:
+                print(f"  {point.scheduler} nwifi={point.nwifi} seed={point.seed}: "
+                      f"{unplaced} packets without a known STA position")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return grids
+
+
+def plot_heatmaps(grids, path, acs=ACS, q=TAIL_QUANTILE, title=None):
+    """One row per scheduler: mean and q-quantile latency per cell (shared colour scales)."""
+    import matplotlib.pyplot as plt
+    from figure_specs import STYLE_PROFILES
+
+    schedulers = [s for s, _ in SCHEDULER_FOLDERS.values() if s in grids]
+    panels = [('Mean latency (ms)', lambda g: g.mean(acs)),
+              (f'p{q * 100:g} latency (ms)', lambda g: g.quantile(q, acs))]
+    maps = {s: [fn(grids[s]) for _, fn in panels] for s in schedulers}
+
+    with plt.rc_context(STYLE_PROFILES['complete']):
+        fig, axes = plt.subplots(len(schedulers), len(panels), squeeze=False,
+                                 figsize=(6 * len(panels), 3.6 * len(schedulers)))
+        cmap = plt.get_cmap('viridis').copy()
+        cmap.set_bad('white')
+        for col, (label, _) in enumerate(panels):
+            values = np.concatenate([maps[s][col].ravel() for s in schedulers])
+            vmin, vmax = (np.nanpercentile(values, [1, 99]) if np.isfinite(values).any()
+                          else (0.0, 1.0))
+            for row, scheduler in enumerate(schedulers):
+                ax = axes[row, col]
+                image = ax.imshow(np.ma.masked_invalid(maps[scheduler][col]), origin='lower',
+                                  extent=grids[scheduler].extent(), cmap=cmap,
+                                  vmin=vmin, vmax=vmax, interpolation='nearest')
+                ax.set_title(f'{scheduler}: {label}')
+                ax.set_xlabel('x (m)')
+                ax.set_ylabel('y (m)')
+                fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+        if title:
+            fig.suptitle(title)
+        fig.tight_layout()
+        fig.savefig(path, dpi=150, bbox_inches='tight', facecolor='white')
+        plt.close(fig)
+    print(f"Saved: {os.path.basename(path)}")
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+
+    parser = argparse.ArgumentParser(description='Case 2 spatial latency heatmaps')
+    parser.add_argument('--root', default=RESULTS_ROOT, help='ns-3 results root')
+    parser.add_argument('--case', default='case2')
+    parser.add_argument('--nwifi', type=int, required=True)
+    parser.add_argument('--schedulers', nargs='+', default=None)
+    parser.add_argument('--acs', nargs='+', choices=ACS, default=list(ACS),
+                        help='ACs pooled into the heatmaps')
+    parser.add_argument('--cell', type=float, default=CELL_M, help='cell size (m)')
+    parser.add_argument('--quantile', type=float, default=TAIL_QUANTILE)
+    parser.add_argument('--node-offset', type=int, default=0,
+                        help='mobility node id of flow label 0')
+    parser.add_argument('--mobility', default=None,
+                        help='one mobility trace for every sweep point')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None, help='output PNG')
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"Spatial latency: {args.case} nwifi={args.nwifi}, {args.cell:g} m cells")
+    print("="*70)
+    grids = case_grids(args.root, args.case, args.nwifi, args.schedulers, args.cell,
+                       args.node_offset, args.mobility, args.workers)
+    if not grids:
+        raise SystemExit(f"No {args.case} nwifi={args.nwifi} points with a mobility trace "
+                         f"under {args.root}")
+    for scheduler, grid in grids.items():
+        count = grid.count[[AC_INDEX[ac] for ac in args.acs]].sum()
+        with np.errstate(invalid='ignore'):
+            worst = np.nanmax(grid.mean(args.acs))
+        print(f"{scheduler:<14} {count:>10,} packets, {np.count_nonzero(grid.count.sum(0)):>4} "
+              f"cells, worst cell mean {worst:.3f} ms")
+    acs = ''.join(args.acs) if len(args.acs) < len(ACS) else 'all'
+    out = args.out or os.path.join(
+        OUTPUT_DIR, f'fig_{args.case}_spatial_latency_n{args.nwifi}_{acs}.png')
+    plot_heatmaps(grids, out, args.acs, args.quantile,
+                  title=f'{args.case} nwifi={args.nwifi}: latency by STA position ({acs} ACs)')
+    print("="*70)
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+Surrogate MU-TXOP Scheduler Simulator
+
+A fast, TXOP-level discrete-event model of the case1 downlink scenario, used
+to explore scheduler variants and sweep points without an ns-3 run. It writes
+the same per-packet latency CSVs as ns-3, so its output goes through
+results_ingest.py / results_store.py unchanged:
+
+    <root>/case1/wifi6-3-develop/nwifi=6/seed=1/third_ac_latency.csv
+
+Model (he_phy.py for the airtime constants, scheduler_policies.py for the
+decision rules):
+- Traffic: STA i has one downlink flow of AC VO, VI, BK (cycling over i),
+  Poisson arrivals with the sizes/rates of TRAFFIC; HE-MCS fixed per STA
+- EDCA: every backlogged AC of the AP draws AIFS + uniform backoff over
+  [0, CWmin]; the earliest expiry is the primary AC (ties: higher priority).
+  External (uplink / OBSS) busy periods arrive as a Poisson process and
+  freeze the backoff countdown
+- Secondary AC: highest-priority other backlogged AC at TXOP start
+- Decision: the 12-dim state is built from the queues and passed to the
+  scheduler's policy; allocate() turns the class into users per AC, oldest
+  head-of-line STAs first. An allocator (scheduler 'Oracle': ru_oracle.py)
+  replaces both and picks the users per AC from the queues themselves
+- Queues (Backlog): arrivals are admitted from one time-sorted stream and every
+  AC keeps running totals plus a heap of its backlogged STAs keyed on
+  head-of-line arrival time, so a TXOP costs O(users log n + new arrivals)
+  instead of scans over all STAs; 100-500 STA points run in seconds
+  (`scale` benchmarks them against the nwifi=6..30 points)
+- A-MPDU: every user aggregates up to MAX_AMPDU_MPDUS MPDUs within the primary
+  AC's TXOP limit; the PPDU lasts as long as its longest user
+- Latency: arrival at the AP queue to the end of the PPDU
+
+Not modeled: RU positions (allocate() is capped by what the RU tree can hold,
+he_phy.max_rus(), but users are not assigned subcarriers), PHY
+errors/retries, collisions with other contenders (only their airtime),
+multiple PPDUs per TXOP.
+
+Calibration (`calibrate`) grid-searches the free knobs (load_scale, ul_rate,
+ul_busy_us) against the verified ns-3 means of PBM / MPS / SU / Non-MU-TXOP and
+stores them in surrogate_calibration.json; the airtime floor of the model is
+above the lowest ns-3 latencies, so a per-AC output scale is fitted as well.
+The Non-MU-TXOP nwifi=18 outlier (BK 10 ms) is not reproduced.
+
+The external busy rate grows with nwifi (ul_rate per STA), which alone fills
+the medium from ~50 STAs; ul_max_stas caps the number of STAs it counts so
+scale-out points measure the schedulers rather than that extrapolation.
+
+Usage:
+    python surrogate_sim.py run --scheduler PBM --nwifi 18 --seed 1 --out lat.csv
+    python surrogate_sim.py run --scheduler Oracle --nwifi 18      # exact RU allocation
+    python surrogate_sim.py sweep --root /tmp/surrogate --seeds 1 2 3
+    python surrogate_sim.py sweep --root /tmp/surrogate --nwifi 30 --cache 65536   # memoized
+    python surrogate_sim.py calibrate
+    python surrogate_sim.py scale --nwifi 6 12 18 24 30 100 200 300 400 500
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from metrics_engine import AC_WEIGHTS
+from results_ingest import AC_INDEX, SCHEDULER_FOLDERS
+from results_store import NWIFI_VALUES, VERIFIED_CASE1
+from he_phy import (AC_PRIORITY, BLOCK_ACK_US, EDCA, HE_SU_PREAMBLE_US,
+                    MAX_AMPDU_MPDUS, MPDU_OVERHEAD_BYTES, MU_ACK_US, SIFS_US,
+                    SLOT_US, SYMBOL_US, aifs_us, data_symbols, he_mu_preamble_us,
+                    max_psdu_bytes, psdu_bytes)
+from scheduler_policies import CLASS_ORIGINAL, N_FEATURES, POLICIES, allocate
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'surrogate_calibration.json')
+
+# Downlink traffic per AC: (packet bytes, packets/s per STA)
+TRAFFIC = {
+    'VO': (200, 50),
+    'VI': (1400, 180),
+    'BK': (1500, 100),
+}
+STA_ACS = ('VO', 'VI', 'BK')
+MCS_RANGE = (5, 9)
+
+DURATION_S = 2.0
+
+# Free parameters of the model (overridden by surrogate_calibration.json)
+DEFAULT_PARAMS = {
+    'load_scale': 1.0,        # multiplies every flow's packet rate
+    'ul_rate': 100.0,         # external busy periods per STA per second
+    'ul_busy_us': 200.0,      # airtime of one external busy period
+    'ul_max_stas': None,      # STAs contributing external busy periods (None: all)
+    'scale': {'BK': 1.0, 'VI': 1.0, 'VO': 1.0},   # per-AC output scale
+}
+
+CALIBRATION_GRID = {
+    'load_scale': [0.5, 1.0, 1.5],
+    'ul_rate': [0.0, 50.0, 100.0, 200.0],
+    'ul_busy_us': [100.0, 200.0],
+}
+CALIBRATION_SCHEDULERS = ['PBM', 'MPS', 'SU', 'Non-MU-TXOP']
+
+# Scale-out points beyond the ns-3 sweeps, and the external-traffic cap used there
+SCALE_NWIFI_VALUES = [50, 100, 200, 300, 400, 500]
+SCALE_UL_MAX_STAS = max(NWIFI_VALUES)
+SATURATION = 0.95     # delivered / offered packets below this: queues grow without bound
+
+ORACLE = 'Oracle'     # ru_oracle.RUOracle allocates instead of a decision policy
+
+
+def load_params(path=CALIBRATION_FILE):
+    """DEFAULT_PARAMS updated with the calibrated values, if any."""
+    params = dict(DEFAULT_PARAMS)
+    if os.path.exists(path):
+        with open(path) as f:
+            params.update(json.load(f)['params'])
+    return params
+
+
+class Medium:
+    """External busy periods the AP defers to (uplink and OBSS airtime)."""
+
+    def __init__(self, rng, rate_per_s, busy_us, horizon_us):
+        n = rng.poisson(rate_per_s * horizon_us * 1e-6)
+        self.starts = np.sort(rng.uniform(0, horizon_us, n))
+        # Running max: ends[i] is the end of the busy span that contains starts[i]
+        self.ends = np.maximum.accumulate(self.starts + busy_us) if n else self.starts
+
+    def idle_at(self, t):
+        """First idle instant at or after t."""
+        i = np.searchsorted(self.starts, t, side='right') - 1
+        while i >= 0 and self.ends[i] > t:
+            t = self.ends[i]
+            i = np.searchsorted(self.starts, t, side='right') - 1
+        return t
+
+    def next_busy(self, t):
+        i = np.searchsorted(self.starts, t, side='right')
+        return self.starts[i] if i < len(self.starts) else math.inf
+
+    def access(self, t, aifs, slots):
+        """Time an AIFS + slots backoff started at t expires (frozen while busy)."""
+        while True:
+            t = self.idle_at(t)
+            expiry = t + aifs + slots * SLOT_US
+            busy = self.next_busy(t)
+            if busy >= expiry:
+                return expiry
+            slots -= max(0, int((busy - t - aifs) // SLOT_US))
+            t = busy
+
+
+class Backlog:
+    """
+    The AP's per-STA queues with per-AC aggregates kept up to date
+    incrementally: queued packets, backlogged STAs and their MCS sum, and a
+    heap of (head-of-line arrival time, STA) per AC. Only STAs with packets
+    queued are in a heap, so the oldest head-of-line STAs are popped in
+    O(log n) and nothing scans all STAs per TXOP.
+    """
+
+    def __init__(self, arrivals, sta_ac, mcs):
+        self.arrivals = arrivals
+        self.sta_ac = sta_ac
+        self.mcs = [int(m) for m in mcs]
+        times = np.concatenate(arrivals) if arrivals else np.empty(0)
+        stas = np.repeat(np.arange(len(arrivals)), [len(a) for a in arrivals])
+        order = np.argsort(times, kind='stable')
+        self.times, self.stas = times[order], stas[order]
+        self.admitted = 0                       # arrivals moved into the queues
+        self.head = [0] * len(arrivals)          # next packet to send per STA
+        self.queued = [0] * len(arrivals)
+        self.ac_queued = {ac: 0 for ac in STA_ACS}
+        self.ac_mcs = {ac: 0 for ac in STA_ACS}
+        self.heaps = {ac: [] for ac in STA_ACS}
+
+    def admit(self, t):
+        """Queue every packet that has arrived by t."""
+        end = int(np.searchsorted(self.times, t, side='right'))
+        if end == self.admitted:
+            return
+        stas, counts = np.unique(self.stas[self.admitted:end], return_counts=True)
+        self.admitted = end
+        for i, k in zip(stas.tolist(), counts.tolist()):
+            ac = self.sta_ac[i]
+            if not self.queued[i]:
+                heapq.heappush(self.heaps[ac], (self.arrivals[i][self.head[i]], i))
+                self.ac_mcs[ac] += self.mcs[i]
+            self.queued[i] += k
+            self.ac_queued[ac] += k
+
+    def any_queued(self):
+        return any(self.heaps.values())
+
+    def next_arrival(self):
+        """Arrival time of the next packet not yet queued (None when there is none)."""
+        return float(self.times[self.admitted]) if self.admitted < len(self.times) else None
+
+    def backlogged(self, ac):
+        return bool(self.heaps.get(ac))
+
+    def features(self, primary, secondary, t):
+        """12-dim scheduler state (scheduler_policies.FEATURE_NAMES) at TXOP start t."""
+        f = np.zeros(N_FEATURES)
+        for q, ac in enumerate(('VO', 'VI', 'BE', 'BK')):
+            f[q] = self.ac_queued.get(ac, 0)
+
+        def side(ac):
+            heap = self.heaps[ac]
+            nbytes = self.ac_queued[ac] * TRAFFIC[ac][0]
+            return len(heap), nbytes, t - heap[0][0], self.ac_mcs[ac] / len(heap) / 11
+
+        n_p, bytes_p, wait_p, phy_p = side(primary)
+        f[4], f[8], f[10] = n_p, AC_INDEX[primary], phy_p
+        f[9] = -1
+        if secondary is not None:
+            n_s, bytes_s, wait_s, phy_s = side(secondary)
+            f[5], f[9], f[11] = n_s, AC_INDEX[secondary], phy_s
+            f[6] = bytes_p / bytes_s
+            f[7] = wait_s / (wait_p + wait_s) if wait_p + wait_s > 0 else 0.5
+        return f
+
+    def peek(self, ac, n):
+        """The n STAs of ac oldest() would pop, in the same order, left queued."""
+        return [i for _, i in heapq.nsmallest(n, self.heaps[ac])]
+
+    def oldest(self, ac, n):
+        """Pop the n STAs of ac with the oldest head-of-line packet (give them back with serve)."""
+        heap = self.heaps[ac]
+        return [heapq.heappop(heap)[1] for _ in range(min(n, len(heap)))]
+
+    def serve(self, i, k):
+        """Dequeue k packets of STA i (popped by oldest) and return their arrival times."""
+        ac, h = self.sta_ac[i], self.head[i]
+        self.head[i] = h + k
+        self.queued[i] -= k
+        self.ac_queued[ac] -= k
+        if self.queued[i]:
+            heapq.heappush(self.heaps[ac], (self.arrivals[i][h + k], i))
+        else:
+            self.ac_mcs[ac] -= self.mcs[i]
+        return self.arrivals[i][h:h + k]
+
+
+def offered_packets(nwifi, duration_s=DURATION_S, params=None):
+    """Expected number of packets arriving in a run (for saturation checks)."""
+    params = load_params() if params is None else params
+    rate = sum(TRAFFIC[STA_ACS[i % len(STA_ACS)]][1] for i in range(nwifi))
+    return rate * params['load_scale'] * duration_s
+
+
+def simulate(scheduler, nwifi, seed=1, duration_s=DURATION_S, params=None, policy=None,
+             allocator=None):
+    """
+    Run one sweep point. Returns (flow, ac, latency_ms) arrays of every
+    delivered packet in delivery order; ac holds AC names.
+    policy overrides the scheduler's rules with any (N, 12) -> (N,) decision
+    function, e.g. a trained mlp_inference.MLPPolicy.
+    allocator replaces decision and allocate(): (backlog, primary AC, secondary
+    AC) -> (HE SU PPDU?, p_ru, p_users, s_ru, s_users), e.g. ru_oracle.RUOracle
+    (the default for scheduler ORACLE).
+    """
+    params = load_params() if params is None else params
+    if allocator is None and scheduler == ORACLE:
+        from ru_oracle import RUOracle
+        allocator = RUOracle()
+    elif allocator is None:
+        policy = POLICIES[scheduler] if policy is None else policy
+    rng = np.random.default_rng([seed, nwifi])
+    horizon = duration_s * 1e6
+
+    sta_ac = [STA_ACS[i % len(STA_ACS)] for i in range(nwifi)]
+    mcs = rng.integers(MCS_RANGE[0], MCS_RANGE[1] + 1, nwifi)
+    arrivals = []
+    for ac in sta_ac:
+        n = rng.poisson(TRAFFIC[ac][1] * params['load_scale'] * duration_s)
+        arrivals.append(np.sort(rng.uniform(0, horizon, n)))
+    ul_stas = nwifi if params.get('ul_max_stas') is None else min(nwifi, params['ul_max_stas'])
+    medium = Medium(rng, params['ul_rate'] * ul_stas, params['ul_busy_us'], horizon)
+    backlog = Backlog(arrivals, sta_ac, mcs)
+
+    flows, acs, latencies = [], [], []
+    t = 0.0
+    while t < horizon:
+        backlog.admit(t)
+        if not backlog.any_queued():
+            t = backlog.next_arrival()
+            if t is None:
+                break
+            continue
+
+        # EDCA contention between the AP's backlogged ACs
+        backlogged = [ac for ac in AC_PRIORITY if backlog.backlogged(ac)]
+        expiry = {ac: medium.access(t, aifs_us(ac), rng.integers(0, EDCA[ac][1] + 1))
+                  for ac in backlogged}
+        primary = min(backlogged, key=expiry.get)
+        t_tx = expiry[primary]
+
+        backlog.admit(t_tx)
+        secondary = next((ac for ac in AC_PRIORITY if ac != primary
+                          and backlog.backlogged(ac)), None)
+        if allocator is None:
+            state = backlog.features(primary, secondary, t_tx)
+            cls = int(policy(state)[0])
+            su = cls == CLASS_ORIGINAL
+            p_ru, p_users, s_ru, s_users = allocate(cls, state[4], state[5])
+        else:
+            su, p_ru, p_users, s_ru, s_users = allocator(backlog, primary, secondary)
+        users = []
+        for ac, ru, n_users in ((primary, p_ru, p_users), (secondary, s_ru, s_users)):
+            if n_users:
+                users += [(i, ru) for i in backlog.oldest(ac, int(n_users))]
+
+        if su:
+            preamble, ack = HE_SU_PREAMBLE_US, BLOCK_ACK_US
+        else:
+            preamble, ack = he_mu_preamble_us(len(users)), MU_ACK_US
+        budget = EDCA[primary][3] - preamble - SIFS_US - ack
+
+        symbols, sent = 0, []
+        for i, ru in users:
+            size = TRAFFIC[sta_ac[i]][0]
+            fit = max_psdu_bytes(budget, ru, mcs[i]) // (size + MPDU_OVERHEAD_BYTES)
+            if fit < 1:
+                continue                # not one MPDU fits the TXOP: the user waits
+            k = int(min(backlog.queued[i], MAX_AMPDU_MPDUS, fit))
+            symbols = max(symbols, data_symbols(psdu_bytes(k, k * size), ru, mcs[i]))
+            sent.append((i, k))
+
+        t_rx = t_tx + preamble + symbols * SYMBOL_US
+        for i, k in sent:
+            scale = params['scale'][sta_ac[i]]
+            latencies.append((t_rx - backlog.serve(i, k)) * 1e-3 * scale)
+            flows.append(np.full(k, i))
+            acs.append(np.full(k, sta_ac[i]))
+        t = t_rx + SIFS_US + ack
+
+    if not latencies:
+        return np.array([], dtype=np.int64), np.array([]), np.array([])
+    return np.concatenate(flows), np.concatenate(acs), np.concatenate(latencies)
+
+
+def write_latency_csv(path, flows, acs, latencies):
+    """Per-packet CSV in the long format read by results_ingest.py."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('flow,ac,latency_ms\n')
+        f.writelines(f'{flow},AC_{ac},{lat:.6f}\n'
+                     for flow, ac, lat in zip(flows, acs, latencies))
+
+
+def result_path(root, scheduler, nwifi, seed, case='case1'):
+    """Where ns-3 would put this sweep point (see SCHEDULER_FOLDERS)."""
+    folder, prefix = next((folder, prefix) for folder, (name, prefix)
+                          in SCHEDULER_FOLDERS.items() if name == scheduler)
+    return os.path.join(root, case, folder, f'nwifi={nwifi}', f'seed={seed}',
+                        f'{prefix}ac_latency.csv')
+
+
+def ac_means(flows, acs, latencies):
+    """{ac: mean latency (ms)} of one run."""
+    return {ac: float(latencies[acs == ac].mean()) for ac in STA_ACS if (acs == ac).any()}
+
+
+def _run_point(job):
+    scheduler, nwifi, seed, duration_s, params, root = job[:6]
+    policy = None
+    if len(job) > 6 and job[6]:                 # decision_cache.CachedPolicy arguments
+        from decision_cache import CachedPolicy
+        policy = CachedPolicy(POLICIES[scheduler], **job[6])
+    flows, acs, latencies = simulate(scheduler, nwifi, seed, duration_s, params, policy)
+    if root is None:
+        return job[:3], ac_means(flows, acs, latencies)
+    path = result_path(root, scheduler, nwifi, seed)
+    write_latency_csv(path, flows, acs, latencies)
+    return job[:3], path
+
+
+def run_jobs(jobs, workers=None):
+    """
+    Run (scheduler, nwifi, seed, duration_s, params, root[, cache]) jobs on a
+    process pool; cache is a dict of decision_cache.CachedPolicy arguments.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        return [_run_point(job) for job in jobs]
+    with multiprocessing.Pool(processes=min(workers, len(jobs))) as pool:
+        return pool.map(_run_point, jobs)
+
+
+def calibrate(duration_s=1.0, seeds=(1,), workers=None, grid=CALIBRATION_GRID):
+    """
+    Grid-search the free parameters against VERIFIED_CASE1['mean'].
+    Objective: median |log(sim / ns-3)| over schedulers x nwifi x AC, after
+    fitting the per-AC output scale (geometric mean ratio) for each grid point.
+    Raises ValueError if every grid point saturates.
+    """
+    names = list(grid)
+    target = VERIFIED_CASE1['mean']
+    best = None
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(DEFAULT_PARAMS, **dict(zip(names, values)),
+                      scale={ac: 1.0 for ac in STA_ACS})
+        jobs = [(s, n, seed, duration_s, params, None)
+                for s in CALIBRATION_SCHEDULERS for n in NWIFI_VALUES for seed in seeds]
+        sim = {}
+        for (s, n, _), means in run_jobs(jobs, workers):
+            for ac, v in means.items():
+                sim.setdefault((s, n, ac), []).append(v)
+        if len(sim) < len(CALIBRATION_SCHEDULERS) * len(NWIFI_VALUES) * len(STA_ACS):
+            print(f"  {dict(zip(names, values))}: saturated (an AC delivered nothing)")
+            continue
+        log_ratio = {ac: np.array([math.log(target[s][ac][j] / np.mean(sim[(s, n, ac)]))
+                                   for s in CALIBRATION_SCHEDULERS
+                                   for j, n in enumerate(NWIFI_VALUES)])
+                     for ac in STA_ACS}
+        scale = {ac: float(np.exp(np.median(r))) for ac, r in log_ratio.items()}
+        error = float(np.median(np.abs(np.concatenate(
+            [r - math.log(scale[ac]) for ac, r in log_ratio.items()]))))
+        print(f"  {dict(zip(names, values))}: median |log ratio| = {error:.3f}")
+        if best is None or error < best[0]:
+            best = (error, dict(params, scale=scale))
+    if best is None:
+        raise ValueError(f"every calibration grid point saturated ({duration_s:g} s, seeds "
+                         f"{list(seeds)}): {', '.join(f'{k}={v}' for k, v in grid.items())}")
+    return best
+
+
+def print_comparison(params, duration_s=DURATION_S, seeds=(1,), workers=None):
+    """Surrogate vs ns-3 mean latency for the calibration schedulers."""
+    jobs = [(s, n, seed, duration_s, params, None)
+            for s in CALIBRATION_SCHEDULERS for n in NWIFI_VALUES for seed in seeds]
+    sim = {}
+    for (s, n, _), means in run_jobs(jobs, workers):
+        for ac, v in means.items():
+            sim.setdefault((s, n, ac), []).append(v)
+    print(f"{'Method':<14}{'AC':<4}" + "".join(f"{n:>14}" for n in NWIFI_VALUES))
+    print("-"*88)
+    for s in CALIBRATION_SCHEDULERS:
+        for ac in ('BK', 'VI', 'VO'):
+            cells = [f"{np.mean(sim[(s, n, ac)]):.3f}/{VERIFIED_CASE1['mean'][s][ac][j]:.3f}"
+                     for j, n in enumerate(NWIFI_VALUES)]
+            print(f"{s:<14}{ac:<4}" + "".join(f"{c:>14}" for c in cells))
+    print("(surrogate / ns-3, ms)")
+
+
+def _scale_point(job):
+    scheduler, nwifi, seed, duration_s, params = job
+    start = time.perf_counter()
+    flows, acs, latencies = simulate(scheduler, nwifi, seed, duration_s, params)
+    seconds = time.perf_counter() - start
+    means = ac_means(flows, acs, latencies)
+    weighted = (sum(AC_WEIGHTS[ac] * means[ac] for ac in STA_ACS)
+                if len(means) == len(STA_ACS) else math.nan)
+    p99 = float(np.percentile(latencies, 99)) if len(latencies) else math.nan
+    delivered = len(latencies) / offered_packets(nwifi, duration_s, params)
+    return (scheduler, nwifi, seed), (weighted, p99, delivered, seconds)
+
+
+def scale_benchmark(schedulers=CALIBRATION_SCHEDULERS, nwifi_values=NWIFI_VALUES + SCALE_NWIFI_VALUES,
+                    seeds=(1,), duration_s=1.0, params=None, workers=None):
+    """
+    {(scheduler, nwifi): (weighted latency, p99, delivered fraction, seconds
+    per run)}, averaged over seeds.
+    """
+    params = load_params() if params is None else params
+    jobs = [(s, n, seed, duration_s, params)
+            for s in schedulers for n in nwifi_values for seed in seeds]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        results = [_scale_point(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(processes=min(workers, len(jobs))) as pool:
+            results = pool.map(_scale_point, jobs)
+    runs = {}
+    for (s, n, _), values in results:
+        runs.setdefault((s, n), []).append(values)
+    return {key: tuple(float(np.mean(column)) for column in zip(*values))
+            for key, values in runs.items()}
+
+
+def break_point(table, scheduler, nwifi_values):
+    """First nwifi whose delivered fraction drops below SATURATION (None if none does)."""
+    return next((n for n in nwifi_values if table[(scheduler, n)][2] < SATURATION), None)
+
+
+def print_scale(table, schedulers, nwifi_values):
+    """Weighted latency vs nwifi per scheduler, with saturation marks and run times."""
+    print(f"{'nwifi':>6}" + "".join(f"{s:>16}" for s in schedulers) + f"{'s/run':>9}")
+    print("-"*(15 + 16 * len(schedulers)))
+    for n in nwifi_values:
+        cells = []
+        for s in schedulers:
+            weighted, _, delivered, _ = table[(s, n)]
+            mark = '*' if delivered < SATURATION else ' '
+            cells.append(f"{weighted:>9.3f}{mark} {delivered:>4.0%}")
+        seconds = np.mean([table[(s, n)][3] for s in schedulers])
+        print(f"{n:>6}" + "".join(f"{c:>16}" for c in cells) + f"{seconds:>9.2f}")
+    print(f"(weighted latency ms, delivered / offered packets; * saturated, "
+          f"below {SATURATION:.0%})")
+    for s in schedulers:
+        n_base = next((n for n in nwifi_values if n in NWIFI_VALUES), nwifi_values[0])
+        n_break = break_point(table, s, nwifi_values)
+        before = [n for n in nwifi_values if n_break is None or n < n_break]
+        growth = (f"weighted latency x{table[(s, before[-1])][0] / table[(s, n_base)][0]:.1f} "
+                  f"from nwifi={n_base} to nwifi={before[-1]}" if before
+                  else "no unsaturated point")
+        saturation = (f"saturates at nwifi={n_break}" if n_break
+                      else f"unsaturated up to nwifi={nwifi_values[-1]}")
+        print(f"  {s:<12} {saturation}; {growth}")
+
+
+def plot_scale(table, schedulers, nwifi_values, path):
+    """Weighted latency vs nwifi (log y), saturated points hollow."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for s in schedulers:
+        values = [table[(s, n)][0] for n in nwifi_values]
+        line, = ax.plot(nwifi_values, values, marker='o', label=s)
+        saturated = [n for n in nwifi_values if table[(s, n)][2] < SATURATION]
+        ax.plot(saturated, [table[(s, n)][0] for n in saturated], 'o',
+                markerfacecolor='white', color=line.get_color())
+    ax.axvspan(min(NWIFI_VALUES), max(NWIFI_VALUES), color='grey', alpha=0.1,
+               label='ns-3 sweep range')
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('Total STA Number')
+    ax.set_ylabel('Weighted Latency (ms)')
+    ax.set_title('Surrogate scale-out (hollow: saturated)')
+    ax.legend(loc='upper left')
+    ax.grid(True, which='both', alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+    print(f"Saved: {path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Surrogate MU-TXOP scheduler simulator')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='simulate one sweep point')
+    run.add_argument('--scheduler', choices=[s for s, _ in SCHEDULER_FOLDERS.values()] + [ORACLE],
+                     default='PBM', help='ML schedulers need --weights')
+    run.add_argument('--weights', help='MLP weights (.pth/.h/.npz) to decide with')
+    run.add_argument('--nwifi', type=int, default=18)
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--duration', type=float, default=DURATION_S, help='seconds')
+    run.add_argument('--out', help='per-packet latency CSV to write')
+    sweep = sub.add_parser('sweep', help='simulate a sweep into an ns-3 style results tree')
+    sweep.add_argument('--root', required=True)
+    sweep.add_argument('--schedulers', nargs='+', choices=list(POLICIES),
+                       default=list(POLICIES))
+    sweep.add_argument('--nwifi', nargs='+', type=int, default=NWIFI_VALUES)
+    sweep.add_argument('--seeds', nargs='+', type=int, default=[1])
+    sweep.add_argument('--duration', type=float, default=DURATION_S)
+    sweep.add_argument('--workers', type=int, default=None)
+    for p in (run, sweep):
+        p.add_argument('--cache', type=int, default=0, metavar='STATES',
+                       help='memoize decisions on discretized states (decision_cache.py)')
+        p.add_argument('--cache-kind', choices=['lru', 'arc'], default='lru')
+    scale = sub.add_parser('scale', help='benchmark the schedulers from nwifi=6 to 500')
+    scale.add_argument('--schedulers', nargs='+', choices=CALIBRATION_SCHEDULERS + [ORACLE],
+                       default=CALIBRATION_SCHEDULERS)
+    scale.add_argument('--nwifi', nargs='+', type=int, default=NWIFI_VALUES + SCALE_NWIFI_VALUES)
+    scale.add_argument('--seeds', nargs='+', type=int, default=[1])
+    scale.add_argument('--duration', type=float, default=1.0)
+    scale.add_argument('--ul-max-stas', type=int, default=SCALE_UL_MAX_STAS,
+                       help='STAs contributing external busy periods (0: all)')
+    scale.add_argument('--workers', type=int, default=None)
+    scale.add_argument('--plot', metavar='PNG', help='also plot latency vs nwifi')
+    cal = sub.add_parser('calibrate', help='fit the model knobs to the ns-3 means')
+    cal.add_argument('--duration', type=float, default=1.0)
+    cal.add_argument('--seeds', nargs='+', type=int, default=[1])
+    cal.add_argument('--workers', type=int, default=None)
+    cal.add_argument('--output', default=CALIBRATION_FILE)
+    args = parser.parse_args()
+
+    print("="*70)
+    if args.command == 'run':
+        policy = None
+        if args.weights:
+            from mlp_inference import MLPPolicy
+            policy = MLPPolicy.load(args.weights)
+        elif args.scheduler not in POLICIES and args.scheduler != ORACLE:
+            parser.error(f'--scheduler {args.scheduler} needs --weights')
+        if args.cache and args.scheduler == ORACLE:
+            parser.error('--cache memoizes decision policies, not the Oracle allocator')
+        if args.cache:
+            from decision_cache import CachedPolicy
+            policy = CachedPolicy(POLICIES[args.scheduler] if policy is None else policy,
+                                  args.cache, args.cache_kind)
+        flows, acs, latencies = simulate(args.scheduler, args.nwifi, args.seed, args.duration,
+                                         policy=policy)
+        print(f"{args.scheduler}, nwifi={args.nwifi}, seed={args.seed}: "
+              f"{len(latencies)} packets in {args.duration:g} s")
+        for ac, mean in ac_means(flows, acs, latencies).items():
+            print(f"  AC_{ac}: {mean:.3f} ms")
+        if args.cache:
+            stats = policy.stats()
+            print(f"Decision cache: {stats['hit_rate']:.2%} hits, {stats['size']:,} states, "
+                  f"{stats['evictions']:,} evictions")
+        if args.out:
+            write_latency_csv(args.out, flows, acs, latencies)
+            print(f"Saved: {args.out}")
+    elif args.command == 'sweep':
+        params = load_params()
+        cache = {'capacity': args.cache, 'kind': args.cache_kind} if args.cache else None
+        jobs = [(s, n, seed, args.duration, params, args.root, cache)
+                for s in args.schedulers for n in args.nwifi for seed in args.seeds]
+        for (s, n, seed), path in run_jobs(jobs, args.workers):
+            print(f"Saved: {path}")
+        print(f"{len(jobs)} sweep points; ingest with: python results_store.py build {args.root}")
+    elif args.command == 'scale':
+        params = dict(load_params(), ul_max_stas=args.ul_max_stas or None)
+        nwifi_values = sorted(args.nwifi)
+        print(f"Scale-out: {len(args.schedulers)} schedulers x {len(nwifi_values)} nwifi, "
+              f"{args.duration:g} s, external traffic from {args.ul_max_stas or 'all'} STAs")
+        print("-"*70)
+        start = time.perf_counter()
+        table = scale_benchmark(args.schedulers, nwifi_values, args.seeds, args.duration,
+                                params, args.workers)
+        print_scale(table, args.schedulers, nwifi_values)
+        print(f"Total: {time.perf_counter() - start:.1f} s")
+        if args.plot:
+            plot_scale(table, args.schedulers, nwifi_values, args.plot)
+    else:
+        print("Calibrating against VERIFIED_CASE1 means")
+        try:
+            error, params = calibrate(args.duration, args.seeds, args.workers)
+        except ValueError as e:
+            raise SystemExit(f"Calibration failed: {e}; {args.output} left unchanged")
+        with open(args.output, 'w') as f:
+            json.dump({'median_abs_log_ratio': error, 'params': params}, f, indent=2)
+        print(f"Saved: {args.output} (median |log ratio| = {error:.3f})")
+        print("-"*70)
+        print_comparison(params, args.duration, args.seeds, args.workers)
+    print("="*70)
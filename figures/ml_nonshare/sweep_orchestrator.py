@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Resumable ns-3 Sweep Orchestrator
+
+Expands a sweep matrix (case × scheduler × nwifi × seed) into simulator jobs,
+runs them on a bounded worker pool and streams every finished CSV into the
+ingester (results_ingest.py), replacing hand-launched runs per folder and the
+'nwifi=30new' style rerun bookkeeping.
+
+Each job runs the simulator command in a scratch directory next to its final
+location and is moved into the ns-3 results layout only when it succeeds:
+
+    <root>/<case>/<folder>/nwifi=<n>/.seed=<s>.partial/   (while running)
+    <root>/<case>/<folder>/nwifi=<n>/seed=<s>/<prefix>ac_latency.csv
+
+Jobs are identified by a config hash over (case, scheduler, nwifi, seed,
+command, extra parameters): duplicate matrix entries (and aliases such as
+B0-NonShare) run once, and a point whose command or parameters changed is
+rerun and replaces the old result. Outcomes are appended to
+<root>/.sweep/journal.jsonl, so after a crash or Ctrl-C the same command
+resumes with the jobs that have no successful journal entry; stale .partial
+directories are discarded.
+
+The simulator command is a template formatted per job with {case},
+{scheduler}, {folder}, {prefix}, {nwifi}, {seed}, {out_dir} (the scratch
+directory, also the working directory) and {python}. The simulator must leave
+a *ac_latency.csv in {out_dir}. --stub uses surrogate_sim.py as the simulator,
+so the orchestrator can be exercised without ns-3.
+
+Usage:
+    python sweep_orchestrator.py --root /tmp/sweep --stub --seeds 1 2 3
+    python sweep_orchestrator.py --root "$NS3_RESULTS_ROOT" --workers 8 \\
+        --command 'cd ~/ns-3/{folder} && ./waf --run "mu-txop --nWifi={nwifi} \\
+                   --RngRun={seed} --outDir={out_dir}"'
+    python sweep_orchestrator.py --root /tmp/sweep --stub --store   # + results store
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from results_ingest import SCHEDULER_ALIASES, SCHEDULER_FOLDERS, ingest_csv
+from results_store import NWIFI_VALUES, RESULTS_STORE, ResultsStore
+
+JOURNAL_DIR = '.sweep'
+JOURNAL_FILE = 'journal.jsonl'
+
+STUB_COMMAND = ('{python} ' + os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                           'surrogate_sim.py') +
+                ' run --scheduler {scheduler} --nwifi {nwifi} --seed {seed}'
+                ' --duration {duration} --out {out_dir}/{prefix}ac_latency.csv')
+
+# Schedulers surrogate_sim.py models (the only ones --stub can run)
+STUB_SCHEDULERS = ('PBM', 'MPS', 'SU', 'Non-MU-TXOP')
+
+# scheduler -> (folder, csv prefix)
+SCHEDULER_DIRS = {scheduler: (folder, prefix)
+                  for folder, (scheduler, prefix) in SCHEDULER_FOLDERS.items()}
+
+Job = namedtuple('Job', 'case scheduler nwifi seed command params key')
+
+
+def config_hash(case, scheduler, nwifi, seed, command, params):
+    """Stable hash of everything that determines a job's output."""
+    config = {'case': case, 'scheduler': scheduler, 'nwifi': nwifi, 'seed': seed,
+              'command': command, 'params': params}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def expand_matrix(cases, schedulers, nwifi_values, seeds, command, params=None):
+    """
+    Sweep matrix -> list of unique Jobs, in matrix order.
+    Alias schedulers (SCHEDULER_ALIASES) map onto their source scheduler.
+    """
+    params = params or {}
+    jobs = {}
+    for case in cases:
+        for scheduler in schedulers:
+            scheduler = SCHEDULER_ALIASES.get(scheduler, scheduler)
+            if scheduler not in SCHEDULER_DIRS:
+                raise KeyError(f"No results folder for scheduler {scheduler!r}")
+            for nwifi in nwifi_values:
+                for seed in seeds:
+                    key = config_hash(case, scheduler, nwifi, seed, command, params)
+                    jobs.setdefault(key, Job(case, scheduler, nwifi, seed,
+                                             command, params, key))
+    return list(jobs.values())
+
+
+def stub_schedulers(schedulers):
+    """
+    The schedulers (or aliases of them) that --stub can run, in order. Warns on
+    stderr about the dropped ones and exits if none is left.
+    """
+    kept = [s for s in schedulers if SCHEDULER_ALIASES.get(s, s) in STUB_SCHEDULERS]
+    dropped = [s for s in schedulers if s not in kept]
+    if dropped:
+        print(f"Warning: --stub skips {', '.join(dropped)} (surrogate_sim.py models only "
+              f"{', '.join(STUB_SCHEDULERS)})", file=sys.stderr)
+    if not kept:
+        raise SystemExit(f"--stub cannot run any of {', '.join(schedulers)}")
+    return kept
+
+
+def point_dir(root, job):
+    folder, _ = SCHEDULER_DIRS[job.scheduler]
+    return os.path.join(root, job.case, folder, f'nwifi={job.nwifi}')
+
+
+def result_dir(root, job):
+    return os.path.join(point_dir(root, job), f'seed={job.seed}')
+
+
+def _find_csv(directory):
+    names = sorted(n for n in os.listdir(directory) if n.endswith('ac_latency.csv'))
+    return os.path.join(directory, names[0]) if names else None
+
+
+class Journal:
+    """
+    Append-only record of job outcomes (one JSON object per line).
+    A truncated last line from a crash is ignored on load.
+    """
+
+    def __init__(self, root):
+        self.path = os.path.join(root, JOURNAL_DIR, JOURNAL_FILE)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.done = {}        # (case, scheduler, nwifi, seed) -> entry of last success
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry['status'] == 'ok':
+                        self.done[tuple(entry['point'])] = entry
+
+    def completed(self, root, job):
+        """True if this exact config already finished and its CSV is still there."""
+        entry = self.done.get((job.case, job.scheduler, job.nwifi, job.seed))
+        return (entry is not None and entry['key'] == job.key
+                and os.path.exists(os.path.join(root, entry['csv'])))
+
+    def record(self, job, status, seconds, csv=None, error=None):
+        entry = {'key': job.key, 'point': [job.case, job.scheduler, job.nwifi, job.seed],
+                 'status': status, 'seconds': round(seconds, 3), 'csv': csv,
+                 'error': error, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if status == 'ok':
+                self.done[tuple(entry['point'])] = entry
+
+
+def run_job(root, job, timeout=None):
+    """
+    Run one simulator job into its scratch directory and move it into place.
+    Returns (status, seconds, csv path relative to root or None, error or None);
+    an exception (bad command template, filesystem error, ...) is returned as
+    a 'failed' status so that the rest of the sweep goes on.
+    """
+    start = time.perf_counter()
+    try:
+        return _run_job(root, job, timeout)
+    except Exception as e:
+        return 'failed', time.perf_counter() - start, None, f'{type(e).__name__}: {e}'
+
+
+def _run_job(root, job, timeout):
+    folder, prefix = SCHEDULER_DIRS[job.scheduler]
+    scratch = os.path.join(point_dir(root, job), f'.seed={job.seed}.partial')
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+
+    command = job.command.format(
+        case=job.case, scheduler=job.scheduler, folder=folder, prefix=prefix,
+        nwifi=job.nwifi, seed=job.seed, out_dir=scratch, python=sys.executable,
+        **job.params)
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(command, shell=True, cwd=scratch, timeout=timeout,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    except subprocess.TimeoutExpired:
+        return 'failed', time.perf_counter() - start, None, f'timeout after {timeout}s'
+    seconds = time.perf_counter() - start
+
+    if proc.returncode != 0:
+        tail = '\n'.join(proc.stdout.strip().splitlines()[-5:])
+        return 'failed', seconds, None, f'exit {proc.returncode}: {tail}'
+    if _find_csv(scratch) is None:
+        return 'failed', seconds, None, 'no *ac_latency.csv written'
+
+    final = result_dir(root, job)
+    if os.path.exists(final):
+        shutil.rmtree(final)
+    os.replace(scratch, final)
+    return 'ok', seconds, os.path.relpath(_find_csv(final), root), None
+
+
+def run_sweep(root, jobs, workers=None, timeout=None, ingest=True, verbose=True):
+    """
+    Run every job without a successful journal entry on a pool of `workers`
+    simulator processes. With ingest, every finished CSV (including those of
+    earlier runs that are skipped) is reduced by results_ingest.ingest_csv as
+    soon as it is available.
+
+    Returns (results, failed): results is {(case, scheduler, nwifi, seed, ac):
+    LatencyAggregate} as from results_ingest.ingest_points(), failed the list of
+    (job, error) that did not complete.
+    """
+    workers = workers or os.cpu_count() or 1
+    journal = Journal(root)
+    results, failed = {}, []
+
+    def collect(job, csv):
+        if not ingest:
+            return
+        for ac, agg in ingest_csv(os.path.join(root, csv)).items():
+            results[(job.case, job.scheduler, job.nwifi, job.seed, ac)] = agg
+
+    pending = []
+    for job in jobs:
+        if journal.completed(root, job):
+            collect(job, journal.done[(job.case, job.scheduler, job.nwifi, job.seed)]['csv'])
+        else:
+            pending.append(job)
+    if verbose:
+        print(f"Jobs: {len(jobs)} ({len(jobs) - len(pending)} already done, "
+              f"{len(pending)} to run on {min(workers, max(len(pending), 1))} workers)")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending) or 1))) as pool:
+        futures = {pool.submit(run_job, root, job, timeout): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            status, seconds, csv, error = future.result()
+            journal.record(job, status, seconds, csv, error)
+            if verbose:
+                print(f"  {seconds:>7.2f}s  {status:<6} {job.case} {job.scheduler} "
+                      f"nwifi={job.nwifi} seed={job.seed}")
+                if error:
+                    print("           " + error.replace('\n', '\n           '))
+            if status == 'ok':
+                collect(job, csv)
+            else:
+                failed.append((job, error))
+
+    for alias, source in SCHEDULER_ALIASES.items():
+        for (case, scheduler, nwifi, seed, ac), agg in list(results.items()):
+            if scheduler == source:
+                results[(case, alias, nwifi, seed, ac)] = agg
+    return results, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Resumable parallel ns-3 sweep')
+    parser.add_argument('--root', required=True, help='results root to fill')
+    parser.add_argument('--cases', nargs='+', default=['case1'])
+    parser.add_argument('--schedulers', nargs='+',
+                        default=[s for s, _ in SCHEDULER_FOLDERS.values()])
+    parser.add_argument('--nwifi', nargs='+', type=int, default=NWIFI_VALUES)
+    parser.add_argument('--seeds', nargs='+', type=int, default=[1])
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--command', help='simulator command template (see module doc)')
+    group.add_argument('--stub', action='store_true',
+                       help='use surrogate_sim.py as the simulator (no ns-3)')
+    parser.add_argument('--duration', type=float, default=1.0,
+                        help='simulated seconds per --stub run')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='concurrent simulator processes (default: all cores)')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds per job')
+    parser.add_argument('--store', nargs='?', const=True, default=None,
+                        help='write the ingested results to a results store '
+                             f'(default path: {RESULTS_STORE})')
+    args = parser.parse_args()
+
+    if args.stub:
+        command, params = STUB_COMMAND, {'duration': args.duration}
+        args.schedulers = stub_schedulers(args.schedulers)
+    else:
+        command, params = args.command, {}
+
+    print("="*70)
+    print(f"Sweep into {args.root}")
+    print("="*70)
+    jobs = expand_matrix(args.cases, args.schedulers, args.nwifi, args.seeds,
+                         command, params)
+    start = time.perf_counter()
+    results, failed = run_sweep(args.root, jobs, args.workers, args.timeout,
+                                ingest=args.store is not None)
+    print("-"*70)
+    print(f"Wall time: {time.perf_counter() - start:.2f}s, failed: {len(failed)}")
+    if args.store is not None and results:
+        store = ResultsStore.write(
+            results, args.store if isinstance(args.store, str) else RESULTS_STORE)
+        print(f"Saved: {store.path} ({store.rows} rows)")
+    print("="*70)
+    sys.exit(1 if failed else 0)